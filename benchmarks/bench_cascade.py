@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark cascaded multi-size resize against the direct path.
+
+Generates a textured JPEG, runs resize_image() with and without cascade,
+and reports wall time plus the per-size difference between the two outputs
+(mean absolute error and PSNR), so the speed/quality trade-off can be judged.
+
+Usage:
+    python benchmarks/bench_cascade.py
+    python benchmarks/bench_cascade.py --megapixels 24 --widths 2400,1600,1200,800,400
+"""
+
+import argparse
+import math
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, ImageChops, ImageStat
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ipro import resize_image, parse_sizes  # noqa: E402
+
+
+def make_textured_jpeg(path, megapixels):
+    """Create a 3:2 JPEG with gradients and noise (worst case for resampling)."""
+    width = int(math.sqrt(megapixels * 1_000_000 * 3 / 2))
+    height = width * 2 // 3
+    size = (width, height)
+    bands = (
+        Image.linear_gradient('L').resize(size),
+        Image.effect_noise(size, 64),
+        Image.radial_gradient('L').resize(size),
+    )
+    Image.merge('RGB', bands).save(path, 'JPEG', quality=95)
+    return size
+
+
+def image_difference(path_a, path_b):
+    """Return (mean absolute error, PSNR in dB) between two images."""
+    with Image.open(path_a) as a, Image.open(path_b) as b:
+        diff = ImageChops.difference(a.convert('RGB'), b.convert('RGB'))
+        stat = ImageStat.Stat(diff)
+        mae = sum(stat.mean) / len(stat.mean)
+        mse = sum(stat.sum2) / (len(stat.sum2) * a.size[0] * a.size[1])
+    psnr = float('inf') if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+    return mae, psnr
+
+
+def time_resize(source, output_dir, sizes, runs, **kwargs):
+    """Run resize_image `runs` times and return (best seconds, created files)."""
+    best = float('inf')
+    created = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        created, _ = resize_image(source, output_dir, sizes, dimension='width', **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, created
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--megapixels', type=float, default=12,
+                        help='Size of the synthetic source image (default: 12)')
+    parser.add_argument('--widths', type=parse_sizes, default=parse_sizes('2400,1600,1200,800,400'),
+                        help='Comma-separated output widths')
+    parser.add_argument('--runs', type=int, default=3, help='Timed runs per mode (best is kept)')
+    parser.add_argument('--draft', action='store_true',
+                        help='Enable reduced-scale JPEG decoding in both modes')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        source = tmp / 'source.jpg'
+        width, height = make_textured_jpeg(source, args.megapixels)
+        print(f"Source: {width}x{height} ({width * height / 1e6:.1f} MP), "
+              f"widths: {','.join(map(str, args.widths))}")
+
+        direct_time, direct = time_resize(source, tmp / 'direct', args.widths, args.runs,
+                                          draft=args.draft)
+        cascade_time, cascaded = time_resize(source, tmp / 'cascade', args.widths, args.runs,
+                                             draft=args.draft, cascade=True)
+
+        print(f"direct:  {direct_time * 1000:8.1f} ms")
+        print(f"cascade: {cascade_time * 1000:8.1f} ms  ({direct_time / cascade_time:.2f}x)")
+        print()
+        print(f"{'width':>6}  {'MAE':>6}  {'PSNR dB':>8}")
+        for d, c in zip(direct, cascaded):
+            mae, psnr = image_difference(d['path'], c['path'])
+            print(f"{d['width']:>6}  {mae:6.3f}  {psnr:8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Time every ipro command over a synthetic corpus and compare against a baseline.
+
+Generates (or reuses) the corpus from corpus.py, then runs each case -
+info, resize (one and several sizes), convert to every output format,
+rename, strip, extract, a batch and "+" chains (file-based and in memory) -
+through ipro's own main() in this process, so interpreter start-up is not
+part of the timings. Each case is run --runs times after one warm-up run,
+and its minimum and median wall time are recorded along with the
+per-stage breakdown (see ipro --profile) of the fastest run.
+
+Results are written as JSON. With --baseline (or --compare OLD NEW, which
+compares two existing results files without running anything), every case
+whose median is more than --threshold percent slower than the baseline is
+flagged and the exit code is 1, so the suite can gate CI.
+
+Usage:
+    python benchmarks/bench_suite.py --output results.json
+    python benchmarks/bench_suite.py --megapixels 1,12,24,50,100 --runs 5
+    python benchmarks/bench_suite.py --filter 'resize|chain' --baseline results.json
+    python benchmarks/bench_suite.py --compare old.json new.json --threshold 5
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import ipro  # noqa: E402
+from corpus import DEFAULT_MEGAPIXELS, corpus_spec, generate_corpus, spec_digest  # noqa: E402
+
+
+RESULTS_VERSION = 1
+
+# Regressions smaller than this are treated as noise whatever the percentage
+MIN_REGRESSION_SECONDS = 0.005
+
+# Cases run on every photo JPEG; {src} is the input, {out} a fresh output directory
+PHOTO_CASES = {
+    'info': ['info', '{src}'],
+    'info-json': ['info', '{src}', '--json'],
+    'resize-single': ['resize', '{src}', '--width', '1200', '--output', '{out}'],
+    'resize-multi': ['resize', '{src}', '--width', '320,640,1280,1920', '--output', '{out}'],
+    'resize-multi-cascade': ['resize', '{src}', '--width', '320,640,1280,1920', '--cascade',
+                             '--output', '{out}'],
+    'convert-jpeg-rewrite': ['convert', '{src}', '--format', 'jpeg', '--output', '{out}'],
+    'convert-jpeg-q80': ['convert', '{src}', '--format', 'jpeg', '--quality', '80',
+                         '--output', '{out}'],
+    'convert-png': ['convert', '{src}', '--format', 'png', '--output', '{out}'],
+    'convert-webp': ['convert', '{src}', '--format', 'webp', '--output', '{out}'],
+    'rename': ['rename', '{src}', '--ext', '--prefix-exif-date', '--output', '{out}'],
+    'strip': ['strip', '{src}', '--output', '{out}'],
+    'chain-files': ['resize', '{src}', '--width', '640,1280', '--output', '{out}',
+                    '+', 'convert', '--format', 'webp'],
+    'chain-memory': ['--in-memory', 'resize', '{src}', '--width', '640,1280', '--output', '{out}',
+                     '+', 'convert', '--format', 'webp'],
+}
+
+# Photo cases also run on the progressive JPEG
+PROGRESSIVE_CASES = ('info', 'resize-multi', 'convert-webp')
+
+# Cases for the other corpus entries, keyed by entry kind
+KIND_CASES = {
+    # Above MAX_IMAGE_PIXELS: the default path (draft to the target size) and
+    # the bounded-decode path that an explicit --max-pixels switches on
+    'jpeg-panorama': {
+        'info': ['info', '{src}'],
+        'resize-single': ['resize', '{src}', '--width', '1200', '--output', '{out}'],
+        'resize-single-max-pixels': ['resize', '{src}', '--width', '1200', '--max-pixels',
+                                     '200M', '--output', '{out}'],
+        'resize-multi': ['resize', '{src}', '--width', '320,640,1280,1920', '--output',
+                         '{out}'],
+        'resize-multi-max-pixels': ['resize', '{src}', '--width', '320,640,1280,1920',
+                                    '--max-pixels', '200M', '--output', '{out}'],
+        'resize-large': ['resize', '{src}', '--width', '11000', '--output', '{out}'],
+    },
+    'heic': {
+        'info': ['info', '{src}'],
+        'convert-jpeg': ['convert', '{src}', '--format', 'jpeg', '--output', '{out}'],
+        'convert-webp': ['convert', '{src}', '--format', 'webp', '--output', '{out}'],
+    },
+    'png-alpha': {
+        'info': ['info', '{src}'],
+        'convert-jpeg': ['convert', '{src}', '--format', 'jpeg', '--output', '{out}'],
+        'convert-webp': ['convert', '{src}', '--format', 'webp', '--output', '{out}'],
+    },
+    'gif-animated': {
+        'info': ['info', '{src}'],
+        'extract': ['extract', '{src}', '--output', '{out}'],
+    },
+    'webp-animated': {
+        'info': ['info', '{src}'],
+        'extract': ['extract', '{src}', '--output', '{out}'],
+    },
+    'mpo': {
+        'info': ['info', '{src}'],
+        'extract': ['extract', '{src}', '--output', '{out}'],
+        'resize-multi': ['resize', '{src}', '--width', '320,640,1280,1920', '--output', '{out}'],
+    },
+}
+
+# Cases over every photo JPEG at once; {dir} is a directory holding them
+BATCH_CASES = {
+    'batch-convert-webp': ['convert', '{dir}', '--format', 'webp', '--output', '{out}',
+                           '--jobs', '0'],
+    'batch-resize': ['resize', '{dir}', '--width', '640,1280', '--output', '{out}',
+                     '--jobs', '0'],
+}
+
+
+def build_cases(corpus):
+    """
+    Expand the case tables over a corpus.
+
+    Returns:
+        Dict of case name ("command/corpus-entry") -> argv template
+    """
+    cases = {}
+    for name, entry in corpus.items():
+        kind = entry['kind']
+        if kind in KIND_CASES:
+            table = KIND_CASES[kind]
+        elif kind == 'jpeg-progressive':
+            table = {case: PHOTO_CASES[case] for case in PROGRESSIVE_CASES}
+        elif kind.startswith('jpeg-'):
+            table = PHOTO_CASES
+        else:
+            table = {}
+        for case, argv in table.items():
+            cases[f'{case}/{name}'] = [arg.replace('{src}', str(entry['path'])) for arg in argv]
+    for case, argv in BATCH_CASES.items():
+        cases[f'{case}/photos'] = argv
+    return cases
+
+
+def run_case(argv):
+    """
+    Run one ipro command line in this process, silencing its output.
+
+    Returns:
+        Tuple of (exit code, seconds, stage records)
+    """
+    out, err = io.StringIO(), io.StringIO()
+    code = 0
+    with ipro.collect_profile([]) as records:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            try:
+                ipro.main(argv)
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        seconds = time.perf_counter() - start
+    if code != 0:
+        sys.stderr.write(err.getvalue())
+    return code, seconds, records
+
+
+def stage_totals(records):
+    """Sum stage records into {stage: wall seconds}."""
+    totals = {}
+    for record in records:
+        totals[record['stage']] = round(totals.get(record['stage'], 0.0) + record['wall_s'], 6)
+    return totals
+
+
+def time_case(argv, work_dir, photo_dir, runs):
+    """
+    Time a case: one warm-up run, then `runs` timed runs.
+
+    Each run writes into a freshly emptied output directory so runs don't
+    see each other's outputs.
+
+    Returns:
+        Dict with the expanded argv and exit code and, if every run
+        succeeded, the run times, their min and median, and the stage
+        totals of the fastest run
+    """
+    out_dir = work_dir / 'out'
+    argv = [arg.replace('{out}', str(out_dir)).replace('{dir}', str(photo_dir)) for arg in argv]
+    times = []
+    best_records = []
+    for run in range(runs + 1):
+        shutil.rmtree(out_dir, ignore_errors=True)
+        code, seconds, records = run_case(argv)
+        if code != 0:
+            return {'argv': argv, 'exit': code}
+        if run == 0:
+            continue  # Warm-up: imports, caches, page cache
+        if not times or seconds < min(times):
+            best_records = records
+        times.append(seconds)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    return {
+        'argv': argv,
+        'exit': 0,
+        'runs_s': [round(t, 6) for t in times],
+        'min_s': round(min(times), 6),
+        'median_s': round(statistics.median(times), 6),
+        'stages': stage_totals(best_records),
+    }
+
+
+def environment():
+    """Describe the machine and library versions the results come from."""
+    import PIL
+    return {
+        'ipro': ipro.__version__,
+        'python': platform.python_version(),
+        'pillow': PIL.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare_results(baseline, current, threshold):
+    """
+    Compare two results documents case by case.
+
+    Args:
+        baseline: Results dict of the reference run
+        current: Results dict of the run being checked
+        threshold: Percentage by which a median may grow before it counts
+                   as a regression
+
+    Returns:
+        Tuple of (rows, regressions): rows are (case, old median, new
+        median, change %, flag) for cases in both, and regressions the
+        names of the flagged cases
+    """
+    rows = []
+    regressions = []
+    old_cases = baseline.get('cases', {})
+    for case, result in current.get('cases', {}).items():
+        old = old_cases.get(case)
+        if not old or 'median_s' not in old or 'median_s' not in result:
+            continue
+        old_median, new_median = old['median_s'], result['median_s']
+        change = (new_median - old_median) / old_median * 100 if old_median else 0.0
+        flag = ''
+        if change > threshold and new_median - old_median > MIN_REGRESSION_SECONDS:
+            flag = 'REGRESSION'
+            regressions.append(case)
+        elif change < -threshold and old_median - new_median > MIN_REGRESSION_SECONDS:
+            flag = 'faster'
+        rows.append((case, old_median, new_median, change, flag))
+    return rows, regressions
+
+
+def print_comparison(baseline, current, threshold):
+    """Print a comparison table and return the number of regressions."""
+    rows, regressions = compare_results(baseline, current, threshold)
+    if baseline.get('corpus') != current.get('corpus'):
+        print("Warning: results were measured on different corpora", file=sys.stderr)
+    width = max((len(row[0]) for row in rows), default=4)
+    print(f"{'case':<{width}}  {'baseline':>10}  {'current':>10}  {'change':>8}")
+    for case, old, new, change, flag in rows:
+        print(f"{case:<{width}}  {old * 1000:>8.1f}ms  {new * 1000:>8.1f}ms  "
+              f"{change:>+7.1f}%  {flag}")
+    missing = set(baseline.get('cases', {})) - set(current.get('cases', {}))
+    if missing:
+        print(f"{len(missing)} baseline case(s) not in the current run")
+    print(f"{len(regressions)} regression(s) above {threshold:g}%")
+    for case in regressions:
+        stages_old = baseline['cases'][case].get('stages', {})
+        stages_new = current['cases'][case].get('stages', {})
+        changed = sorted(stages_new, key=lambda s: stages_old.get(s, 0) - stages_new[s])[:3]
+        detail = ', '.join(f"{stage} {stages_old.get(stage, 0) * 1000:.1f}→"
+                           f"{stages_new[stage] * 1000:.1f}ms" for stage in changed)
+        print(f"  {case}: {detail}")
+    return len(regressions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--corpus', type=Path,
+                        default=Path(tempfile.gettempdir()) / 'ipro-bench-corpus',
+                        help='Corpus directory, generated if missing (default: %(default)s)')
+    parser.add_argument('--megapixels', default=','.join(map(str, DEFAULT_MEGAPIXELS)),
+                        help='Photo JPEG sizes in megapixels (default: %(default)s; up to 100)')
+    parser.add_argument('--seed', type=int, default=0, help='Corpus seed (default: 0)')
+    parser.add_argument('--runs', type=int, default=3,
+                        help='Timed runs per case, after one warm-up run (default: 3)')
+    parser.add_argument('--filter', metavar='REGEX',
+                        help='Only run cases whose name matches, e.g. "resize|chain"')
+    parser.add_argument('--output', type=Path, help='Write results JSON to this file')
+    parser.add_argument('--baseline', type=Path,
+                        help='Results JSON to compare against; exits 1 on regressions')
+    parser.add_argument('--compare', nargs=2, type=Path, metavar=('OLD', 'NEW'),
+                        help='Compare two results files without running anything')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='Slowdown in percent that counts as a regression (default: 10)')
+    args = parser.parse_args()
+
+    if args.compare:
+        old, new = (json.loads(path.read_text()) for path in args.compare)
+        sys.exit(1 if print_comparison(old, new, args.threshold) else 0)
+
+    megapixels = [int(mp) for mp in args.megapixels.split(',')]
+    print(f"Corpus: {args.corpus}", file=sys.stderr)
+    corpus = generate_corpus(args.corpus, megapixels, args.seed)
+    cases = build_cases(corpus)
+    if args.filter:
+        cases = {name: argv for name, argv in cases.items() if re.search(args.filter, name)}
+
+    results = {
+        'version': RESULTS_VERSION,
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'corpus': spec_digest(corpus_spec(megapixels, args.seed)),
+        'runs': args.runs,
+        'cases': {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        photo_dir = work_dir / 'photos'
+        photo_dir.mkdir()
+        for entry in corpus.values():
+            if entry['kind'] in ('jpeg-srgb', 'jpeg-p3'):
+                shutil.copy(entry['path'], photo_dir / entry['path'].name)
+
+        width = max((len(name) for name in cases), default=4)
+        for name, argv in cases.items():
+            result = time_case(argv, work_dir, photo_dir, args.runs)
+            results['cases'][name] = result
+            if result['exit'] != 0:
+                print(f"{name:<{width}}  FAILED (exit {result['exit']})")
+                continue
+            top = sorted(result['stages'].items(), key=lambda item: -item[1])[:2]
+            stages = ', '.join(f"{stage} {seconds * 1000:.0f}ms" for stage, seconds in top)
+            print(f"{name:<{width}}  {result['median_s'] * 1000:>9.1f}ms  "
+                  f"(min {result['min_s'] * 1000:.1f}ms)  {stages}")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + '\n')
+        print(f"Results: {args.output}", file=sys.stderr)
+
+    failed = [name for name, result in results['cases'].items() if result['exit'] != 0]
+    regressions = 0
+    if args.baseline:
+        print()
+        regressions = print_comparison(json.loads(args.baseline.read_text()), results,
+                                       args.threshold)
+    sys.exit(1 if failed or regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Generate a reproducible synthetic image corpus for benchmarking.
+
+Every image is built from a seeded random generator, so the same spec
+gives the same pixels on every machine. The content is varied:
+gradients, overlapping shapes and a noise texture, roughly as hard to
+compress and resample as a photograph. The corpus covers what ipro is used on:
+
+- photo JPEGs from 1 to 100 MP with camera EXIF (including GPS) and an ICC
+  profile, alternating sRGB and Display P3 so both the skip and the
+  transform path of convert are exercised, plus one progressive JPEG
+- a panorama above ipro's decompression-bomb limit (MAX_IMAGE_PIXELS), as
+  a baseline and a progressive JPEG, for the inputs --max-pixels admits
+- HEIC (when pillow-heif is installed)
+- PNG with an alpha channel
+- animated GIF and animated WebP
+- MPO (two-frame stereo JPEG)
+
+The corpus is written to a directory together with corpus.json, which
+records the spec it was generated from; an existing corpus with the same
+spec is reused instead of being generated again.
+
+Usage:
+    python benchmarks/corpus.py DIR
+    python benchmarks/corpus.py DIR --megapixels 1,12,24,50,100
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import struct
+import sys
+from pathlib import Path
+
+from PIL import Image, ImageCms, ImageDraw
+
+try:
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+    HEIF_AVAILABLE = True
+except ImportError:
+    HEIF_AVAILABLE = False
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ipro import MAX_IMAGE_PIXELS  # noqa: E402
+
+
+# Bump when the generated content changes, so cached corpora are rebuilt
+CORPUS_VERSION = 3
+
+DEFAULT_MEGAPIXELS = (1, 12, 24)
+
+# Photo JPEGs stay at or below the decompression-bomb limit ...
+MAX_PHOTO_MEGAPIXELS = MAX_IMAGE_PIXELS // 1_000_000
+
+# ... while the panorama is deliberately above it (but below twice it, where
+# Pillow refuses to open an image without --max-pixels)
+PANORAMA_MEGAPIXELS = 120
+
+# Display P3 colorants adapted to D50, as in Apple's Display P3 profile
+DISPLAY_P3_COLORANTS = {
+    b'rXYZ': (0.5151, 0.2412, -0.0011),
+    b'gXYZ': (0.2920, 0.6922, 0.0419),
+    b'bXYZ': (0.1571, 0.0666, 0.7841),
+}
+
+
+def corpus_spec(megapixels=DEFAULT_MEGAPIXELS, seed=0):
+    """Return the spec dict a corpus is generated from (and cached under)."""
+    return {
+        'version': CORPUS_VERSION,
+        'megapixels': sorted(set(megapixels)),
+        'seed': seed,
+        'panorama': PANORAMA_MEGAPIXELS,
+        'heif': HEIF_AVAILABLE,
+        'pillow': Image.__version__,
+    }
+
+
+def dimensions_for(megapixels, aspect=(3, 2)):
+    """Return a (width, height) with the given aspect ratio and pixel count."""
+    pixels = megapixels * 1_000_000
+    width = int(math.sqrt(pixels * aspect[0] / aspect[1]))
+    height = int(pixels // width)
+    return width, height
+
+
+def srgb_profile():
+    """Return the bytes of Pillow's built-in sRGB profile."""
+    return ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+
+
+def display_p3_profile():
+    """Return an ICC profile with Display P3 primaries (sRGB tone curves)."""
+    profile = bytearray(srgb_profile())
+    count = struct.unpack_from('>I', profile, 128)[0]
+    for index in range(count):
+        entry = 132 + 12 * index
+        signature = bytes(profile[entry:entry + 4])
+        if signature in DISPLAY_P3_COLORANTS:
+            offset = struct.unpack_from('>I', profile, entry + 4)[0]
+            values = [round(v * 65536) for v in DISPLAY_P3_COLORANTS[signature]]
+            struct.pack_into('>3i', profile, offset + 8, *values)
+        elif signature == b'desc':
+            offset = struct.unpack_from('>I', profile, entry + 4)[0]
+            text = profile.find(b'sRGB', offset)
+            if text != -1:
+                profile[text:text + 4] = b'P3  '
+    return bytes(profile)
+
+
+def camera_exif(rng, index):
+    """Return EXIF like a phone camera writes: make, model, dates, GPS."""
+    exif = Image.Exif()
+    exif[0x010F] = 'BenchCam'                      # Make
+    exif[0x0110] = f'Model {index % 3 + 1}'        # Model
+    exif[0x0112] = 1                               # Orientation
+    exif[0x0131] = 'ipro corpus'                   # Software
+    stamp = f'2024:{rng.randint(1, 12):02d}:{rng.randint(1, 28):02d} ' \
+            f'{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}'
+    exif[0x0132] = stamp                           # DateTime
+    exif_ifd = exif.get_ifd(0x8769)
+    exif_ifd[0x9003] = stamp                       # DateTimeOriginal
+    exif_ifd[0x829A] = 1 / rng.choice((60, 125, 250, 500))  # ExposureTime
+    exif_ifd[0x8827] = rng.choice((100, 200, 400, 800))    # ISO
+    exif[0x8825] = {1: 'N', 2: (40.0, 26.0, 46.0), 3: 'W', 4: (79.0, 58.0, 56.0)}
+    return exif
+
+
+def _noise_tile(rng, size=256):
+    # getrandbits rather than randbytes, which needs Python 3.9
+    data = rng.getrandbits(8 * size * size).to_bytes(size * size, 'little')
+    return Image.frombytes('L', (size, size), data)
+
+
+def make_photo(size, seed, mode='RGB'):
+    """
+    Draw a photo-like image: gradients, shapes and a seeded noise texture.
+
+    Args:
+        size: (width, height)
+        seed: Seed for the random generator (same seed, same pixels)
+        mode: 'RGB' or 'RGBA' (alpha gets its own shapes and gradient)
+
+    Returns:
+        PIL Image
+    """
+    rng = random.Random(seed)
+    width, height = size
+
+    image = Image.merge('RGB', (
+        Image.linear_gradient('L').resize(size),
+        Image.radial_gradient('L').resize(size),
+        Image.linear_gradient('L').rotate(90).resize(size),
+    ))
+
+    draw = ImageDraw.Draw(image)
+    scale = max(width, height)
+    for _ in range(60):
+        x, y = rng.randrange(width), rng.randrange(height)
+        radius = rng.randint(scale // 60, scale // 6)
+        colour = tuple(rng.randrange(256) for _ in range(3))
+        box = (x - radius, y - radius, x + radius, y + radius * rng.choice((1, 2)) // 2)
+        if rng.random() < 0.5:
+            draw.ellipse(box, fill=colour)
+        else:
+            draw.rectangle(box, fill=colour)
+
+    # Fine texture, so the encoder and resampler have detail to work on
+    tile = _noise_tile(rng)
+    noise = Image.new('L', size)
+    for top in range(0, height, tile.height):
+        for left in range(0, width, tile.width):
+            noise.paste(tile, (left, top))
+    image = Image.blend(image, Image.merge('RGB', (noise, noise, noise)), 0.12)
+
+    if mode == 'RGBA':
+        alpha = Image.radial_gradient('L').resize(size)
+        ImageDraw.Draw(alpha).rectangle((width // 4, height // 4, width // 2, height // 2),
+                                        fill=0)
+        image.putalpha(alpha)
+    return image
+
+
+def make_animation(size, frames, seed):
+    """Return a list of frames: a shape moving over a textured background."""
+    rng = random.Random(seed)
+    background = make_photo(size, seed)
+    result = []
+    for index in range(frames):
+        frame = background.copy()
+        draw = ImageDraw.Draw(frame)
+        x = index * size[0] // frames
+        draw.ellipse((x, size[1] // 3, x + size[0] // 5, size[1] // 3 + size[0] // 5),
+                     fill=tuple(rng.randrange(256) for _ in range(3)))
+        result.append(frame)
+    return result
+
+
+def generate_corpus(directory, megapixels=DEFAULT_MEGAPIXELS, seed=0):
+    """
+    Generate (or reuse) a corpus in directory.
+
+    Args:
+        directory: Directory to write the corpus into
+        megapixels: Sizes of the photo JPEGs, in megapixels
+        seed: Base seed; different seeds give different corpora
+
+    Returns:
+        Dict of corpus entry name -> {'path', 'kind', 'megapixels'}
+    """
+    directory = Path(directory)
+    spec = corpus_spec(megapixels, seed)
+    index_path = directory / 'corpus.json'
+    if index_path.exists():
+        index = json.loads(index_path.read_text())
+        if index.get('spec') == spec and all(
+                (directory / entry['file']).exists() for entry in index['entries'].values()):
+            return _resolve(directory, index['entries'])
+
+    directory.mkdir(parents=True, exist_ok=True)
+    entries = {}
+    profiles = (('srgb', srgb_profile()), ('p3', display_p3_profile()))
+
+    def add(name, filename, kind, size):
+        entries[name] = {'file': filename, 'kind': kind,
+                         'megapixels': round(size[0] * size[1] / 1e6, 1)}
+        print(f"  {filename} ({size[0]}x{size[1]})", file=sys.stderr)
+
+    for index, mp in enumerate(spec['megapixels']):
+        # Capped just below the decompression-bomb limit, so "100 MP" stays
+        # a valid input for every command
+        size = dimensions_for(min(mp, MAX_PHOTO_MEGAPIXELS))
+        profile_name, profile = profiles[index % 2]
+        rng = random.Random(seed * 1000 + index)
+        filename = f'photo_{mp}mp.jpg'
+        make_photo(size, seed * 1000 + index).save(
+            directory / filename, 'JPEG', quality=92, exif=camera_exif(rng, index),
+            icc_profile=profile)
+        add(f'photo-{mp}mp', filename, f'jpeg-{profile_name}', size)
+
+    size = dimensions_for(12)
+    make_photo(size, seed + 101).save(directory / 'progressive_12mp.jpg', 'JPEG', quality=88,
+                                      progressive=True, icc_profile=srgb_profile(),
+                                      exif=camera_exif(random.Random(seed + 101), 0))
+    add('progressive-12mp', 'progressive_12mp.jpg', 'jpeg-progressive', size)
+
+    size = dimensions_for(PANORAMA_MEGAPIXELS, aspect=(3, 1))
+    panorama = make_photo(size, seed + 107)
+    for progressive, suffix in ((False, ''), (True, '_progressive')):
+        filename = f'panorama{suffix}_{PANORAMA_MEGAPIXELS}mp.jpg'
+        panorama.save(directory / filename, 'JPEG', quality=88, progressive=progressive,
+                      icc_profile=srgb_profile())
+        add(f'panorama{suffix.replace("_", "-")}-{PANORAMA_MEGAPIXELS}mp', filename,
+            'jpeg-panorama', size)
+    del panorama
+
+    if HEIF_AVAILABLE:
+        # x265 at its default preset takes most of a minute here; decode cost,
+        # which is what gets benchmarked, doesn't depend on the preset
+        make_photo(size, seed + 102).save(directory / 'photo_12mp.heic', 'HEIF', quality=80,
+                                          exif=camera_exif(random.Random(seed + 102), 1),
+                                          enc_params={'preset': 'ultrafast'})
+        add('heic-12mp', 'photo_12mp.heic', 'heic', size)
+
+    size = dimensions_for(4)
+    make_photo(size, seed + 103, mode='RGBA').save(directory / 'alpha_4mp.png', 'PNG')
+    add('png-alpha-4mp', 'alpha_4mp.png', 'png-alpha', size)
+
+    size = (640, 480)
+    frames = make_animation(size, 12, seed + 104)
+    frames[0].save(directory / 'animated.gif', 'GIF', save_all=True,
+                   append_images=frames[1:], duration=80, loop=0)
+    add('gif-animated', 'animated.gif', 'gif-animated', size)
+    frames[0].save(directory / 'animated.webp', 'WEBP', save_all=True,
+                   append_images=frames[1:], duration=80, loop=0, quality=80)
+    add('webp-animated', 'animated.webp', 'webp-animated', size)
+
+    size = dimensions_for(6, aspect=(4, 3))
+    left, right = make_photo(size, seed + 105), make_photo(size, seed + 106)
+    left.save(directory / 'stereo.mpo', 'MPO', save_all=True, append_images=[right],
+              quality=90, exif=camera_exif(random.Random(seed + 105), 2))
+    add('mpo-stereo', 'stereo.mpo', 'mpo', size)
+
+    index_path.write_text(json.dumps({'spec': spec, 'entries': entries}, indent=2))
+    return _resolve(directory, entries)
+
+
+def _resolve(directory, entries):
+    return {name: dict(entry, path=directory / entry['file']) for name, entry in entries.items()}
+
+
+def spec_digest(spec):
+    """Return a short digest identifying a corpus spec (stored with results)."""
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('directory', type=Path, help='Directory to write the corpus into')
+    parser.add_argument('--megapixels', default=','.join(map(str, DEFAULT_MEGAPIXELS)),
+                        help='Comma-separated photo JPEG sizes in megapixels '
+                             '(default: %(default)s; up to 100)')
+    parser.add_argument('--seed', type=int, default=0, help='Base random seed (default: 0)')
+    args = parser.parse_args()
+
+    megapixels = [int(mp) for mp in args.megapixels.split(',')]
+    corpus = generate_corpus(args.directory, megapixels, args.seed)
+    print(f"Corpus: {len(corpus)} image(s) in {args.directory}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,13 @@ ipro - Command-line tool for responsive image processing
 
 import argparse
 import sys
+import collections
+import contextlib
+import contextvars
+import functools
+import hashlib
+import glob
+import http.server
 from pathlib import Path
 from PIL import Image
 from PIL import ImageCms
@@ -13,9 +20,22 @@ from PIL.TiffImagePlugin import IFDRational
 import os
 import json
 import math
+import re
+import struct
 import io
 import shutil
 import tempfile
+import signal
+import threading
+import time
+import socket
+import socketserver
+import sqlite3
+import tarfile
+import urllib.parse
+import concurrent.futures
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 # Register HEIF opener if pillow-heif is available
 try:
@@ -46,8 +66,24 @@ Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
 DEFAULT_RESIZE_QUALITY = 90
 DEFAULT_CONVERT_QUALITY = 80
 
+# JPEG draft decoding keeps at least this much resolution above the largest output
+DRAFT_HEADROOM = 2
+
+# Decode-memory ceiling for inputs above MAX_IMAGE_PIXELS that --max-pixels
+# admitted (what the largest normally accepted image takes decoded): they are
+# decoded at a reduced DCT scale
+DEFAULT_DECODE_MEMORY = MAX_IMAGE_PIXELS * 4
+
+# DCT scale denominators libjpeg can decode at
+JPEG_DCT_SCALES = (1, 2, 4, 8)
+
+# Cascaded resize: minimum source/target ratio for reusing an intermediate,
+# and the reducing_gap passed to Image.resize() for integer-factor pre-reduction
+CASCADE_MIN_RATIO = 2
+CASCADE_REDUCING_GAP = 3.0
+
 # Known ipro output directory names for chain detection
-IPRO_OUTPUT_DIRS = {'converted', 'renamed', 'extracted', 'output'}
+IPRO_OUTPUT_DIRS = {'converted', 'renamed', 'extracted', 'stripped', 'output'}
 
 
 def is_ipro_output_dir(dirname):
@@ -269,685 +305,3265 @@ def validate_input_file(filepath):
     return path
 
 
-def convert_to_srgb(img):
-    """
-    Convert image to sRGB color profile if it has a different profile.
+def _exif_to_dict(exif):
+    """Convert a PIL Exif object to a dict keyed by tag name, or None if empty."""
+    if not exif:
+        return None
 
-    Args:
-        img: PIL Image object
+    exif_dict = {}
+    for tag_id, value in exif.items():
+        tag_name = TAGS.get(tag_id, tag_id)
+        exif_dict[tag_name] = value
 
-    Returns:
-        PIL Image object in sRGB color space
-    """
-    try:
-        # Check if image has an ICC profile
-        icc_profile = img.info.get('icc_profile')
-        if icc_profile:
-            # Create profile objects
-            src_profile = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
-            srgb_profile = ImageCms.createProfile('sRGB')
-
-            # Convert to sRGB
-            img = ImageCms.profileToProfile(
-                img, src_profile, srgb_profile,
-                outputMode='RGB' if img.mode == 'RGB' else img.mode
-            )
-    except ImageCms.PyCMSError:
-        # If color management conversion fails, return the original image
-        pass
-    return img
+    return exif_dict if exif_dict else None
 
 
-def _strip_gps_from_exif(exif_data):
-    """
-    Remove GPS metadata (tag 34853/0x8825) from EXIF data.
+# Header probing: JPEG segments, PNG chunks, RIFF chunks and HEIF boxes are
+# read one at a time; a single segment or box larger than this is not probed
+PROBE_MAX_SEGMENT = 4 * 1024 * 1024
 
-    GPS data contains location information that is a privacy risk.
-    This is stripped by default when EXIF is preserved during conversion.
+# HEIF brands handled by the pillow-heif opener
+HEIF_BRANDS = {b'heic', b'heix', b'heim', b'heis', b'hevc', b'hevx'}
 
-    Args:
-        exif_data: PIL Exif object
+# JPEG start-of-frame markers (SOF0-3, SOF5-7, SOF9-11, SOF13-15)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                    0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
 
-    Returns:
-        PIL Exif object with GPS data removed, or original if no GPS present
-    """
-    GPS_IFD_TAG = 0x8825  # GPSInfo tag
-    if exif_data and GPS_IFD_TAG in exif_data:
-        del exif_data[GPS_IFD_TAG]
-        return exif_data, True
-    return exif_data, False
+# JPEG markers without a length field (TEM, RST0-7)
+JPEG_STANDALONE_MARKERS = {0x01} | set(range(0xD0, 0xD8))
 
+# Byte size of each TIFF field type, for walking EXIF directories
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4}
 
-def convert_image(source_path, output_path, target_format, quality=DEFAULT_CONVERT_QUALITY, strip_exif=False, convert_to_srgb_profile=True):
-    """
-    Convert an image to a different format.
+# Sentinel for strip_jpeg_metadata(): leave ICC profile segments untouched
+KEEP_ICC = object()
 
-    Args:
-        source_path: Path to source image
-        output_path: Path for output image
-        target_format: Target format (e.g., "jpeg", "png")
-        quality: JPEG quality 1-100 (default: 80)
-        strip_exif: If True, strip EXIF metadata from output
-        convert_to_srgb_profile: If True, convert to sRGB color profile (default: True)
+EXIF_ORIENTATION_TAG = 0x0112
+GPS_IFD_TAG = 0x8825
+XMP_ORIENTATION_PATTERN = re.compile(rb'tiff:Orientation(="|>)([0-9])')
 
-    Returns:
-        bool: True if successful, False otherwise
+
+def _open_binary(target, mode='rb'):
     """
-    try:
-        source_path = Path(source_path)
-        output_path = Path(output_path)
+    Return a context manager yielding a binary file for a path or a stream.
 
-        # Refuse to write through a symlink output path
-        if output_path.exists() and output_path.is_symlink():
-            print(f"Error: Output path is a symlink — refusing to write: {output_path}",
-                  file=sys.stderr)
-            return False
+    Paths are opened in mode and closed on exit; objects that already have
+    read() (or write(), for writing modes) are yielded as they are and left
+    open for the caller.
+    """
+    if hasattr(target, 'read' if 'r' in mode else 'write'):
+        return contextlib.nullcontext(target)
+    return open(target, mode)
 
-        with Image.open(source_path) as img:
-            # Get EXIF data if we need to preserve it
-            exif_data = None
-            if not strip_exif:
-                try:
-                    exif_data = img.getexif()
-                except Exception:
-                    exif_data = None
-
-                # Strip GPS data by default when preserving EXIF (privacy protection)
-                if exif_data:
-                    exif_data, gps_stripped = _strip_gps_from_exif(exif_data)
-                    if gps_stripped:
-                        print("Note: GPS metadata stripped from output (use --keep-gps to preserve)",
-                              file=sys.stderr)
 
-            # Convert to sRGB if requested
-            if convert_to_srgb_profile:
-                img = convert_to_srgb(img)
-
-            # Handle color mode conversion for JPEG output
-            if target_format.lower() in ('jpeg', 'jpg'):
-                img = ensure_rgb_for_jpeg(img)
-
-            # Prepare save arguments
-            save_kwargs = {}
-            if target_format.lower() in ('jpeg', 'jpg'):
-                save_kwargs['quality'] = quality
-                save_kwargs['format'] = 'JPEG'
-            elif target_format.lower() == 'png':
-                save_kwargs['format'] = 'PNG'
-            elif target_format.lower() == 'webp':
-                save_kwargs['quality'] = quality
-                save_kwargs['format'] = 'WEBP'
-
-            # Add EXIF if preserving
-            if exif_data and not strip_exif and target_format.lower() in ('jpeg', 'jpg'):
-                save_kwargs['exif'] = exif_data
-
-            # Embed sRGB ICC profile for better compatibility
-            if convert_to_srgb_profile:
-                srgb_profile = ImageCms.createProfile('sRGB')
-                save_kwargs['icc_profile'] = ImageCms.ImageCmsProfile(srgb_profile).tobytes()
-
-            # Ensure output directory exists
-            output_path.parent.mkdir(parents=True, exist_ok=True)
+def _read_exact(f, n):
+    """Read exactly n bytes from f, raising ValueError on a short read."""
+    data = f.read(n)
+    if len(data) != n:
+        raise ValueError("Unexpected end of file")
+    return data
 
-            # Save the image
-            img.save(output_path, **save_kwargs)
 
-        return True
+def _parse_mp_index(mpf):
+    """
+    Parse the MP Index IFD of an MPO file's APP2 "MPF" segment.
 
-    except Image.DecompressionBombError:
-        print(f"Error: Image exceeds pixel limit ({MAX_IMAGE_PIXELS:,} pixels) — "
-              "possible decompression bomb", file=sys.stderr)
-        return False
-    except Exception:
-        # Clean up partial output files if they were created
-        try:
-            if output_path.exists():
-                output_path.unlink()
-        except OSError:
-            pass
-        return False
+    Uses the same IFD parse as Pillow's MPO plugin.
 
+    Args:
+        mpf: Segment payload after the "MPF\\0" identifier (starts with a TIFF header)
 
-def parse_sizes(size_str):
-    """Parse comma-separated list of sizes into integers.
+    Returns:
+        List of (size, offset) per image; offsets are relative to the TIFF
+        header, except the first image's, which starts the file
 
-    Enforces MAX_SIZES_COUNT to prevent unbounded resize operations.
+    Raises:
+        ValueError: If the index is missing or malformed
     """
-    try:
-        sizes = [int(s.strip()) for s in size_str.split(',')]
-        if any(s <= 0 for s in sizes):
-            raise ValueError("Sizes must be positive integers")
-        if len(sizes) > MAX_SIZES_COUNT:
-            raise ValueError(
-                f"Too many sizes ({len(sizes)}). Maximum is {MAX_SIZES_COUNT}"
-            )
-        return sizes
-    except ValueError as e:
-        raise argparse.ArgumentTypeError(f"Invalid size format: {e}")
-
+    from PIL import TiffImagePlugin
+    mp_data = io.BytesIO(mpf)
+    head = mp_data.read(8)
+    mp_ifd = TiffImagePlugin.ImageFileDirectory_v2(head)
+    mp_data.seek(mp_ifd.next)
+    mp_ifd.load(mp_data)
+    count = mp_ifd.get(0xB001)
+    entries = mp_ifd.get(0xB002)
+    if not isinstance(count, int) or not isinstance(entries, bytes) or len(entries) < 16 * count:
+        raise ValueError("Malformed MP Index IFD")
+
+    endian = '>' if head.startswith(b'MM\x00*') else '<'
+    return [struct.unpack_from(endian + 'LLLHH', entries, 16 * i)[1:3] for i in range(count)]
+
+
+def _scan_jpeg_header(f):
+    """
+    Locate the marker segments of a JPEG stream's header.
 
+    Segment payloads are skipped with seeks, so only marker and length
+    bytes are read.
 
-def get_file_size_kb(filepath):
-    """Get file size in KB."""
-    return os.path.getsize(filepath) / 1024
+    Args:
+        f: Binary file object positioned at the stream's SOI marker
 
+    Returns:
+        Tuple of (segments, scan_start): segments is a list of
+        (marker, start, end) absolute byte ranges (including the marker
+        bytes) for everything between SOI and the first SOS marker, which
+        starts at scan_start
 
-def calculate_aspect_ratio(width, height):
+    Raises:
+        ValueError: If the stream is not a well-formed JPEG header
     """
-    Calculate aspect ratio as a reduced integer ratio string.
+    if f.read(2) != b'\xff\xd8':
+        raise ValueError("Not a JPEG stream")
+    segments = []
+    while True:
+        start = f.tell()
+        byte = f.read(1)
+        if byte != b'\xff':
+            raise ValueError("Expected a JPEG marker")
+        while byte == b'\xff':
+            byte = f.read(1)  # Fill bytes
+        if not byte:
+            raise ValueError("Unexpected end of JPEG header")
+        marker = byte[0]
+        if marker == 0xDA:
+            return segments, start
+        if marker == 0xD9:
+            raise ValueError("JPEG stream without image data")
+        if marker in JPEG_STANDALONE_MARKERS:
+            segments.append((marker, start, f.tell()))
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) != 2:
+            raise ValueError("Unexpected end of JPEG header")
+        length = struct.unpack('>H', length_bytes)[0]
+        if length < 2:
+            raise ValueError("Invalid JPEG segment length")
+        end = f.tell() + length - 2
+        f.seek(end)
+        segments.append((marker, start, end))
+
+
+def _jpeg_header_segments(data):
+    """Byte-string form of _scan_jpeg_header()."""
+    segments, scan_start = _scan_jpeg_header(io.BytesIO(data))
+    if segments and segments[-1][2] > len(data) or scan_start >= len(data):
+        raise ValueError("Unexpected end of JPEG header")
+    return segments, scan_start
+
+
+def _jpeg_segment(marker, payload):
+    """Serialise one JPEG marker segment."""
+    if marker in JPEG_STANDALONE_MARKERS:
+        return bytes((0xFF, marker))
+    if len(payload) > 65533:
+        raise ValueError("JPEG segment payload too large")
+    return bytes((0xFF, marker)) + struct.pack('>H', len(payload) + 2) + payload
+
+
+def rewrite_jpeg_stream(src, dst, edit):
+    """
+    Copy a JPEG stream, passing each header segment through an edit function.
+
+    Only the header (everything before the first scan) is parsed; the
+    entropy-coded image data and anything after it are streamed to dst
+    unchanged, so pixels are never decoded or re-encoded.
 
     Args:
-        width: Image width in pixels
-        height: Image height in pixels
+        src: Binary file object positioned at the stream's SOI marker
+        dst: Binary file object to write to
+        edit: Callable (marker, payload) -> list of (marker, payload) to
+              write in place of the segment ([] drops it); payload excludes
+              the marker and length bytes
 
-    Returns:
-        String in format "W:H" (e.g., "16:9", "4:3")
+    Raises:
+        ValueError: If the stream is not a well-formed JPEG header
     """
-    gcd = math.gcd(width, height)
-    ratio_w = width // gcd
-    ratio_h = height // gcd
-    return f"{ratio_w}:{ratio_h}"
+    segments, scan_start = _scan_jpeg_header(src)
+    dst.write(b'\xff\xd8')
+    for marker, start, end in segments:
+        src.seek(start)
+        raw = src.read(end - start)
+        if len(raw) != end - start:
+            raise ValueError("Unexpected end of JPEG header")
+        # Drop fill bytes, the marker and the length field
+        payload = raw.lstrip(b'\xff')[1:] if marker in JPEG_STANDALONE_MARKERS else raw.lstrip(b'\xff')[3:]
+        replacement = edit(marker, payload)
+        if replacement == [(marker, payload)]:
+            dst.write(raw)
+        else:
+            for new_marker, new_payload in replacement:
+                dst.write(_jpeg_segment(new_marker, new_payload))
+    src.seek(scan_start)
+    shutil.copyfileobj(src, dst)
 
 
-def classify_orientation(width, height):
+def _rewrite_jpeg_header(data, keep):
     """
-    Classify image orientation based on dimensions.
+    Rebuild a JPEG stream keeping only selected header segments.
 
     Args:
-        width: Image width in pixels
-        height: Image height in pixels
+        data: Complete JPEG stream
+        keep: Callable (marker, payload) -> bool
 
     Returns:
-        String: "square", "landscape", or "portrait"
+        New JPEG stream bytes
+
+    Raises:
+        ValueError: If the stream is not a well-formed JPEG header
     """
-    if width == height:
-        return "square"
-    elif width > height:
-        return "landscape"
-    else:
-        return "portrait"
+    _jpeg_header_segments(data)
+    out = io.BytesIO()
+    rewrite_jpeg_stream(io.BytesIO(data), out,
+                        lambda marker, payload: [(marker, payload)] if keep(marker, payload) else [])
+    return out.getvalue()
 
 
-def match_common_ratio(ratio_str):
+def blank_gps_ifd(exif_payload):
     """
-    Match a ratio string against common aspect ratios.
+    Blank the GPS IFD of an APP1 EXIF payload in place.
+
+    The GPSInfo pointer is kept but the directory it points to is emptied
+    (zero entries) and every value it referenced is zeroed, so the rest of
+    the EXIF data - including maker notes and their absolute offsets - is
+    preserved byte for byte.
 
     Args:
-        ratio_str: Ratio string in format "W:H" (e.g., "16:9")
+        exif_payload: APP1 payload starting with "Exif\\0\\0"
 
     Returns:
-        String: matched common ratio name or "none"
+        Tuple of (new payload bytes, True if GPS data was present)
+
+    Raises:
+        ValueError: If the EXIF structure is malformed
     """
-    # Define common ratios with their standard names
-    common_ratios = {
-        "1:1": "1:1",
-        "4:3": "4:3",
-        "3:4": "3:4",
-        "3:2": "3:2",
-        "2:3": "2:3",
-        "16:9": "16:9",
-        "9:16": "9:16",
-        "5:4": "5:4",
-        "4:5": "4:5",
-        "191:100": "1.91:1",  # Instagram landscape
-    }
+    if not exif_payload.startswith(b'Exif\x00\x00'):
+        raise ValueError("Not an EXIF payload")
+    tiff = bytearray(exif_payload[6:])
+    if tiff[:4] == b'II*\x00':
+        endian = '<'
+    elif tiff[:4] == b'MM\x00*':
+        endian = '>'
+    else:
+        raise ValueError("Bad TIFF header in EXIF")
+
+    def read(fmt, offset):
+        size = struct.calcsize(fmt)
+        if offset < 0 or offset + size > len(tiff):
+            raise ValueError("EXIF offset out of range")
+        return struct.unpack_from(endian + fmt, tiff, offset)[0]
+
+    ifd0 = read('I', 4)
+    gps_offset = None
+    for index in range(read('H', ifd0)):
+        entry = ifd0 + 2 + 12 * index
+        if read('H', entry) == GPS_IFD_TAG:
+            gps_offset = read('I', entry + 8)
+            break
+    if gps_offset is None:
+        return exif_payload, False
+
+    count = read('H', gps_offset)
+    entries_end = gps_offset + 2 + 12 * count
+    if entries_end + 4 > len(tiff):
+        raise ValueError("GPS IFD out of range")
+    for index in range(count):
+        entry = gps_offset + 2 + 12 * index
+        value_type, value_count = read('H', entry + 2), read('I', entry + 4)
+        if value_type not in TIFF_TYPE_SIZES:
+            raise ValueError(f"Unknown TIFF type {value_type} in GPS IFD")
+        size = TIFF_TYPE_SIZES[value_type] * value_count
+        if size > 4:
+            value_offset = read('I', entry + 8)
+            if value_offset + size > len(tiff):
+                raise ValueError("GPS value out of range")
+            tiff[value_offset:value_offset + size] = bytes(size)
+    # An empty directory: zero entries, and (from the zeroed bytes) no next IFD
+    tiff[gps_offset:entries_end + 4] = bytes(entries_end + 4 - gps_offset)
+    return b'Exif\x00\x00' + bytes(tiff), True
+
+
+def _icc_segments(icc_profile):
+    """Split an ICC profile into APP2 "ICC_PROFILE" segment payloads."""
+    chunk_size = 65533 - 14
+    chunks = [icc_profile[i:i + chunk_size] for i in range(0, len(icc_profile), chunk_size)]
+    return [(0xE2, b'ICC_PROFILE\x00' + bytes((number, len(chunks))) + chunk)
+            for number, chunk in enumerate(chunks, 1)]
+
+
+def strip_jpeg_metadata(source_path, output_path, exif='remove', keep_other=False,
+                        icc_profile=KEEP_ICC):
+    """
+    Write a copy of a JPEG with its metadata segments removed or edited.
 
-    return common_ratios.get(ratio_str, "none")
+    Works on the marker segments only (see rewrite_jpeg_stream); the image
+    data is streamed from input to output without decoding. JFIF (APP0) and
+    Adobe (APP14) segments, which affect how pixels are decoded, are always
+    kept.
+
+    Args:
+        source_path: Path to a JPEG file, or a binary file positioned at
+                     the start of one
+        output_path: Path or writable binary file for the rewritten JPEG
+        exif: 'remove' drops EXIF, 'no-gps' keeps it with the GPS IFD
+              blanked (see blank_gps_ifd), 'keep' leaves it untouched
+        keep_other: If True, keep XMP, IPTC (APP13), comments and other
+                    application segments; XMP mentioning GPS is still
+                    dropped unless exif is 'keep'
+        icc_profile: KEEP_ICC leaves ICC profile segments as they are, None
+                     removes them, bytes replaces (or adds) the profile
 
+    Returns:
+        True if GPS data was removed, else False
 
-def extract_exif_data(filepath):
+    Raises:
+        ValueError: If the file is not a well-formed JPEG or its EXIF is malformed
     """
-    Extract EXIF metadata from an image file.
+    gps_removed = False
+    icc_written = False
+
+    def edit(marker, payload):
+        nonlocal gps_removed, icc_written
+        segment = [(marker, payload)]
+        replacement = segment
+        is_app = 0xE0 <= marker <= 0xEF
+
+        if marker == 0xE1 and payload.startswith(b'Exif\x00\x00'):
+            if exif == 'remove':
+                replacement = []
+            elif exif == 'no-gps':
+                payload, removed = blank_gps_ifd(payload)
+                gps_removed = gps_removed or removed
+                replacement = [(marker, payload)]
+        elif marker == 0xE2 and payload.startswith(b'ICC_PROFILE\x00'):
+            if icc_profile is not KEEP_ICC:
+                replacement = []
+                if icc_profile is not None and not icc_written:
+                    replacement = _icc_segments(icc_profile)
+                    icc_written = True
+        elif marker in (0xE0, 0xEE):
+            pass  # JFIF and Adobe segments change how pixels decode
+        elif marker == 0xE1 and payload.startswith(b'http://ns.adobe.com/xap/1.0/\x00'):
+            if not keep_other or (exif != 'keep' and b'GPS' in payload):
+                replacement = []
+        elif (is_app or marker == 0xFE) and not keep_other:
+            replacement = []
+
+        if (not is_app and marker != 0xFE and isinstance(icc_profile, bytes)
+                and not icc_written):
+            # No profile in the source: add it before the first non-APPn segment
+            icc_written = True
+            return _icc_segments(icc_profile) + replacement
+        return replacement
+
+    input_path = None if hasattr(source_path, 'read') else source_path
+    written_path = None if hasattr(output_path, 'write') else output_path
+    with profile_stage('rewrite', input_path, written_path) as counts:
+        with _open_binary(source_path) as src, _open_binary(output_path, 'wb') as dst:
+            start = src.tell()
+            rewrite_jpeg_stream(src, dst, edit)
+            counts['bytes_read'] = src.tell() - start
+    return gps_removed
+
+
+def _probe_jpeg(f):
+    """Probe JPEG/MPO markers up to the first scan (SOFn, APP1 EXIF/XMP, APP2 MPF)."""
+    _read_exact(f, 2)  # SOI
+    size = None
+    exif = None
+    xmp = None
+    mpf = None
+    ultra_hdr = False
+
+    while True:
+        byte = _read_exact(f, 1)
+        if byte != b'\xff':
+            raise ValueError("Expected a JPEG marker")
+        while byte == b'\xff':
+            byte = _read_exact(f, 1)
+        marker = byte[0]
+        if marker == 0xD8 or marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            continue  # Markers without a payload
+        if marker in (0xD9, 0xDA):
+            break  # End of image or start of scan: header is complete
+
+        length = struct.unpack('>H', _read_exact(f, 2))[0] - 2
+        if length < 0:
+            raise ValueError("Invalid JPEG segment length")
+        if marker in JPEG_SOF_MARKERS:
+            payload = _read_exact(f, length)
+            height, width = struct.unpack('>HH', payload[1:5])
+            size = (width, height)
+        elif marker in (0xE1, 0xE2):
+            payload = _read_exact(f, length)
+            if marker == 0xE1 and payload.startswith(b'Exif\x00\x00'):
+                # Pillow concatenates the payloads of repeated EXIF segments
+                exif = payload if exif is None else exif + payload[6:]
+            elif marker == 0xE1 and payload.startswith(b'http://ns.adobe.com/xap/1.0/\x00'):
+                xmp = payload.split(b'\x00', 1)[1]
+            elif marker == 0xE2 and payload.startswith(b'MPF\x00'):
+                mpf = payload[4:]
+            if marker == 0xE1 and b' hdrgm:Version="' in payload:
+                ultra_hdr = True
+        else:
+            f.seek(length, os.SEEK_CUR)
+
+    if size is None:
+        raise ValueError("No JPEG frame header")
+
+    image_format, n_frames = 'JPEG', 1
+    if mpf is not None:
+        count = len(_parse_mp_index(mpf))
+        if count > 1 and not ultra_hdr:
+            image_format, n_frames = 'MPO', count
+
+    return image_format, size, n_frames, exif, xmp
+
+
+def _probe_png(f):
+    """Probe PNG chunks (IHDR, acTL, eXIf) without decompressing image data."""
+    _read_exact(f, 8)  # Signature
+    size = None
+    n_frames = 1
+    exif = None
+    seen_idat = False
+
+    while True:
+        length, chunk_type = struct.unpack('>I4s', _read_exact(f, 8))
+        if chunk_type == b'IEND':
+            break
+        if chunk_type == b'IHDR':
+            size = struct.unpack('>II', _read_exact(f, 8))
+            f.seek(length - 8 + 4, os.SEEK_CUR)
+            continue
+        if chunk_type == b'IDAT':
+            seen_idat = True
+        elif chunk_type == b'acTL' and not seen_idat:
+            frames = struct.unpack('>I', _read_exact(f, 4))[0]
+            if 0 < frames <= 2 ** 31:
+                n_frames = frames
+            f.seek(length - 4 + 4, os.SEEK_CUR)
+            continue
+        elif chunk_type == b'eXIf':
+            if length > PROBE_MAX_SEGMENT:
+                raise ValueError("eXIf chunk too large to probe")
+            exif = b'Exif\x00\x00' + _read_exact(f, length)
+            f.seek(4, os.SEEK_CUR)
+            continue
+        elif chunk_type in (b'tEXt', b'zTXt', b'iTXt'):
+            # Text chunks that Pillow turns into EXIF or orientation need Pillow
+            keyword = f.read(min(length, 80)).split(b'\x00', 1)[0]
+            if keyword in (b'Raw profile type exif', b'XML:com.adobe.xmp'):
+                raise ValueError("Metadata in text chunk")
+            f.seek(length - min(length, 80) + 4, os.SEEK_CUR)
+            continue
+        f.seek(length + 4, os.SEEK_CUR)
+
+    if size is None:
+        raise ValueError("No IHDR chunk")
+    return 'PNG', size, n_frames, exif, None
+
+
+def _skip_gif_sub_blocks(f):
+    """Skip a sequence of GIF data sub-blocks up to the block terminator."""
+    while True:
+        block_size = _read_exact(f, 1)[0]
+        if block_size == 0:
+            return
+        f.seek(block_size, os.SEEK_CUR)
+
+
+def _probe_gif(f):
+    """Probe a GIF's logical screen and count its image descriptors."""
+    header = _read_exact(f, 13)
+    width, height = struct.unpack('<HH', header[6:10])
+    flags = header[10]
+    if flags & 0x80:
+        f.seek(3 << ((flags & 7) + 1), os.SEEK_CUR)  # Global colour table
+
+    n_frames = 0
+    while True:
+        introducer = f.read(1)
+        if not introducer or introducer == b';':
+            break
+        if introducer == b'!':
+            label = _read_exact(f, 1)
+            if label == b'\xff':
+                block_size = _read_exact(f, 1)[0]
+                if _read_exact(f, block_size)[:11] == b'XMP DataXMP':
+                    raise ValueError("XMP in GIF")
+            _skip_gif_sub_blocks(f)
+        elif introducer == b',':
+            x0, y0, frame_width, frame_height, frame_flags = struct.unpack(
+                '<HHHHB', _read_exact(f, 9))
+            if n_frames == 0:
+                # Pillow grows the canvas to fit a first frame that overflows it
+                width = max(width, x0 + frame_width)
+                height = max(height, y0 + frame_height)
+            if frame_flags & 0x80:
+                f.seek(3 << ((frame_flags & 7) + 1), os.SEEK_CUR)  # Local colour table
+            _read_exact(f, 1)  # LZW minimum code size
+            _skip_gif_sub_blocks(f)
+            n_frames += 1
+        # Anything else is skipped a byte at a time, as Pillow does
+
+    if n_frames == 0:
+        raise ValueError("No GIF image data")
+    return 'GIF', (width, height), n_frames, None, None
+
+
+def _probe_webp(f):
+    """Probe WebP RIFF chunks (VP8, VP8L, VP8X, ANMF, EXIF, XMP)."""
+    riff_size = struct.unpack('<I', _read_exact(f, 12)[4:8])[0]
+    end = 8 + riff_size
+    size = None
+    animated = False
+    n_frames = 0
+    exif = None
+    xmp = None
+
+    while f.tell() + 8 <= end:
+        chunk_type, length = struct.unpack('<4sI', _read_exact(f, 8))
+        padded = length + (length & 1)
+        if chunk_type == b'VP8X':
+            data = _read_exact(f, 10)
+            animated = bool(data[0] & 0x02)
+            width = int.from_bytes(data[4:7], 'little') + 1
+            height = int.from_bytes(data[7:10], 'little') + 1
+            size = (width, height)
+            f.seek(padded - 10, os.SEEK_CUR)
+        elif chunk_type == b'VP8 ' and size is None:
+            data = _read_exact(f, 10)
+            if data[3:6] != b'\x9d\x01\x2a':
+                raise ValueError("Bad VP8 frame header")
+            width, height = struct.unpack('<HH', data[6:10])
+            size = (width & 0x3fff, height & 0x3fff)
+            f.seek(padded - 10, os.SEEK_CUR)
+        elif chunk_type == b'VP8L' and size is None:
+            data = _read_exact(f, 5)
+            if data[0] != 0x2f:
+                raise ValueError("Bad VP8L signature")
+            bits = int.from_bytes(data[1:5], 'little')
+            size = ((bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1)
+            f.seek(padded - 5, os.SEEK_CUR)
+        elif chunk_type in (b'EXIF', b'XMP ') and length <= PROBE_MAX_SEGMENT:
+            data = _read_exact(f, length)
+            if chunk_type == b'EXIF':
+                exif = exif or data
+            else:
+                xmp = xmp or data
+            f.seek(padded - length, os.SEEK_CUR)
+        else:
+            if chunk_type == b'ANMF':
+                n_frames += 1
+            f.seek(padded, os.SEEK_CUR)
+
+    if size is None:
+        raise ValueError("No WebP image header")
+    if not animated:
+        n_frames = 1
+    elif n_frames == 0:
+        raise ValueError("Animated WebP without frames")
+    return 'WEBP', size, n_frames, exif, xmp
+
+
+def _probe_tiff(f):
+    """Probe a classic TIFF's first IFD and count the IFD chain."""
+    from PIL import TiffImagePlugin
+    header = _read_exact(f, 8)
+    endian = '<' if header[:2] == b'II' else '>'
+
+    # IFD0 doubles as the EXIF directory for TIFF files, as in Pillow
+    f.seek(0)
+    exif = Image.Exif()
+    exif.load_from_fp(f)
+    width, height = exif.get(256), exif.get(257)
+    if not isinstance(width, int) or not isinstance(height, int):
+        raise ValueError("TIFF without image dimensions")
+    if exif.get(EXIF_ORIENTATION_TAG) in (5, 6, 7, 8):
+        # Whether the reported size is transposed depends on the Pillow version
+        raise ValueError("Transposing orientation in TIFF")
+    if 700 in exif and EXIF_ORIENTATION_TAG not in exif:
+        raise ValueError("XMP orientation in TIFF")
+
+    file_size = os.fstat(f.fileno()).st_size
+    offsets = set()
+    offset = struct.unpack(endian + 'I', header[4:8])[0]
+    while offset and offset < file_size and offset not in offsets:
+        offsets.add(offset)
+        f.seek(offset)
+        entry_count = struct.unpack(endian + 'H', _read_exact(f, 2))[0]
+        f.seek(offset + 2 + 12 * entry_count)
+        offset = struct.unpack(endian + 'I', _read_exact(f, 4))[0]
+
+    return 'TIFF', (width, height), max(len(offsets), 1), exif, None
+
+
+def _iter_boxes(data, start=0, end=None):
+    """Yield (type, payload_start, payload_end) for ISO-BMFF boxes in data."""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        box_size, box_type = struct.unpack('>I4s', data[pos:pos + 8])
+        header = 8
+        if box_size == 1:
+            box_size = struct.unpack('>Q', data[pos + 8:pos + 16])[0]
+            header = 16
+        elif box_size == 0:
+            box_size = end - pos
+        if box_size < header or pos + box_size > end:
+            raise ValueError("Malformed box")
+        yield box_type, pos + header, pos + box_size
+        pos += box_size
+
+
+def _read_uint(data, pos, size):
+    """Read a big-endian unsigned integer of size bytes (0 = absent)."""
+    return int.from_bytes(data[pos:pos + size], 'big') if size else 0
+
+
+def _probe_heif(f):
+    """Probe HEIF item boxes (pitm, iinf, iref, ispe/irot, iloc) for the primary image."""
+    meta = None
+    while meta is None:
+        header = _read_exact(f, 8)
+        box_size, box_type = struct.unpack('>I4s', header)
+        if box_size == 1:
+            box_size = struct.unpack('>Q', _read_exact(f, 8))[0] - 8
+        if box_size < 8:
+            raise ValueError("Malformed box")
+        if box_type == b'ftyp':
+            payload = _read_exact(f, box_size - 8)
+            brands = {payload[:4]} | {payload[i:i + 4] for i in range(8, len(payload), 4)}
+            if not brands & HEIF_BRANDS or b'avif' in brands:
+                raise ValueError("Not a HEIC file")
+        elif box_type == b'meta':
+            if box_size - 8 > PROBE_MAX_SEGMENT:
+                raise ValueError("meta box too large to probe")
+            meta = _read_exact(f, box_size - 8)
+        else:
+            f.seek(box_size - 8, os.SEEK_CUR)
+
+    primary = None
+    items = {}          # item_ID -> (item_type, hidden)
+    references = []     # (ref_type, from_ID, [to_IDs])
+    properties = []
+    associations = {}   # item_ID -> [property indices]
+    locations = {}      # item_ID -> (construction_method, [(offset, length)])
+    idat_start = None
+
+    for box_type, start, end in _iter_boxes(meta, 4):
+        version, flags = meta[start], _read_uint(meta, start + 1, 3)
+        body = start + 4
+        if box_type == b'hdlr' and meta[body + 4:body + 8] != b'pict':
+            raise ValueError("Not an image HEIF")
+        elif box_type == b'pitm':
+            primary = _read_uint(meta, body, 2 if version == 0 else 4)
+        elif box_type == b'iinf':
+            count_size = 2 if version == 0 else 4
+            for infe_type, infe_start, _ in _iter_boxes(meta, body + count_size, end):
+                infe_version = meta[infe_start]
+                if infe_type != b'infe' or infe_version < 2:
+                    raise ValueError("Unsupported item info")
+                pos = infe_start + 4
+                id_size = 2 if infe_version == 2 else 4
+                item_id = _read_uint(meta, pos, id_size)
+                item_type = meta[pos + id_size + 2:pos + id_size + 6]
+                items[item_id] = (item_type, bool(_read_uint(meta, infe_start + 1, 3) & 1))
+        elif box_type == b'iref':
+            id_size = 2 if version == 0 else 4
+            for ref_type, ref_start, ref_end in _iter_boxes(meta, body, end):
+                from_id = _read_uint(meta, ref_start, id_size)
+                count = _read_uint(meta, ref_start + id_size, 2)
+                pos = ref_start + id_size + 2
+                to_ids = [_read_uint(meta, pos + i * id_size, id_size) for i in range(count)]
+                references.append((ref_type, from_id, to_ids))
+        elif box_type == b'iprp':
+            for sub_type, sub_start, sub_end in _iter_boxes(meta, start, end):
+                if sub_type == b'ipco':
+                    properties = list(_iter_boxes(meta, sub_start, sub_end))
+                elif sub_type == b'ipma':
+                    ipma_version, ipma_flags = meta[sub_start], _read_uint(meta, sub_start + 1, 3)
+                    pos = sub_start + 4
+                    entry_count = _read_uint(meta, pos, 4)
+                    pos += 4
+                    for _ in range(entry_count):
+                        id_size = 2 if ipma_version < 1 else 4
+                        item_id = _read_uint(meta, pos, id_size)
+                        count = meta[pos + id_size]
+                        pos += id_size + 1
+                        index_size = 2 if ipma_flags & 1 else 1
+                        mask = 0x7fff if index_size == 2 else 0x7f
+                        associations[item_id] = [_read_uint(meta, pos + i * index_size, index_size) & mask
+                                                 for i in range(count)]
+                        pos += count * index_size
+        elif box_type == b'iloc':
+            offset_size, length_size = meta[body] >> 4, meta[body] & 15
+            base_offset_size = meta[body + 1] >> 4
+            index_size = meta[body + 1] & 15 if version in (1, 2) else 0
+            pos = body + 2
+            count_size = 2 if version < 2 else 4
+            item_count = _read_uint(meta, pos, count_size)
+            pos += count_size
+            for _ in range(item_count):
+                item_id = _read_uint(meta, pos, count_size)
+                pos += count_size
+                method = 0
+                if version in (1, 2):
+                    method = _read_uint(meta, pos, 2) & 15
+                    pos += 2
+                pos += 2  # data_reference_index
+                base_offset = _read_uint(meta, pos, base_offset_size)
+                pos += base_offset_size
+                extent_count = _read_uint(meta, pos, 2)
+                pos += 2
+                extents = []
+                for _ in range(extent_count):
+                    pos += index_size
+                    extent_offset = _read_uint(meta, pos, offset_size)
+                    extent_length = _read_uint(meta, pos + offset_size, length_size)
+                    pos += offset_size + length_size
+                    extents.append((base_offset + extent_offset, extent_length))
+                locations[item_id] = (method, extents)
+        elif box_type == b'idat':
+            idat_start = start
+
+    if primary not in items:
+        raise ValueError("No primary item")
+
+    size = None
+    rotation = 0
+    for index in associations.get(primary, []):
+        if not 1 <= index <= len(properties):
+            continue
+        prop_type, prop_start, _ = properties[index - 1]
+        if prop_type == b'ispe':
+            size = struct.unpack('>II', meta[prop_start + 4:prop_start + 12])
+        elif prop_type == b'irot':
+            rotation = meta[prop_start] & 3
+        elif prop_type == b'clap':
+            raise ValueError("Cropped HEIF")
+    if size is None:
+        raise ValueError("Primary item without ispe")
+    if rotation in (1, 3):
+        size = (size[1], size[0])
+
+    # Top-level images: every visible image item that is not a thumbnail,
+    # auxiliary image or grid tile
+    image_types = {b'hvc1', b'grid', b'iden', b'iovl'}
+    other_types = {b'Exif', b'mime', b'uri '}
+    if any(t not in image_types | other_types for t, _ in items.values()):
+        raise ValueError("Unsupported HEIF item type")
+    secondary = set()
+    exif_item = None
+    for ref_type, from_id, to_ids in references:
+        if ref_type in (b'thmb', b'auxl'):
+            secondary.add(from_id)
+        elif ref_type == b'dimg':
+            secondary.update(to_ids)
+        elif (ref_type == b'cdsc' and primary in to_ids and exif_item is None
+              and items.get(from_id, (None,))[0] == b'Exif'):
+            exif_item = from_id
+    n_frames = sum(1 for item_id, (item_type, hidden) in items.items()
+                   if item_type in image_types and not hidden and item_id not in secondary)
+
+    exif = None
+    if exif_item is not None and exif_item in locations:
+        method, extents = locations[exif_item]
+        if method not in (0, 1) or (method == 1 and idat_start is None):
+            raise ValueError("Unsupported EXIF location")
+        if sum(length for _, length in extents) > PROBE_MAX_SEGMENT:
+            raise ValueError("EXIF item too large to probe")
+        chunks = []
+        for offset, length in extents:
+            if method == 1:
+                chunks.append(meta[idat_start + offset:idat_start + offset + length])
+            else:
+                f.seek(offset)
+                chunks.append(_read_exact(f, length))
+        data = b''.join(chunks)
+        # Skip the item's TIFF header offset the way pillow-heif does
+        skip = int.from_bytes(data[:4], 'big') + 4
+        if len(data) - skip <= 4:
+            skip = 4
+        elif skip >= 6 and data[skip - 6:skip] == b'Exif\x00\x00':
+            skip -= 6
+        exif = data[skip:] or None
+
+    return 'HEIF', size, max(n_frames, 1), exif, None
+
+
+def _header_probe_for(head):
+    """Return the header parser for a file's leading bytes, or None."""
+    if head[:3] == b'\xff\xd8\xff':
+        return _probe_jpeg
+    if head[:8] == b'\x89PNG\r\n\x1a\n':
+        return _probe_png
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return _probe_gif
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return _probe_webp
+    if head[:4] in (b'II*\x00', b'MM\x00*'):
+        return _probe_tiff
+    if head[4:8] == b'ftyp':
+        return _probe_heif
+    return None
+
+
+def probe_image_header(filepath):
+    """
+    Read an image's format, size, frame count and EXIF from its headers.
+
+    Pure-Python parsers walk the container structure of JPEG/MPO, PNG/APNG,
+    GIF, WebP, TIFF and HEIF files (usually only the first few KB) without
+    handing the file to a Pillow plugin, and report the same values Pillow
+    would. Anything the parsers don't model - an unusual layout, metadata
+    Pillow derives from elsewhere, a format with no Pillow plugin here, or
+    an image beyond the decompression bomb limit - returns None so the
+    caller falls back to Pillow.
 
     Args:
-        filepath: Path to image file
+        filepath: Path to image file, or a seekable binary file holding
+                  one from offset 0
 
     Returns:
-        Dictionary of EXIF data or None if no EXIF present
+        Dict with 'format', 'width', 'height', 'n_frames' and 'exif'
+        (EXIF dict keyed by tag name, or None), or None if not probed
     """
+    input_path = None if hasattr(filepath, 'read') else filepath
     try:
-        with Image.open(filepath) as img:
-            exif = img.getexif()
-
-            if not exif:
+        with _open_binary(filepath) as f, profile_stage('probe', input_path) as counts:
+            parser = _header_probe_for(f.read(16))
+            if parser is None:
                 return None
+            f.seek(0)
+            image_format, size, n_frames, exif, xmp = parser(f)
+            counts['bytes_read'] = f.tell()
 
-            # Convert to dictionary with tag names
-            exif_dict = {}
-            for tag_id, value in exif.items():
-                tag_name = TAGS.get(tag_id, tag_id)
-                exif_dict[tag_name] = value
-
-            return exif_dict if exif_dict else None
+            # Only report formats Pillow could open here (MPO is read by the JPEG plugin)
+            Image.init()
+            if {'MPO': 'JPEG'}.get(image_format, image_format) not in Image.ID:
+                return None
+            width, height = size
+            if width <= 0 or height <= 0 or width * height > Image.MAX_IMAGE_PIXELS:
+                return None
 
+            if not isinstance(exif, Image.Exif):
+                exif_bytes, exif = exif, Image.Exif()
+                if exif_bytes:
+                    exif.load(exif_bytes)
+            if image_format == 'HEIF':
+                # pillow-heif resets the orientation it has already applied
+                if exif.get(EXIF_ORIENTATION_TAG, 1) != 1:
+                    exif[EXIF_ORIENTATION_TAG] = 1
+            elif xmp and EXIF_ORIENTATION_TAG not in exif:
+                # Pillow falls back to the XMP orientation when EXIF has none
+                match = XMP_ORIENTATION_PATTERN.search(xmp)
+                if match:
+                    exif[EXIF_ORIENTATION_TAG] = int(match[2])
+            exif_dict = _exif_to_dict(exif)
     except Exception:
         return None
 
+    return {
+        'format': image_format,
+        'width': width,
+        'height': height,
+        'n_frames': n_frames,
+        'exif': exif_dict,
+    }
 
-def format_exif_curated(exif_dict):
-    """
-    Format curated subset of EXIF data.
 
-    Args:
-        exif_dict: Dictionary of EXIF data
+# Stage names in the order they are listed in the --profile summary
+PROFILE_STAGES = ('open', 'probe', 'decode', 'icc', 'ensure_rgb', 'resample', 'encode',
+                  'rewrite', 'copy', 'fsync')
 
-    Returns:
-        Dictionary with curated EXIF fields using friendly names
-    """
-    if not exif_dict:
-        return {}
+# Records of the running --profile session, or None when profiling is off
+_profile = None
+_profile_lock = threading.Lock()
 
-    curated = {}
+# Input file that stages running in this context are attributed to
+_profile_input = contextvars.ContextVar('ipro_profile_input', default=None)
 
-    # Date taken (prefer DateTimeOriginal, fall back to DateTime)
-    if 'DateTimeOriginal' in exif_dict:
-        curated['date_taken'] = exif_dict['DateTimeOriginal']
-    elif 'DateTime' in exif_dict:
-        curated['date_taken'] = exif_dict['DateTime']
 
-    # Camera make and model
-    if 'Make' in exif_dict:
-        curated['camera_make'] = exif_dict['Make']
-    if 'Model' in exif_dict:
-        curated['camera_model'] = exif_dict['Model']
+def profile_active():
+    """Return True if stage timings are being recorded (see profiling)."""
+    return _profile is not None
 
-    # Orientation
-    if 'Orientation' in exif_dict:
-        curated['orientation'] = exif_dict['Orientation']
 
-    # DPI/Resolution
-    if 'XResolution' in exif_dict:
-        curated['dpi_x'] = exif_dict['XResolution']
-    if 'YResolution' in exif_dict:
-        curated['dpi_y'] = exif_dict['YResolution']
-    if 'ResolutionUnit' in exif_dict:
-        curated['resolution_unit'] = exif_dict['ResolutionUnit']
+@contextlib.contextmanager
+def profile_stage(stage, input_path=None, output_path=None, read_path=None):
+    """
+    Record the wall time, CPU time and I/O of one processing stage.
 
-    return curated
+    Does nothing beyond yielding an empty dict unless a profiling session is
+    active. The yielded dict may be given 'bytes_read' and 'bytes_written';
+    otherwise they are the sizes of read_path and (after the stage)
+    output_path. CPU time is the calling thread's, so stages run on worker
+    threads are measured separately.
+
+    Args:
+        stage: Stage name (see PROFILE_STAGES)
+        input_path: Input the stage works on (default: the ImageContext
+                    entered in this context)
+        output_path: Output file the stage writes, if any
+        read_path: File the stage reads in full, if any (e.g. decode)
+
+    Yields:
+        dict for optional byte counts
+    """
+    counts = {}
+    if _profile is None:
+        yield counts
+        return
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    try:
+        yield counts
+    finally:
+        wall = time.perf_counter() - wall
+        cpu = time.thread_time() - cpu
+        for key, path in (('bytes_read', read_path), ('bytes_written', output_path)):
+            if key not in counts and path is not None:
+                with contextlib.suppress(OSError):
+                    counts[key] = os.path.getsize(path)
+        if input_path is None:
+            input_path = _profile_input.get()
+        record = {
+            'stage': stage,
+            'input': None if input_path is None else str(input_path),
+            'output': None if output_path is None else _atomic_targets.get(str(output_path),
+                                                                           str(output_path)),
+            'wall_s': round(wall, 6),
+            'cpu_s': round(cpu, 6),
+            'bytes_read': counts.get('bytes_read', 0),
+            'bytes_written': counts.get('bytes_written', 0),
+            'pid': os.getpid(),
+        }
+        with _profile_lock:
+            if _profile is not None:
+                _profile.append(record)
+
+
+@contextlib.contextmanager
+def collect_profile(records):
+    """Record stages into the given list for the duration (used by batch workers)."""
+    global _profile
+    previous = _profile
+    _profile = records
+    try:
+        yield records
+    finally:
+        _profile = previous
 
 
-def get_format_extension(format_str):
+def format_profile(records, wall):
     """
-    Map Pillow format name to lowercase file extension.
+    Summarise stage records as a table, one row per stage.
 
     Args:
-        format_str: Pillow format string (e.g., "JPEG", "PNG", "HEIF")
+        records: Stage records (see profile_stage)
+        wall: Wall time of the whole run, in seconds
 
     Returns:
-        String: lowercase extension with dot (e.g., ".jpg", ".png", ".heic")
+        String table with calls, wall/CPU seconds, MB read/written and the
+        share of the run's wall time per stage (stages on parallel threads
+        or processes can add up to more than 100%)
     """
-    # Normalize input to uppercase
-    format_upper = format_str.upper()
+    totals = {}
+    for record in records:
+        row = totals.setdefault(record['stage'], [0, 0.0, 0.0, 0, 0])
+        row[0] += 1
+        row[1] += record['wall_s']
+        row[2] += record['cpu_s']
+        row[3] += record['bytes_read']
+        row[4] += record['bytes_written']
+
+    inputs = {record['input'] for record in records if record['input']}
+    outputs = {record['output'] for record in records if record['output']}
+    order = [stage for stage in PROFILE_STAGES if stage in totals]
+    order += sorted(set(totals) - set(order))
+
+    lines = [f"Profile: {len(inputs)} input(s), {len(outputs)} output(s), {wall:.3f} s wall",
+             f"  {'Stage':<12}{'Calls':>7}{'Wall (s)':>11}{'CPU (s)':>10}"
+             f"{'Read (MB)':>11}{'Written (MB)':>14}{'Wall %':>8}"]
+    for stage in order:
+        calls, stage_wall, cpu, read, written = totals[stage]
+        share = stage_wall / wall * 100 if wall > 0 else 0.0
+        lines.append(f"  {stage:<12}{calls:>7}{stage_wall:>11.3f}{cpu:>10.3f}"
+                     f"{read / 2**20:>11.2f}{written / 2**20:>14.2f}{share:>7.1f}%")
+    return '\n'.join(lines)
+
+
+def profile_settings(args):
+    """
+    Work out whether and where to profile from args and IPRO_PROFILE.
 
-    # Map common formats to preferred extensions
-    format_map = {
-        "JPEG": ".jpg",
-        "MPO": ".jpg",
-        "PNG": ".png",
-        "HEIF": ".heic",
-        "GIF": ".gif",
-        "WEBP": ".webp",
-        "TIFF": ".tiff",
-        "BMP": ".bmp",
-        "ICO": ".ico",
-        "PPM": ".ppm",
-        "DNG": ".dng",
-    }
+    IPRO_PROFILE=1 turns profiling on; any other value except 0 or empty is
+    also taken as the JSON Lines path. --profile-jsonl takes precedence.
 
-    return format_map.get(format_upper, f".{format_str.lower()}")
+    Returns:
+        Tuple of (enabled, jsonl_path or None)
+    """
+    env = os.environ.get('IPRO_PROFILE', '').strip()
+    env_path = env if env not in ('', '0', '1') else None
+    jsonl = getattr(args, 'profile_jsonl', None) or env_path
+    enabled = bool(getattr(args, 'profile', False) or jsonl or env == '1')
+    return enabled, jsonl
 
 
-def format_exif_date_prefix(exif_date_str):
+@contextlib.contextmanager
+def profiling(args):
     """
-    Convert EXIF date string to filename-safe prefix.
+    Profile the command or chain run inside the block, if requested.
 
-    Args:
-        exif_date_str: EXIF format date string "YYYY:MM:DD HH:MM:SS"
+    On exit (including sys.exit) the per-stage summary is printed to stderr
+    and, with a JSON Lines path, every stage record is written there, one
+    object per line.
 
-    Returns:
-        String: Filename prefix "YYYY-MM-DDTHHMMSS_" or None if invalid
+    Args:
+        args: Parsed arguments of the (first) command
     """
-    if not exif_date_str:
-        return None
+    enabled, jsonl = profile_settings(args)
+    if not enabled or _profile is not None:
+        yield
+        return
 
+    records = []
+    start = time.perf_counter()
     try:
-        # EXIF format: "YYYY:MM:DD HH:MM:SS"
-        # Target format: "YYYY-MM-DDTHHMMSS_"
-        parts = exif_date_str.split(' ')
-        if len(parts) != 2:
-            return None
+        with collect_profile(records):
+            yield
+    finally:
+        wall = time.perf_counter() - start
+        print(format_profile(records, wall), file=sys.stderr)
+        if jsonl:
+            try:
+                with open(jsonl, 'w') as f:
+                    for record in records:
+                        f.write(json.dumps(record) + '\n')
+            except OSError as e:
+                print(f"Warning: Cannot write profile to {jsonl}: {e}", file=sys.stderr)
 
-        date_part = parts[0]
-        time_part = parts[1]
 
-        # Validate date format: must be YYYY:MM:DD
-        date_components = date_part.split(':')
-        if len(date_components) != 3:
-            return None
-        # Check that all components are ASCII numeric (reject Unicode digits)
-        for comp in date_components:
-            if not comp.isascii() or not comp.isdigit():
-                return None
+# How outputs reach the disk (--durability). Every writer encodes into a
+# hidden sibling file and renames it into place, so a crash never leaves a
+# truncated output under the final name. 'none' stops there; 'file' and
+# 'batch' also fsync each file's data before the rename, then 'file' fsyncs
+# its directory at once while 'batch' fsyncs directories in groups (see
+# SyncGroup).
+DURABILITY_MODES = ('none', 'file', 'batch')
 
-        # Validate time format: must be HH:MM:SS
-        time_components = time_part.split(':')
-        if len(time_components) != 3:
-            return None
-        for comp in time_components:
-            if not comp.isascii() or not comp.isdigit():
-                return None
+# Outputs a batch renames into place between directory fsyncs with 'batch'
+BATCH_SYNC_INTERVAL = 256
 
-        formatted_date = date_part.replace(':', '-')  # YYYY:MM:DD -> YYYY-MM-DD
-        formatted_time = time_part.replace(':', '')   # HH:MM:SS -> HHMMSS
+_durability = contextvars.ContextVar('ipro_durability', default='none')
+_sync_group = contextvars.ContextVar('ipro_sync_group', default=None)
 
-        return f"{formatted_date}T{formatted_time}_"
-    except Exception:
-        return None
+# Final path of each temporary file being written, for profile records
+_atomic_targets = {}
 
 
-def build_renamed_filename(original, ext=None, date_prefix=None):
+def _fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_directory(path):
+    """Flush a directory's entries (e.g. a rename into it) to disk, where supported."""
+    with contextlib.suppress(OSError):
+        _fsync_path(path)
+
+
+@contextlib.contextmanager
+def atomic_output(path):
     """
-    Build a new filename with optional extension change and date prefix.
+    Write a file through a temporary sibling that is renamed into place.
+
+    The temporary file is hidden (so batch inputs skip it), keeps the final
+    extension (so Image.save() infers the same format) and takes the
+    permissions of the file it replaces, or the umask's defaults for a new
+    one. If the block raises, it is removed and the final path is left as
+    it was. Unless the durability in effect is 'none', its data is fsynced
+    before the rename, so the final name never points at unwritten data;
+    when its directory is fsynced depends on the mode (see durability).
 
     Args:
-        original: Original filename (string or Path)
-        ext: New extension (e.g., ".jpg") or None to keep original
-        date_prefix: Date prefix to prepend (e.g., "2024-11-12T143000_") or None
+        path: Final output path
 
-    Returns:
-        String: New filename
+    Yields:
+        Path of the (empty) temporary file to write
     """
-    # Handle Path objects
-    if isinstance(original, Path):
-        original = original.name
+    path = Path(path)
+    while True:
+        temp = path.with_name(f'.{path.stem}.{os.urandom(4).hex()}{path.suffix}')
+        try:
+            os.close(os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+            break
+        except FileExistsError:
+            continue
+    _atomic_targets[str(temp)] = str(path)
+    try:
+        with contextlib.suppress(FileNotFoundError):
+            os.chmod(temp, os.stat(path).st_mode & 0o7777)
+        yield temp
+        mode = _durability.get()
+        if mode != 'none':
+            with profile_stage('fsync', output_path=temp):
+                _fsync_path(temp)
+        os.replace(temp, path)
+        if mode == 'file':
+            with profile_stage('fsync'):
+                fsync_directory(path.parent)
+        elif mode == 'batch' and _sync_group.get() is not None:
+            _sync_group.get().add([path])
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(temp)
+        raise
+    finally:
+        _atomic_targets.pop(str(temp), None)
 
-    # Get basename without extension
-    path = Path(original)
-    stem = path.stem
-    original_ext = path.suffix
 
-    # Use new extension or keep original
-    new_ext = ext if ext is not None else original_ext
+class SyncGroup:
+    """
+    Outputs renamed into place whose directory fsync has been deferred (--durability batch).
 
-    # Build new filename
-    new_name = stem + new_ext
+    The outputs' data was fsynced before each rename (see atomic_output);
+    what a crash can still lose is the rename itself. flush() fsyncs each
+    directory the pending outputs were renamed into once, so a group of
+    outputs in one directory costs one directory fsync instead of one each.
+    """
 
-    # Add date prefix if provided
-    if date_prefix:
-        new_name = date_prefix + new_name
+    def __init__(self):
+        self._directories = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Number of outputs added since the last flush."""
+        return self._count
+
+    def add(self, paths):
+        """Add written output paths to the group."""
+        with self._lock:
+            for path in paths:
+                self._directories[os.path.dirname(os.path.abspath(path))] = None
+                self._count += 1
+
+    def flush(self):
+        """Fsync the pending outputs' directories, then empty the group."""
+        with self._lock:
+            directories, self._directories, self._count = list(self._directories), {}, 0
+        if not directories:
+            return
+        with profile_stage('fsync'):
+            for directory in directories:
+                fsync_directory(directory)
 
-    return new_name
 
+def current_sync_group():
+    """Return the SyncGroup collecting this run's outputs, or None."""
+    return _sync_group.get()
 
-def get_image_format(filepath):
+
+@contextlib.contextmanager
+def durability(mode, collect=True):
     """
-    Get the actual image format from file content (not extension).
+    Set how outputs written inside the block reach the disk.
 
-    Args:
-        filepath: Path to image file
+    With 'batch' and collect, the outputs' directories are gathered into a
+    SyncGroup (run_batch also flushes it every BATCH_SYNC_INTERVAL outputs)
+    that is flushed when the block exits normally. Batch items run with collect
+    off: their outputs are added by the parent as results come back.
 
-    Returns:
-        String: Pillow format name (e.g., "JPEG", "PNG") or None if can't read
+    Args:
+        mode: One of DURABILITY_MODES, or None for 'none'
+        collect: If False, don't start a SyncGroup for 'batch'
     """
+    mode = mode or 'none'
+    group = SyncGroup() if mode == 'batch' and collect else None
+    mode_token = _durability.set(mode)
+    group_token = _sync_group.set(group)
     try:
-        with Image.open(filepath) as img:
-            return img.format
-    except Exception:
-        return None
+        yield
+        if group is not None:
+            group.flush()
+    finally:
+        _sync_group.reset(group_token)
+        _durability.reset(mode_token)
 
 
-def get_image_info(filepath):
+class ImageContext:
     """
-    Get comprehensive information about an image file.
+    One input image, opened once and probed lazily.
 
-    Args:
-        filepath: Path to image file
+    Validation, probing and processing all read the same Pillow handle, so a
+    command opens (and, for HEIF, parses the container of) each input a single
+    time. Format, size, frame count, EXIF and ICC bytes are cached on first
+    access. Use as a context manager to close the underlying image.
 
-    Returns:
-        Dictionary containing image metadata
+    Attributes:
+        path: Path object of the input file
     """
-    filepath = Path(filepath)
 
-    # Open image
-    with Image.open(filepath) as img:
-        # Get dimensions (EXIF orientation is already handled by Pillow in most cases)
-        width, height = img.size
-        image_format = img.format
-        n_frames = getattr(img, 'n_frames', 1)
+    def __init__(self, path):
+        self.path = Path(path)
+        self._image = None
+        self._error = None
+        self._cache = {}
+        self._profile_token = None
+
+    def __enter__(self):
+        # Stages run while the context is open are profiled against this input
+        self._profile_token = _profile_input.set(self.path)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        if self._profile_token is not None:
+            _profile_input.reset(self._profile_token)
+            self._profile_token = None
+
+    def close(self):
+        """Close the underlying image, if it was opened."""
+        if self._image is not None:
+            self._image.close()
+            self._image = None
+
+    @property
+    def image(self):
+        """
+        The open PIL Image.
+
+        Raises:
+            The original exception (e.g., DecompressionBombError, OSError)
+            if the file could not be opened; later accesses re-raise it
+        """
+        if self._image is None:
+            if self._error is not None:
+                raise self._error
+            try:
+                with profile_stage('open', self.path):
+                    self._image = Image.open(self.path)
+            except Exception as e:
+                self._error = e
+                raise
+        return self._image
 
-    # Calculate ratios and orientation
-    ratio_raw = calculate_aspect_ratio(width, height)
-    common_ratio = match_common_ratio(ratio_raw)
-    orientation = classify_orientation(width, height)
+    def _cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
 
-    # Extract EXIF
-    exif_data = extract_exif_data(filepath)
-    has_exif = exif_data is not None and len(exif_data) > 0
+    @property
+    def format(self):
+        """Pillow format name (e.g., "JPEG"), or None if the file can't be read."""
+        def compute():
+            try:
+                return self.image.format
+            except Exception:
+                return None
+        return self._cached('format', compute)
+
+    @property
+    def size(self):
+        """Original (width, height), recorded before any draft decoding."""
+        return self._cached('size', lambda: self.image.size)
+
+    @property
+    def n_frames(self):
+        """Number of frames (1 for single-frame images)."""
+        return self._cached('n_frames', lambda: getattr(self.image, 'n_frames', 1))
+
+    @property
+    def exif(self):
+        """PIL Exif object, or None if EXIF can't be read."""
+        def compute():
+            try:
+                return self.image.getexif()
+            except Exception:
+                return None
+        return self._cached('exif', compute)
+
+    @property
+    def exif_dict(self):
+        """EXIF data keyed by tag name, or None if no EXIF present."""
+        return self._cached('exif_dict', lambda: _exif_to_dict(self.exif))
+
+    @property
+    def header(self):
+        """Header-only probe result (see probe_image_header), or None."""
+        return self._cached('header', lambda: probe_image_header(self.path))
+
+    @property
+    def icc_profile(self):
+        """Embedded ICC profile bytes, or None."""
+        def compute():
+            try:
+                return self.image.info.get('icc_profile')
+            except Exception:
+                return None
+        return self._cached('icc_profile', compute)
 
-    # Format curated EXIF
-    exif_curated = format_exif_curated(exif_data) if has_exif else None
 
-    # Get file metadata
-    size_kb = get_file_size_kb(filepath)
+# Number of built source-profile -> sRGB transforms kept by srgb_transform()
+ICC_TRANSFORM_CACHE_SIZE = 32
 
-    # Get creation date from EXIF if available
-    creation_date = None
-    if exif_curated and 'date_taken' in exif_curated:
-        creation_date = exif_curated['date_taken']
+_srgb_transforms = collections.OrderedDict()
+_srgb_transforms_lock = threading.Lock()
 
-    # Note: Full path disclosure in info output is intentional — this is a CLI tool
-    # where the user already knows the file path. Not a security concern.
-    return {
-        'filename': filepath.name,
-        'path': str(filepath.absolute()),
-        'format': image_format,
-        'frames': n_frames,
-        'width': width,
-        'height': height,
-        'orientation': orientation,
-        'ratio_raw': ratio_raw,
-        'common_ratio': common_ratio,
-        'size_kb': size_kb,
-        'has_exif': has_exif,
-        'exif': exif_curated,
-        'exif_all': exif_data,
-        'creation_date': creation_date,
-    }
 
+@functools.lru_cache(maxsize=None)
+def _srgb_profile():
+    """Return the sRGB ImageCmsProfile used as the conversion target."""
+    return ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB'))
 
-def resize_image(input_path, output_dir, sizes, dimension='width', quality=DEFAULT_RESIZE_QUALITY, preserve_filename=False):
-    """
-    Resize an image to multiple sizes.
 
-    Args:
-        input_path: Path to input image
-        output_dir: Directory for output images
-        sizes: List of target sizes
-        dimension: 'width' or 'height'
-        quality: JPEG quality (1-100)
+@functools.lru_cache(maxsize=None)
+def srgb_profile_bytes():
+    """Return the serialised sRGB ICC profile embedded in converted outputs."""
+    return _srgb_profile().tobytes()
 
-    Returns:
-        List of created files with metadata
+
+def _icc_tags(icc_profile):
     """
-    # Open and validate image
-    try:
-        img = Image.open(input_path)
-    except Image.DecompressionBombError:
-        raise OSError(
-            f"Image exceeds pixel limit ({MAX_IMAGE_PIXELS:,} pixels) — "
-            "possible decompression bomb"
-        )
-    except Exception as e:
-        raise OSError(f"Cannot read image: {input_path} ({e})") from e
+    Return the tags of an ICC profile as a dict of signature -> tag data.
 
-    with img:
-        # Get original dimensions
-        orig_width, orig_height = img.size
+    Raises:
+        ValueError: If the profile header or tag table is malformed
+    """
+    if len(icc_profile) < 132 or icc_profile[36:40] != b'acsp':
+        raise ValueError("Not an ICC profile")
+    count = struct.unpack_from('>I', icc_profile, 128)[0]
+    if 132 + 12 * count > len(icc_profile):
+        raise ValueError("ICC tag table out of range")
+    tags = {}
+    for index in range(count):
+        signature, offset, size = struct.unpack_from('>4sII', icc_profile, 132 + 12 * index)
+        if offset + size > len(icc_profile):
+            raise ValueError("ICC tag out of range")
+        tags[signature] = icc_profile[offset:offset + size]
+    return tags
 
-        # Prepare output
-        output_dir = Path(output_dir)
-        output_dir.mkdir(parents=True, exist_ok=True)
 
-        # Get base name and extension
-        base_name = input_path.stem
-        extension = input_path.suffix
+def _icc_xyz(data):
+    """Decode an ICC XYZType tag into an (X, Y, Z) tuple."""
+    if data[:4] != b'XYZ ' or len(data) < 20:
+        raise ValueError("Not an XYZ tag")
+    return tuple(value / 65536 for value in struct.unpack_from('>3i', data, 8))
 
-        created_files = []
-        skipped_sizes = []
 
-        # Process each size
-        for size in sizes:
-            # Calculate new dimensions
-            if dimension == 'width':
-                if size > orig_width:
-                    skipped_sizes.append((size, f"original is only {orig_width}px wide"))
-                    continue
-                new_width = size
-                new_height = int((size / orig_width) * orig_height)
-            else:  # height
-                if size > orig_height:
-                    skipped_sizes.append((size, f"original is only {orig_height}px tall"))
-                    continue
-                new_height = size
-                new_width = int((size / orig_height) * orig_width)
+# Parameter counts of the ICC parametricCurveType function types
+ICC_PARA_PARAMS = {0: 1, 1: 3, 2: 4, 3: 5, 4: 7}
 
-            # Resize image using high-quality Lanczos resampling
-            resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
 
-            # Prepare output filename
-            if preserve_filename:
-                output_filename = f"{base_name}{extension}"
-            else:
-                output_filename = f"{base_name}_{size}{extension}"
-            output_path = output_dir / output_filename
+def _icc_curve(data):
+    """
+    Decode an ICC curveType/parametricCurveType tag into a function.
 
-            # Refuse to write through a symlink output path
-            if output_path.exists() and output_path.is_symlink():
-                print(f"Error: Output path is a symlink — refusing to write: {output_path}",
-                      file=sys.stderr)
-                continue
+    Returns:
+        Callable mapping a device value in [0, 1] to a linear value
+    """
+    kind = data[:4]
+    if kind == b'curv':
+        count = struct.unpack_from('>I', data, 8)[0]
+        if count == 0:
+            return lambda x: x
+        if count == 1:
+            gamma = struct.unpack_from('>H', data, 12)[0] / 256
+            return lambda x: x ** gamma
+        table = [v / 65535 for v in struct.unpack_from(f'>{count}H', data, 12)]
+
+        def interpolate(x):
+            position = x * (count - 1)
+            index = min(int(position), count - 2)
+            fraction = position - index
+            return table[index] + (table[index + 1] - table[index]) * fraction
+        return interpolate
+    if kind == b'para':
+        function = struct.unpack_from('>H', data, 8)[0]
+        if function not in ICC_PARA_PARAMS:
+            raise ValueError(f"Unknown parametric curve type {function}")
+        params = [v / 65536 for v in
+                  struct.unpack_from(f'>{ICC_PARA_PARAMS[function]}i', data, 12)]
+        g, a, b, c, d, e, f = params + [0.0] * (7 - len(params))
+        if function == 0:
+            return lambda x: x ** g
+        if function == 1:
+            return lambda x: (a * x + b) ** g if a * x + b > 0 else 0.0
+        if function == 2:
+            return lambda x: (a * x + b) ** g + c if a * x + b > 0 else c
+        if function == 3:
+            return lambda x: (a * x + b) ** g if x >= d else c * x
+        return lambda x: (a * x + b) ** g + e if x >= d else c * x + f
+    raise ValueError("Not a curve tag")
+
+
+def _matrix_shaper(icc_profile):
+    """
+    Return the colorants and tone curves of an RGB matrix/TRC profile.
 
-            # Strip EXIF by converting to RGB if needed and not saving exif
-            resized_img = ensure_rgb_for_jpeg(resized_img)
+    Returns:
+        Tuple of ((rXYZ, gXYZ, bXYZ), (rTRC, gTRC, bTRC) sampled at 256 points)
 
-            # Save without EXIF data
-            resized_img.save(output_path, 'JPEG', quality=quality, optimize=True)
+    Raises:
+        ValueError: If the profile isn't a plain RGB matrix/TRC profile
+        (LittleCMS prefers a profile's LUTs over its matrix when present)
+    """
+    if icc_profile[16:20] != b'RGB ' or icc_profile[20:24] != b'XYZ ':
+        raise ValueError("Not an RGB profile with an XYZ connection space")
+    tags = _icc_tags(icc_profile)
+    if any(signature in tags for signature in (b'A2B0', b'A2B1', b'A2B2', b'D2B0')):
+        raise ValueError("LUT-based profile")
+    colorants = tuple(_icc_xyz(tags[signature]) for signature in (b'rXYZ', b'gXYZ', b'bXYZ'))
+    curves = tuple(tuple(map(_icc_curve(tags[signature]), (i / 255 for i in range(256))))
+                   for signature in (b'rTRC', b'gTRC', b'bTRC'))
+    return colorants, curves
 
-            # Get file size
-            file_size = get_file_size_kb(output_path)
 
-            created_files.append({
-                'path': output_path,
-                'filename': output_filename,
-                'width': new_width,
-                'height': new_height,
-                'size_kb': file_size
-            })
+@functools.lru_cache(maxsize=None)
+def _srgb_matrix_shaper():
+    """Return _matrix_shaper() of our own sRGB profile, the reference for is_srgb_profile."""
+    return _matrix_shaper(srgb_profile_bytes())
 
-    return created_files, skipped_sizes
 
+# How far an embedded profile may stray from sRGB and still be treated as
+# sRGB: colorant XYZ (s15Fixed16 rounding differs between vendors) and
+# linear tone-curve values (half an 8-bit code value)
+SRGB_COLORANT_TOLERANCE = 0.002
+SRGB_TRC_TOLERANCE = 0.5 / 255
 
-def extract_frames(input_path, output_dir):
+
+def is_srgb_profile(icc_profile):
     """
-    Extract individual frames from a multi-frame image file.
+    Check whether an ICC profile is colorimetrically equivalent to sRGB.
 
-    Supports MPO, animated GIF, APNG, animated WebP, and multi-page TIFF.
+    Camera and OS "sRGB IEC61966-2.1" profiles differ from ours byte for
+    byte (descriptions, sampled instead of parametric curves, fixed-point
+    rounding) but not in effect. A matrix/TRC RGB profile whose colorants
+    and tone curves match our sRGB profile within tolerance is treated as
+    sRGB.
 
     Args:
-        input_path: Path to input image
-        output_dir: Directory for output frame files
+        icc_profile: ICC profile bytes
 
     Returns:
-        List of dicts with path, filename, width, height, size_kb for each frame
+        bool: True if converting from this profile to sRGB would be a no-op
     """
-    input_path = Path(input_path)
-    output_dir = Path(output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
+    if icc_profile == srgb_profile_bytes():
+        return True
+    try:
+        colorants, curves = _matrix_shaper(icc_profile)
+    except (ValueError, KeyError, TypeError, struct.error, OverflowError, ZeroDivisionError):
+        return False
+    srgb_colorants, srgb_curves = _srgb_matrix_shaper()
+    return (all(abs(value - expected) <= SRGB_COLORANT_TOLERANCE
+                for colorant, srgb_colorant in zip(colorants, srgb_colorants)
+                for value, expected in zip(colorant, srgb_colorant))
+            and all(abs(value - expected) <= SRGB_TRC_TOLERANCE
+                    for curve, srgb_curve in zip(curves, srgb_curves)
+                    for value, expected in zip(curve, srgb_curve)))
 
-    base_name = input_path.stem
 
-    try:
-        img = Image.open(input_path)
-    except Image.DecompressionBombError:
-        raise OSError(
-            f"Image exceeds pixel limit ({MAX_IMAGE_PIXELS:,} pixels) — "
-            "possible decompression bomb"
-        )
-    except Exception as e:
-        raise OSError(f"Cannot read image: {input_path} ({e})") from e
+def srgb_transform(icc_profile, mode):
+    """
+    Return a LittleCMS transform from an ICC profile to sRGB.
 
-    with img:
-        n_frames = getattr(img, 'n_frames', 1)
-        image_format = img.format
-        pad_width = len(str(n_frames))
-        if pad_width < 3:
-            pad_width = 3
+    Building a transform means parsing the source profile and compiling a
+    pipeline, which costs far more than applying it to a typical photo.
+    Batches usually share a handful of profiles, so the most recently used
+    transforms are kept (see ICC_TRANSFORM_CACHE_SIZE), keyed by a digest
+    of the profile bytes and the image mode. Profiles that are already
+    sRGB-equivalent (see is_srgb_profile) are cached as None, so each is
+    only inspected once. Safe to call from threads.
 
-        # Determine output extension based on format
-        if image_format in ('MPO', 'JPEG'):
-            out_ext = '.jpg'
-            save_format = 'JPEG'
-        elif image_format == 'PNG' or image_format == 'APNG':
-            out_ext = '.png'
-            save_format = 'PNG'
-        elif image_format == 'GIF':
-            out_ext = '.png'  # Save GIF frames as PNG to preserve quality
-            save_format = 'PNG'
-        elif image_format == 'WEBP':
-            out_ext = '.png'  # Save WebP frames as PNG to preserve quality
-            save_format = 'PNG'
-        elif image_format == 'TIFF':
-            out_ext = '.tiff'
-            save_format = 'TIFF'
-        else:
-            out_ext = '.png'
-            save_format = 'PNG'
+    Args:
+        icc_profile: Source ICC profile bytes
+        mode: Image mode, used for both input and output
 
-        created_files = []
+    Returns:
+        ImageCms.ImageCmsTransform, or None if the profile is sRGB-equivalent
 
-        for frame_idx in range(n_frames):
-            img.seek(frame_idx)
+    Raises:
+        ImageCms.PyCMSError: If the profile can't be parsed or the mode
+        isn't supported by the transform
+    """
+    key = (hashlib.sha256(icc_profile).digest(), mode)
+    with _srgb_transforms_lock:
+        if key in _srgb_transforms:
+            _srgb_transforms.move_to_end(key)
+            return _srgb_transforms[key]
+
+    if is_srgb_profile(icc_profile):
+        transform = None
+    else:
+        try:
+            source = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+            transform = ImageCms.ImageCmsTransform(source, _srgb_profile(), mode, mode)
+        except (OSError, TypeError, ValueError) as e:
+            raise ImageCms.PyCMSError(e) from e
 
-            # Build output filename with zero-padded numbering
-            frame_num = str(frame_idx + 1).zfill(pad_width)
-            output_filename = f"{base_name}_{frame_num}{out_ext}"
-            output_path = output_dir / output_filename
+    with _srgb_transforms_lock:
+        _srgb_transforms[key] = transform
+        while len(_srgb_transforms) > ICC_TRANSFORM_CACHE_SIZE:
+            _srgb_transforms.popitem(last=False)
+    return transform
 
-            # Refuse to write through a symlink output path
-            if output_path.exists() and output_path.is_symlink():
-                print(f"Error: Output path is a symlink — refusing to write: {output_path}",
-                      file=sys.stderr)
-                continue
 
-            # Convert to RGB for JPEG output
-            frame_img = img.copy()
-            if save_format == 'JPEG':
-                frame_img = ensure_rgb_for_jpeg(frame_img)
+def convert_to_srgb(img, in_place=False):
+    """
+    Convert image to sRGB color profile if it has a different profile.
 
-            # Save frame
-            save_kwargs = {'format': save_format}
-            if save_format == 'JPEG':
-                save_kwargs['quality'] = DEFAULT_CONVERT_QUALITY
-                save_kwargs['optimize'] = True
+    Images whose embedded profile is already sRGB-equivalent are returned
+    as they are, without a transform or a copy.
 
-            frame_img.save(output_path, **save_kwargs)
+    Args:
+        img: PIL Image object
+        in_place: If True, transform img's own pixel buffer instead of
+                  allocating a new image (falls back to a copy when the
+                  buffer is read-only, e.g. memory-mapped)
 
-            file_size = get_file_size_kb(output_path)
-            width, height = frame_img.size
+    Returns:
+        PIL Image object in sRGB color space
+    """
+    try:
+        # Check if image has an ICC profile
+        icc_profile = img.info.get('icc_profile')
+        if icc_profile:
+            transform = srgb_transform(icc_profile, img.mode)
+            if transform is None:
+                return img
+            if in_place:
+                img.load()
+            if in_place and not img.readonly:
+                transform.apply_in_place(img)
+            else:
+                img = transform.apply(img)
+    except (ImageCms.PyCMSError, ValueError):
+        # If color management conversion fails, return the original image
+        pass
+    return img
 
-            created_files.append({
-                'path': output_path,
-                'filename': output_filename,
-                'width': width,
-                'height': height,
-                'size_kb': file_size,
-            })
 
-    return created_files
+# Printed when convert keeps EXIF but drops its GPS directory (there is no
+# option to keep location data; --strip-exif drops the rest as well)
+GPS_STRIPPED_NOTE = ("Note: GPS metadata stripped from output (other EXIF is kept; "
+                     "use --strip-exif to remove it all)")
 
 
-def serialize_exif_value(value):
+def note_gps_stripped():
+    """Tell the user (on stderr) that GPS data was left out of a converted output."""
+    print(GPS_STRIPPED_NOTE, file=sys.stderr)
+
+
+def _strip_gps_from_exif(exif_data):
+    """
+    Remove GPS metadata (tag 34853/0x8825) from EXIF data.
+
+    GPS data contains location information that is a privacy risk.
+    This is stripped by default when EXIF is preserved during conversion.
+
+    Args:
+        exif_data: PIL Exif object
+
+    Returns:
+        PIL Exif object with GPS data removed, or original if no GPS present
+    """
+    if exif_data and GPS_IFD_TAG in exif_data:
+        del exif_data[GPS_IFD_TAG]
+        return exif_data, True
+    return exif_data, False
+
+
+def _open_source(source_path, context):
+    """
+    Return a context manager yielding the PIL image for a source.
+
+    A caller-supplied ImageContext keeps ownership of its image (it is not
+    closed on exit); otherwise the file is opened and closed here.
+    """
+    if context is not None:
+        return contextlib.nullcontext(context.image)
+    return Image.open(source_path)
+
+
+def prepare_for_format(img, target_format, quality=DEFAULT_CONVERT_QUALITY, exif_data=None,
+                       convert_to_srgb_profile=True, in_place=False):
+    """
+    Prepare an image and its encoder options for a target format.
+
+    Applies the sRGB conversion and JPEG mode handling used by convert, and
+    builds the keyword arguments for Image.save().
+
+    Args:
+        img: PIL Image object
+        target_format: Target format (e.g., "jpeg", "png", "webp")
+        quality: JPEG/WebP quality 1-100
+        exif_data: EXIF to embed (JPEG only), or None
+        convert_to_srgb_profile: If True, convert to sRGB and embed the sRGB profile
+        in_place: If True, the sRGB conversion may modify img itself (see
+                  convert_to_srgb); only for images the caller won't reuse
+
+    Returns:
+        Tuple of (PIL Image ready to save, dict of save keyword arguments)
+    """
+    # Convert to sRGB if requested
+    if convert_to_srgb_profile:
+        with profile_stage('icc'):
+            img = convert_to_srgb(img, in_place=in_place)
+
+    # Handle color mode conversion for JPEG output
+    if target_format.lower() in ('jpeg', 'jpg'):
+        with profile_stage('ensure_rgb'):
+            img = ensure_rgb_for_jpeg(img)
+
+    # Prepare save arguments
+    save_kwargs = {}
+    if target_format.lower() in ('jpeg', 'jpg'):
+        save_kwargs['quality'] = quality
+        save_kwargs['format'] = 'JPEG'
+    elif target_format.lower() == 'png':
+        save_kwargs['format'] = 'PNG'
+    elif target_format.lower() == 'webp':
+        save_kwargs['quality'] = quality
+        save_kwargs['format'] = 'WEBP'
+
+    # Add EXIF if preserving
+    if exif_data and target_format.lower() in ('jpeg', 'jpg'):
+        save_kwargs['exif'] = exif_data
+
+    # Embed sRGB ICC profile for better compatibility
+    if convert_to_srgb_profile:
+        save_kwargs['icc_profile'] = srgb_profile_bytes()
+
+    return img, save_kwargs
+
+
+@functools.lru_cache(maxsize=None)
+def _pillow_jpeg_tables(quality):
+    """Return the (quantization tables, subsampling) Pillow encodes at a quality."""
+    from PIL import JpegImagePlugin
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (16, 16)).save(buffer, format='JPEG', quality=quality)
+    with Image.open(buffer) as encoded:
+        return encoded.quantization, JpegImagePlugin.get_sampling(encoded)
+
+
+def _can_rewrite_jpeg(img, target_format, quality, convert_to_srgb_profile):
+    """
+    Check whether a JPEG-to-JPEG convert can skip decoding and re-encoding.
+
+    The source's entropy-coded data can be reused when re-encoding would
+    produce the same kind of stream anyway: an RGB JPEG whose colours need
+    no transform (no profile, or an sRGB-equivalent one), at the requested
+    quality (or with no quality requested).
+
+    Args:
+        img: Opened (not yet decoded) source image
+        target_format: Target format name
+        quality: Requested quality, or None if not specified
+        convert_to_srgb_profile: Whether the output must be sRGB
+
+    Returns:
+        bool: True if strip_jpeg_metadata() can produce the output
+    """
+    from PIL import JpegImagePlugin
+
+    if target_format.lower() not in ('jpeg', 'jpg'):
+        return False
+    if img.format != 'JPEG' or img.mode != 'RGB':
+        return False
+    icc_profile = img.info.get('icc_profile')
+    if convert_to_srgb_profile and icc_profile:
+        try:
+            if srgb_transform(icc_profile, img.mode) is not None:
+                return False
+        except ImageCms.PyCMSError:
+            return False
+    if quality is not None:
+        tables, subsampling = _pillow_jpeg_tables(quality)
+        if img.quantization != tables or JpegImagePlugin.get_sampling(img) != subsampling:
+            return False
+    return True
+
+
+def _convert_to(img, source, destination, target_format, quality=None, strip_exif=False,
+                convert_to_srgb_profile=True, in_place=False):
+    """
+    Write an opened image to a destination in another format.
+
+    A JPEG that can keep its entropy-coded data (see _can_rewrite_jpeg) is
+    rewritten at segment level from source instead of being decoded and
+    re-encoded; everything else goes through prepare_for_format(). EXIF is
+    kept, without GPS data, unless strip_exif is set.
+
+    Args:
+        img: Opened source image
+        source: Path or seekable binary file of the encoded source, or None
+                if there is none (rules out the no-re-encode path)
+        destination: Path or writable binary file for the output
+        target_format: Target format (e.g., "jpeg", "png")
+        quality: Quality 1-100, or None for the default (80) or the JPEG
+                 source's own quality
+        strip_exif: If True, write no EXIF
+        convert_to_srgb_profile: If True, convert to sRGB and embed its profile
+        in_place: Passed to prepare_for_format()
+
+    Returns:
+        Tuple of (rewritten, gps_removed): rewritten is True if the JPEG was
+        rewritten without re-encoding, gps_removed if GPS data was dropped
+
+    Raises:
+        Whatever decoding or encoding raises (OSError, ValueError, ...)
+    """
+    if source is not None and _can_rewrite_jpeg(img, target_format, quality,
+                                                convert_to_srgb_profile):
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        try:
+            gps_removed = strip_jpeg_metadata(
+                source, destination,
+                exif='remove' if strip_exif else 'no-gps',
+                icc_profile=srgb_profile_bytes() if convert_to_srgb_profile else None,
+            )
+        except ValueError:
+            # Malformed header or EXIF: fall back to re-encoding
+            if hasattr(destination, 'truncate'):
+                destination.seek(0)
+                destination.truncate()
+        else:
+            return True, gps_removed
+
+    # Get EXIF data if we need to preserve it
+    exif_data, gps_removed = None, False
+    if not strip_exif:
+        try:
+            exif_data = img.getexif()
+        except Exception:
+            exif_data = None
+        if exif_data:
+            exif_data, gps_removed = _strip_gps_from_exif(exif_data)
+
+    if quality is None:
+        quality = DEFAULT_CONVERT_QUALITY
+    source_path = None if source is None or hasattr(source, 'read') else source
+    with profile_stage('decode', source_path, read_path=source_path):
+        img.load()
+    img, save_kwargs = prepare_for_format(
+        img, target_format, quality=quality, exif_data=exif_data,
+        convert_to_srgb_profile=convert_to_srgb_profile, in_place=in_place,
+    )
+
+    # Save the image
+    destination_path = None if hasattr(destination, 'write') else destination
+    with profile_stage('encode', output_path=destination_path):
+        img.save(destination, **save_kwargs)
+    return False, gps_removed
+
+
+def convert_image(source_path, output_path, target_format, quality=None, strip_exif=False, convert_to_srgb_profile=True, context=None):
+    """
+    Convert an image to a different format.
+
+    Args:
+        source_path: Path to source image
+        output_path: Path for output image
+        target_format: Target format (e.g., "jpeg", "png")
+        quality: JPEG quality 1-100, or None for the default (80). A JPEG
+                 source already encoded at this quality (or any JPEG when
+                 None) has its metadata rewritten without re-encoding.
+        strip_exif: If True, strip EXIF metadata from output
+        convert_to_srgb_profile: If True, convert to sRGB color profile (default: True)
+        context: Optional ImageContext for source_path (reuses its open image,
+                 whose pixels may be colour-converted in place)
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        source_path = Path(source_path)
+        output_path = Path(output_path)
+
+        # Refuse to write through a symlink output path
+        if output_path.exists() and output_path.is_symlink():
+            print(f"Error: Output path is a symlink — refusing to write: {output_path}",
+                  file=sys.stderr)
+            return False
+
+        with _open_source(source_path, context) as img:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            with atomic_output(output_path) as temp_path:
+                _, gps_stripped = _convert_to(
+                    img, source_path, temp_path, target_format, quality=quality,
+                    strip_exif=strip_exif, convert_to_srgb_profile=convert_to_srgb_profile,
+                    in_place=True,
+                )
+        if gps_stripped:
+            note_gps_stripped()
+
+        return True
+
+    except Image.DecompressionBombError:
+        print(f"Error: Image exceeds pixel limit ({MAX_IMAGE_PIXELS:,} pixels) — "
+              "possible decompression bomb", file=sys.stderr)
+        return False
+    except Exception:
+        # atomic_output removed the partial file; output_path is untouched
+        return False
+
+
+# Suffixes accepted by parse_memory_size (binary multiples)
+MEMORY_UNITS = {'': 1, 'K': 2**10, 'M': 2**20, 'G': 2**30, 'T': 2**40}
+
+
+def parse_memory_size(value):
+    """Parse a memory size such as "512M", "4G" or "4GB" (binary units) into bytes."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?\s*', value, re.IGNORECASE)
+    if not match or float(match.group(1)) <= 0:
+        raise argparse.ArgumentTypeError(
+            f"Invalid memory size: {value!r} (expected e.g. 512M, 4G)")
+    return int(float(match.group(1)) * MEMORY_UNITS[match.group(2).upper()])
+
+
+# Suffixes accepted by parse_pixel_count (decimal multiples, as in "megapixels")
+PIXEL_UNITS = {'': 1, 'K': 10**3, 'M': 10**6, 'G': 10**9}
+
+
+def parse_pixel_count(value):
+    """Parse a pixel count such as "600M", "1.5G" or "250000000" into an int."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?)(?:P|PX)?\s*', value, re.IGNORECASE)
+    if not match or float(match.group(1)) <= 0:
+        raise argparse.ArgumentTypeError(
+            f"Invalid pixel count: {value!r} (expected e.g. 600M, 1.5G)")
+    return int(float(match.group(1)) * PIXEL_UNITS[match.group(2).upper()])
+
+
+def parse_sizes(size_str):
+    """Parse comma-separated list of sizes into integers.
+
+    Enforces MAX_SIZES_COUNT to prevent unbounded resize operations.
+    """
+    try:
+        sizes = [int(s.strip()) for s in size_str.split(',')]
+        if any(s <= 0 for s in sizes):
+            raise ValueError("Sizes must be positive integers")
+        if len(sizes) > MAX_SIZES_COUNT:
+            raise ValueError(
+                f"Too many sizes ({len(sizes)}). Maximum is {MAX_SIZES_COUNT}"
+            )
+        return sizes
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"Invalid size format: {e}")
+
+
+
+def get_file_size_kb(filepath):
+    """Get file size in KB."""
+    return os.path.getsize(filepath) / 1024
+
+
+def calculate_aspect_ratio(width, height):
+    """
+    Calculate aspect ratio as a reduced integer ratio string.
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+
+    Returns:
+        String in format "W:H" (e.g., "16:9", "4:3")
+    """
+    gcd = math.gcd(width, height)
+    ratio_w = width // gcd
+    ratio_h = height // gcd
+    return f"{ratio_w}:{ratio_h}"
+
+
+def classify_orientation(width, height):
+    """
+    Classify image orientation based on dimensions.
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+
+    Returns:
+        String: "square", "landscape", or "portrait"
+    """
+    if width == height:
+        return "square"
+    elif width > height:
+        return "landscape"
+    else:
+        return "portrait"
+
+
+def match_common_ratio(ratio_str):
+    """
+    Match a ratio string against common aspect ratios.
+
+    Args:
+        ratio_str: Ratio string in format "W:H" (e.g., "16:9")
+
+    Returns:
+        String: matched common ratio name or "none"
+    """
+    # Define common ratios with their standard names
+    common_ratios = {
+        "1:1": "1:1",
+        "4:3": "4:3",
+        "3:4": "3:4",
+        "3:2": "3:2",
+        "2:3": "2:3",
+        "16:9": "16:9",
+        "9:16": "9:16",
+        "5:4": "5:4",
+        "4:5": "4:5",
+        "191:100": "1.91:1",  # Instagram landscape
+    }
+
+    return common_ratios.get(ratio_str, "none")
+
+
+def extract_exif_data(filepath, context=None):
+    """
+    Extract EXIF metadata from an image file.
+
+    Args:
+        filepath: Path to image file
+        context: Optional ImageContext for filepath (reuses its open image)
+
+    Returns:
+        Dictionary of EXIF data or None if no EXIF present
+    """
+    if context is not None:
+        return context.exif_dict
+
+    try:
+        with Image.open(filepath) as img:
+            return _exif_to_dict(img.getexif())
+    except Exception:
+        return None
+
+
+def format_exif_curated(exif_dict):
+    """
+    Format curated subset of EXIF data.
+
+    Args:
+        exif_dict: Dictionary of EXIF data
+
+    Returns:
+        Dictionary with curated EXIF fields using friendly names
+    """
+    if not exif_dict:
+        return {}
+
+    curated = {}
+
+    # Date taken (prefer DateTimeOriginal, fall back to DateTime)
+    if 'DateTimeOriginal' in exif_dict:
+        curated['date_taken'] = exif_dict['DateTimeOriginal']
+    elif 'DateTime' in exif_dict:
+        curated['date_taken'] = exif_dict['DateTime']
+
+    # Camera make and model
+    if 'Make' in exif_dict:
+        curated['camera_make'] = exif_dict['Make']
+    if 'Model' in exif_dict:
+        curated['camera_model'] = exif_dict['Model']
+
+    # Orientation
+    if 'Orientation' in exif_dict:
+        curated['orientation'] = exif_dict['Orientation']
+
+    # DPI/Resolution
+    if 'XResolution' in exif_dict:
+        curated['dpi_x'] = exif_dict['XResolution']
+    if 'YResolution' in exif_dict:
+        curated['dpi_y'] = exif_dict['YResolution']
+    if 'ResolutionUnit' in exif_dict:
+        curated['resolution_unit'] = exif_dict['ResolutionUnit']
+
+    return curated
+
+
+def get_format_extension(format_str):
+    """
+    Map Pillow format name to lowercase file extension.
+
+    Args:
+        format_str: Pillow format string (e.g., "JPEG", "PNG", "HEIF")
+
+    Returns:
+        String: lowercase extension with dot (e.g., ".jpg", ".png", ".heic")
+    """
+    # Normalize input to uppercase
+    format_upper = format_str.upper()
+
+    # Map common formats to preferred extensions
+    format_map = {
+        "JPEG": ".jpg",
+        "MPO": ".jpg",
+        "PNG": ".png",
+        "HEIF": ".heic",
+        "GIF": ".gif",
+        "WEBP": ".webp",
+        "TIFF": ".tiff",
+        "BMP": ".bmp",
+        "ICO": ".ico",
+        "PPM": ".ppm",
+        "DNG": ".dng",
+    }
+
+    return format_map.get(format_upper, f".{format_str.lower()}")
+
+
+def format_exif_date_prefix(exif_date_str):
+    """
+    Convert EXIF date string to filename-safe prefix.
+
+    Args:
+        exif_date_str: EXIF format date string "YYYY:MM:DD HH:MM:SS"
+
+    Returns:
+        String: Filename prefix "YYYY-MM-DDTHHMMSS_" or None if invalid
+    """
+    if not exif_date_str:
+        return None
+
+    try:
+        # EXIF format: "YYYY:MM:DD HH:MM:SS"
+        # Target format: "YYYY-MM-DDTHHMMSS_"
+        parts = exif_date_str.split(' ')
+        if len(parts) != 2:
+            return None
+
+        date_part = parts[0]
+        time_part = parts[1]
+
+        # Validate date format: must be YYYY:MM:DD
+        date_components = date_part.split(':')
+        if len(date_components) != 3:
+            return None
+        # Check that all components are ASCII numeric (reject Unicode digits)
+        for comp in date_components:
+            if not comp.isascii() or not comp.isdigit():
+                return None
+
+        # Validate time format: must be HH:MM:SS
+        time_components = time_part.split(':')
+        if len(time_components) != 3:
+            return None
+        for comp in time_components:
+            if not comp.isascii() or not comp.isdigit():
+                return None
+
+        formatted_date = date_part.replace(':', '-')  # YYYY:MM:DD -> YYYY-MM-DD
+        formatted_time = time_part.replace(':', '')   # HH:MM:SS -> HHMMSS
+
+        return f"{formatted_date}T{formatted_time}_"
+    except Exception:
+        return None
+
+
+def build_renamed_filename(original, ext=None, date_prefix=None):
+    """
+    Build a new filename with optional extension change and date prefix.
+
+    Args:
+        original: Original filename (string or Path)
+        ext: New extension (e.g., ".jpg") or None to keep original
+        date_prefix: Date prefix to prepend (e.g., "2024-11-12T143000_") or None
+
+    Returns:
+        String: New filename
+    """
+    # Handle Path objects
+    if isinstance(original, Path):
+        original = original.name
+
+    # Get basename without extension
+    path = Path(original)
+    stem = path.stem
+    original_ext = path.suffix
+
+    # Use new extension or keep original
+    new_ext = ext if ext is not None else original_ext
+
+    # Build new filename
+    new_name = stem + new_ext
+
+    # Add date prefix if provided
+    if date_prefix:
+        new_name = date_prefix + new_name
+
+    return new_name
+
+
+def get_image_format(filepath, context=None):
+    """
+    Get the actual image format from file content (not extension).
+
+    Args:
+        filepath: Path to image file
+        context: Optional ImageContext for filepath (reuses its open image)
+
+    Returns:
+        String: Pillow format name (e.g., "JPEG", "PNG") or None if can't read
+    """
+    if context is not None:
+        return context.format
+
+    try:
+        with Image.open(filepath) as img:
+            return img.format
+    except Exception:
+        return None
+
+
+def get_image_info(filepath, context=None):
+    """
+    Get comprehensive information about an image file.
+
+    Args:
+        filepath: Path to image file
+        context: Optional ImageContext for filepath (reuses its open image)
+
+    Returns:
+        Dictionary containing image metadata
+    """
+    filepath = Path(filepath)
+
+    if context is None:
+        with ImageContext(filepath) as context:
+            return get_image_info(filepath, context=context)
+
+    header = context.header
+    if header is not None:
+        # Parsed from the file's headers; Pillow is never invoked
+        width, height = header['width'], header['height']
+        image_format = header['format']
+        n_frames = header['n_frames']
+        exif_data = header['exif']
+    else:
+        # Get dimensions (EXIF orientation is already handled by Pillow in most cases)
+        width, height = context.size
+        image_format = context.image.format
+        n_frames = context.n_frames
+
+        # Extract EXIF
+        exif_data = extract_exif_data(filepath, context=context)
+
+    # Get file metadata
+    size_kb = get_file_size_kb(filepath)
+
+    return build_image_info(filepath, width, height, image_format, n_frames, exif_data, size_kb)
+
+
+def build_image_info(filepath, width, height, image_format, n_frames, exif_data, size_kb):
+    """
+    Assemble the info dictionary reported by the info command.
+
+    Args:
+        filepath: Path of the image (used for filename and path fields)
+        width: Image width in pixels
+        height: Image height in pixels
+        image_format: Pillow format name
+        n_frames: Number of frames
+        exif_data: EXIF dictionary keyed by tag name, or None
+        size_kb: File size in KB, or None for an image not on disk
+
+    Returns:
+        Dictionary containing image metadata
+    """
+    filepath = Path(filepath)
+
+    # Calculate ratios and orientation
+    ratio_raw = calculate_aspect_ratio(width, height)
+    common_ratio = match_common_ratio(ratio_raw)
+    orientation = classify_orientation(width, height)
+
+    has_exif = exif_data is not None and len(exif_data) > 0
+
+    # Format curated EXIF
+    exif_curated = format_exif_curated(exif_data) if has_exif else None
+
+    # Get creation date from EXIF if available
+    creation_date = None
+    if exif_curated and 'date_taken' in exif_curated:
+        creation_date = exif_curated['date_taken']
+
+    # Note: Full path disclosure in info output is intentional — this is a CLI tool
+    # where the user already knows the file path. Not a security concern.
+    return {
+        'filename': filepath.name,
+        'path': str(filepath.absolute()),
+        'format': image_format,
+        'frames': n_frames,
+        'width': width,
+        'height': height,
+        'orientation': orientation,
+        'ratio_raw': ratio_raw,
+        'common_ratio': common_ratio,
+        'size_kb': size_kb,
+        'has_exif': has_exif,
+        'exif': exif_curated,
+        'exif_all': exif_data,
+        'creation_date': creation_date,
+    }
+
+
+def compute_resize_targets(orig_width, orig_height, sizes, dimension='width'):
+    """
+    Calculate output dimensions for each requested size.
+
+    Sizes larger than the original are skipped (no upscaling).
+
+    Args:
+        orig_width: Original width in pixels
+        orig_height: Original height in pixels
+        sizes: List of target sizes
+        dimension: 'width' or 'height'
+
+    Returns:
+        Tuple of (targets, skipped_sizes): targets is a list of
+        (size, new_width, new_height); skipped_sizes is a list of (size, reason)
+    """
+    targets = []
+    skipped_sizes = []
+
+    for size in sizes:
+        if dimension == 'width':
+            if size > orig_width:
+                skipped_sizes.append((size, f"original is only {orig_width}px wide"))
+                continue
+            new_width = size
+            new_height = int((size / orig_width) * orig_height)
+        else:  # height
+            if size > orig_height:
+                skipped_sizes.append((size, f"original is only {orig_height}px tall"))
+                continue
+            new_height = size
+            new_width = int((size / orig_height) * orig_width)
+        targets.append((size, new_width, new_height))
+
+    return targets, skipped_sizes
+
+
+def apply_jpeg_draft(img, target_size, headroom=DRAFT_HEADROOM):
+    """
+    Configure a JPEG to decode at a reduced DCT scale (1/2, 1/4 or 1/8).
+
+    libjpeg can skip most of the IDCT work when it only needs a fraction of
+    the original resolution. The scale is chosen so the decoded image is
+    still at least `headroom` times the target size, leaving the final
+    Lanczos pass enough pixels to keep the output sharp. Must be called
+    before the image data is loaded; non-JPEG images are left untouched.
+
+    Args:
+        img: PIL Image object (not yet loaded)
+        target_size: (width, height) of the largest output that will be made
+        headroom: Minimum ratio of decoded size to target size
+
+    Returns:
+        int: The DCT scale denominator applied (1 if no reduction)
+    """
+    if img.format not in ('JPEG', 'MPO'):
+        return 1
+
+    target_width, target_height = target_size
+    img.draft(None, (target_width * headroom, target_height * headroom))
+    # Read the scale libjpeg was configured with: scaled sizes are rounded
+    # up, so 1001 px at 1/2 decodes to 501 px and the size ratio would say 1
+    config = img.decoderconfig
+    return config[0] if config else 1
+
+
+def decode_memory(img, scale=1):
+    """
+    Estimate the memory needed to decode an image at a DCT scale.
+
+    Counts the decoded pixel buffer plus, for progressive JPEGs, the
+    full-resolution coefficient buffer libjpeg keeps regardless of scale
+    (about 3 bytes per pixel with 4:2:0 chroma). Baseline JPEGs are decoded
+    one MCU row at a time straight into the scaled buffer.
+
+    Args:
+        img: PIL Image object (not yet loaded)
+        scale: DCT scale denominator (1, 2, 4 or 8)
+
+    Returns:
+        int: Estimated bytes
+    """
+    width, height = img.size
+    pixels = math.ceil(width / scale) * math.ceil(height / scale)
+    coefficients = width * height * 3 if img.info.get('progressive') else 0
+    return pixels * _bytes_per_pixel(img.mode) + coefficients
+
+
+def apply_bounded_draft(img, target_size, max_memory, headroom=DRAFT_HEADROOM, draft=True):
+    """
+    Configure a JPEG to decode within a memory ceiling.
+
+    Picks the smallest DCT reduction whose decode (see decode_memory) fits
+    in max_memory while still producing at least target_size, so huge
+    inputs are streamed through libjpeg into a buffer proportional to the
+    output rather than the input. With draft set, a stronger reduction is
+    used when the headroom rule of apply_jpeg_draft allows it. Must be
+    called before the image data is loaded.
+
+    Args:
+        img: PIL Image object (not yet loaded)
+        target_size: (width, height) of the largest output that will be made
+        max_memory: Decode-memory ceiling in bytes
+        headroom: Minimum ratio of decoded size to target size for draft
+        draft: If True, also apply apply_jpeg_draft's reduction
+
+    Returns:
+        int: The DCT scale denominator applied
+
+    Raises:
+        OSError: If no scale fits the ceiling without going below target_size
+    """
+    width, height = img.size
+    target_width, target_height = target_size
+    scales = JPEG_DCT_SCALES if img.format in ('JPEG', 'MPO') else (1,)
+    candidates = [scale for scale in scales
+                  if width // scale >= target_width and height // scale >= target_height]
+    fitting = [scale for scale in candidates if decode_memory(img, scale) <= max_memory]
+    if not fitting:
+        smallest = max(candidates, default=1)
+        raise OSError(
+            f"Decoding needs ~{decode_memory(img, smallest) / 2**20:,.0f} MB even at 1/{smallest} "
+            f"scale, above the {max_memory / 2**20:,.0f} MB memory ceiling (--max-memory)"
+        )
+    scale = fitting[0]
+    if draft:
+        scale = max([scale] + [s for s in candidates
+                               if width // s >= target_width * headroom
+                               and height // s >= target_height * headroom])
+    if scale > 1:
+        img.draft(None, (width // scale, height // scale))
+    return scale
+
+
+def resize_memory_ceiling(args, width, height):
+    """
+    Return the decode-memory ceiling for one resize input, or None for none.
+
+    --max-memory always applies. Without it, only inputs above
+    MAX_IMAGE_PIXELS that --max-pixels explicitly admitted get
+    DEFAULT_DECODE_MEMORY; everything else decodes as it always has
+    (reduced only by the draft-to-target rule).
+
+    Args:
+        args: Parsed CLI arguments of a resize invocation
+        width, height: Input dimensions
+    """
+    max_memory = getattr(args, 'max_memory', None)
+    if (max_memory is None and getattr(args, 'max_pixels', None)
+            and width * height > MAX_IMAGE_PIXELS):
+        max_memory = DEFAULT_DECODE_MEMORY
+    return max_memory
+
+
+@contextlib.contextmanager
+def pixel_limit(limit):
+    """Temporarily set Pillow's decompression-bomb limit (Image.MAX_IMAGE_PIXELS)."""
+    previous = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = limit
+    try:
+        yield
+    finally:
+        Image.MAX_IMAGE_PIXELS = previous
+
+
+def plan_cascade(dimensions, min_ratio=CASCADE_MIN_RATIO):
+    """
+    Plan a cascaded multi-size resize.
+
+    Sizes are processed largest first. Each size is resampled from the
+    smallest already-produced output that is at least `min_ratio` times
+    larger in both dimensions, or from the original when no intermediate
+    qualifies, so that no step shrinks by less than the ratio.
+
+    Args:
+        dimensions: List of (width, height) targets in requested order
+        min_ratio: Minimum source/target ratio for reusing an intermediate
+
+    Returns:
+        List of (target_index, source_index) tuples in processing order;
+        source_index is None when the target comes from the original image
+    """
+    order = sorted(range(len(dimensions)), key=lambda i: dimensions[i], reverse=True)
+    plan = []
+    done = []
+
+    for index in order:
+        width, height = dimensions[index]
+        source_index = None
+        # Outputs so far are in descending order; the last match is the smallest
+        for candidate in done:
+            cand_width, cand_height = dimensions[candidate]
+            if cand_width >= width * min_ratio and cand_height >= height * min_ratio:
+                source_index = candidate
+        plan.append((index, source_index))
+        done.append(index)
+
+    return plan
+
+
+def _render_sizes(img, targets, emit, draft=True, cascade=False, threads=1, max_memory=None,
+                  input_path=None):
+    """
+    Resample an opened image to each target and hand the results to emit.
+
+    Applies the reduced-scale decode (see apply_jpeg_draft and
+    apply_bounded_draft), decodes once, then resamples every target -
+    from the original or, with cascade, from earlier results - calling
+    emit(index, resized_img) for each. With threads > 1, emit runs on
+    worker threads, so it must only touch per-index state.
+
+    Args:
+        img: Opened source image (draft mode may be applied to it)
+        targets: List of (size, width, height) from compute_resize_targets
+        emit: Callable receiving (index into targets, resized image)
+        draft, cascade, threads, max_memory: As for resize_image()
+        input_path: Path the profile stages are attributed to, if any
+    """
+    if not targets:
+        return
+
+    # Decode JPEGs at a reduced scale when every output is much smaller,
+    # or when that is the only way to stay within the memory ceiling
+    largest = (max(t[1] for t in targets), max(t[2] for t in targets))
+    if max_memory is not None:
+        apply_bounded_draft(img, largest, max_memory, draft=draft)
+    elif draft:
+        apply_jpeg_draft(img, largest)
+
+    # Work out where each size is resampled from
+    if cascade:
+        plan = plan_cascade([(w, h) for _, w, h in targets])
+    else:
+        plan = [(index, None) for index in range(len(targets))]
+
+    # Cascade results are kept only until the last size resampled from them,
+    # so peak memory doesn't grow with the number of sizes
+    last_use = {source: step for step, (_, source) in enumerate(plan) if source is not None}
+    intermediates = {}
+
+    def render(index):
+        _, new_width, new_height = targets[index]
+        # Resize image using high-quality Lanczos resampling
+        with profile_stage('resample', input_path):
+            resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        emit(index, resized_img)
+
+    # Decode once up front so worker threads only ever read the pixels
+    with profile_stage('decode', input_path, read_path=input_path):
+        img.load()
+
+    # Resampling and encoding release the GIL, so sizes can run on threads
+    workers = min(threads, len(targets))
+    executor = None
+    if workers > 1:
+        executor = ThreadPoolExecutor(max_workers=workers)
+
+    try:
+        pending = []
+
+        # Process each size
+        for step, (index, source_index) in enumerate(plan):
+            if cascade:
+                # Each step depends on an earlier output: resample in order,
+                # hand only the emit to the pool
+                _, new_width, new_height = targets[index]
+                source = img if source_index is None else intermediates[source_index]
+                with profile_stage('resample', input_path):
+                    resized_img = source.resize((new_width, new_height),
+                                                Image.Resampling.LANCZOS,
+                                                reducing_gap=CASCADE_REDUCING_GAP)
+                source = None
+                if index in last_use:
+                    intermediates[index] = resized_img
+                if last_use.get(source_index) == step:
+                    del intermediates[source_index]
+                job = (emit, index, resized_img)
+            else:
+                job = (render, index)
+
+            if executor is not None:
+                pending.append(executor.submit(*job))
+            else:
+                job[0](*job[1:])
+
+        for future in pending:
+            future.result()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def resize_image(input_path, output_dir, sizes, dimension='width', quality=DEFAULT_RESIZE_QUALITY, preserve_filename=False, draft=True, cascade=False, context=None, threads=1, max_memory=None):
+    """
+    Resize an image to multiple sizes.
+
+    Args:
+        input_path: Path to input image
+        output_dir: Directory for output images
+        sizes: List of target sizes
+        dimension: 'width' or 'height'
+        quality: JPEG quality (1-100)
+        draft: If True, let JPEG inputs decode at a reduced DCT scale when the
+               largest output is small enough (see apply_jpeg_draft)
+        cascade: If True, derive smaller sizes from larger intermediate
+                 results instead of the original (see plan_cascade)
+        context: Optional ImageContext for input_path (reuses its open image)
+        threads: Maximum number of sizes resampled and encoded concurrently
+        max_memory: Decode-memory ceiling in bytes (see apply_bounded_draft),
+                    or None for no ceiling (see resize_memory_ceiling)
+
+    Returns:
+        List of created files with metadata
+    """
+    # Open and validate image
+    try:
+        source = _open_source(input_path, context)
+    except Image.DecompressionBombError:
+        raise OSError(
+            f"Image exceeds pixel limit ({Image.MAX_IMAGE_PIXELS:,} pixels) — "
+            "possible decompression bomb"
+        )
+    except Exception as e:
+        raise OSError(f"Cannot read image: {input_path} ({e})") from e
+
+    with source as img:
+        # Get original dimensions
+        orig_width, orig_height = img.size
+
+        # Prepare output
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        # Get base name and extension
+        base_name = input_path.stem
+        extension = input_path.suffix
+
+        # Calculate new dimensions for each size
+        targets, skipped_sizes = compute_resize_targets(orig_width, orig_height, sizes, dimension)
+
+        results = {}
+
+        def encode(index, resized_img):
+            size, new_width, new_height = targets[index]
+
+            # Prepare output filename
+            if preserve_filename:
+                output_filename = f"{base_name}{extension}"
+            else:
+                output_filename = f"{base_name}_{size}{extension}"
+            output_path = output_dir / output_filename
+
+            # Refuse to write through a symlink output path
+            if output_path.exists() and output_path.is_symlink():
+                print(f"Error: Output path is a symlink — refusing to write: {output_path}",
+                      file=sys.stderr)
+                return
+
+            # Strip EXIF by converting to RGB if needed and not saving exif
+            with profile_stage('ensure_rgb', input_path):
+                resized_img = ensure_rgb_for_jpeg(resized_img)
+
+            # Save without EXIF data
+            with atomic_output(output_path) as temp_path:
+                with profile_stage('encode', input_path, temp_path):
+                    resized_img.save(temp_path, 'JPEG', quality=quality, optimize=True)
+
+            # Get file size
+            file_size = get_file_size_kb(output_path)
+
+            results[index] = {
+                'path': output_path,
+                'filename': output_filename,
+                'width': new_width,
+                'height': new_height,
+                'size_kb': file_size
+            }
+
+        _render_sizes(img, targets, encode, draft=draft, cascade=cascade, threads=threads,
+                      max_memory=max_memory, input_path=input_path)
+
+    # Report outputs in the order the sizes were requested
+    created_files = [results[index] for index in sorted(results)]
+
+    return created_files, skipped_sizes
+
+
+def get_frame_output_format(image_format):
+    """
+    Choose the output extension and Pillow format for extracted frames.
+
+    JPEG-based containers keep JPEG; GIF and WebP frames are saved as PNG
+    to preserve quality.
+
+    Args:
+        image_format: Pillow format of the source (e.g., "MPO", "GIF")
+
+    Returns:
+        Tuple of (extension with dot, Pillow save format)
+    """
+    if image_format in ('MPO', 'JPEG'):
+        return '.jpg', 'JPEG'
+    elif image_format == 'TIFF':
+        return '.tiff', 'TIFF'
+    # PNG, APNG, GIF, WebP and anything else
+    return '.png', 'PNG'
+
+
+def _is_extracted_frame_segment(marker, payload):
+    """Header segments kept in losslessly extracted frames (drops EXIF/XMP, IPTC and the MP index)."""
+    if marker in (0xE1, 0xED):
+        return False
+    return not (marker == 0xE2 and payload.startswith(b'MPF\x00'))
+
+
+def split_mpo_frames(data):
+    """
+    Split an MPO file into the JPEG streams of its frames without decoding.
+
+    Frames are located through the MP Index IFD and copied byte for byte.
+    EXIF/XMP, IPTC and MP index segments are removed from each frame's
+    header, matching the metadata-free frames of the decode path; the
+    compressed image data is untouched.
+
+    Args:
+        data: Complete MPO file contents
+
+    Returns:
+        List of JPEG stream bytes, one per frame
+
+    Raises:
+        ValueError: If the MP index is missing or corrupt
+    """
+    segments, _ = _jpeg_header_segments(data)
+    for marker, start, end in segments:
+        payload = data[start:end].lstrip(b'\xff')[3:]
+        if marker == 0xE2 and payload.startswith(b'MPF\x00'):
+            # MP offsets are relative to the TIFF header after the identifier
+            base = end - len(payload) + 4
+            entries = _parse_mp_index(data[base:end])
+            break
+    else:
+        raise ValueError("No MP index")
+
+    if len(entries) < 2:
+        raise ValueError("MP index lists a single image")
+
+    frames = []
+    for index, (size, offset) in enumerate(entries):
+        start = 0 if index == 0 else base + offset
+        if size < 4 or start + size > len(data) or data[start:start + 2] != b'\xff\xd8':
+            raise ValueError(f"MP index entry {index + 1} does not point at a JPEG stream")
+        frames.append(_rewrite_jpeg_header(data[start:start + size], _is_extracted_frame_segment))
+    return frames
+
+
+def _split_mpo_source(source, n_frames):
+    """
+    Split an MPO's frames out of its encoded data (see split_mpo_frames).
+
+    Args:
+        source: Path or seekable binary file of the MPO
+        n_frames: Frame count Pillow reports for it
+
+    Returns:
+        List of JPEG stream bytes, or None if the MP index is missing,
+        corrupt or disagrees with n_frames (the frames must be decoded)
+    """
+    try:
+        with _open_binary(source) as f:
+            f.seek(0)
+            frames = split_mpo_frames(f.read())
+    except Exception:
+        return None
+    return frames if len(frames) == n_frames else None
+
+
+def _save_frame(img, frame_idx, save_format, destination, input_path=None, frame_data=None):
+    """
+    Write one frame of a multi-frame image.
+
+    Args:
+        img: Opened multi-frame image (seeked to frame_idx when decoding)
+        frame_idx: Zero-based frame number
+        save_format: Pillow format from get_frame_output_format()
+        destination: Path or writable binary file
+        input_path: Path the profile stages are attributed to, if any
+        frame_data: The frame's JPEG stream, when it can be copied as it is
+                    (see split_mpo_frames); it is then not decoded
+
+    Returns:
+        Tuple of (width, height) of the frame
+    """
+    output_path = None if hasattr(destination, 'write') else destination
+    if frame_data is not None:
+        with profile_stage('copy', input_path, output_path):
+            with _open_binary(destination, 'wb') as f:
+                f.write(frame_data)
+        return _probe_jpeg(io.BytesIO(frame_data))[1]
+
+    with profile_stage('decode', input_path):
+        img.seek(frame_idx)
+        frame_img = img.copy()
+
+    # Convert to RGB for JPEG output
+    if save_format == 'JPEG':
+        with profile_stage('ensure_rgb', input_path):
+            frame_img = ensure_rgb_for_jpeg(frame_img)
+
+    # Save frame
+    save_kwargs = {'format': save_format}
+    if save_format == 'JPEG':
+        save_kwargs['quality'] = DEFAULT_CONVERT_QUALITY
+        save_kwargs['optimize'] = True
+
+    with profile_stage('encode', input_path, output_path):
+        frame_img.save(destination, **save_kwargs)
+    return frame_img.size
+
+
+def extract_frames(input_path, output_dir, context=None):
+    """
+    Extract individual frames from a multi-frame image file.
+
+    Supports MPO, animated GIF, APNG, animated WebP, and multi-page TIFF.
+    MPO frames are copied out of the file losslessly (see split_mpo_frames);
+    if the MP index is missing or corrupt they are decoded and re-encoded
+    like other formats.
+
+    Args:
+        input_path: Path to input image
+        output_dir: Directory for output frame files
+        context: Optional ImageContext for input_path (reuses its open image)
+
+    Returns:
+        List of dicts with path, filename, width, height, size_kb for each frame
+    """
+    input_path = Path(input_path)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    base_name = input_path.stem
+
+    try:
+        source = _open_source(input_path, context)
+    except Image.DecompressionBombError:
+        raise OSError(
+            f"Image exceeds pixel limit ({MAX_IMAGE_PIXELS:,} pixels) — "
+            "possible decompression bomb"
+        )
+    except Exception as e:
+        raise OSError(f"Cannot read image: {input_path} ({e})") from e
+
+    with source as img:
+        n_frames = getattr(img, 'n_frames', 1)
+        image_format = img.format
+        pad_width = len(str(n_frames))
+        if pad_width < 3:
+            pad_width = 3
+
+        # Determine output extension based on format
+        out_ext, save_format = get_frame_output_format(image_format)
+
+        # MPO frames are complete JPEG streams: copy them out without decoding
+        mpo_frames = None
+        if image_format == 'MPO':
+            with profile_stage('copy', input_path, read_path=input_path):
+                mpo_frames = _split_mpo_source(input_path, n_frames)
+
+        created_files = []
+
+        for frame_idx in range(n_frames):
+            # Build output filename with zero-padded numbering
+            frame_num = str(frame_idx + 1).zfill(pad_width)
+            output_filename = f"{base_name}_{frame_num}{out_ext}"
+            output_path = output_dir / output_filename
+
+            # Refuse to write through a symlink output path
+            if output_path.exists() and output_path.is_symlink():
+                print(f"Error: Output path is a symlink — refusing to write: {output_path}",
+                      file=sys.stderr)
+                continue
+
+            with atomic_output(output_path) as temp_path:
+                width, height = _save_frame(
+                    img, frame_idx, save_format, temp_path, input_path,
+                    frame_data=mpo_frames[frame_idx] if mpo_frames is not None else None,
+                )
+
+            file_size = get_file_size_kb(output_path)
+
+            created_files.append({
+                'path': output_path,
+                'filename': output_filename,
+                'width': width,
+                'height': height,
+                'size_kb': file_size,
+            })
+
+    return created_files
+
+
+# Library API: bytes, file objects or PIL Images in, encoded buffers out.
+# Nothing below prints, exits or writes files; errors are raised as these
+# IproError subclasses, whose exit_code is what the CLI would exit with.
+
+
+class IproError(Exception):
+    """Base class of the errors raised by the library API."""
+
+    exit_code = EXIT_READ_ERROR
+
+
+class InvalidOptionsError(IproError, ValueError):
+    """Options that the CLI would reject (sizes, quality, format, ...)."""
+
+    exit_code = EXIT_INVALID_ARGS
+
+
+class UnsupportedFormatError(IproError):
+    """The input isn't an image Pillow can read, or not one the operation handles."""
+
+    exit_code = EXIT_UNSUPPORTED_FORMAT
+
+
+class ImageReadError(IproError, OSError):
+    """The input couldn't be read, decoded or processed."""
+
+    exit_code = EXIT_READ_ERROR
+
+
+class ImageNotFoundError(ImageReadError, FileNotFoundError):
+    """A source path doesn't exist."""
+
+    exit_code = EXIT_FILE_NOT_FOUND
+
+
+class ImageTooLargeError(ImageReadError):
+    """The input exceeds MAX_INPUT_FILE_SIZE bytes or the decompression-bomb pixel limit."""
+
+
+def _read_source_bytes(source):
+    """Return the encoded bytes of a bytes-like or file-like source, enforcing the size limit."""
+    if hasattr(source, 'read'):
+        data = source.read(MAX_INPUT_FILE_SIZE + 1)
+    else:
+        data = bytes(source)
+    if not isinstance(data, bytes):
+        raise InvalidOptionsError("File objects must be opened in binary mode")
+    if len(data) > MAX_INPUT_FILE_SIZE:
+        raise ImageTooLargeError(
+            f"Input exceeds the {MAX_INPUT_FILE_SIZE // (1024 * 1024)} MB size limit")
+    return data
+
+
+def _encoded_source(source):
+    """
+    Resolve an API source to something Image.open() and the header parsers accept.
+
+    Args:
+        source: bytes, bytearray, memoryview, binary file object, or path
+
+    Returns:
+        A BytesIO positioned at 0, or a Path to an existing file
+
+    Raises:
+        ImageNotFoundError, ImageTooLargeError, InvalidOptionsError
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)) or hasattr(source, 'read'):
+        return io.BytesIO(_read_source_bytes(source))
+    try:
+        path = Path(source)
+    except TypeError:
+        raise InvalidOptionsError(
+            f"Unsupported source type: {type(source).__name__} "
+            "(expected bytes, a binary file object, a path or a PIL Image)") from None
+    if not path.is_file():
+        raise ImageNotFoundError(f"File not found: {path}")
+    if path.stat().st_size > MAX_INPUT_FILE_SIZE:
+        raise ImageTooLargeError(
+            f"File exceeds the {MAX_INPUT_FILE_SIZE // (1024 * 1024)} MB size limit: {path}")
+    return path
+
+
+@contextlib.contextmanager
+def _api_errors():
+    """Translate Pillow and decoder errors raised inside the block into IproError subclasses."""
+    try:
+        yield
+    except IproError:
+        raise
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(
+            f"Image exceeds pixel limit ({Image.MAX_IMAGE_PIXELS:,} pixels) — "
+            "possible decompression bomb") from e
+    except Image.UnidentifiedImageError as e:
+        raise UnsupportedFormatError("Cannot identify image format") from e
+    except (OSError, ValueError, SyntaxError, EOFError) as e:
+        raise ImageReadError(f"Cannot process image: {e}") from e
+
+
+@contextlib.contextmanager
+def _open_api_source(source):
+    """
+    Open an API source as a PIL Image.
+
+    PIL Images are decoded if they aren't already (so draft decoding can't
+    change them) and yielded as they are; they are never modified or
+    closed. Everything else is opened here and closed on exit.
+
+    Yields:
+        Tuple of (PIL Image, encoded source for _convert_to(): a BytesIO,
+        a Path, or None for Image inputs)
+    """
+    if isinstance(source, Image.Image):
+        with _api_errors():
+            source.load()
+        yield source, None
+        return
+
+    encoded = _encoded_source(source)
+    with _api_errors():
+        img = Image.open(encoded)
+    with img:
+        yield img, encoded
+
+
+def _validate_quality(quality):
+    if quality is not None and (isinstance(quality, bool) or not isinstance(quality, int)
+                                or not 1 <= quality <= 100):
+        raise InvalidOptionsError(f"Quality must be between 1-100, got {quality!r}")
+
+
+def _validate_sizes(sizes):
+    sizes = [sizes] if isinstance(sizes, int) else list(sizes)
+    if not sizes:
+        raise InvalidOptionsError("At least one size is required")
+    if any(isinstance(s, bool) or not isinstance(s, int) or s <= 0 for s in sizes):
+        raise InvalidOptionsError("Sizes must be positive integers")
+    if len(sizes) > MAX_SIZES_COUNT:
+        raise InvalidOptionsError(f"Too many sizes ({len(sizes)}). Maximum is {MAX_SIZES_COUNT}")
+    return sizes
+
+
+def read_image_info(source):
+    """
+    Report the metadata the info command shows, for an image in memory or on disk.
+
+    Header-parseable formats are read without decoding (see
+    probe_image_header); others fall back to Pillow.
+
+    Args:
+        source: bytes, bytearray, memoryview, binary file object, path or PIL Image
+
+    Returns:
+        Dict as from build_image_info(). 'filename' and 'path' are only
+        present for path sources; 'size_kb' is None for PIL Images
+
+    Raises:
+        UnsupportedFormatError, ImageReadError, InvalidOptionsError
+    """
+    if isinstance(source, Image.Image):
+        width, height = source.size
+        info = build_image_info('', width, height, source.format,
+                                getattr(source, 'n_frames', 1),
+                                _exif_to_dict(source.getexif()), None)
+    else:
+        encoded = _encoded_source(source)
+        if isinstance(encoded, Path):
+            size_kb = get_file_size_kb(encoded)
+        else:
+            size_kb = len(encoded.getbuffer()) / 1024
+        header = probe_image_header(encoded)
+        if header is None:
+            if hasattr(encoded, 'seek'):
+                encoded.seek(0)
+            with _api_errors(), Image.open(encoded) as img:
+                header = {
+                    'format': img.format,
+                    'width': img.width,
+                    'height': img.height,
+                    'n_frames': getattr(img, 'n_frames', 1),
+                    'exif': _exif_to_dict(img.getexif()),
+                }
+        info = build_image_info(encoded if isinstance(encoded, Path) else '',
+                                header['width'], header['height'], header['format'],
+                                header['n_frames'], header['exif'], size_kb)
+        if isinstance(encoded, Path):
+            return info
+    del info['filename'], info['path']
+    return info
+
+
+def resize_to_buffers(source, widths=None, heights=None, quality=DEFAULT_RESIZE_QUALITY,
+                      draft=True, cascade=False, threads=1, max_memory=None):
+    """
+    Resize an image to several widths (or heights) as in-memory JPEGs.
+
+    The counterpart of resize_image() without files: same targets, draft
+    decoding, cascade and thread options, same metadata-free JPEG output.
+    Sizes larger than the original are skipped, not upscaled.
+
+    Args:
+        source: bytes, bytearray, memoryview, binary file object, path or PIL Image
+        widths: Target width or list of widths (exclusive with heights)
+        heights: Target height or list of heights
+        quality: JPEG quality 1-100 (None for the default, 90)
+        draft, cascade, threads, max_memory: As for resize_image()
+
+    Returns:
+        Tuple of (outputs, skipped): outputs follow the requested order,
+        each a dict with 'size', 'width', 'height', 'format' ("JPEG") and
+        'data' (bytes); skipped is a list of (size, reason) as from
+        compute_resize_targets()
+
+    Raises:
+        InvalidOptionsError, UnsupportedFormatError, ImageTooLargeError,
+        ImageReadError
+    """
+    if (widths is None) == (heights is None):
+        raise InvalidOptionsError("Specify exactly one of widths or heights")
+    dimension = 'width' if widths is not None else 'height'
+    sizes = _validate_sizes(widths if widths is not None else heights)
+    quality = DEFAULT_RESIZE_QUALITY if quality is None else quality
+    _validate_quality(quality)
+
+    results = {}
+    with _open_api_source(source) as (img, _), _api_errors():
+        targets, skipped = compute_resize_targets(img.width, img.height, sizes, dimension)
+
+        def encode(index, resized_img):
+            size, width, height = targets[index]
+            with profile_stage('ensure_rgb'):
+                resized_img = ensure_rgb_for_jpeg(resized_img)
+            buffer = io.BytesIO()
+            with profile_stage('encode'):
+                resized_img.save(buffer, 'JPEG', quality=quality, optimize=True)
+            results[index] = {'size': size, 'width': width, 'height': height,
+                              'format': 'JPEG', 'data': buffer.getvalue()}
+
+        _render_sizes(img, targets, encode, draft=draft, cascade=cascade,
+                      threads=max(1, threads), max_memory=max_memory)
+
+    return [results[index] for index in sorted(results)], skipped
+
+
+def convert_to_buffer(source, format, quality=None, strip_exif=False,
+                      convert_to_srgb_profile=True):
+    """
+    Convert an image to JPEG, PNG or WebP in memory.
+
+    The counterpart of convert_image(): colour is converted to sRGB, EXIF
+    is kept without GPS data unless strip_exif is set, and a JPEG that
+    needs no re-encoding is rewritten at segment level instead. Only the
+    first frame of animated inputs is converted.
+
+    Args:
+        source: bytes, bytearray, memoryview, binary file object, path or PIL Image
+        format: Target format ("jpeg", "jpg", "png" or "webp")
+        quality: Quality 1-100, or None for the default (80) or, for a
+                 JPEG kept as it is, the source's own quality
+        strip_exif: If True, write no EXIF
+        convert_to_srgb_profile: If True, convert to sRGB and embed its profile
+
+    Returns:
+        Dict with 'data' (bytes), 'format' (Pillow format name), 'width',
+        'height', 'rewritten' (True if the JPEG data was reused without
+        re-encoding) and 'gps_removed'
+
+    Raises:
+        InvalidOptionsError, UnsupportedFormatError, ImageTooLargeError,
+        ImageReadError
+    """
+    if not isinstance(format, str) or not is_supported_output_format(format):
+        raise InvalidOptionsError(
+            f"Unsupported output format: {format!r} (supported: "
+            f"{', '.join(sorted(SUPPORTED_OUTPUT_FORMATS))})")
+    _validate_quality(quality)
+
+    buffer = io.BytesIO()
+    with _open_api_source(source) as (img, encoded), _api_errors():
+        rewritten, gps_removed = _convert_to(
+            img, encoded, buffer, format, quality=quality, strip_exif=strip_exif,
+            convert_to_srgb_profile=convert_to_srgb_profile, in_place=encoded is not None,
+        )
+        width, height = img.size
+
+    return {
+        'data': buffer.getvalue(),
+        'format': 'JPEG' if format.lower() in ('jpeg', 'jpg') else format.upper(),
+        'width': width,
+        'height': height,
+        'rewritten': rewritten,
+        'gps_removed': gps_removed,
+    }
+
+
+def strip_to_buffer(source, keep_exif=False, gps_only=False, strip_icc=False):
+    """
+    Remove metadata from a JPEG in memory without re-encoding it.
+
+    The counterpart of the strip command (see strip_jpeg_metadata).
+
+    Args:
+        source: bytes, bytearray, memoryview, binary file object or path
+                holding a JPEG (PIL Images have no encoded data to rewrite)
+        keep_exif: If True, keep EXIF and remove only its GPS data
+        gps_only: If True, remove only GPS data and keep all other metadata
+        strip_icc: If True, also remove the ICC colour profile
+
+    Returns:
+        Dict with 'data' (bytes) and 'gps_removed'
+
+    Raises:
+        InvalidOptionsError, UnsupportedFormatError, ImageReadError
+    """
+    if isinstance(source, Image.Image):
+        raise InvalidOptionsError("strip needs the encoded JPEG, not a PIL Image")
+    encoded = _encoded_source(source)
+    header = probe_image_header(encoded)
+    if header is None or header['format'] != 'JPEG':
+        found = header['format'] if header else 'not a recognised image'
+        raise UnsupportedFormatError(f"strip only rewrites JPEG data; input is {found}")
+
+    if hasattr(encoded, 'seek'):
+        encoded.seek(0)
+    buffer = io.BytesIO()
+    try:
+        gps_removed = strip_jpeg_metadata(
+            encoded, buffer,
+            exif='no-gps' if (keep_exif or gps_only) else 'remove',
+            keep_other=gps_only,
+            icc_profile=None if strip_icc else KEEP_ICC,
+        )
+    except (OSError, ValueError) as e:
+        raise ImageReadError(f"Cannot rewrite JPEG: {e}") from e
+    return {'data': buffer.getvalue(), 'gps_removed': gps_removed}
+
+
+def extract_to_buffers(source):
+    """
+    Extract the frames of a multi-frame image in memory.
+
+    The counterpart of extract_frames(): MPO frames are copied out without
+    re-encoding when the MP index allows; other frames are decoded and
+    saved as PNG (JPEG for JPEG-based containers, TIFF for TIFF).
+
+    Args:
+        source: bytes, bytearray, memoryview, binary file object, path or PIL Image
+
+    Returns:
+        List of dicts with 'index' (1-based), 'width', 'height', 'format'
+        and 'data' (bytes), one per frame
+
+    Raises:
+        UnsupportedFormatError, ImageTooLargeError, ImageReadError,
+        InvalidOptionsError
+    """
+    frames = []
+    with _open_api_source(source) as (img, encoded), _api_errors():
+        n_frames = getattr(img, 'n_frames', 1)
+        _, save_format = get_frame_output_format(img.format)
+        mpo_frames = None
+        if img.format == 'MPO' and encoded is not None:
+            mpo_frames = _split_mpo_source(encoded, n_frames)
+        try:
+            for frame_idx in range(n_frames):
+                buffer = io.BytesIO()
+                width, height = _save_frame(
+                    img, frame_idx, save_format, buffer,
+                    frame_data=mpo_frames[frame_idx] if mpo_frames is not None else None,
+                )
+                frames.append({'index': frame_idx + 1, 'width': width, 'height': height,
+                               'format': save_format, 'data': buffer.getvalue()})
+        finally:
+            if encoded is None and n_frames > 1:
+                img.seek(0)  # Leave the caller's Image on its first frame
+    return frames
+
+
+def render_variant(source, width=None, height=None, format=None, quality=None):
+    """
+    Resize and re-encode an image in one pass, as the http command serves it.
+
+    Combines resize_to_buffers() and convert_to_buffer() with a single
+    decode: the image is scaled to the requested width or height (never
+    upscaled; the original size is kept instead), converted to sRGB and
+    encoded without metadata. A JPEG kept at its size, format and quality
+    is rewritten at segment level rather than re-encoded.
+
+    Args:
+        source: bytes, bytearray, memoryview, binary file object, path or PIL Image
+        width: Target width, or None
+        height: Target height, or None (exclusive with width)
+        format: "jpeg", "jpg", "png" or "webp"; None keeps the source's
+                format when it is one of those, else JPEG
+        quality: Quality 1-100, or None for the default (80) or, for a
+                 JPEG kept as it is, the source's own quality
+
+    Returns:
+        Dict with 'data' (bytes), 'format' (Pillow format name), 'width'
+        and 'height'
+
+    Raises:
+        InvalidOptionsError, UnsupportedFormatError, ImageTooLargeError,
+        ImageReadError
+    """
+    if width is not None and height is not None:
+        raise InvalidOptionsError("Specify at most one of width or height")
+    size = width if width is not None else height
+    if size is not None:
+        _validate_sizes(size)
+    if format is not None and (not isinstance(format, str)
+                               or not is_supported_output_format(format)):
+        raise InvalidOptionsError(
+            f"Unsupported output format: {format!r} (supported: "
+            f"{', '.join(sorted(SUPPORTED_OUTPUT_FORMATS))})")
+    _validate_quality(quality)
+
+    buffer = io.BytesIO()
+    with _open_api_source(source) as (img, encoded), _api_errors():
+        if format is None:
+            format = img.format.lower() if img.format in ('JPEG', 'PNG', 'WEBP') else 'jpeg'
+        output, rewrite_from, in_place = img, encoded, encoded is not None
+        if size is not None:
+            targets, _ = compute_resize_targets(img.width, img.height, [size],
+                                                'width' if width is not None else 'height')
+            if targets:
+                resized = {}
+                _render_sizes(img, targets, resized.__setitem__)
+                output, rewrite_from, in_place = resized[0], None, True
+        _convert_to(output, rewrite_from, buffer, format, quality=quality, strip_exif=True,
+                    in_place=in_place)
+        width, height = output.size
+
+    return {
+        'data': buffer.getvalue(),
+        'format': 'JPEG' if format.lower() in ('jpeg', 'jpg') else format.upper(),
+        'width': width,
+        'height': height,
+    }
+
+
+def serialize_exif_value(value):
     """Convert EXIF values to JSON-serializable types."""
     if isinstance(value, IFDRational):
         # Convert IFDRational to float
@@ -955,433 +3571,3205 @@ def serialize_exif_value(value):
     elif isinstance(value, bytes):
         # Convert bytes to string
         try:
-            return value.decode('utf-8', errors='ignore')
+            return value.decode('utf-8', errors='ignore')
+        except Exception:
+            return str(value)
+    elif isinstance(value, (tuple, list)):
+        # Recursively handle tuples and lists
+        return [serialize_exif_value(v) for v in value]
+    elif isinstance(value, dict):
+        # Recursively handle dicts
+        return {k: serialize_exif_value(v) for k, v in value.items()}
+    else:
+        # Return as-is for JSON-serializable types
+        return value
+
+
+def _format_info_json(info, args):
+    """Format image info as JSON and print it.
+
+    Args:
+        info: Dictionary from get_image_info()
+        args: Parsed CLI arguments (uses exif_all flag)
+    """
+    output_data = {
+        'filename': info['filename'],
+        'path': info['path'],
+        'format': info['format'],
+        'frames': info['frames'],
+        'width': info['width'],
+        'height': info['height'],
+        'orientation': info['orientation'],
+        'ratio_raw': info['ratio_raw'],
+        'common_ratio': info['common_ratio'],
+        'size_kb': round(info['size_kb'], 2) if info['size_kb'] is not None else None,
+        'has_exif': info['has_exif'],
+        'creation_date': info['creation_date'] if info['creation_date'] else None,
+    }
+
+    # Add EXIF data based on flags (serialize for JSON compatibility)
+    if args.exif_all and info['exif_all']:
+        output_data['exif'] = {k: serialize_exif_value(v) for k, v in info['exif_all'].items()}
+    elif info['exif']:
+        output_data['exif'] = {k: serialize_exif_value(v) for k, v in info['exif'].items()}
+    else:
+        output_data['exif'] = None
+
+    print(json.dumps(output_data))
+
+
+def _format_info_csv(info):
+    """Format image info as a single CSV line and print it.
+
+    Args:
+        info: Dictionary from get_image_info()
+    """
+    fields = [
+        info['filename'],
+        info['format'],
+        str(info['frames']),
+        str(info['width']),
+        str(info['height']),
+        info['orientation'],
+        info['ratio_raw'],
+        info['common_ratio'],
+        f"{info['size_kb']:.2f}" if info['size_kb'] is not None else '',
+        info['creation_date'] if info['creation_date'] else ''
+    ]
+    print(','.join(fields))
+
+
+def _format_info_human(info, args):
+    """Format image info as human-readable text and print it.
+
+    Args:
+        info: Dictionary from get_image_info()
+        args: Parsed CLI arguments (uses exif, exif_all flags)
+    """
+    print(f"File: {info['filename']}")
+    print(f"Path: {info['path']}")
+    print(f"Format: {info['format']}")
+    if info['frames'] > 1:
+        print(f"Frames: {info['frames']}")
+    print(f"Dimensions: {info['width']}x{info['height']}")
+    print(f"Orientation: {info['orientation']}")
+    print(f"Aspect Ratio: {info['ratio_raw']}", end='')
+    if info['common_ratio'] != 'none':
+        print(f" ({info['common_ratio']})")
+    else:
+        print()
+    if info['size_kb'] is not None:
+        print(f"File Size: {info['size_kb']:.2f} KB")
+    else:
+        print("File Size: n/a (in memory)")
+    print(f"EXIF Present: {'Yes' if info['has_exif'] else 'No'}")
+
+    # Show EXIF data if requested or if present
+    if (args.exif or args.exif_all) and info['has_exif']:
+        print("\nEXIF Data:")
+        if args.exif_all and info['exif_all']:
+            for key, value in info['exif_all'].items():
+                print(f"  {key}: {value}")
+        elif info['exif']:
+            for key, value in info['exif'].items():
+                formatted_key = key.replace('_', ' ').title()
+                print(f"  {formatted_key}: {value}")
+
+
+def expand_inputs(patterns, recursive=False):
+    """
+    Expand file, directory, and glob arguments into a list of input files.
+
+    Directories contain their image files (by registered Pillow extension),
+    descending into subdirectories when recursive is set. Hidden entries and
+    ipro output directories are skipped so re-runs don't reprocess outputs.
+    Paths that don't exist and aren't globs are passed through unchanged so
+    that validate_input_file() can report them.
+
+    Args:
+        patterns: List of path strings, directory paths, or glob patterns
+        recursive: If True, descend into subdirectories (and honour '**')
+
+    Returns:
+        List of Path objects, de-duplicated, in argument order
+    """
+    image_extensions = Image.registered_extensions()
+    files = []
+    seen = set()
+
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            candidates = path.rglob('*') if recursive else path.glob('*')
+            matches = []
+            for candidate in candidates:
+                relative_parts = candidate.relative_to(path).parts
+                if any(part.startswith('.') for part in relative_parts):
+                    continue
+                if any(is_ipro_output_dir(part) for part in relative_parts[:-1]):
+                    continue
+                if candidate.suffix.lower() in image_extensions and candidate.is_file():
+                    matches.append(candidate)
+            matches.sort()
+        elif path.exists():
+            matches = [path]
+        elif glob.has_magic(pattern):
+            matches = sorted(Path(p) for p in glob.glob(pattern, recursive=recursive)
+                             if Path(p).is_file())
+        else:
+            matches = [path]
+
+        for match in matches:
+            key = str(match)
+            if key not in seen:
+                seen.add(key)
+                files.append(match)
+
+    return files
+
+
+def _is_batch_request(args):
+    """
+    Decide whether parsed args describe a batch or a single input file.
+
+    The 'file' positional accepts several values. A single existing file (or
+    a single missing path, so the normal "not found" error is reported) is
+    normalised back to a plain string and handled by the command as before.
+
+    Args:
+        args: Parsed CLI arguments
+
+    Returns:
+        bool: True if the command should run through run_batch()
+    """
+    if not isinstance(args.file, (list, tuple)):
+        return False
+    if getattr(args, 'journal', None) or getattr(args, 'resume', False):
+        return True     # a journal is kept by run_batch, even for one file
+    if len(args.file) == 1:
+        path = Path(args.file[0])
+        if not path.is_dir() and (path.exists() or not glob.has_magic(args.file[0])):
+            args.file = args.file[0]
+            return False
+    return True
+
+
+def _run_batch_item(func, args, capture=False, profile=False):
+    """
+    Run one command invocation of a batch, trapping exits and errors.
+
+    This is a module-level function so it can be dispatched to worker
+    processes. When capture is set, stdout and stderr are collected and
+    returned so the parent can print them in input order; with profile
+    set, the item's stage records are collected and returned likewise.
+
+    Args:
+        func: Command handler (e.g., cmd_resize)
+        args: Parsed CLI arguments with 'file' bound to one input
+        capture: If True, capture stdout/stderr instead of printing
+        profile: If True, record stages into a list of this item's own
+                 (for worker processes; see profile_stage)
+
+    Returns:
+        Tuple of (output_files, exit_code, stdout_text, stderr_text,
+        profile_records)
+    """
+    out = io.StringIO()
+    err = io.StringIO()
+    result = []
+    code = EXIT_SUCCESS
+    records = []
+
+    with contextlib.ExitStack() as stack:
+        if capture:
+            stack.enter_context(contextlib.redirect_stdout(out))
+            stack.enter_context(contextlib.redirect_stderr(err))
+        if profile:
+            stack.enter_context(collect_profile(records))
+        # Outputs are synced by the parent, which sees every item's results
+        stack.enter_context(durability(getattr(args, 'durability', None), collect=False))
+        try:
+            result = func(args) or []
+        except SystemExit as e:
+            if e.code is None:
+                code = EXIT_SUCCESS
+            elif isinstance(e.code, int):
+                code = e.code
+            else:
+                code = EXIT_READ_ERROR
+        except Exception as e:
+            print(f"Error: {args.file}: {e}", file=sys.stderr)
+            code = EXIT_READ_ERROR
+
+    return result, code, out.getvalue(), err.getvalue(), records
+
+
+def _iter_item_results(func, items, workers, memory_budget=None):
+    """
+    Run a command handler over pre-built argument namespaces, in order.
+
+    With more than one worker the items run on a process pool; each item's
+    captured stdout/stderr is printed as its result is consumed, so output
+    stays in input order regardless of completion order. Successful items'
+    outputs join the run's SyncGroup, if there is one. With a memory
+    budget, items are admitted to the pool by their estimated peak memory
+    (see estimate_job_memory and iter_admitted).
+
+    Args:
+        func: Command handler (e.g., cmd_convert)
+        items: List of argparse.Namespace objects, one per input
+        workers: Number of worker processes (1 = run in this process)
+        memory_budget: Bytes the running items' estimates may add up to, or
+                       None for no limit
+
+    Yields:
+        Tuples of (item_args, output_files, exit_code)
+    """
+    group = current_sync_group()
+    if workers <= 1:
+        for item_args in items:
+            result, code, _, _, _ = _run_batch_item(func, item_args)
+            if group is not None and code == EXIT_SUCCESS:
+                group.add(result)
+            yield item_args, result, code
+        return
+
+    # Workers record their stages separately; they are merged back here
+    profile = profile_active()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        if memory_budget is None:
+            results = executor.map(_run_batch_item, [func] * len(items), items,
+                                   [True] * len(items), [profile] * len(items))
+        else:
+            estimates = [estimate_job_memory(item_args) for item_args in items]
+            for item_args, estimate in zip(items, estimates):
+                if estimate > memory_budget:
+                    print(f"Note: {Path(item_args.file).name} needs ~{estimate / 2**20:,.0f} MB, "
+                          f"more than --memory-budget; it will run on its own",
+                          file=sys.stderr)
+            results = iter_admitted(
+                executor, functools.partial(_run_batch_item, func, capture=True,
+                                            profile=profile),
+                items, estimates, workers, memory_budget,
+            )
+        for item_args, (result, code, out, err, records) in zip(items, results):
+            sys.stdout.write(out)
+            sys.stderr.write(err)
+            sys.stdout.flush()
+            if records:
+                with _profile_lock:
+                    _profile.extend(records)
+            if group is not None and code == EXIT_SUCCESS:
+                group.add(result)
+            yield item_args, result, code
+
+
+# Copies of the decoded source frame each command keeps alive at its peak
+# (e.g. convert: the decoded image plus its RGB/mode-converted copy).
+# Header-only commands decode nothing.
+JOB_FRAME_COPIES = {'info': 0, 'rename': 0, 'strip': 0, 'convert': 2, 'extract': 2, 'resize': 2}
+
+
+def _bytes_per_pixel(mode):
+    """Bytes per pixel of Pillow's in-memory storage for a mode."""
+    if mode in ('1', 'L', 'P'):
+        return 1
+    if mode.startswith('I;16'):
+        return 2
+    return 4  # Pillow pads RGB/YCbCr/LAB to 32 bits per pixel
+
+
+def estimate_job_memory(args):
+    """
+    Estimate the peak image memory of one command invocation.
+
+    Only the image header is read (Image.open is lazy), so this is cheap
+    enough to run for every input before any worker starts. The header is
+    read with the decompression-bomb limit lifted, so the largest inputs
+    (those --max-pixels admits, or that the command will refuse) are
+    estimated at full size rather than skipped. The estimate counts decoded
+    pixel buffers: the source frame times the command's JOB_FRAME_COPIES,
+    plus for resize each downscaled output and its RGB-converted copy.
+    For resize the source frame is the one actually decoded: reduced by
+    the draft or bounded-draft DCT scale _render_sizes will apply, plus the
+    full-size coefficient buffer of progressive JPEGs.
+
+    Args:
+        args: Parsed CLI arguments bound to one input file
+
+    Returns:
+        int: Estimated bytes (0 if the file is not an image Pillow can
+        identify; such inputs fail before decoding anything)
+    """
+    copies = JOB_FRAME_COPIES.get(args.command, 2)
+    if copies == 0:
+        return 0
+    try:
+        with pixel_limit(None), Image.open(args.file) as img:
+            width, height = img.size
+            bytes_per_pixel = _bytes_per_pixel(img.mode)
+            coefficients = decode_memory(img) - width * height * bytes_per_pixel
+            scale, outputs = 1, 0
+            if args.command == 'resize':
+                scale, outputs = _estimate_resize(args, img)
+    except Exception:
+        return 0
+
+    decoded = math.ceil(width / scale) * math.ceil(height / scale) * bytes_per_pixel
+    return decoded * copies + coefficients + outputs
+
+
+def _estimate_resize(args, img):
+    """
+    Work out the decode scale and output buffers of a resize, for estimate_job_memory.
+
+    Applies the same draft choice as _render_sizes to the (unloaded) image.
+
+    Returns:
+        Tuple of (DCT scale denominator, bytes of the outputs and their RGB copies)
+    """
+    width, height = img.size
+    frame = width * height * _bytes_per_pixel(img.mode)
+    dimension, sizes = _resize_options_from_args(args)
+    targets, _ = compute_resize_targets(width, height, sizes, dimension)
+    outputs = sum(int(frame * (w * h) / (width * height)) * 2 for _, w, h in targets)
+    if not targets:
+        return 1, outputs
+    largest = (max(t[1] for t in targets), max(t[2] for t in targets))
+    ceiling = resize_memory_ceiling(args, width, height)
+    draft = not getattr(args, 'no_draft', False)
+    try:
+        if ceiling is not None:
+            return apply_bounded_draft(img, largest, ceiling, draft=draft), outputs
+    except OSError:
+        return 1, outputs   # fails before decoding; count it at full size anyway
+    if draft:
+        return apply_jpeg_draft(img, largest), outputs
+    return 1, outputs
+
+
+def iter_admitted(executor, fn, items, estimates, workers, budget):
+    """
+    Run fn over items on an executor, admitting work against a memory budget.
+
+    Items are submitted in input order while fewer than workers are running
+    and the running items' estimates plus the next one fit within budget.
+    An item that doesn't fit waits for running items to finish; one that
+    exceeds the budget on its own runs when nothing else is running. So
+    small inputs run at full parallelism while huge ones are serialised,
+    and the queue never reorders (no starvation).
+
+    Args:
+        executor: concurrent.futures executor
+        fn: Callable taking one item
+        items: List of work items
+        estimates: Estimated peak bytes per item
+        workers: Maximum number of items running at once
+        budget: Memory budget in bytes
+
+    Yields:
+        Results of fn(item), in input order
+    """
+    pending = {}
+    next_index = 0
+
+    def admit():
+        nonlocal next_index
+        while next_index < len(items):
+            running = [i for i, future in pending.items() if not future.done()]
+            if len(running) >= workers:
+                return
+            load = sum(estimates[i] for i in running)
+            if running and load + estimates[next_index] > budget:
+                return
+            pending[next_index] = executor.submit(fn, items[next_index])
+            next_index += 1
+
+    for index in range(len(items)):
+        while True:
+            admit()
+            future = pending.get(index)
+            if future is not None and future.done():
+                break
+            concurrent.futures.wait([f for f in pending.values() if not f.done()],
+                                    return_when=concurrent.futures.FIRST_COMPLETED)
+        yield pending.pop(index).result()
+
+
+def resolve_jobs(jobs):
+    """
+    Resolve a --jobs value to a worker count.
+
+    Args:
+        jobs: Requested worker count; 0 means one per CPU
+
+    Returns:
+        int: Number of workers (at least 1)
+    """
+    if jobs is None or jobs == 1:
+        return 1
+    if jobs == 0:
+        return os.cpu_count() or 1
+    return max(1, jobs)
+
+
+def resolve_threads(threads, workers=1):
+    """
+    Share a --threads budget between batch worker processes.
+
+    Args:
+        threads: Total thread budget; 0 or None means one per CPU
+        workers: Number of processes the budget is divided between
+
+    Returns:
+        int: Threads available to each process (at least 1)
+    """
+    budget = threads if threads else (os.cpu_count() or 1)
+    return max(1, budget // workers)
+
+
+def run_batch(func, args):
+    """
+    Run a command handler over every input matched by args.file.
+
+    Inputs are expanded with expand_inputs(). Options are validated once
+    (see ChainStage) and each file is processed with its own copy of the
+    parsed arguments; with --jobs > 1 the work is spread
+    over a process pool and each worker's output is printed in input order.
+    Per-file failures are collected into a summary on stderr instead of
+    ending the batch. With --journal, each finished input is recorded as it
+    completes (see BatchJournal), and --resume skips inputs the journal
+    shows as done. With --durability batch, the outputs' directories and
+    then the journal are fsynced every BATCH_SYNC_INTERVAL outputs and at
+    the end.
+
+    Args:
+        func: Command handler to run per file (e.g., cmd_convert)
+        args: Parsed CLI arguments (file is a list of inputs)
+
+    Returns:
+        List of output file paths from all successful inputs (for chaining)
+
+    Raises:
+        SystemExit with EXIT_FILE_NOT_FOUND if nothing matched, or with the
+        first failing exit code once the whole batch has run
+    """
+    files = expand_inputs(args.file, recursive=getattr(args, 'recursive', False))
+    if not files:
+        print(f"Error: No input files matched: {' '.join(args.file)}", file=sys.stderr)
+        sys.exit(EXIT_FILE_NOT_FOUND)
+
+    jobs = getattr(args, 'jobs', 1)
+    if jobs is not None and jobs < 0:
+        print("Error: --jobs must be 0 (one per CPU) or a positive integer", file=sys.stderr)
+        sys.exit(EXIT_INVALID_ARGS)
+    if getattr(args, 'resume', False) and not getattr(args, 'journal', None):
+        print("Error: --resume requires --journal FILE", file=sys.stderr)
+        sys.exit(EXIT_INVALID_ARGS)
+
+    # Validate the options once; each file only binds its own path
+    stage = ChainStage(args)
+
+    outputs_by_file = {}
+    failures = []
+    manifest_dirs = []
+
+    journal = BatchJournal(args.journal, args) if getattr(args, 'journal', None) else None
+    with journal or contextlib.nullcontext():
+        if journal is not None and args.resume:
+            for path in files:
+                outputs = journal.completed(path)
+                if outputs is not None:
+                    outputs_by_file[str(path)] = outputs
+            print(f"Resuming: {len(outputs_by_file)} of {len(files)} file(s) already done "
+                  f"(journal {args.journal})", file=sys.stderr)
+
+        remaining = [path for path in files if str(path) not in outputs_by_file]
+        workers = min(resolve_jobs(jobs), len(remaining))
+        items = [stage.bind(path, workers) for path in remaining]
+        if incremental_requested(args):
+            check_output_collisions(items)
+
+        group = current_sync_group()
+        for item_args, result, code in _iter_item_results(func, items, workers,
+                                                          getattr(args, 'memory_budget', None)):
+            if code == EXIT_SUCCESS:
+                outputs_by_file[item_args.file] = result
+                if journal is not None:
+                    journal.record(item_args.file, result)
+                if group is not None and len(group) >= BATCH_SYNC_INTERVAL:
+                    _sync_checkpoint(group, journal)
+                if incremental_requested(item_args):
+                    output_dir = incremental_output_dir(item_args, Path(item_args.file))
+                    if output_dir not in manifest_dirs:
+                        manifest_dirs.append(output_dir)
+            else:
+                failures.append((item_args.file, code))
+        if group is not None:
+            _sync_checkpoint(group, journal)
+
+    output_files = [output for path in files for output in outputs_by_file.get(str(path), [])]
+
+    # Outputs of inputs that have disappeared are found once per directory
+    for output_dir in manifest_dirs:
+        sweep_manifest(output_dir, getattr(args, 'prune', False))
+
+    succeeded = len(items) - len(failures)
+    print(f"Batch complete: {len(items)} file(s), {succeeded} succeeded, "
+          f"{len(failures)} failed", file=sys.stderr)
+    for path, code in failures:
+        print(f"  ✗ {path} (exit code {code})", file=sys.stderr)
+
+    if failures:
+        sys.exit(failures[0][1])
+
+    return output_files
+
+
+def _sync_checkpoint(group, journal):
+    """Fsync the directories of a batch's pending outputs, then the journal records describing them."""
+    group.flush()
+    if journal is not None:
+        journal.sync()
+
+
+JOURNAL_VERSION = 1
+
+# Options that only change how a batch runs, not what it writes
+JOURNAL_IGNORED_OPTIONS = frozenset({
+    'file', 'func', 'command', 'connect', 'explain', 'in_memory', 'keep_intermediates',
+    'jobs', 'memory_budget', 'recursive', 'threads', 'max_pixels', 'profile', 'profile_jsonl',
+    'journal', 'resume', 'durability', 'incremental', 'content_hash', 'prune', 'in_batch',
+    'options_validated', 'resize_options',
+})
+
+
+def journal_options(args):
+    """Return the options of a batch that determine its outputs, for the journal."""
+    return {name: value for name, value in sorted(vars(args).items())
+            if name not in JOURNAL_IGNORED_OPTIONS}
+
+
+def _file_sha256(path):
+    """Return the hex SHA-256 of a file's contents."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class BatchJournal:
+    """
+    Append-only record of the inputs a batch has finished.
+
+    The journal is a JSON Lines file with one record per successful input:
+    the command, the options that affect the outputs, the ipro version, the
+    input's path and fingerprint, and each output's path, size and SHA-256.
+    Records are appended and flushed as items finish, so a batch killed at
+    any point (OOM, Ctrl-C) leaves a journal of everything it completed; a
+    torn final line is ignored when the journal is read back. To survive a
+    power loss or reboot as well, records are fsynced after their outputs:
+    each one with --durability file, after every group of directory fsyncs
+    with batch (see run_batch).
+
+    completed() answers whether an input can be skipped on --resume: it
+    needs a record with the same command, options and version whose input
+    fingerprint still matches and whose outputs all still exist with their
+    recorded sizes. An input that is itself a recorded output (a file that
+    was renamed or stripped in place) counts as done too. Anything else,
+    including the items that were in flight when the batch died, is redone.
+
+    Use as a context manager; the file is only created on first record.
+
+    Args:
+        path: Path of the journal file
+        args: Parsed CLI arguments of the batch
+    """
+
+    def __init__(self, path, args):
+        self.path = Path(path)
+        self.command = args.command
+        self.options = json.loads(json.dumps(journal_options(args), default=str))
+        self.content_hash = getattr(args, 'content_hash', False)
+        self.durability = getattr(args, 'durability', None) or 'none'
+        self._file = None
+        self._by_input = {}
+        self._by_output = {}
+        self._load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the journal file, if one was opened."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue    # a line torn by a crash mid-write
+            if not isinstance(record, dict) or not self._matches(record):
+                continue
+            self._by_input[record['input']] = record
+            for output in record['outputs']:
+                self._by_output[output['path']] = record
+
+    def _matches(self, record):
+        return (record.get('journal') == JOURNAL_VERSION and record.get('command') == self.command
+                and record.get('options') == self.options
+                and record.get('version') == __version__)
+
+    def completed(self, input_path):
+        """
+        Return an input's recorded outputs if the journal shows it as done.
+
+        Args:
+            input_path: Path to the input file
+
+        Returns:
+            List of output paths, or None if the input must be processed
+        """
+        key = str(Path(input_path).resolve())
+        record = self._by_input.get(key)
+        if record is not None:
+            try:
+                fingerprint = input_fingerprint(key, self.content_hash)
+            except OSError:
+                return None
+            recorded = record['fingerprint']
+            if (recorded is None or recorded['size'] != fingerprint['size']
+                    or recorded['mtime_ns'] != fingerprint['mtime_ns']
+                    or (self.content_hash and recorded['sha256'] != fingerprint['sha256'])):
+                return None
+        else:
+            record = self._by_output.get(key)
+            if record is None:
+                return None
+        for output in record['outputs']:
+            try:
+                if os.stat(output['path']).st_size != output['size']:
+                    return None
+            except OSError:
+                return None
+        return [output['path'] for output in record['outputs']]
+
+    def sync(self):
+        """Fsync the records written so far."""
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+
+    def record(self, input_path, outputs):
+        """
+        Append the record of a finished input.
+
+        With --durability file it is fsynced at once; otherwise it is
+        flushed to the OS and fsynced by sync().
+
+        Args:
+            input_path: Path to the input file
+            outputs: Paths the command wrote for it
+        """
+        key = str(Path(input_path).resolve())
+        try:
+            fingerprint = input_fingerprint(key, self.content_hash)
+        except OSError:
+            fingerprint = None      # renamed away
+        entries = []
+        for output in outputs:
+            output_path = str(Path(output).resolve())
+            entries.append({'path': output_path, 'size': os.stat(output_path).st_size,
+                            'sha256': _file_sha256(output_path)})
+        record = {'journal': JOURNAL_VERSION, 'command': self.command, 'options': self.options,
+                  'version': __version__, 'input': key, 'fingerprint': fingerprint,
+                  'outputs': entries}
+
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            created = not self.path.exists()
+            self._file = open(self.path, 'a+b')
+            if created and self.durability != 'none':
+                fsync_directory(self.path.parent)
+            # Start on a fresh line if the last run died mid-record
+            if self._file.tell() > 0:
+                self._file.seek(-1, os.SEEK_END)
+                if self._file.read(1) != b'\n':
+                    self._file.write(b'\n')
+        self._file.write(json.dumps(record, sort_keys=True).encode('utf-8') + b'\n')
+        self._file.flush()
+        if self.durability == 'file':
+            self.sync()
+        self._by_input[key] = record
+        for entry in entries:
+            self._by_output[entry['path']] = record
+
+
+# Sidecar database recording what produced each output directory's files
+MANIFEST_NAME = '.ipro-manifest.sqlite'
+
+
+def incremental_requested(args):
+    """Return True if args ask for incremental processing (--incremental or an option implying it)."""
+    return any(getattr(args, name, False) for name in ('incremental', 'prune', 'content_hash'))
+
+
+def input_fingerprint(input_path, content_hash=False):
+    """
+    Fingerprint an input file for incremental builds.
+
+    Args:
+        input_path: Path to the input file
+        content_hash: If True, include the SHA-256 of the file's contents
+
+    Returns:
+        Dict with 'size', 'mtime_ns' and 'sha256' (None unless content_hash)
+    """
+    stat = os.stat(input_path)
+    digest = None
+    if content_hash:
+        sha = hashlib.sha256()
+        with open(input_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+
+
+class Manifest:
+    """
+    Incremental-build manifest of one output directory.
+
+    Stored as a SQLite sidecar (MANIFEST_NAME) so concurrent --jobs workers
+    can update it safely. Each record describes the last successful run of
+    one command on one input: the input's fingerprint, the options that
+    affect the outputs, the ipro version, and the output file names. An
+    output directory therefore reflects the latest options used for each
+    input; outputs an earlier run produced that the latest one didn't are
+    stale.
+
+    Use as a context manager; the database is only created on first write.
+
+    Attributes:
+        directory: Path of the output directory
+        path: Path of the manifest database
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.path = self.directory / MANIFEST_NAME
+        self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the database connection, if one was opened."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _connect(self, create=False):
+        if self._db is None:
+            if not create and not self.path.exists():
+                return None
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=60)
+            with self._db:
+                self._db.execute(
+                    'CREATE TABLE IF NOT EXISTS runs ('
+                    ' input TEXT NOT NULL, command TEXT NOT NULL,'
+                    ' size INTEGER, mtime_ns INTEGER, sha256 TEXT,'
+                    ' options TEXT, version TEXT, outputs TEXT,'
+                    ' PRIMARY KEY (input, command))'
+                )
+                self._db.execute('CREATE TABLE IF NOT EXISTS stale (output TEXT PRIMARY KEY)')
+        return self._db
+
+    def _lookup(self, input_path, command):
+        db = self._connect()
+        if db is None:
+            return None
+        return db.execute(
+            'SELECT size, mtime_ns, sha256, options, version, outputs FROM runs'
+            ' WHERE input = ? AND command = ?',
+            (str(Path(input_path).resolve()), command),
+        ).fetchone()
+
+    def current_outputs(self, input_path, command, options, content_hash=False):
+        """
+        Return the recorded outputs if they are up to date, else None.
+
+        Up to date means: same ipro version and options, every recorded
+        output still exists, and the input has the same size and either the
+        same mtime or (with content_hash) the same SHA-256.
+
+        Args:
+            input_path: Path to the input file
+            command: Subcommand name
+            options: JSON-serialisable dict of output-affecting options
+            content_hash: If True, accept an input whose mtime changed but
+                          whose contents did not
+
+        Returns:
+            List of output paths, or None if the input must be processed
+        """
+        row = self._lookup(input_path, command)
+        if row is None:
+            return None
+        size, mtime_ns, sha256, recorded_options, version, outputs = row
+        if version != __version__ or recorded_options != json.dumps(options, sort_keys=True):
+            return None
+        outputs = [self.directory / name for name in json.loads(outputs)]
+        if not all(path.is_file() for path in outputs):
+            return None
+        fingerprint = input_fingerprint(input_path)
+        if fingerprint['size'] != size:
+            return None
+        if fingerprint['mtime_ns'] != mtime_ns:
+            if not (content_hash and sha256 and
+                    input_fingerprint(input_path, content_hash=True)['sha256'] == sha256):
+                return None
+            # Touched but unchanged (e.g. a fresh checkout): remember the new mtime
+            with self._connect() as db:
+                db.execute('UPDATE runs SET mtime_ns = ? WHERE input = ? AND command = ?',
+                           (fingerprint['mtime_ns'], str(Path(input_path).resolve()), command))
+        return [str(path) for path in outputs]
+
+    def record(self, input_path, command, options, outputs, content_hash=False):
+        """
+        Record a successful run and return outputs it made stale.
+
+        Args:
+            input_path: Path to the input file
+            command: Subcommand name
+            options: JSON-serialisable dict of output-affecting options
+            outputs: Paths of the files the run wrote (inside directory)
+            content_hash: If True, store the input's SHA-256
+
+        Returns:
+            List of Paths recorded for this input by an earlier run that this
+            run did not produce
+        """
+        previous = self._lookup(input_path, command)
+        names = [Path(output).name for output in outputs]
+        fingerprint = input_fingerprint(input_path, content_hash=content_hash)
+        with self._connect(create=True) as db:
+            db.execute(
+                'INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (str(Path(input_path).resolve()), command, fingerprint['size'],
+                 fingerprint['mtime_ns'], fingerprint['sha256'],
+                 json.dumps(options, sort_keys=True), __version__, json.dumps(names)),
+            )
+            db.executemany('DELETE FROM stale WHERE output = ?', [(name,) for name in names])
+        if previous is None:
+            return []
+        return [self.directory / name for name in json.loads(previous[5])
+                if name not in names and (self.directory / name).exists()]
+
+    def mark_stale(self, paths):
+        """Remember stale outputs that were reported but kept, for a later prune."""
+        if paths:
+            with self._connect(create=True) as db:
+                db.executemany('INSERT OR IGNORE INTO stale VALUES (?)',
+                               [(Path(path).name,) for path in paths])
+
+    def marked_stale(self):
+        """Return the remembered stale outputs that still exist."""
+        db = self._connect()
+        if db is None:
+            return []
+        names = [name for (name,) in db.execute('SELECT output FROM stale ORDER BY output')]
+        return [self.directory / name for name in names if (self.directory / name).exists()]
+
+    def clear_stale(self):
+        """Forget all remembered stale outputs."""
+        db = self._connect()
+        if db is not None:
+            with db:
+                db.execute('DELETE FROM stale')
+
+    def claimed_outputs(self, input_path, command, names):
+        """
+        Return outputs that a different input's recorded run already wrote.
+
+        Two inputs that map to the same output name (a.jpg and a.png both
+        converting to a.webp) would overwrite each other, and the manifest
+        would hold two records for one file.
+
+        Args:
+            input_path: Path to the input about to be processed
+            command: Subcommand name
+            names: Output file names the run would write
+
+        Returns:
+            List of (output name, input path of the run that wrote it)
+        """
+        db = self._connect()
+        if db is None:
+            return []
+        key = (str(Path(input_path).resolve()), command)
+        claimed = []
+        for input_name, other_command, outputs in db.execute(
+                'SELECT input, command, outputs FROM runs ORDER BY input'):
+            if (input_name, other_command) == key or not Path(input_name).exists():
+                continue
+            claimed.extend((name, input_name) for name in json.loads(outputs) if name in names)
+        return claimed
+
+    def orphans(self):
+        """
+        Return records whose input file no longer exists.
+
+        Returns:
+            List of (input, command, [output Paths that still exist])
+        """
+        db = self._connect()
+        if db is None:
+            return []
+        result = []
+        for input_name, command, outputs in db.execute(
+                'SELECT input, command, outputs FROM runs ORDER BY input'):
+            if not Path(input_name).exists():
+                paths = [self.directory / name for name in json.loads(outputs)]
+                result.append((input_name, command, [p for p in paths if p.exists()]))
+        return result
+
+    def forget(self, input_name, command):
+        """Delete the record of one input's run."""
+        db = self._connect()
+        if db is not None:
+            with db:
+                db.execute('DELETE FROM runs WHERE input = ? AND command = ?',
+                           (input_name, command))
+
+
+def _stale_outputs(paths, prune):
+    """Report stale output files on stderr, deleting them when prune is set."""
+    for path in paths:
+        if prune:
+            with contextlib.suppress(FileNotFoundError):
+                path.unlink()
+            print(f"Pruned: {path}", file=sys.stderr)
+        else:
+            print(f"Stale: {path} (use --prune to delete)", file=sys.stderr)
+
+
+def _incremental_options(args):
+    """Return the options that determine a command's outputs, for the manifest."""
+    if args.command == 'resize':
+        dimension, sizes = _resize_options_from_args(args)
+        # --max-memory and --max-pixels can change the decode scale, and so the pixels
+        return {'dimension': dimension, 'sizes': sizes, 'quality': args.quality,
+                'draft': not getattr(args, 'no_draft', False),
+                'cascade': getattr(args, 'cascade', False),
+                'max_memory': getattr(args, 'max_memory', None),
+                'max_pixels': getattr(args, 'max_pixels', None)}
+    return {'format': args.format.lower(), 'quality': args.quality,
+            'strip_exif': args.strip_exif}
+
+
+def _incremental_output_names(args, input_path):
+    """Return the file names a resize or convert of input_path can write."""
+    if args.command == 'resize':
+        _, sizes = _resize_options_from_args(args)
+        if len(sizes) == 1:
+            return [input_path.name]
+        return [f"{input_path.stem}_{size}{input_path.suffix}" for size in sizes]
+    return [input_path.stem + get_target_extension(args.format)]
+
+
+def incremental_outputs(args, input_path, output_dir):
+    """
+    Return an input's recorded outputs if an incremental run can skip it.
+
+    Args:
+        args: Parsed CLI arguments of a resize or convert invocation
+        input_path: Path to the input file
+        output_dir: Resolved output directory
+
+    Returns:
+        List of output paths, or None if the input must be processed
+
+    Raises:
+        SystemExit with EXIT_INVALID_ARGS if another input already owns one
+        of the outputs this input would write
+    """
+    with Manifest(output_dir) as manifest:
+        claimed = manifest.claimed_outputs(input_path, args.command,
+                                           _incremental_output_names(args, input_path))
+        for name, other_input in claimed:
+            print(f"Error: {output_dir / name} is already the output of {other_input}; "
+                  f"{input_path.name} would overwrite it", file=sys.stderr)
+        if claimed:
+            sys.exit(EXIT_INVALID_ARGS)
+        return manifest.current_outputs(input_path, args.command, _incremental_options(args),
+                                        content_hash=getattr(args, 'content_hash', False))
+
+
+def check_output_collisions(items):
+    """
+    Refuse an incremental batch in which two inputs would write the same output.
+
+    Args:
+        items: Per-file parsed arguments, as bound for the batch
+
+    Raises:
+        SystemExit with EXIT_INVALID_ARGS naming the inputs and the shared output
+    """
+    owners = {}
+    collisions = []
+    for item_args in items:
+        input_path = Path(item_args.file)
+        output_dir = incremental_output_dir(item_args, input_path)
+        for name in _incremental_output_names(item_args, input_path):
+            output = output_dir / name
+            if output in owners:
+                collisions.append((output, owners[output], input_path))
+            else:
+                owners[output] = input_path
+    for output, first, second in collisions:
+        print(f"Error: {first} and {second} would both write {output}", file=sys.stderr)
+    if collisions:
+        sys.exit(EXIT_INVALID_ARGS)
+
+
+def record_incremental(args, input_path, output_dir, outputs):
+    """
+    Record a finished incremental run, then report or prune stale outputs.
+
+    Outputs this input produced in an earlier run but not in this one are
+    stale, as are (outside batches, which sweep once at the end) the
+    outputs of inputs that no longer exist.
+
+    Args:
+        args: Parsed CLI arguments of a resize or convert invocation
+        input_path: Path to the input file
+        output_dir: Resolved output directory
+        outputs: Paths written by this run
+    """
+    prune = getattr(args, 'prune', False)
+    with Manifest(output_dir) as manifest:
+        stale = manifest.record(input_path, args.command, _incremental_options(args), outputs,
+                                content_hash=getattr(args, 'content_hash', False))
+        if not prune:
+            manifest.mark_stale(stale)
+    _stale_outputs(stale, prune)
+    if not getattr(args, 'in_batch', False):
+        sweep_manifest(output_dir, prune)
+
+
+def sweep_manifest(output_dir, prune):
+    """
+    Report (or, with prune, delete) outputs whose inputs no longer exist.
+
+    Outputs reported as stale by earlier runs without --prune are deleted
+    here too once prune is set.
+
+    Args:
+        output_dir: Output directory holding a manifest
+        prune: If True, delete the outputs and forget their records
+    """
+    with Manifest(output_dir) as manifest:
+        if prune:
+            _stale_outputs(manifest.marked_stale(), prune)
+            manifest.clear_stale()
+        for input_name, command, outputs in manifest.orphans():
+            _stale_outputs(outputs, prune)
+            if prune:
+                manifest.forget(input_name, command)
+
+
+def incremental_output_dir(args, input_path):
+    """Resolve the output directory a resize or convert invocation writes to."""
+    if args.command == 'resize':
+        dimension, sizes = _resize_options_from_args(args)
+        return resolve_output_dir(args.output, input_path, get_resize_dir_name(sizes, dimension))
+    return resolve_output_dir(args.output, input_path, "converted")
+
+
+def _resize_options_from_args(args):
+    """
+    Validate resize options and return the dimension and sizes.
+
+    Args:
+        args: Parsed CLI arguments (uses width, height, quality)
+
+    Returns:
+        Tuple of (dimension, sizes) where dimension is 'width' or 'height'
+
+    Raises:
+        SystemExit with EXIT_INVALID_ARGS on invalid options
+    """
+    if getattr(args, 'resize_options', None) is not None:
+        # Already validated when the stage was compiled
+        return args.resize_options
+
+    if args.width and args.height:
+        print("Error: Cannot specify both --width and --height", file=sys.stderr)
+        sys.exit(EXIT_INVALID_ARGS)
+    elif args.width:
+        dimension = 'width'
+        sizes = parse_sizes(args.width)
+    elif args.height:
+        dimension = 'height'
+        sizes = parse_sizes(args.height)
+    else:
+        print("Error: Must specify either --width or --height", file=sys.stderr)
+        sys.exit(EXIT_INVALID_ARGS)
+
+    # Validate quality
+    if not (1 <= args.quality <= 100):
+        print("Error: Quality must be between 1-100", file=sys.stderr)
+        sys.exit(EXIT_INVALID_ARGS)
+
+    return dimension, sizes
+
+
+def _convert_quality(args):
+    """Return the effective convert quality (--quality, or the default if unset)."""
+    return DEFAULT_CONVERT_QUALITY if args.quality is None else args.quality
+
+
+def _validate_convert_options(args):
+    """
+    Validate convert options (target format and quality).
+
+    Args:
+        args: Parsed CLI arguments (uses format, quality)
+
+    Raises:
+        SystemExit with EXIT_INVALID_ARGS on invalid options
+    """
+    if getattr(args, 'options_validated', False):
+        return
+
+    if not is_supported_output_format(args.format):
+        print(f"Error: Unsupported output format: {args.format}", file=sys.stderr)
+        print(f"Supported formats: {', '.join(sorted(set(SUPPORTED_OUTPUT_FORMATS.keys())))}",
+              file=sys.stderr)
+        sys.exit(EXIT_INVALID_ARGS)
+
+    if args.quality is not None and not (1 <= args.quality <= 100):
+        print(f"Error: Quality must be between 1-100, got {args.quality}", file=sys.stderr)
+        sys.exit(EXIT_INVALID_ARGS)
+
+
+def _validate_rename_options(args):
+    """
+    Validate rename options (at least one action flag).
+
+    Args:
+        args: Parsed CLI arguments (uses ext, prefix_exif_date)
+
+    Raises:
+        SystemExit with EXIT_INVALID_ARGS on invalid options
+    """
+    if getattr(args, 'options_validated', False):
+        return
+
+    if not args.ext and not args.prefix_exif_date:
+        print("Error: At least one action flag (--ext or --prefix-exif-date) is required",
+              file=sys.stderr)
+        sys.exit(EXIT_INVALID_ARGS)
+
+
+def compile_stage_options(args):
+    """
+    Validate a command's options once and record the results on args.
+
+    Resize stores its parsed (dimension, sizes) as args.resize_options;
+    every command is marked with args.options_validated so the per-file
+    handlers skip repeating the same checks.
+
+    Args:
+        args: Parsed CLI arguments for one command
+
+    Raises:
+        SystemExit with EXIT_INVALID_ARGS on invalid options
+    """
+    if args.command == 'resize':
+        args.resize_options = _resize_options_from_args(args)
+    elif args.command == 'convert':
+        _validate_convert_options(args)
+    elif args.command == 'rename':
+        _validate_rename_options(args)
+    args.options_validated = True
+
+
+class ChainStage:
+    """
+    A parsed command whose options have been validated once.
+
+    Parsing and validation (size lists, quality ranges, format lookup) happen
+    when the stage is built; bind() then produces the arguments for one input
+    by copying the namespace with only 'file' changed. A stage fanned out
+    over thousands of files therefore costs one parse, not one per file.
+
+    Args:
+        args: Parsed argparse.Namespace for the command
+    """
+
+    def __init__(self, args):
+        compile_stage_options(args)
+        self.args = args
+        self.command = args.command
+        self.func = args.func
+
+    @classmethod
+    def from_segment(cls, parser, segment, input_file):
+        """Parse a chain segment (with a placeholder file) and compile it."""
+        return cls(_parse_chain_segment(parser, segment, input_file))
+
+    def bind(self, input_file, workers=1):
+        """
+        Return the stage's arguments bound to one input file.
+
+        Args:
+            input_file: Path to process
+            workers: Number of worker processes sharing the thread budget
+
+        Returns:
+            argparse.Namespace copy with 'file' set
+        """
+        item_args = argparse.Namespace(**vars(self.args))
+        item_args.file = str(input_file)
+        item_args.in_batch = True
+        if hasattr(self.args, 'threads'):
+            # Each worker process gets its share of the global thread budget
+            item_args.threads = resolve_threads(self.args.threads, workers)
+        return item_args
+
+
+def cmd_info(args):
+    """Handle the info subcommand."""
+    if pipe_requested(args):
+        return run_pipe(args)
+    if _is_batch_request(args):
+        return run_batch(cmd_info, args)
+
+    input_path = validate_input_file(args.file)
+
+    with ImageContext(input_path) as context:
+        # Try to get image info
+        try:
+            info = get_image_info(input_path, context=context)
+        except Image.DecompressionBombError:
+            print(f"Error: Image exceeds pixel limit ({MAX_IMAGE_PIXELS:,} pixels) — "
+                  "possible decompression bomb", file=sys.stderr)
+            sys.exit(EXIT_UNSUPPORTED_FORMAT)
+        except Exception as e:
+            # If Pillow can't open it, it's unsupported or corrupt
+            print(f"Error: Unsupported or unreadable image format: {args.file}", file=sys.stderr)
+            sys.exit(EXIT_UNSUPPORTED_FORMAT)
+
+        # Determine output format
+        if args.json:
+            _format_info_json(info, args)
+        elif args.short:
+            _format_info_csv(info)
+        else:
+            _format_info_human(info, args)
+
+        # Return input path for chaining (info is read-only, passes through)
+        return [str(input_path)]
+
+
+def _exit_if_over_pixel_limit(context, max_pixels):
+    """
+    Exit with EXIT_READ_ERROR if an input is above the pixel limit.
+
+    Call inside pixel_limit(max_pixels or Image.MAX_IMAGE_PIXELS). Inputs that
+    can't be read at all are left for the command's format check to report.
+
+    Args:
+        context: ImageContext for the input
+        max_pixels: The --max-pixels value, or None
+    """
+    try:
+        width, height = context.size
+    except Image.DecompressionBombError:
+        width = height = None
+    except Exception:
+        return
+    if width is None or (max_pixels and width * height > max_pixels):
+        print(f"Error: Image exceeds pixel limit ({Image.MAX_IMAGE_PIXELS:,} pixels) — "
+              "possible decompression bomb; use --max-pixels to allow larger inputs",
+              file=sys.stderr)
+        sys.exit(EXIT_READ_ERROR)
+
+
+def cmd_resize(args):
+    """Handle the resize subcommand."""
+    if pipe_requested(args):
+        return run_pipe(args)
+    if _is_batch_request(args):
+        return run_batch(cmd_resize, args)
+
+    input_path = validate_input_file(args.file)
+
+    if incremental_requested(args):
+        output_dir = incremental_output_dir(args, input_path)
+        outputs = incremental_outputs(args, input_path, output_dir)
+        if outputs is not None:
+            print(f"Up to date: {input_path.name} ({len(outputs)} output(s))")
+            return outputs
+
+    max_pixels = getattr(args, 'max_pixels', None)
+    with pixel_limit(max_pixels or Image.MAX_IMAGE_PIXELS), ImageContext(input_path) as context:
+        _exit_if_over_pixel_limit(context, max_pixels)
+
+        # Validate it's a JPEG or MPO (content-based check)
+        image_format = get_image_format(input_path, context=context)
+        if image_format not in ('JPEG', 'MPO'):
+            print(f"Error: Unsupported format. Resize supports JPEG and MPO formats.", file=sys.stderr)
+            print(f"Supported extensions: .jpg, .jpeg, .JPG, .JPEG, .MPO", file=sys.stderr)
+            sys.exit(EXIT_UNSUPPORTED_FORMAT)
+
+        # Determine dimension and sizes, and validate quality
+        dimension, sizes = _resize_options_from_args(args)
+
+        # Get image dimensions for output
+        try:
+            orig_width, orig_height = context.size
+        except Exception as e:
+            print(f"Error: Cannot read image: {input_path}", file=sys.stderr)
+            sys.exit(EXIT_READ_ERROR)
+
+        # Resolve output directory
+        dir_name = get_resize_dir_name(sizes, dimension)
+        output_dir = resolve_output_dir(args.output, input_path, dir_name)
+
+        # Print processing info
+        print(f"Processing: {input_path.name} ({orig_width}x{orig_height})")
+        print(f"Output directory: {output_dir}")
+        print()
+
+        # Process the image
+        try:
+            created_files, skipped_sizes = resize_image(
+                input_path,
+                output_dir,
+                sizes,
+                dimension=dimension,
+                quality=args.quality,
+                preserve_filename=(len(sizes) == 1),
+                draft=not getattr(args, 'no_draft', False),
+                cascade=getattr(args, 'cascade', False),
+                context=context,
+                threads=resolve_threads(getattr(args, 'threads', 1)),
+                max_memory=resize_memory_ceiling(args, orig_width, orig_height),
+            )
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(EXIT_READ_ERROR)
+
+        # Print results
+        for file_info in created_files:
+            print(f"✓ Created: {file_info['filename']} "
+                  f"({file_info['width']}x{file_info['height']}, "
+                  f"{file_info['size_kb']:.0f} KB)")
+
+        # Print warnings for skipped sizes
+        if skipped_sizes:
+            print()
+            for size, reason in skipped_sizes:
+                print(f"⚠ Skipped {size}px: {reason}")
+
+        # Print summary
+        print()
+        if created_files:
+            print(f"Successfully created {len(created_files)} image(s) from {input_path.name}")
+        else:
+            print(f"Warning: No images created (all sizes would require upscaling)")
+
+        if incremental_requested(args):
+            record_incremental(args, input_path, output_dir, [f['path'] for f in created_files])
+
+        # Return list of created file paths for chaining
+        return [str(f['path']) for f in created_files]
+
+
+def cmd_rename(args):
+    """Handle the rename subcommand."""
+    if pipe_requested(args):
+        return run_pipe(args)
+    if _is_batch_request(args):
+        return run_batch(cmd_rename, args)
+
+    input_path = validate_input_file(args.file)
+
+    # Check if at least one action flag is provided
+    _validate_rename_options(args)
+
+    # Probe format and EXIF with a single open; the handle is closed before
+    # any file operations so the source can be moved on every platform
+    with ImageContext(input_path) as context:
+        image_format = get_image_format(input_path, context=context)
+        if image_format is None:
+            print(f"Error: Cannot read image: {input_path}", file=sys.stderr)
+            sys.exit(EXIT_READ_ERROR)
+        exif_data = extract_exif_data(input_path, context=context) if args.prefix_exif_date else None
+
+    # Determine new extension if --ext flag is set
+    new_ext = None
+    if args.ext:
+        new_ext = get_format_extension(image_format)
+
+    # Determine date prefix if --prefix-exif-date flag is set
+    date_prefix = None
+    if args.prefix_exif_date:
+        curated = format_exif_curated(exif_data)
+
+        if curated and 'date_taken' in curated:
+            date_prefix = format_exif_date_prefix(curated['date_taken'])
+        else:
+            # No EXIF date - skip with warning
+            print(f"Warning: No EXIF date found in {input_path.name}, skipping",
+                  file=sys.stderr)
+            # If only --prefix-exif-date was requested, return input (passthrough)
+            if not args.ext:
+                return [str(input_path)]
+            # Otherwise continue with just the extension change
+
+    # Build new filename
+    new_filename = build_renamed_filename(
+        input_path.name,
+        ext=new_ext,
+        date_prefix=date_prefix
+    )
+
+    # Determine output directory
+    output_dir = resolve_output_dir(args.output, input_path, "renamed")
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Build output path
+    output_path = output_dir / new_filename
+
+    # Check if source and destination are the same
+    if input_path.resolve() == output_path.resolve():
+        # Nothing to do - file already has correct name
+        print(f"No change needed: {input_path.name}")
+        return [str(input_path)]
+
+    # Handle case-insensitive filesystems (macOS, Windows)
+    # If the paths differ only by case, we need to use a temp file
+    try:
+        if output_path.exists() and os.path.samefile(input_path, output_path):
+            # Same file on case-insensitive filesystem - rename via temp file
+            # Use tempfile.mkstemp for unpredictable temp filename (L1 security fix)
+            fd, temp_name = tempfile.mkstemp(
+                dir=str(output_path.parent),
+                prefix='.ipro_tmp_',
+                suffix=output_path.suffix
+            )
+            temp_path = Path(temp_name)
+            try:
+                os.close(fd)
+                shutil.copy2(input_path, temp_path)
+                os.remove(input_path)
+                shutil.move(str(temp_path), str(output_path))
+            except Exception:
+                # Clean up temp file on failure
+                if temp_path.exists():
+                    try:
+                        temp_path.unlink()
+                    except OSError:
+                        pass
+                raise
+            print(f"Created: {output_path}")
+            return [str(output_path)]
+    except OSError:
+        pass  # Files are different, proceed normally
+
+    # Warn if output file already exists (preserves backward compatibility)
+    if output_path.exists():
+        print(f"Warning: Overwriting existing file: {output_path}", file=sys.stderr)
+
+    # Copy the file (non-destructive)
+    with atomic_output(output_path) as temp_path:
+        shutil.copy2(input_path, temp_path)
+
+    # Print success message
+    print(f"Created: {output_path}")
+
+    # Return output path for chaining
+    return [str(output_path)]
+
+
+def cmd_convert(args):
+    """Handle the convert subcommand."""
+    if pipe_requested(args):
+        return run_pipe(args)
+    if _is_batch_request(args):
+        return run_batch(cmd_convert, args)
+
+    input_path = validate_input_file(args.file)
+
+    if incremental_requested(args):
+        output_dir = incremental_output_dir(args, input_path)
+        outputs = incremental_outputs(args, input_path, output_dir)
+        if outputs is not None:
+            print(f"Up to date: {input_path.name} ({len(outputs)} output(s))")
+            return outputs
+
+    with ImageContext(input_path) as context:
+        # Validate format and quality options
+        _validate_convert_options(args)
+
+        # Try to read the image to verify it's valid
+        image_format = get_image_format(input_path, context=context)
+        if image_format is None:
+            print(f"Error: Cannot read image: {input_path}", file=sys.stderr)
+            sys.exit(EXIT_READ_ERROR)
+
+        # Warn if multi-frame image — only the primary frame will be converted
+        try:
+            n_frames = context.n_frames
+            if n_frames > 1:
+                print(f"Warning: {input_path.name} contains {n_frames} frames; "
+                      f"only the primary frame will be converted. "
+                      f"Use 'extract' to export all frames.",
+                      file=sys.stderr)
         except Exception:
-            return str(value)
-    elif isinstance(value, (tuple, list)):
-        # Recursively handle tuples and lists
-        return [serialize_exif_value(v) for v in value]
-    elif isinstance(value, dict):
-        # Recursively handle dicts
-        return {k: serialize_exif_value(v) for k, v in value.items()}
+            pass
+
+        # Determine output path
+        output_dir = resolve_output_dir(args.output, input_path, "converted")
+        target_ext = get_target_extension(args.format)
+        output_filename = input_path.stem + target_ext
+        output_path = output_dir / output_filename
+
+        # Check if output file already exists
+        if output_path.exists():
+            print(f"Warning: Overwriting existing file: {output_path}", file=sys.stderr)
+
+        # Create output directory if needed
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        # Convert the image
+        success = convert_image(
+            input_path,
+            output_path,
+            args.format,
+            quality=args.quality,
+            strip_exif=args.strip_exif,
+            context=context,
+        )
+
+        if success:
+            print(f"Created: {output_path}")
+            if incremental_requested(args):
+                record_incremental(args, input_path, output_dir, [output_path])
+            return [str(output_path)]
+        else:
+            print(f"Error: Failed to convert image", file=sys.stderr)
+            sys.exit(EXIT_READ_ERROR)
+
+
+def cmd_strip(args):
+    """Handle the strip subcommand."""
+    if pipe_requested(args):
+        return run_pipe(args)
+    if _is_batch_request(args):
+        return run_batch(cmd_strip, args)
+
+    input_path = validate_input_file(args.file)
+
+    # The input is opened once (headers only; strip never decodes pixels)
+    max_pixels = getattr(args, 'max_pixels', None)
+    with pixel_limit(max_pixels or Image.MAX_IMAGE_PIXELS), ImageContext(input_path) as context:
+        _exit_if_over_pixel_limit(context, max_pixels)
+
+        image_format = get_image_format(input_path, context=context)
+        if image_format is None:
+            print(f"Error: Cannot read image: {input_path}", file=sys.stderr)
+            sys.exit(EXIT_READ_ERROR)
+        if image_format != 'JPEG':
+            print(f"Error: strip only rewrites JPEG files; {input_path.name} is {image_format}. "
+                  "Use 'convert --strip-exif' instead.", file=sys.stderr)
+            sys.exit(EXIT_UNSUPPORTED_FORMAT)
+
+        output_dir = resolve_output_dir(args.output, input_path, "stripped")
+        output_path = output_dir / input_path.name
+        if output_path.is_symlink():
+            print(f"Error: Output path is a symlink — refusing to write: {output_path}",
+                  file=sys.stderr)
+            sys.exit(EXIT_INVALID_ARGS)
+        if output_path.exists():
+            if output_path.resolve() == input_path.resolve():
+                print(f"Error: Output would overwrite the input file: {input_path}",
+                      file=sys.stderr)
+                sys.exit(EXIT_INVALID_ARGS)
+            print(f"Warning: Overwriting existing file: {output_path}", file=sys.stderr)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        try:
+            with atomic_output(output_path) as temp_path:
+                gps_removed = strip_jpeg_metadata(
+                    input_path, temp_path,
+                    exif='no-gps' if (args.keep_exif or args.gps_only) else 'remove',
+                    keep_other=args.gps_only,
+                    icc_profile=None if args.strip_icc else KEEP_ICC,
+                )
+        except ValueError as e:
+            print(f"Error: Cannot rewrite {input_path.name}: {e}", file=sys.stderr)
+            sys.exit(EXIT_READ_ERROR)
+
+    print(f"Created: {output_path}" + (" (GPS removed)" if gps_removed else ""))
+    return [str(output_path)]
+
+
+def cmd_extract(args):
+    """Handle the extract subcommand."""
+    if pipe_requested(args):
+        return run_pipe(args)
+    if _is_batch_request(args):
+        return run_batch(cmd_extract, args)
+
+    input_path = validate_input_file(args.file)
+
+    with ImageContext(input_path) as context:
+        # Resolve output directory
+        output_dir = resolve_output_dir(args.output, input_path, "extracted")
+
+        # Check frame count
+        try:
+            n_frames = context.n_frames
+        except Exception as e:
+            print(f"Error: Cannot read image: {input_path}", file=sys.stderr)
+            sys.exit(EXIT_READ_ERROR)
+
+        if n_frames == 1:
+            print(f"Note: {input_path.name} contains only 1 frame.")
+
+        # Extract frames
+        try:
+            created_files = extract_frames(input_path, output_dir, context=context)
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(EXIT_READ_ERROR)
+
+        # Print results
+        for file_info in created_files:
+            print(f"Created: {file_info['filename']} "
+                  f"({file_info['width']}x{file_info['height']}, "
+                  f"{file_info['size_kb']:.0f} KB)")
+
+        # Print summary
+        print()
+        print(f"Extracted {len(created_files)} frame(s) from {input_path.name}")
+
+        # Return list of created file paths for chaining
+        return [str(f['path']) for f in created_files]
+
+
+class ImageHandle:
+    """
+    A decoded image passed between chain stages without touching disk.
+
+    Each stage computes the path its output would have been written to, so a
+    handle can be materialised later in exactly the place the file-based
+    chain would have used. Source handles decode lazily through their
+    ImageContext, so the first stage can still use draft decoding.
+
+    Attributes:
+        path: Path the image is written to when materialised
+        format: Pillow format name used when materialising (e.g., "JPEG")
+        save_kwargs: Encoder options for Image.save() (quality, exif, icc_profile)
+        exif: PIL Exif carried to later stages, or None once metadata is dropped
+        backing_path: File whose bytes are exactly this image, if any;
+                      materialising copies it instead of re-encoding
+        context: ImageContext for handles read from disk, else None
+    """
+
+    def __init__(self, path, image=None, format=None, save_kwargs=None, exif=None,
+                 backing_path=None, context=None):
+        self.path = Path(path)
+        self._image = image
+        self.format = format
+        self.save_kwargs = save_kwargs or {}
+        self.exif = exif
+        self.backing_path = Path(backing_path) if backing_path is not None else None
+        self.context = context
+
+    @classmethod
+    def from_context(cls, context):
+        """Create a source handle for a file opened as an ImageContext."""
+        return cls(context.path, format=context.format, exif=context.exif,
+                   backing_path=context.path, context=context)
+
+    @property
+    def image(self):
+        """The PIL Image (decoded on first pixel access for source handles)."""
+        if self._image is None and self.context is not None:
+            self._image = self.context.image
+        return self._image
+
+    @property
+    def size(self):
+        """Original (width, height) of the image."""
+        if self.context is not None:
+            return self.context.size
+        return self.image.size
+
+    @property
+    def n_frames(self):
+        """Number of frames (in-memory results are always single-frame)."""
+        if self.context is not None:
+            return self.context.n_frames
+        return 1
+
+    @property
+    def in_memory(self):
+        """True if the handle has no file on disk at its path yet."""
+        return self.backing_path is None or self.backing_path != self.path
+
+    def derive(self, path, **changes):
+        """Return a copy of this handle at a new path with selected fields changed."""
+        fields = {
+            'image': self._image,
+            'format': self.format,
+            'save_kwargs': dict(self.save_kwargs),
+            'exif': self.exif,
+            'backing_path': self.backing_path,
+            'context': self.context,
+        }
+        fields.update(changes)
+        return ImageHandle(path, **fields)
+
+
+def materialise_handle(handle):
+    """
+    Write an image handle to its path.
+
+    Handles backed by an unchanged file are copied byte-for-byte; everything
+    else is encoded with the handle's format and save options.
+
+    Args:
+        handle: ImageHandle to write
+
+    Returns:
+        String path of the written file, or None if the write was refused
+    """
+    output_path = handle.path
+
+    if not handle.in_memory:
+        return str(output_path)
+
+    # Refuse to write through a symlink output path
+    if output_path.exists() and output_path.is_symlink():
+        print(f"Error: Output path is a symlink — refusing to write: {output_path}",
+              file=sys.stderr)
+        return None
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_output(output_path) as temp_path:
+        if handle.backing_path is not None:
+            with profile_stage('copy', output_path=temp_path, read_path=handle.backing_path):
+                shutil.copy2(handle.backing_path, temp_path)
+        else:
+            with profile_stage('encode', output_path=temp_path):
+                handle.image.save(temp_path, format=handle.format, **handle.save_kwargs)
+
+    # The file now exists; later stages must not write it a second time
+    handle.backing_path = output_path
+
+    print(f"Created: {output_path}")
+    return str(output_path)
+
+
+def _memory_info(args, handle):
+    """In-memory info stage: report metadata and pass the handle through."""
+    if handle.in_memory and handle.backing_path is None:
+        width, height = handle.size
+        info = build_image_info(handle.path, width, height, handle.format, handle.n_frames,
+                                _exif_to_dict(handle.exif), None)
+    else:
+        try:
+            info = get_image_info(handle.backing_path, context=handle.context)
+        except Exception:
+            print(f"Error: Unsupported or unreadable image format: {handle.path}",
+                  file=sys.stderr)
+            sys.exit(EXIT_UNSUPPORTED_FORMAT)
+        info['filename'] = handle.path.name
+        info['path'] = str(handle.path.absolute())
+
+    if args.json:
+        _format_info_json(info, args)
+    elif args.short:
+        _format_info_csv(info)
+    else:
+        _format_info_human(info, args)
+
+    return [handle]
+
+
+def _memory_resize(args, handle, convert_args=None):
+    """
+    In-memory resize stage: one JPEG-bound handle per requested size.
+
+    With convert_args, this is the fused resize → convert operation: each
+    size goes straight from the resampler through the sRGB conversion to a
+    handle in the convert stage's format and directory, with no JPEG-bound
+    intermediate. The sRGB conversion runs once on the decoded image instead
+    of once per size when that touches fewer pixels.
+    """
+    if convert_args is not None:
+        _validate_convert_options(convert_args)
+    if handle.format not in ('JPEG', 'MPO'):
+        print(f"Error: Unsupported format. Resize supports JPEG and MPO formats.", file=sys.stderr)
+        print(f"Supported extensions: .jpg, .jpeg, .JPG, .JPEG, .MPO", file=sys.stderr)
+        sys.exit(EXIT_UNSUPPORTED_FORMAT)
+
+    dimension, sizes = _resize_options_from_args(args)
+
+    try:
+        orig_width, orig_height = handle.size
+    except Exception:
+        print(f"Error: Cannot read image: {handle.path}", file=sys.stderr)
+        sys.exit(EXIT_READ_ERROR)
+
+    output_dir = resolve_output_dir(args.output, handle.path, get_resize_dir_name(sizes, dimension))
+
+    print(f"Processing: {handle.path.name} ({orig_width}x{orig_height})")
+    print(f"Output directory: {output_dir}")
+    print()
+
+    targets, skipped_sizes = compute_resize_targets(orig_width, orig_height, sizes, dimension)
+    cascade = getattr(args, 'cascade', False)
+
+    try:
+        img = handle.image
+        if targets and handle.context is not None and not getattr(args, 'no_draft', False):
+            apply_jpeg_draft(img, (max(t[1] for t in targets), max(t[2] for t in targets)))
+        if targets and handle.context is not None:
+            with profile_stage('decode', read_path=handle.context.path):
+                img.load()
+
+        srgb_first = (convert_args is not None and targets
+                      and img.width * img.height < sum(w * h for _, w, h in targets))
+        if srgb_first:
+            # Resampling copies the info dict, so every size inherits the
+            # sRGB profile and prepare_for_format() finds nothing to convert
+            with profile_stage('icc'):
+                img = convert_to_srgb(img, in_place=handle.context is not None)
+
+        if cascade:
+            plan = plan_cascade([(w, h) for _, w, h in targets])
+        else:
+            plan = [(index, None) for index in range(len(targets))]
+
+        resized = {}
+        for index, source_index in plan:
+            _, new_width, new_height = targets[index]
+            source = img if source_index is None else resized[source_index]
+            with profile_stage('resample'):
+                if cascade:
+                    resized[index] = source.resize((new_width, new_height),
+                                                   Image.Resampling.LANCZOS,
+                                                   reducing_gap=CASCADE_REDUCING_GAP)
+                else:
+                    resized[index] = source.resize((new_width, new_height),
+                                                   Image.Resampling.LANCZOS)
+    except Image.DecompressionBombError:
+        print(f"Error: Image exceeds pixel limit ({MAX_IMAGE_PIXELS:,} pixels) — "
+              "possible decompression bomb", file=sys.stderr)
+        sys.exit(EXIT_READ_ERROR)
+    except OSError as e:
+        print(f"Error: Cannot read image: {handle.path} ({e})", file=sys.stderr)
+        sys.exit(EXIT_READ_ERROR)
+
+    base_name = handle.path.stem
+    extension = handle.path.suffix
+    handles = []
+    for index, (size, new_width, new_height) in enumerate(targets):
+        if len(sizes) == 1:
+            output_filename = f"{base_name}{extension}"
+        else:
+            output_filename = f"{base_name}_{size}{extension}"
+        # Every size has been resampled, so cascade sources can be changed in place
+        resized_img = resized.pop(index)
+        if convert_args is None:
+            with profile_stage('ensure_rgb'):
+                resized_img = ensure_rgb_for_jpeg(resized_img)
+            handles.append(ImageHandle(
+                output_dir / output_filename,
+                image=resized_img,
+                format='JPEG',
+                save_kwargs={'quality': args.quality, 'optimize': True},
+            ))
+        else:
+            handles.append(_convert_handle(convert_args, output_dir / output_filename,
+                                           resized_img, in_place=True))
+        print(f"✓ Resized: {output_filename} ({new_width}x{new_height})")
+
+    if skipped_sizes:
+        print()
+        for size, reason in skipped_sizes:
+            print(f"⚠ Skipped {size}px: {reason}")
+
+    print()
+    if not handles:
+        print(f"Warning: No images created (all sizes would require upscaling)")
+
+    return handles
+
+
+def _memory_rename(args, handle):
+    """In-memory rename stage: change the output name, keep the pixels."""
+    _validate_rename_options(args)
+
+    if handle.format is None:
+        print(f"Error: Cannot read image: {handle.path}", file=sys.stderr)
+        sys.exit(EXIT_READ_ERROR)
+
+    new_ext = get_format_extension(handle.format) if args.ext else None
+
+    date_prefix = None
+    if args.prefix_exif_date:
+        curated = format_exif_curated(_exif_to_dict(handle.exif))
+        if curated and 'date_taken' in curated:
+            date_prefix = format_exif_date_prefix(curated['date_taken'])
+        else:
+            print(f"Warning: No EXIF date found in {handle.path.name}, skipping",
+                  file=sys.stderr)
+            if not args.ext:
+                return [handle]
+
+    new_filename = build_renamed_filename(handle.path.name, ext=new_ext, date_prefix=date_prefix)
+    output_dir = resolve_output_dir(args.output, handle.path, "renamed")
+    output_path = output_dir / new_filename
+
+    if output_path.resolve() == handle.path.resolve():
+        print(f"No change needed: {handle.path.name}")
+        return [handle]
+
+    return [handle.derive(output_path)]
+
+
+def _memory_convert(args, handle):
+    """In-memory convert stage: apply colour/mode conversion for the target format."""
+    _validate_convert_options(args)
+
+    if handle.format is None:
+        print(f"Error: Cannot read image: {handle.path}", file=sys.stderr)
+        sys.exit(EXIT_READ_ERROR)
+
+    if handle.n_frames > 1:
+        print(f"Warning: {handle.path.name} contains {handle.n_frames} frames; "
+              f"only the primary frame will be converted. "
+              f"Use 'extract' to export all frames.",
+              file=sys.stderr)
+
+    exif_data = None
+    if not args.strip_exif and handle.exif:
+        exif_data, gps_stripped = _strip_gps_from_exif(handle.exif)
+        if gps_stripped:
+            note_gps_stripped()
+
+    try:
+        if handle.context is not None:
+            with profile_stage('decode', read_path=handle.context.path):
+                handle.image.load()
+    except Exception as e:
+        print(f"Error: Failed to convert image", file=sys.stderr)
+        sys.exit(EXIT_READ_ERROR)
+
+    return [_convert_handle(args, handle.path, handle.image, exif_data=exif_data)]
+
+
+def _convert_handle(args, path, img, exif_data=None, in_place=False):
+    """
+    Build the convert stage's output handle for one decoded image.
+
+    Args:
+        args: Parsed convert arguments
+        path: Path the image had before the convert stage
+        img: Decoded PIL Image
+        exif_data: EXIF to embed, or None
+        in_place: Passed to prepare_for_format(); only for images nothing else uses
+
+    Returns:
+        ImageHandle in the target format, at the path convert would write
+    """
+    output_dir = resolve_output_dir(args.output, path, "converted")
+    output_path = output_dir / (path.stem + get_target_extension(args.format))
+    try:
+        img, save_kwargs = prepare_for_format(img, args.format, quality=_convert_quality(args),
+                                              exif_data=exif_data, in_place=in_place)
+    except Exception as e:
+        print(f"Error: Failed to convert image", file=sys.stderr)
+        sys.exit(EXIT_READ_ERROR)
+
+    save_format = save_kwargs.pop('format')
+    return ImageHandle(
+        output_path,
+        image=img,
+        format=save_format,
+        save_kwargs=save_kwargs,
+        exif=save_kwargs.get('exif'),
+    )
+
+
+def _memory_extract(args, handle):
+    """In-memory extract stage: one handle per frame."""
+    output_dir = resolve_output_dir(args.output, handle.path, "extracted")
+
+    try:
+        n_frames = handle.n_frames
+        img = handle.image
+    except Exception:
+        print(f"Error: Cannot read image: {handle.path}", file=sys.stderr)
+        sys.exit(EXIT_READ_ERROR)
+
+    if n_frames == 1:
+        print(f"Note: {handle.path.name} contains only 1 frame.")
+
+    out_ext, save_format = get_frame_output_format(handle.format)
+    pad_width = max(3, len(str(n_frames)))
+    save_kwargs = {'quality': DEFAULT_CONVERT_QUALITY, 'optimize': True} if save_format == 'JPEG' else {}
+
+    handles = []
+    for frame_idx in range(n_frames):
+        with profile_stage('decode'):
+            if n_frames > 1:
+                img.seek(frame_idx)
+            frame_img = img.copy()
+        if save_format == 'JPEG':
+            with profile_stage('ensure_rgb'):
+                frame_img = ensure_rgb_for_jpeg(frame_img)
+
+        frame_num = str(frame_idx + 1).zfill(pad_width)
+        handles.append(ImageHandle(
+            output_dir / f"{handle.path.stem}_{frame_num}{out_ext}",
+            image=frame_img,
+            format=save_format,
+            save_kwargs=dict(save_kwargs),
+        ))
+
+    print(f"Extracted {len(handles)} frame(s) from {handle.path.name}")
+    return handles
+
+
+# In-memory implementations of each subcommand, used by --in-memory chains
+MEMORY_STAGES = {
+    'info': _memory_info,
+    'resize': _memory_resize,
+    'rename': _memory_rename,
+    'convert': _memory_convert,
+    'extract': _memory_extract,
+}
+
+
+def _memory_resize_convert(resize_args, convert_args, handle):
+    """Fused in-memory resize → convert: one decode, one encode per output."""
+    return _memory_resize(resize_args, handle, convert_args=convert_args)
+
+
+# Adjacent stages that run as one in-memory operation: one decode, one encode.
+# Pairs mapped to a handler run through it as a single stage; rename needs no
+# handler, since it never touches the pixels convert works on.
+FUSABLE_STAGES = {
+    ('resize', 'convert'): _memory_resize_convert,
+    ('rename', 'convert'): None,
+}
+
+
+def plan_chain(stages, fuse=True):
+    """
+    Group parsed chain stages into operations.
+
+    Fusable neighbours (see FUSABLE_STAGES) are collapsed into one operation,
+    and info fuses with whatever follows it since it only reads the header.
+    Each operation decodes its input once and encodes its outputs once.
+
+    Args:
+        stages: List of parsed argument Namespaces, one per chain segment
+        fuse: If False, every stage is its own operation
+
+    Returns:
+        List of operations, each a list of stage Namespaces
+    """
+    plan = []
+    for stage in stages:
+        if fuse and plan:
+            previous = plan[-1][-1].command
+            if previous == 'info' or (previous, stage.command) in FUSABLE_STAGES:
+                plan[-1].append(stage)
+                continue
+        plan.append([stage])
+    return plan
+
+
+def _describe_stage(args):
+    """Return a one-line description of a parsed chain stage for --explain."""
+    if args.command == 'info':
+        return 'info (header probe, no decode)'
+    if args.command == 'resize':
+        dimension = 'width' if args.width else 'height'
+        sizes = args.width or args.height
+        extra = ' cascade' if getattr(args, 'cascade', False) else ''
+        return f"resize {dimension}={sizes}{extra}"
+    if args.command == 'convert':
+        extra = ' strip-exif' if args.strip_exif else ''
+        return f"convert → sRGB → {args.format.upper()} q={_convert_quality(args)}{extra}"
+    if args.command == 'rename':
+        actions = [name for name, enabled in (('ext', args.ext),
+                                              ('prefix-exif-date', args.prefix_exif_date))
+                   if enabled]
+        return f"rename {'+'.join(actions) or '(no action)'}"
+    if args.command == 'extract':
+        return 'extract frames'
+    if args.command == 'strip':
+        return 'strip metadata (segment rewrite, no decode)'
+    return args.command
+
+
+def format_chain_plan(plan, in_memory=True):
+    """
+    Render a chain plan as text for --explain.
+
+    Args:
+        plan: List of operations from plan_chain()
+        in_memory: Whether the chain runs in memory (vs. via intermediate files)
+
+    Returns:
+        String describing each operation, one per line
+    """
+    if in_memory:
+        mode = 'in-memory: 1 decode per input, 1 encode per output'
     else:
-        # Return as-is for JSON-serializable types
-        return value
+        mode = 'file-based: each stage decodes and encodes; --in-memory fuses stages'
+    lines = [f"Chain plan ({mode}; {len(plan)} operation(s)):"]
+    for number, operation in enumerate(plan, 1):
+        steps = ' + '.join(_describe_stage(stage) for stage in operation)
+        if len(operation) > 1:
+            note = 'fused'
+        elif in_memory:
+            note = 'in memory'
+        else:
+            note = 'reads and writes files'
+        lines.append(f"  {number}. {steps}  [{note}]")
+    return '\n'.join(lines)
 
 
-def _format_info_json(info, args):
-    """Format image info as JSON and print it.
+def run_memory_chain(args):
+    """
+    Run a '+' chain for one input, passing images between stages in memory.
+
+    The first stage's arguments are args itself; the remaining stages were
+    parsed once up front into args.chain_stages. The stages are grouped by
+    plan_chain() and each operation's stages run back to back on image
+    handles, with fused pairs (see FUSABLE_STAGES) run by their combined
+    handler. Only the final operation's outputs are written, plus every
+    stage's outputs when args.keep_intermediates is set (which disables
+    fusion).
 
     Args:
-        info: Dictionary from get_image_info()
-        args: Parsed CLI arguments (uses exif_all flag)
+        args: Parsed arguments of the first segment, with 'chain_stages'
+              (parsed Namespaces for the remaining segments) and
+              'keep_intermediates'
+
+    Returns:
+        List of written output file paths
     """
-    output_data = {
-        'filename': info['filename'],
-        'path': info['path'],
-        'format': info['format'],
-        'frames': info['frames'],
-        'width': info['width'],
-        'height': info['height'],
-        'orientation': info['orientation'],
-        'ratio_raw': info['ratio_raw'],
-        'common_ratio': info['common_ratio'],
-        'size_kb': round(info['size_kb'], 2),
-        'has_exif': info['has_exif'],
-        'creation_date': info['creation_date'] if info['creation_date'] else None,
-    }
+    if _is_batch_request(args):
+        return run_batch(run_memory_chain, args)
 
-    # Add EXIF data based on flags (serialize for JSON compatibility)
-    if args.exif_all and info['exif_all']:
-        output_data['exif'] = {k: serialize_exif_value(v) for k, v in info['exif_all'].items()}
-    elif info['exif']:
-        output_data['exif'] = {k: serialize_exif_value(v) for k, v in info['exif'].items()}
+    input_path = validate_input_file(args.file)
+    keep_intermediates = getattr(args, 'keep_intermediates', False)
+    plan = plan_chain([args] + list(args.chain_stages), fuse=not keep_intermediates)
+    written = []
+
+    with ImageContext(input_path) as context:
+        handles = [ImageHandle.from_context(context)]
+
+        for i, operation in enumerate(plan):
+            stages = iter(zip(operation, operation[1:] + [None]))
+            for stage_args, next_args in stages:
+                fused = next_args is not None and FUSABLE_STAGES.get(
+                    (stage_args.command, next_args.command))
+                next_handles = []
+                for handle in handles:
+                    if fused:
+                        next_handles.extend(fused(stage_args, next_args, handle))
+                    else:
+                        next_handles.extend(MEMORY_STAGES[stage_args.command](stage_args, handle))
+                handles = next_handles
+                if fused:
+                    next(stages)
+
+            is_last = i == len(plan) - 1
+            if is_last or keep_intermediates:
+                written = [path for path in (materialise_handle(h) for h in handles) if path]
+
+            if not handles:
+                return []
+
+    return written
+
+
+# Argument standing for stdin (as input) or stdout (as --output)
+PIPE_ARG = '-'
+
+# Stdin inputs up to this size are held in memory; larger ones are spooled
+# to a temporary file
+STDIN_SPOOL_THRESHOLD = 64 * 1024 * 1024
+
+
+def pipe_requested(args):
+    """True if the command reads stdin ('-' as the input) or writes stdout (--output -)."""
+    files = args.file if isinstance(args.file, (list, tuple)) else [args.file]
+    return PIPE_ARG in files or getattr(args, 'output', None) == PIPE_ARG
+
+
+@contextlib.contextmanager
+def stdin_source(stream=None, threshold=STDIN_SPOOL_THRESHOLD):
+    """
+    Read an image from stdin for the library API.
+
+    Data up to threshold bytes is returned as bytes. Past that it is spooled
+    to a temporary file, which is removed on exit, so a large input doesn't
+    have to fit in memory twice.
+
+    Args:
+        stream: Binary stream to read (default: sys.stdin.buffer)
+        threshold: Largest input kept in memory, in bytes
+
+    Yields:
+        bytes, or the Path of the spooled file
+
+    Raises:
+        SystemExit with EXIT_INVALID_ARGS if the input is empty or exceeds
+        MAX_INPUT_FILE_SIZE
+    """
+    if stream is None:
+        stream = sys.stdin.buffer
+    data = stream.read(threshold + 1)
+    if len(data) <= threshold:
+        if not data:
+            print("Error: No input on stdin", file=sys.stderr)
+            sys.exit(EXIT_INVALID_ARGS)
+        yield data
+        return
+
+    spool = tempfile.NamedTemporaryFile(prefix='ipro-stdin-', delete=False)
+    try:
+        with spool:
+            size = 0
+            while data:
+                size += len(data)
+                if size > MAX_INPUT_FILE_SIZE:
+                    limit_mb = MAX_INPUT_FILE_SIZE / (1024 * 1024)
+                    print(f"Error: Input on stdin exceeds limit ({limit_mb:.0f} MB)",
+                          file=sys.stderr)
+                    sys.exit(EXIT_INVALID_ARGS)
+                spool.write(data)
+                data = stream.read(1024 * 1024)
+        yield Path(spool.name)
+    finally:
+        with contextlib.suppress(OSError):
+            os.unlink(spool.name)
+
+
+def write_pipe_outputs(outputs, as_tar, stream=None):
+    """
+    Write encoded outputs to stdout.
+
+    Args:
+        outputs: List of (member name, bytes)
+        as_tar: If True, write a tar stream with one member per output;
+                otherwise the single output's bytes as they are
+        stream: Binary stream to write (default: sys.stdout.buffer)
+    """
+    if stream is None:
+        sys.stdout.flush()
+        stream = sys.stdout.buffer
+    if as_tar:
+        now = time.time()
+        with tarfile.open(fileobj=stream, mode='w|') as tar:
+            for name, data in outputs:
+                member = tarfile.TarInfo(name)
+                member.size = len(data)
+                member.mtime = now
+                member.mode = 0o644
+                tar.addfile(member, io.BytesIO(data))
     else:
-        output_data['exif'] = None
+        for _, data in outputs:
+            stream.write(data)
+    stream.flush()
 
-    print(json.dumps(output_data))
 
+@contextlib.contextmanager
+def _exit_on_api_error():
+    """Report IproError raised in the block and exit with its exit_code."""
+    try:
+        yield
+    except IproError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(e.exit_code)
+
+
+def _pipe_info(args, source, name):
+    info = read_image_info(source)
+    info.setdefault('filename', PIPE_ARG)
+    info.setdefault('path', PIPE_ARG)
+    if args.json:
+        _format_info_json(info, args)
+    elif args.short:
+        _format_info_csv(info)
+    else:
+        _format_info_human(info, args)
+    return None
+
+
+def _pipe_resize(args, source, name):
+    dimension, sizes = _resize_options_from_args(args)
+    max_pixels = getattr(args, 'max_pixels', None)
+    # The header is read under the same limit as the pixels, so inputs that
+    # --max-pixels admits aren't refused before resizing starts
+    with pixel_limit(max_pixels or Image.MAX_IMAGE_PIXELS):
+        info = read_image_info(source)
+        if info['format'] not in ('JPEG', 'MPO'):
+            print("Error: Unsupported format. Resize supports JPEG and MPO formats.",
+                  file=sys.stderr)
+            sys.exit(EXIT_UNSUPPORTED_FORMAT)
+        if max_pixels and info['width'] * info['height'] > max_pixels:
+            raise ImageTooLargeError(f"Image exceeds pixel limit ({max_pixels:,} pixels)")
+
+        outputs, skipped_sizes = resize_to_buffers(
+            source, **{f'{dimension}s': sizes}, quality=args.quality,
+            draft=not getattr(args, 'no_draft', False),
+            cascade=getattr(args, 'cascade', False),
+            threads=resolve_threads(getattr(args, 'threads', 1)),
+            max_memory=resize_memory_ceiling(args, info['width'], info['height']),
+        )
+    for size, reason in skipped_sizes:
+        print(f"⚠ Skipped {size}px: {reason}", file=sys.stderr)
+    return [(f"{name}_{output['size']}.jpg", output['data']) for output in outputs], len(sizes) > 1
+
+
+def _pipe_convert(args, source, name):
+    _validate_convert_options(args)
+    result = convert_to_buffer(source, args.format, quality=args.quality,
+                               strip_exif=args.strip_exif)
+    if result['gps_removed']:
+        note_gps_stripped()
+    return [(name + get_target_extension(args.format), result['data'])], False
+
+
+def _pipe_strip(args, source, name):
+    with pixel_limit(getattr(args, 'max_pixels', None) or Image.MAX_IMAGE_PIXELS):
+        result = strip_to_buffer(source, keep_exif=args.keep_exif, gps_only=args.gps_only,
+                                 strip_icc=args.strip_icc)
+    return [(f"{name}.jpg", result['data'])], False
+
+
+def _pipe_extract(args, source, name):
+    frames = extract_to_buffers(source)
+    pad_width = max(3, len(str(len(frames))))
+    extensions = {'JPEG': '.jpg', 'TIFF': '.tiff', 'PNG': '.png'}
+    return [(f"{name}_{str(frame['index']).zfill(pad_width)}{extensions[frame['format']]}",
+             frame['data']) for frame in frames], True
+
+
+# Pipe-mode implementations of each subcommand: return (outputs, as_tar) for
+# write_pipe_outputs(), or None when the result was printed (info)
+PIPE_STAGES = {
+    'info': _pipe_info,
+    'resize': _pipe_resize,
+    'convert': _pipe_convert,
+    'strip': _pipe_strip,
+    'extract': _pipe_extract,
+}
 
-def _format_info_csv(info):
-    """Format image info as a single CSV line and print it.
+
+def run_pipe(args):
+    """
+    Run a command reading stdin and/or writing stdout, without output directories.
+
+    The input ('-' for stdin, or one file) is processed in memory with the
+    library API. A single output is written to stdout as it is; commands
+    that can produce several (resize with several sizes, extract) write a
+    tar stream. A file input's outputs are named after it; stdin's are
+    named "stdin". Commands other than info always write to stdout.
 
     Args:
-        info: Dictionary from get_image_info()
+        args: Parsed CLI arguments with file '-' or output '-'
+
+    Returns:
+        Empty list (nothing is written for a following chain stage)
+
+    Raises:
+        SystemExit with the usual exit codes on errors
     """
-    fields = [
-        info['filename'],
-        info['format'],
-        str(info['frames']),
-        str(info['width']),
-        str(info['height']),
-        info['orientation'],
-        info['ratio_raw'],
-        info['common_ratio'],
-        f"{info['size_kb']:.2f}",
-        info['creation_date'] if info['creation_date'] else ''
-    ]
-    print(','.join(fields))
+    files = args.file if isinstance(args.file, (list, tuple)) else [args.file]
+    if args.command not in PIPE_STAGES:
+        print(f"Error: {args.command} can't read stdin or write stdout ('-')", file=sys.stderr)
+        sys.exit(EXIT_INVALID_ARGS)
+    if len(files) != 1:
+        print("Error: '-' can't be combined with other inputs", file=sys.stderr)
+        sys.exit(EXIT_INVALID_ARGS)
+    if incremental_requested(args):
+        print("Error: --incremental needs output files; it can't be used with '-'",
+              file=sys.stderr)
+        sys.exit(EXIT_INVALID_ARGS)
+    if args.command != 'info' and not hasattr(sys.stdout, 'buffer'):
+        # e.g. output captured by a server worker, which only relays text
+        print("Error: stdout doesn't accept binary data here", file=sys.stderr)
+        sys.exit(EXIT_INVALID_ARGS)
+    if args.command != 'info' and sys.stdout.isatty():
+        print("Error: Refusing to write image data to a terminal; redirect stdout",
+              file=sys.stderr)
+        sys.exit(EXIT_INVALID_ARGS)
+
+    if files[0] == PIPE_ARG:
+        source_scope, name = stdin_source(), 'stdin'
+    else:
+        input_path = validate_input_file(files[0])
+        source_scope, name = contextlib.nullcontext(input_path), input_path.stem
 
+    with source_scope as source, _exit_on_api_error():
+        result = PIPE_STAGES[args.command](args, source, name)
+    if result is not None:
+        outputs, as_tar = result
+        write_pipe_outputs(outputs, as_tar)
+    return []
 
-def _format_info_human(info, args):
-    """Format image info as human-readable text and print it.
+
+# Subcommands that run a server of their own, refused inside server workers
+SERVER_COMMANDS = ('serve', 'http')
+
+
+def _starts_server(argv):
+    """
+    Return True if a command line would start a server or act as a client.
+
+    The subcommand of every chain segment is located the way the real parser
+    finds it, skipping global options and their values, so it is found after
+    options like --profile or --in-memory, while an input file that happens
+    to be called "http" is not mistaken for it.
 
     Args:
-        info: Dictionary from get_image_info()
-        args: Parsed CLI arguments (uses exif, exif_all flags)
+        argv: Argument list, exactly as given to the ipro CLI
     """
-    print(f"File: {info['filename']}")
-    print(f"Path: {info['path']}")
-    print(f"Format: {info['format']}")
-    if info['frames'] > 1:
-        print(f"Frames: {info['frames']}")
-    print(f"Dimensions: {info['width']}x{info['height']}")
-    print(f"Orientation: {info['orientation']}")
-    print(f"Aspect Ratio: {info['ratio_raw']}", end='')
-    if info['common_ratio'] != 'none':
-        print(f" ({info['common_ratio']})")
+    if any(arg == '--connect' or arg.startswith('--connect=') for arg in argv):
+        return True
+    global_options = _create_parser()._option_string_actions
+    for segment in split_chain(argv):
+        tokens = iter(segment)
+        for token in tokens:
+            if not token.startswith('-'):
+                if token in SERVER_COMMANDS:
+                    return True
+                break
+            action = global_options.get(token.split('=', 1)[0])
+            if action is not None and action.nargs != 0 and '=' not in token:
+                next(tokens, None)
+    return False
+
+
+class _ServeStream(io.TextIOBase):
+    """
+    Text stream that forwards a command's output to a serve client.
+
+    Each complete line is sent as soon as it is written, as a protocol
+    message keyed by the stream name, so the client sees progress the way a
+    local run would. A client that went away is ignored: the command runs
+    to completion either way.
+    """
+
+    def __init__(self, connection, key):
+        self._connection = connection
+        self._key = key
+        self._pending = ''
+        self._lock = threading.Lock()
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        with self._lock:
+            self._pending += text
+            if '\n' in self._pending:
+                complete, _, self._pending = self._pending.rpartition('\n')
+                self._send(complete + '\n')
+        return len(text)
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                self._send(self._pending)
+                self._pending = ''
+
+    def _send(self, text):
+        if self._connection is None:
+            return
+        try:
+            self._connection.sendall((json.dumps({self._key: text}) + '\n').encode('utf-8'))
+        except OSError:
+            self._connection = None
+
+
+def _serve_request(argv, cwd, connection=None):
+    """
+    Run one command line inside a server worker.
+
+    This is a module-level function so it can be dispatched to the worker
+    pool. The working directory is switched to the client's for the run.
+    With a connection, stdout and stderr are streamed to the client as they
+    are written (see _ServeStream); otherwise they are captured and returned.
+
+    Args:
+        argv: Argument list, exactly as given to the ipro CLI
+        cwd: Client's working directory (for relative paths)
+        connection: Client socket to stream output to, or None
+
+    Returns:
+        Tuple of (exit_code, output_files, stdout_text, stderr_text); the
+        texts are empty when the output was streamed
+    """
+    if connection is not None:
+        out, err = _ServeStream(connection, 'stdout'), _ServeStream(connection, 'stderr')
     else:
-        print()
-    print(f"File Size: {info['size_kb']:.2f} KB")
-    print(f"EXIF Present: {'Yes' if info['has_exif'] else 'No'}")
+        out, err = io.StringIO(), io.StringIO()
+    result = []
+    code = EXIT_SUCCESS
+    original_dir = os.getcwd()
 
-    # Show EXIF data if requested or if present
-    if (args.exif or args.exif_all) and info['has_exif']:
-        print("\nEXIF Data:")
-        if args.exif_all and info['exif_all']:
-            for key, value in info['exif_all'].items():
-                print(f"  {key}: {value}")
-        elif info['exif']:
-            for key, value in info['exif'].items():
-                formatted_key = key.replace('_', ' ').title()
-                print(f"  {formatted_key}: {value}")
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        try:
+            if _starts_server(argv):
+                print("Error: serve, http and --connect cannot be used through a server",
+                      file=sys.stderr)
+                sys.exit(EXIT_INVALID_ARGS)
+            os.chdir(cwd)
+            result = main(argv) or []
+        except SystemExit as e:
+            if e.code is None:
+                code = EXIT_SUCCESS
+            elif isinstance(e.code, int):
+                code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                code = EXIT_READ_ERROR
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            code = EXIT_READ_ERROR
+        finally:
+            os.chdir(original_dir)
 
+    if connection is not None:
+        out.flush()
+        err.flush()
+        connection.close()
+        return code, [str(path) for path in result], '', ''
+    return code, [str(path) for path in result], out.getvalue(), err.getvalue()
 
-def cmd_info(args):
-    """Handle the info subcommand."""
-    input_path = validate_input_file(args.file)
 
-    # Try to get image info
+def _warm_worker(_=None):
+    """Build the parser once in a fresh worker so the first request is fast."""
+    _create_parser()
+    return os.getpid()
+
+
+class _ServeHandler(socketserver.StreamRequestHandler):
+    """
+    Handle one client connection of the serve protocol.
+
+    The client sends a single JSON line: {"argv": [...], "cwd": "..."}.
+    The server replies with JSON lines: {"stdout": text} and {"stderr": text}
+    as the command writes output, then {"exit": code, "outputs": [paths]}.
+    The worker writes the output messages itself, to its own copy of the
+    connection, so they reach the client while the command is running.
+    """
+
+    def _send(self, message):
+        self.wfile.write((json.dumps(message) + '\n').encode('utf-8'))
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return  # Liveness probe or client went away before sending
+
+        try:
+            request = json.loads(line.decode('utf-8'))
+            argv = [str(a) for a in request['argv']]
+            cwd = str(request.get('cwd') or os.getcwd())
+        except (ValueError, KeyError, TypeError):
+            self._send({'stderr': "Error: Malformed request\n"})
+            self._send({'exit': EXIT_INVALID_ARGS, 'outputs': []})
+            return
+
+        try:
+            code, outputs, out, err = self.server.executor.submit(
+                _serve_request, argv, cwd, self.connection).result()
+        except BrokenProcessPool:
+            code, outputs, out, err = (EXIT_READ_ERROR, [], '',
+                                       "Error: Worker process died while handling request\n")
+
+        try:
+            if out:
+                self._send({'stdout': out})
+            if err:
+                self._send({'stderr': err})
+            self._send({'exit': code, 'outputs': outputs})
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client went away; nothing to report to
+
+
+def create_server(socket_path, workers=0):
+    """
+    Create a serve-protocol server bound to a Unix socket.
+
+    The worker pool is started (and each worker warmed up) before the
+    server is returned. Call serve_forever() to handle requests and
+    close_server() to stop it and remove the socket.
+
+    Args:
+        socket_path: Path of the Unix socket to listen on
+        workers: Number of worker processes (0 = one per CPU)
+
+    Returns:
+        socketserver.ThreadingUnixStreamServer with an 'executor' attribute
+
+    Raises:
+        OSError: If the socket is in use by a running server or cannot be bound
+    """
+    socket_path = Path(socket_path)
+    if socket_path.exists() or socket_path.is_symlink():
+        # Remove a stale socket, but never one a live server is listening on
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(socket_path))
+        except OSError:
+            if not socket_path.is_socket():
+                raise OSError(f"Not a socket: {socket_path}")
+            socket_path.unlink()
+        else:
+            raise OSError(f"A server is already listening on {socket_path}")
+        finally:
+            probe.close()
+
+    workers = resolve_jobs(workers)
+    executor = ProcessPoolExecutor(max_workers=workers)
+    list(executor.map(_warm_worker, range(workers)))
+
+    # Bind with a restrictive umask: the socket must never be connectable by
+    # other users, not even between bind() and the chmod below
+    previous_umask = os.umask(0o177)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(str(socket_path), _ServeHandler)
+    finally:
+        os.umask(previous_umask)
+    server.daemon_threads = True
+    server.executor = executor
+    server.workers = workers
+    server.socket_path = socket_path
+    os.chmod(socket_path, 0o600)
+    return server
+
+
+def close_server(server):
+    """Stop accepting requests, shut the worker pool down and remove the socket."""
+    server.server_close()
+    server.executor.shutdown(wait=True)
     try:
-        info = get_image_info(input_path)
-    except Image.DecompressionBombError:
-        print(f"Error: Image exceeds pixel limit ({MAX_IMAGE_PIXELS:,} pixels) — "
-              "possible decompression bomb", file=sys.stderr)
-        sys.exit(EXIT_UNSUPPORTED_FORMAT)
-    except Exception as e:
-        # If Pillow can't open it, it's unsupported or corrupt
-        print(f"Error: Unsupported or unreadable image format: {args.file}", file=sys.stderr)
-        sys.exit(EXIT_UNSUPPORTED_FORMAT)
+        server.socket_path.unlink()
+    except OSError:
+        pass
 
-    # Determine output format
-    if args.json:
-        _format_info_json(info, args)
-    elif args.short:
-        _format_info_csv(info)
-    else:
-        _format_info_human(info, args)
 
-    # Return input path for chaining (info is read-only, passes through)
-    return [str(input_path)]
+def run_client(socket_path, argv):
+    """
+    Run a command line on a running "ipro serve" instance.
 
+    The server's stdout and stderr text is written to this process's
+    streams as it arrives.
 
-def cmd_resize(args):
-    """Handle the resize subcommand."""
-    input_path = validate_input_file(args.file)
+    Args:
+        socket_path: Path of the server's Unix socket
+        argv: Argument list, exactly as it would be given to the ipro CLI
 
-    # Validate it's a JPEG or MPO (content-based check)
-    image_format = get_image_format(input_path)
-    if image_format not in ('JPEG', 'MPO'):
-        print(f"Error: Unsupported format. Resize supports JPEG and MPO formats.", file=sys.stderr)
-        print(f"Supported extensions: .jpg, .jpeg, .JPG, .JPEG, .MPO", file=sys.stderr)
+    Returns:
+        The command's exit code
+    """
+    try:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(str(socket_path))
+    except (OSError, AttributeError) as e:
+        print(f"Error: Cannot connect to ipro server at {socket_path}: {e}", file=sys.stderr)
+        return EXIT_READ_ERROR
+
+    with client, client.makefile('rwb') as stream:
+        request = {'argv': list(argv), 'cwd': os.getcwd()}
+        stream.write((json.dumps(request) + '\n').encode('utf-8'))
+        stream.flush()
+        for line in stream:
+            message = json.loads(line.decode('utf-8'))
+            if 'stdout' in message:
+                sys.stdout.write(message['stdout'])
+                sys.stdout.flush()
+            if 'stderr' in message:
+                sys.stderr.write(message['stderr'])
+                sys.stderr.flush()
+            if 'exit' in message:
+                return message['exit']
+
+    print("Error: Connection closed by ipro server", file=sys.stderr)
+    return EXIT_READ_ERROR
+
+
+def cmd_serve(args):
+    """Handle the serve subcommand."""
+    if not hasattr(socket, 'AF_UNIX'):
+        print("Error: serve requires Unix domain sockets, which this platform lacks",
+              file=sys.stderr)
         sys.exit(EXIT_UNSUPPORTED_FORMAT)
 
-    # Determine dimension and sizes
-    if args.width and args.height:
-        print("Error: Cannot specify both --width and --height", file=sys.stderr)
-        sys.exit(EXIT_INVALID_ARGS)
-    elif args.width:
-        dimension = 'width'
-        sizes = parse_sizes(args.width)
-    elif args.height:
-        dimension = 'height'
-        sizes = parse_sizes(args.height)
-    else:
-        print("Error: Must specify either --width or --height", file=sys.stderr)
-        sys.exit(EXIT_INVALID_ARGS)
-
-    # Validate quality
-    if not (1 <= args.quality <= 100):
-        print("Error: Quality must be between 1-100", file=sys.stderr)
+    if args.workers < 0:
+        print("Error: --workers must be 0 (one per CPU) or a positive integer", file=sys.stderr)
         sys.exit(EXIT_INVALID_ARGS)
 
-    # Get image dimensions for output
     try:
-        with Image.open(input_path) as img:
-            orig_width, orig_height = img.size
-    except Exception as e:
-        print(f"Error: Cannot read image: {input_path}", file=sys.stderr)
+        server = create_server(args.socket, args.workers)
+    except OSError as e:
+        print(f"Error: Cannot listen on {args.socket}: {e}", file=sys.stderr)
         sys.exit(EXIT_READ_ERROR)
 
-    # Resolve output directory
-    dir_name = get_resize_dir_name(sizes, dimension)
-    output_dir = resolve_output_dir(args.output, input_path, dir_name)
+    def _stop(signum, frame):
+        raise KeyboardInterrupt
 
-    # Print processing info
-    print(f"Processing: {input_path.name} ({orig_width}x{orig_height})")
-    print(f"Output directory: {output_dir}")
-    print()
-
-    # Process the image
+    signal.signal(signal.SIGTERM, _stop)
+    print(f"Serving on {args.socket} with {server.workers} worker(s)", file=sys.stderr)
     try:
-        created_files, skipped_sizes = resize_image(
-            input_path,
-            output_dir,
-            sizes,
-            dimension=dimension,
-            quality=args.quality,
-            preserve_filename=(len(sizes) == 1),
-        )
-    except OSError as e:
-        print(f"Error: {e}", file=sys.stderr)
-        sys.exit(EXIT_READ_ERROR)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_server(server)
 
-    # Print results
-    for file_info in created_files:
-        print(f"✓ Created: {file_info['filename']} "
-              f"({file_info['width']}x{file_info['height']}, "
-              f"{file_info['size_kb']:.0f} KB)")
+    return []
 
-    # Print warnings for skipped sizes
-    if skipped_sizes:
-        print()
-        for size, reason in skipped_sizes:
-            print(f"⚠ Skipped {size}px: {reason}")
 
-    # Print summary
-    print()
-    if created_files:
-        print(f"Successfully created {len(created_files)} image(s) from {input_path.name}")
-    else:
-        print(f"Warning: No images created (all sizes would require upscaling)")
+# Variant parameters of http URLs (/w/800/q/80/f/webp/path/to/img.jpg) and
+# the render_variant() arguments they set
+HTTP_VARIANT_KEYS = {'w': 'width', 'h': 'height', 'q': 'quality', 'f': 'format'}
 
-    # Return list of created file paths for chaining
-    return [str(f['path']) for f in created_files]
+HTTP_CONTENT_TYPES = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp'}
 
+# Response status for each library API error (most specific class first)
+HTTP_ERROR_STATUS = (
+    (ImageNotFoundError, 404),
+    (ImageTooLargeError, 413),
+    (InvalidOptionsError, 400),
+    (UnsupportedFormatError, 415),
+    (IproError, 500),
+)
 
-def cmd_rename(args):
-    """Handle the rename subcommand."""
-    input_path = validate_input_file(args.file)
+DEFAULT_HTTP_CACHE_SIZE = 1024 * 1024 * 1024
+DEFAULT_HTTP_MAX_AGE = 3600
 
-    # Check if at least one action flag is provided
-    if not args.ext and not args.prefix_exif_date:
-        print("Error: At least one action flag (--ext or --prefix-exif-date) is required",
-              file=sys.stderr)
-        sys.exit(EXIT_INVALID_ARGS)
 
-    # Try to read the image format
-    image_format = get_image_format(input_path)
-    if image_format is None:
-        print(f"Error: Cannot read image: {input_path}", file=sys.stderr)
-        sys.exit(EXIT_READ_ERROR)
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one.
 
-    # Determine new extension if --ext flag is set
-    new_ext = None
-    if args.ext:
-        new_ext = get_format_extension(image_format)
+    The first caller for a key runs the function; callers arriving while it
+    runs wait for and share its result (or exception).
+    """
 
-    # Determine date prefix if --prefix-exif-date flag is set
-    date_prefix = None
-    if args.prefix_exif_date:
-        # Extract EXIF data
-        exif_data = extract_exif_data(input_path)
-        curated = format_exif_curated(exif_data)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
 
-        if curated and 'date_taken' in curated:
-            date_prefix = format_exif_date_prefix(curated['date_taken'])
+    def do(self, key, func):
+        """
+        Run func() once for all concurrent callers with this key.
+
+        Returns:
+            Tuple of (func's result, True if this caller ran it)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = concurrent.futures.Future()
+
+        if not leader:
+            return future.result(), False
+
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
         else:
-            # No EXIF date - skip with warning
-            print(f"Warning: No EXIF date found in {input_path.name}, skipping",
-                  file=sys.stderr)
-            # If only --prefix-exif-date was requested, return input (passthrough)
-            if not args.ext:
-                return [str(input_path)]
-            # Otherwise continue with just the extension change
+            future.set_result(result)
+            return result, True
+        finally:
+            with self._lock:
+                del self._calls[key]
 
-    # Build new filename
-    new_filename = build_renamed_filename(
-        input_path.name,
-        ext=new_ext,
-        date_prefix=date_prefix
-    )
 
-    # Determine output directory
-    output_dir = resolve_output_dir(args.output, input_path, "renamed")
-    output_dir.mkdir(parents=True, exist_ok=True)
+class VariantCache:
+    """
+    Content-addressed on-disk cache of rendered variants with LRU eviction.
 
-    # Build output path
-    output_path = output_dir / new_filename
+    Files are stored as DIR/ab/abcdef...<ext> under their key. When the
+    total size exceeds max_bytes, the least recently used files are removed.
+    Recency is kept in file modification times, so it survives restarts.
+    Safe to use from threads.
 
-    # Check if source and destination are the same
-    if input_path.resolve() == output_path.resolve():
-        # Nothing to do - file already has correct name
-        print(f"No change needed: {input_path.name}")
-        return [str(input_path)]
+    Args:
+        directory: Cache directory (created if missing)
+        max_bytes: Size limit for all cached files together
+    """
 
-    # Handle case-insensitive filesystems (macOS, Windows)
-    # If the paths differ only by case, we need to use a temp file
-    try:
-        if output_path.exists() and os.path.samefile(input_path, output_path):
-            # Same file on case-insensitive filesystem - rename via temp file
-            # Use tempfile.mkstemp for unpredictable temp filename (L1 security fix)
-            fd, temp_name = tempfile.mkstemp(
-                dir=str(output_path.parent),
-                prefix='.ipro_tmp_',
-                suffix=output_path.suffix
-            )
-            temp_path = Path(temp_name)
-            try:
-                os.close(fd)
-                shutil.copy2(input_path, temp_path)
-                os.remove(input_path)
-                shutil.move(str(temp_path), str(output_path))
-            except Exception:
-                # Clean up temp file on failure
-                if temp_path.exists():
-                    try:
-                        temp_path.unlink()
-                    except OSError:
-                        pass
-                raise
-            print(f"Created: {output_path}")
-            return [str(output_path)]
-    except OSError:
-        pass  # Files are different, proceed normally
+    def __init__(self, directory, max_bytes=DEFAULT_HTTP_CACHE_SIZE):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # key -> (path, size), oldest first
+        self.total_bytes = 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        found = []
+        for path in self.directory.glob('??/*'):
+            if path.name.startswith('.'):
+                with contextlib.suppress(OSError):
+                    path.unlink()  # Temporary file of an interrupted write
+                continue
+            with contextlib.suppress(OSError):
+                stat = path.stat()
+                found.append((stat.st_mtime_ns, path.name.split('.')[0], path, stat.st_size))
+        for _, key, path, size in sorted(found):
+            self._entries[key] = (path, size)
+            self.total_bytes += size
+        with self._lock:
+            self._evict()
+
+    def get(self, key):
+        """Return the cached data for key (marking it recently used), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        path, _ = entry
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                if self._entries.get(key) == entry:
+                    del self._entries[key]
+                    self.total_bytes -= entry[1]
+            return None
+        return data
+
+    def put(self, key, data, suffix=''):
+        """Store data under key, evicting least recently used entries past max_bytes."""
+        path = self.directory / key[:2] / (key + suffix)
+        path.parent.mkdir(exist_ok=True)
+        with atomic_output(path) as temp_path:
+            temp_path.write_bytes(data)
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            self._entries[key] = (path, len(data))
+            self.total_bytes += len(data)
+            self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._entries:
+            _, (path, size) = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            with contextlib.suppress(OSError):
+                path.unlink()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class VariantService:
+    """
+    Serve resized and converted variants of the images under a root directory.
 
-    # Warn if output file already exists (preserves backward compatibility)
-    if output_path.exists():
-        print(f"Warning: Overwriting existing file: {output_path}", file=sys.stderr)
+    URLs are a sequence of key/value segments followed by the image's path
+    under root: /w/800/q/80/f/webp/photos/a.jpg (see HTTP_VARIANT_KEYS).
+    Variants are rendered with render_variant() and kept in a VariantCache,
+    keyed by the source's fingerprint, the parameters and the ipro version,
+    which also serves as the ETag. Concurrent requests for one variant are
+    rendered once. handle() is the whole HTTP exchange minus the socket, so
+    the service can be driven in-process.
 
-    # Copy the file (non-destructive)
-    shutil.copy2(input_path, output_path)
+    Args:
+        root: Directory the image paths are resolved under
+        cache: VariantCache for rendered variants
+        content_hash: If True, fingerprint sources by SHA-256 of their
+                      contents as well as size and mtime
+        max_age: Cache-Control max-age for responses, in seconds
+    """
 
-    # Print success message
-    print(f"Created: {output_path}")
+    def __init__(self, root, cache, content_hash=False, max_age=DEFAULT_HTTP_MAX_AGE):
+        self.root = Path(root).resolve()
+        self.cache = cache
+        self.content_hash = content_hash
+        self.max_age = max_age
+        self._flights = SingleFlight()
+
+    def parse(self, url_path):
+        """
+        Split a URL path into render_variant() arguments and the source file.
+
+        Returns:
+            Tuple of (dict of arguments, Path of the source)
+
+        Raises:
+            InvalidOptionsError: Malformed parameters or path
+            ImageNotFoundError: No such file under root
+        """
+        segments = urllib.parse.unquote(urllib.parse.urlsplit(url_path).path).split('/')[1:]
+        options = {}
+        while len(segments) > 2 and segments[0] in HTTP_VARIANT_KEYS:
+            key, value = segments[0], segments[1]
+            name = HTTP_VARIANT_KEYS[key]
+            if name in options:
+                raise InvalidOptionsError(f"Parameter given twice: {key}")
+            if name == 'format':
+                options[name] = value
+            else:
+                try:
+                    options[name] = int(value)
+                except ValueError:
+                    raise InvalidOptionsError(f"Not a number: /{key}/{value}") from None
+            segments = segments[2:]
+
+        if not segments or any(part in ('', '.', '..') or '\x00' in part for part in segments):
+            raise InvalidOptionsError("Invalid image path")
+        source = (self.root / Path(*segments)).resolve()
+        try:
+            source.relative_to(self.root)
+        except ValueError:
+            raise ImageNotFoundError(f"Not found: /{'/'.join(segments)}") from None
+        if not source.is_file():
+            raise ImageNotFoundError(f"Not found: /{'/'.join(segments)}")
+        return options, source
+
+    def variant_key(self, options, source):
+        """Return the cache key (and ETag) of a variant of source."""
+        identity = {
+            'version': __version__,
+            'source': str(source.relative_to(self.root)),
+            'fingerprint': input_fingerprint(source, self.content_hash),
+            'options': options,
+        }
+        return hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()
+
+    def render(self, url_path):
+        """
+        Return a variant, from the cache or freshly rendered.
+
+        Returns:
+            Tuple of (key, data, content type, cache status "hit", "miss" or "shared")
+
+        Raises:
+            IproError subclasses (see parse() and render_variant())
+        """
+        options, source = self.parse(url_path)
+        key = self.variant_key(options, source)
+
+        data = self.cache.get(key)
+        if data is not None:
+            return key, data, _sniff_content_type(data), 'hit'
+
+        def render():
+            result = render_variant(source, **options)
+            self.cache.put(key, result['data'], get_target_extension(result['format']))
+            return result['data']
+
+        data, leader = self._flights.do(key, render)
+        return key, data, _sniff_content_type(data), 'miss' if leader else 'shared'
+
+    def handle(self, method, url_path, headers=None):
+        """
+        Answer one HTTP request.
+
+        Args:
+            method: Request method (GET and HEAD are served)
+            url_path: Request target, e.g. "/w/800/f/webp/a.jpg"
+            headers: Mapping of request headers (If-None-Match is honoured)
+
+        Returns:
+            Tuple of (status code, dict of response headers, body bytes)
+        """
+        headers = headers or {}
+        if method not in ('GET', 'HEAD'):
+            return 405, {'Allow': 'GET, HEAD'}, b''
 
-    # Return output path for chaining
-    return [str(output_path)]
+        try:
+            key, data, content_type, status = self.render(url_path)
+        except IproError as e:
+            code = next(code for error, code in HTTP_ERROR_STATUS if isinstance(e, error))
+            body = f"{e}\n".encode('utf-8')
+            return code, {'Content-Type': 'text/plain; charset=utf-8'}, body
+
+        etag = f'"{key}"'
+        response_headers = {
+            'ETag': etag,
+            'Cache-Control': f'public, max-age={self.max_age}',
+            'X-Ipro-Cache': status,
+        }
+        if _etag_matches(headers.get('If-None-Match'), etag):
+            return 304, response_headers, b''
+        response_headers['Content-Type'] = content_type
+        response_headers['Content-Length'] = str(len(data))
+        return 200, response_headers, b'' if method == 'HEAD' else data
+
+
+def _sniff_content_type(data):
+    """Return the MIME type of encoded JPEG, PNG or WebP data."""
+    if data.startswith(b'\x89PNG'):
+        return HTTP_CONTENT_TYPES['PNG']
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return HTTP_CONTENT_TYPES['WEBP']
+    return HTTP_CONTENT_TYPES['JPEG']
+
+
+def _etag_matches(if_none_match, etag):
+    """True if an If-None-Match header value matches etag (weak comparison)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or any((tag[2:] if tag.startswith('W/') else tag) == etag
+                                     for tag in candidates)
 
 
-def cmd_convert(args):
-    """Handle the convert subcommand."""
-    input_path = validate_input_file(args.file)
+class _HttpHandler(http.server.BaseHTTPRequestHandler):
+    """Adapt HTTP requests to the server's VariantService."""
 
-    # Validate format option
-    if not is_supported_output_format(args.format):
-        print(f"Error: Unsupported output format: {args.format}", file=sys.stderr)
-        print(f"Supported formats: {', '.join(sorted(set(SUPPORTED_OUTPUT_FORMATS.keys())))}",
-              file=sys.stderr)
-        sys.exit(EXIT_INVALID_ARGS)
+    server_version = f"ipro/{__version__}"
+    protocol_version = 'HTTP/1.1'  # Every response has a length, so connections can persist
 
-    # Validate quality
-    if args.quality < 1 or args.quality > 100:
-        print(f"Error: Quality must be between 1-100, got {args.quality}", file=sys.stderr)
-        sys.exit(EXIT_INVALID_ARGS)
+    def _respond(self):
+        status, headers, body = self.server.service.handle(self.command, self.path, self.headers)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if 'Content-Length' not in headers and status != 304:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
 
-    # Try to read the image to verify it's valid
-    image_format = get_image_format(input_path)
-    if image_format is None:
-        print(f"Error: Cannot read image: {input_path}", file=sys.stderr)
-        sys.exit(EXIT_READ_ERROR)
+    do_GET = do_HEAD = _respond
 
-    # Warn if multi-frame image — only the primary frame will be converted
-    try:
-        with Image.open(input_path) as img:
-            n_frames = getattr(img, 'n_frames', 1)
-            if n_frames > 1:
-                print(f"Warning: {input_path.name} contains {n_frames} frames; "
-                      f"only the primary frame will be converted. "
-                      f"Use 'extract' to export all frames.",
-                      file=sys.stderr)
-    except Exception:
-        pass
+    def do_POST(self):
+        self.close_connection = True  # The request body is never read
+        self._respond()  # 405
 
-    # Determine output path
-    output_dir = resolve_output_dir(args.output, input_path, "converted")
-    target_ext = get_target_extension(args.format)
-    output_filename = input_path.stem + target_ext
-    output_path = output_dir / output_filename
+    do_PUT = do_DELETE = do_PATCH = do_POST
 
-    # Check if output file already exists
-    if output_path.exists():
-        print(f"Warning: Overwriting existing file: {output_path}", file=sys.stderr)
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
 
-    # Create output directory if needed
-    output_dir.mkdir(parents=True, exist_ok=True)
 
-    # Convert the image
-    success = convert_image(
-        input_path,
-        output_path,
-        args.format,
-        quality=args.quality,
-        strip_exif=args.strip_exif
-    )
+def create_http_server(service, host='127.0.0.1', port=8080, quiet=False):
+    """
+    Create an HTTP server for a VariantService.
 
-    if success:
-        print(f"Created: {output_path}")
-        return [str(output_path)]
-    else:
-        print(f"Error: Failed to convert image", file=sys.stderr)
-        sys.exit(EXIT_READ_ERROR)
+    Call serve_forever() to handle requests (each on its own thread) and
+    server_close() to stop listening.
 
+    Args:
+        service: VariantService answering the requests
+        host: Address to bind
+        port: Port to bind (0 picks a free one; see server_address)
+        quiet: If True, don't log requests to stderr
 
-def cmd_extract(args):
-    """Handle the extract subcommand."""
-    input_path = validate_input_file(args.file)
+    Returns:
+        http.server.ThreadingHTTPServer with 'service' and 'quiet' attributes
 
-    # Resolve output directory
-    output_dir = resolve_output_dir(args.output, input_path, "extracted")
+    Raises:
+        OSError: If the address cannot be bound
+    """
+    server = http.server.ThreadingHTTPServer((host, port), _HttpHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.quiet = quiet
+    return server
+
+
+def cmd_http(args):
+    """Handle the http subcommand."""
+    root = Path(args.root)
+    if not root.is_dir():
+        print(f"Error: Root directory not found: {args.root}", file=sys.stderr)
+        sys.exit(EXIT_FILE_NOT_FOUND)
+    if args.max_age < 0:
+        print("Error: --max-age must be 0 or more seconds", file=sys.stderr)
+        sys.exit(EXIT_INVALID_ARGS)
 
-    # Check frame count
     try:
-        with Image.open(input_path) as img:
-            n_frames = getattr(img, 'n_frames', 1)
-    except Exception as e:
-        print(f"Error: Cannot read image: {input_path}", file=sys.stderr)
+        cache = VariantCache(args.cache, args.cache_size)
+        server = create_http_server(
+            VariantService(root, cache, content_hash=args.content_hash, max_age=args.max_age),
+            args.host, args.port, quiet=args.quiet,
+        )
+    except OSError as e:
+        print(f"Error: Cannot start HTTP server: {e}", file=sys.stderr)
         sys.exit(EXIT_READ_ERROR)
 
-    if n_frames == 1:
-        print(f"Note: {input_path.name} contains only 1 frame.")
+    def _stop(signum, frame):
+        raise KeyboardInterrupt
 
-    # Extract frames
+    signal.signal(signal.SIGTERM, _stop)
+    host, port = server.server_address[:2]
+    print(f"Serving {root} on http://{host}:{port}/ (cache: {args.cache}, "
+          f"{len(cache)} variant(s), {cache.total_bytes / 2**20:.1f} MB)", file=sys.stderr)
     try:
-        created_files = extract_frames(input_path, output_dir)
-    except OSError as e:
-        print(f"Error: {e}", file=sys.stderr)
-        sys.exit(EXIT_READ_ERROR)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
 
-    # Print results
-    for file_info in created_files:
-        print(f"Created: {file_info['filename']} "
-              f"({file_info['width']}x{file_info['height']}, "
-              f"{file_info['size_kb']:.0f} KB)")
+    return []
 
-    # Print summary
-    print()
-    print(f"Extracted {len(created_files)} frame(s) from {input_path.name}")
 
-    # Return list of created file paths for chaining
-    return [str(f['path']) for f in created_files]
+def main(argv=None):
+    """Main entry point for ipro CLI.
 
+    Args:
+        argv: Argument list (default: sys.argv[1:])
 
-def main():
-    """Main entry point for ipro CLI."""
+    Returns:
+        List of output file paths from the command or chain (may be None)
+    """
     # Save current directory to restore after processing
     original_dir = os.getcwd()
 
     try:
-        _main_impl()
+        return _main_impl(argv)
     finally:
         # Restore original directory
         os.chdir(original_dir)
@@ -1405,6 +6793,24 @@ def _create_parser():
     )
 
     parser.add_argument('--version', '-v', action='version', version=f'ipro {__version__}')
+    parser.add_argument('--in-memory', action='store_true',
+                        help='Run "+" chains in memory: stages pass decoded images instead of '
+                             'writing and re-reading intermediate files')
+    parser.add_argument('--keep-intermediates', action='store_true',
+                        help='With --in-memory, also write the outputs of intermediate stages')
+    parser.add_argument('--explain', action='store_true',
+                        help='Print the execution plan for a "+" chain (showing fused '
+                             'operations) without running it')
+    parser.add_argument('--profile', action='store_true',
+                        help='Print wall/CPU time and bytes read/written per processing stage '
+                             '(open, probe, decode, icc, ensure_rgb, resample, encode, ...) to '
+                             'stderr when done (also enabled by IPRO_PROFILE=1)')
+    parser.add_argument('--profile-jsonl', metavar='FILE',
+                        help='With --profile, also write one JSON record per stage, input and '
+                             'output to FILE (implies --profile; IPRO_PROFILE=FILE does the same)')
+    parser.add_argument('--connect', metavar='SOCKET',
+                        help='Send the command to a running "ipro serve" instance '
+                             '(must be the first argument)')
 
     # Create subparsers for different commands
     subparsers = parser.add_subparsers(dest='command', help='Available commands')
@@ -1414,10 +6820,55 @@ def _create_parser():
     _add_rename_parser(subparsers)
     _add_convert_parser(subparsers)
     _add_extract_parser(subparsers)
+    _add_strip_parser(subparsers)
+    _add_serve_parser(subparsers)
+    _add_http_parser(subparsers)
 
     return parser
 
 
+def _add_incremental_arguments(command_parser):
+    """Add the incremental-build options shared by resize and convert."""
+    command_parser.add_argument('--incremental', action='store_true',
+                                help=f'Skip inputs whose outputs are up to date (tracked in '
+                                     f'{MANIFEST_NAME} in the output directory)')
+    command_parser.add_argument('--content-hash', action='store_true',
+                                help='Also compare input contents (SHA-256), so files whose '
+                                     'mtime changed but contents did not are skipped '
+                                     '(implies --incremental)')
+    command_parser.add_argument('--prune', action='store_true',
+                                help='Delete stale outputs: those of removed inputs or no longer '
+                                     'produced with the current options (implies --incremental)')
+
+
+def _add_batch_arguments(command_parser):
+    """Add the batch-mode options shared by every subcommand parser."""
+    command_parser.add_argument('--recursive', '-r', action='store_true',
+                                help='Descend into subdirectories of directory inputs')
+    command_parser.add_argument('--jobs', '-j', type=int, default=1,
+                                help='Number of worker processes for batches (0 = one per CPU, '
+                                     'default: 1)')
+    command_parser.add_argument('--memory-budget', type=parse_memory_size, default=None,
+                                metavar='SIZE',
+                                help='Cap the estimated image memory of concurrently running '
+                                     '--jobs workers (e.g. 4G, 512M); larger images wait for '
+                                     'room and oversized ones run alone')
+
+
+def _add_crash_safety_arguments(command_parser):
+    """Add the durability and resumable-batch options shared by the commands that write files."""
+    command_parser.add_argument('--durability', choices=DURABILITY_MODES, default='none',
+                                help='Outputs are always written to a temporary file and renamed '
+                                     'into place; "file" also fsyncs each one and its directory, '
+                                     '"batch" fsyncs them in groups (default: none)')
+    command_parser.add_argument('--journal', metavar='FILE',
+                                help='Append a record of each finished input (options, outputs '
+                                     'and their checksums) to FILE as the batch runs')
+    command_parser.add_argument('--resume', action='store_true',
+                                help='With --journal, skip inputs the journal shows as done '
+                                     'with the same options and outputs still in place')
+
+
 def _add_info_parser(subparsers):
     """Add the info subcommand parser."""
     info_parser = subparsers.add_parser(
@@ -1425,11 +6876,13 @@ def _add_info_parser(subparsers):
         help='Display image information and metadata',
         description='Inspect an image file and report metadata, orientation, and aspect ratio'
     )
-    info_parser.add_argument('file', help='Path to image file')
+    info_parser.add_argument('file', nargs='+',
+                             help='Image file(s), directories, or glob patterns (- reads stdin)')
     info_parser.add_argument('--json', action='store_true', help='Output in JSON format')
     info_parser.add_argument('--short', action='store_true', help='Output as a single CSV line')
     info_parser.add_argument('--exif', action='store_true', help='Show curated EXIF metadata')
     info_parser.add_argument('--exif-all', action='store_true', help='Show all EXIF metadata tags')
+    _add_batch_arguments(info_parser)
     info_parser.set_defaults(func=cmd_info)
 
 
@@ -1444,11 +6897,38 @@ def _add_resize_parser(subparsers):
                                help='Comma-separated list of target widths (e.g., 300,600,900)')
     resize_parser.add_argument('--height', type=str,
                                help='Comma-separated list of target heights (e.g., 400,800)')
-    resize_parser.add_argument('file', help='Path to input image file')
-    resize_parser.add_argument('--output', default=None,
-                               help='Output directory (default: resized-{size}{w|h}/ or resized/)')
+    resize_parser.add_argument('file', nargs='+',
+                               help='Input image file(s), directories, or glob patterns '
+                                    '(- reads stdin)')
+    resize_parser.add_argument('--output', '-o', default=None,
+                               help='Output directory (default: resized-{size}{w|h}/ or '
+                                    'resized/), or - for stdout (a tar stream for several sizes)')
     resize_parser.add_argument('--quality', type=int, default=DEFAULT_RESIZE_QUALITY,
                                help=f'JPEG quality 1-100 (default: {DEFAULT_RESIZE_QUALITY})')
+    resize_parser.add_argument('--no-draft', action='store_true',
+                               help='Always decode JPEGs at full resolution '
+                                    '(disables reduced-scale DCT decoding)')
+    resize_parser.add_argument('--cascade', action='store_true',
+                               help='Derive smaller sizes from larger results instead of the '
+                                    'original (faster for many sizes, slightly softer)')
+    resize_parser.add_argument('--threads', type=int, default=1,
+                               help='Threads for resampling and encoding sizes in parallel; shared '
+                                    'across --jobs workers (0 = one per CPU, default: 1)')
+    resize_parser.add_argument('--max-pixels', type=parse_pixel_count, default=None,
+                               metavar='N',
+                               help=f'Accept inputs up to N pixels, e.g. 600M or 2G (default: '
+                                    f'{MAX_IMAGE_PIXELS // 10**6}M); larger inputs are decoded at '
+                                    f'a reduced scale to stay within --max-memory')
+    resize_parser.add_argument('--max-memory', type=parse_memory_size, default=None,
+                               metavar='SIZE',
+                               help=f'Ceiling on decode memory per image, e.g. 256M; JPEGs are '
+                                    f'decoded at 1/2, 1/4 or 1/8 scale to fit (default: '
+                                    f'{DEFAULT_DECODE_MEMORY // 2**20} MB for inputs above '
+                                    f'{MAX_IMAGE_PIXELS // 10**6}M pixels admitted by '
+                                    f'--max-pixels, otherwise no limit)')
+    _add_incremental_arguments(resize_parser)
+    _add_batch_arguments(resize_parser)
+    _add_crash_safety_arguments(resize_parser)
     resize_parser.set_defaults(func=cmd_resize)
 
 
@@ -1459,12 +6939,15 @@ def _add_rename_parser(subparsers):
         help='Rename image files based on format or EXIF data',
         description='Rename images by correcting extensions or adding EXIF date prefixes'
     )
-    rename_parser.add_argument('file', help='Path to image file')
+    rename_parser.add_argument('file', nargs='+',
+                               help='Image file(s), directories, or glob patterns')
     rename_parser.add_argument('--ext', action='store_true',
                                help='Correct file extension based on actual image format')
     rename_parser.add_argument('--prefix-exif-date', action='store_true',
                                help='Prepend EXIF date to filename (format: YYYY-MM-DDTHHMMSS_)')
     rename_parser.add_argument('--output', help='Output directory (default: renamed/)')
+    _add_batch_arguments(rename_parser)
+    _add_crash_safety_arguments(rename_parser)
     rename_parser.set_defaults(func=cmd_rename)
 
 
@@ -1475,15 +6958,22 @@ def _add_convert_parser(subparsers):
         help='Convert images between formats',
         description='Convert images to different formats (e.g., HEIC to JPEG)'
     )
-    convert_parser.add_argument('file', help='Path to source image file')
+    convert_parser.add_argument('file', nargs='+',
+                                help='Source image file(s), directories, or glob patterns '
+                                     '(- reads stdin)')
     convert_parser.add_argument('--format', '-f', required=True,
                                 help='Target format (jpeg, jpg, png, webp)')
-    convert_parser.add_argument('--output', default=None,
-                                help='Output directory (default: converted/)')
-    convert_parser.add_argument('--quality', type=int, default=DEFAULT_CONVERT_QUALITY,
-                                help=f'JPEG quality 1-100 (default: {DEFAULT_CONVERT_QUALITY})')
+    convert_parser.add_argument('--output', '-o', default=None,
+                                help='Output directory (default: converted/), or - for stdout')
+    convert_parser.add_argument('--quality', type=int, default=None,
+                                help=f'JPEG quality 1-100 (default: {DEFAULT_CONVERT_QUALITY}; '
+                                     'JPEG to JPEG without --quality keeps the original '
+                                     'encoding)')
     convert_parser.add_argument('--strip-exif', action='store_true',
                                 help='Remove EXIF metadata from output')
+    _add_incremental_arguments(convert_parser)
+    _add_batch_arguments(convert_parser)
+    _add_crash_safety_arguments(convert_parser)
     convert_parser.set_defaults(func=cmd_convert)
 
 
@@ -1495,81 +6985,254 @@ def _add_extract_parser(subparsers):
         description='Export individual frames from multi-frame image formats '
                     '(MPO, animated GIF, APNG, animated WebP, multi-page TIFF)'
     )
-    extract_parser.add_argument('file', help='Path to image file')
-    extract_parser.add_argument('--output', default=None,
-                                help='Output directory (default: extracted/)')
+    extract_parser.add_argument('file', nargs='+',
+                                help='Image file(s), directories, or glob patterns '
+                                     '(- reads stdin)')
+    extract_parser.add_argument('--output', '-o', default=None,
+                                help='Output directory (default: extracted/), or - for a tar '
+                                     'stream on stdout')
+    _add_batch_arguments(extract_parser)
+    _add_crash_safety_arguments(extract_parser)
     extract_parser.set_defaults(func=cmd_extract)
 
 
+def _add_strip_parser(subparsers):
+    """Add the strip subcommand parser."""
+    strip_parser = subparsers.add_parser(
+        'strip',
+        help='Remove metadata from JPEG files without re-encoding',
+        description='Rewrite JPEG metadata segments (EXIF, XMP, IPTC, comments, ICC) '
+                    'without decoding the image, so pixels are unchanged. By default '
+                    'EXIF, XMP, IPTC and comments are removed and the ICC profile is kept.'
+    )
+    strip_parser.add_argument('file', nargs='+',
+                              help='Image file(s), directories, or glob patterns '
+                                   '(- reads stdin)')
+    strip_parser.add_argument('--output', '-o', default=None,
+                              help='Output directory (default: stripped/), or - for stdout')
+    mode = strip_parser.add_mutually_exclusive_group()
+    mode.add_argument('--keep-exif', action='store_true',
+                      help='Keep EXIF (with GPS location removed); drop other metadata')
+    mode.add_argument('--gps-only', action='store_true',
+                      help='Only remove GPS location data; keep all other metadata')
+    strip_parser.add_argument('--strip-icc', action='store_true',
+                              help='Also remove the embedded ICC color profile')
+    strip_parser.add_argument('--max-pixels', type=parse_pixel_count, default=None,
+                              metavar='N',
+                              help=f'Accept inputs up to N pixels, e.g. 600M or 2G (default: '
+                                   f'{MAX_IMAGE_PIXELS // 10**6}M)')
+    _add_batch_arguments(strip_parser)
+    _add_crash_safety_arguments(strip_parser)
+    strip_parser.set_defaults(func=cmd_strip)
+
+
+def _add_serve_parser(subparsers):
+    """Add the serve subcommand parser."""
+    serve_parser = subparsers.add_parser(
+        'serve',
+        help='Run a persistent server with warm worker processes',
+        description='Accept ipro command lines over a Unix socket and run them on '
+                    'warm worker processes. Use "ipro --connect SOCKET ..." as a client.'
+    )
+    serve_parser.add_argument('--socket', required=True,
+                              help='Path of the Unix socket to listen on')
+    serve_parser.add_argument('--workers', type=int, default=0,
+                              help='Number of worker processes (default: 0 = one per CPU)')
+    serve_parser.set_defaults(func=cmd_serve)
+
+
+def _add_http_parser(subparsers):
+    """Add the http subcommand parser."""
+    http_parser = subparsers.add_parser(
+        'http',
+        help='Serve resized and converted image variants over HTTP',
+        description='Serve variants of the images under --root at URLs like '
+                    '/w/800/q/80/f/webp/path/to/img.jpg (w = width, h = height, '
+                    'q = quality, f = format), caching them on disk.'
+    )
+    http_parser.add_argument('--root', required=True,
+                             help='Directory the image paths in URLs are resolved under')
+    http_parser.add_argument('--cache', required=True,
+                             help='Directory for cached variants (created if missing)')
+    http_parser.add_argument('--cache-size', type=parse_memory_size,
+                             default=DEFAULT_HTTP_CACHE_SIZE, metavar='SIZE',
+                             help='Evict least recently used variants past this total size, '
+                                  'e.g. 512M (default: 1G)')
+    http_parser.add_argument('--host', default='127.0.0.1',
+                             help='Address to listen on (default: 127.0.0.1)')
+    http_parser.add_argument('--port', type=int, default=8080,
+                             help='Port to listen on (default: 8080)')
+    http_parser.add_argument('--max-age', type=int, default=DEFAULT_HTTP_MAX_AGE,
+                             metavar='SECONDS',
+                             help=f'Cache-Control max-age of responses '
+                                  f'(default: {DEFAULT_HTTP_MAX_AGE})')
+    http_parser.add_argument('--content-hash', action='store_true',
+                             help='Key variants by a SHA-256 of the source as well as its size '
+                                  'and mtime')
+    http_parser.add_argument('--quiet', action='store_true',
+                             help="Don't log requests to stderr")
+    http_parser.set_defaults(func=cmd_http)
+
+
+def _parse_chain_segment(parser, segment, input_file):
+    """
+    Parse one chained segment with input_file injected as its 'file'.
+
+    Args:
+        parser: Parser from _create_parser()
+        segment: Argument list for the segment (command + options)
+        input_file: Path string to inject as the positional file
+
+    Returns:
+        Parsed argparse.Namespace
+
+    Raises:
+        SystemExit on parse errors or a missing command
+    """
+    try:
+        args = parser.parse_args([segment[0], input_file] + segment[1:])
+    except SystemExit as e:
+        sys.exit(e.code)
+    if not args.command:
+        print("Error: Invalid command in chain", file=sys.stderr)
+        sys.exit(EXIT_INVALID_ARGS)
+    return args
+
+
 def _execute_chain(segments):
     """Execute a chain of commands, forwarding output file paths between steps.
 
     For each segment after the first, the 'file' positional argument is
     auto-injected from the previous command's output. When a command produces
     multiple output files (e.g., resize with multiple widths), the next
-    command is executed once per file.
+    command is executed once per file. Each segment is compiled once into a
+    ChainStage and only its input path is bound per file; with
+    --jobs N on a segment, its fan-out runs on a process pool and results
+    are merged in the original order.
 
     Args:
         segments: List of argument segments from split_chain().
                   Each segment is a list of strings (command + args).
+
+    Returns:
+        List of output file paths from the last command (None with --explain)
     """
+    if any(PIPE_ARG in segment for segment in segments):
+        print("Error: stdin/stdout ('-') can't be used in a chain; pipe one ipro into the next "
+              "instead", file=sys.stderr)
+        sys.exit(EXIT_INVALID_ARGS)
+    if any(option in segment for segment in segments for option in ('--journal', '--resume')):
+        print("Error: --journal and --resume can't be used in a chain", file=sys.stderr)
+        sys.exit(EXIT_INVALID_ARGS)
+
     parser = _create_parser()
     output_files = None
 
-    for i, segment in enumerate(segments):
-        # TOCTOU detection: verify intermediate files still exist before passing
-        # to the next command in the chain
-        if output_files is not None and i > 0:
-            missing = [f for f in output_files if not Path(f).exists()]
-            if missing:
-                for mf in missing:
-                    print(f"Error: Intermediate file disappeared during chain: {mf}",
-                          file=sys.stderr)
-                sys.exit(EXIT_READ_ERROR)
-
-        if output_files is not None:
-            # Chained command: inject file from previous output
-            if not output_files:
-                # Previous command produced no output files (e.g., all resize sizes skipped)
-                return
-            next_output_files = []
-            for input_file in output_files:
-                # Build full args: subcommand_name + input_file + remaining_args
-                full_segment = [segment[0], input_file] + segment[1:]
+    with contextlib.ExitStack() as profile_scope:
+        for i, segment in enumerate(segments):
+            # TOCTOU detection: verify intermediate files still exist before passing
+            # to the next command in the chain
+            if output_files is not None and i > 0:
+                missing = [f for f in output_files if not Path(f).exists()]
+                if missing:
+                    for mf in missing:
+                        print(f"Error: Intermediate file disappeared during chain: {mf}",
+                              file=sys.stderr)
+                    sys.exit(EXIT_READ_ERROR)
+
+            if output_files is not None:
+                # Chained command: inject file from previous output
+                if not output_files:
+                    # Previous command produced no output files (e.g., all resize sizes skipped)
+                    return []
+                # Compile the segment once, then bind each input file to a copy
+                stage = ChainStage.from_segment(parser, segment, output_files[0])
+                workers = min(resolve_jobs(getattr(stage.args, 'jobs', 1)), len(output_files))
+                items = [stage.bind(input_file, workers) for input_file in output_files]
+
+                next_output_files = []
+                if workers > 1:
+                    # Fan out over a process pool; results are merged in input order
+                    for item_args, result, code in _iter_item_results(
+                            stage.func, items, workers, getattr(stage.args, 'memory_budget', None)):
+                        if code != EXIT_SUCCESS:
+                            sys.exit(code)
+                        next_output_files.extend(result)
+                else:
+                    for item_args in items:
+                        try:
+                            result = item_args.func(item_args)
+                        except SystemExit as e:
+                            sys.exit(e.code)
+                        if result:
+                            next_output_files.extend(result)
+                output_files = next_output_files
+            else:
+                # First command: parse normally
                 try:
-                    args = parser.parse_args(full_segment)
+                    args = parser.parse_args(segment)
                 except SystemExit as e:
                     sys.exit(e.code)
                 if not args.command:
-                    print("Error: Invalid command in chain", file=sys.stderr)
-                    sys.exit(EXIT_INVALID_ARGS)
+                    parser.print_help()
+                    sys.exit(EXIT_SUCCESS)
+                if not getattr(args, 'explain', False):
+                    # The whole chain is profiled, from the first stage on
+                    profile_scope.enter_context(profiling(args))
+                    profile_scope.enter_context(durability(getattr(args, 'durability', None)))
+                if getattr(args, 'in_memory', False) or getattr(args, 'explain', False):
+                    # Parse every remaining segment before running anything
+                    placeholder = args.file[0] if isinstance(args.file, list) else args.file
+                    stages = [ChainStage.from_segment(parser, seg, placeholder).args
+                              for seg in segments[1:]]
+                    in_memory = getattr(args, 'in_memory', False)
+                    file_only = sorted({stage.command for stage in [args] + stages
+                                        if stage.command not in MEMORY_STAGES})
+                    if in_memory and file_only:
+                        print(f"Note: {', '.join(file_only)} cannot run in memory; "
+                              "running the chain through files", file=sys.stderr)
+                        in_memory = False
+                    if getattr(args, 'explain', False):
+                        fuse = in_memory and not getattr(args, 'keep_intermediates', False)
+                        print(format_chain_plan(plan_chain([args] + stages, fuse=fuse), in_memory))
+                        return
+                    if in_memory:
+                        # Hand the whole chain to the in-memory executor
+                        args.chain_stages = stages
+                        return run_memory_chain(args)
                 try:
-                    result = args.func(args)
+                    output_files = args.func(args)
                 except SystemExit as e:
                     sys.exit(e.code)
-                if result:
-                    next_output_files.extend(result)
-            output_files = next_output_files
-        else:
-            # First command: parse normally
-            try:
-                args = parser.parse_args(segment)
-            except SystemExit as e:
-                sys.exit(e.code)
-            if not args.command:
-                parser.print_help()
-                sys.exit(EXIT_SUCCESS)
-            try:
-                output_files = args.func(args)
-            except SystemExit as e:
-                sys.exit(e.code)
-            if output_files is None:
-                output_files = []
+                if output_files is None:
+                    output_files = []
+
+    return output_files
+
 
+def _main_impl(argv=None):
+    """Implementation of main CLI logic.
+
+    Args:
+        argv: Argument list (default: sys.argv[1:])
+
+    Returns:
+        List of output file paths from the command or chain (may be None)
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if argv and (argv[0] == '--connect' or argv[0].startswith('--connect=')):
+        # Thin client: hand the rest of the command line to a running server
+        if '=' in argv[0]:
+            socket_path, argv = argv[0].split('=', 1)[1], argv[1:]
+        elif len(argv) > 1:
+            socket_path, argv = argv[1], argv[2:]
+        else:
+            print("Error: --connect requires a socket path", file=sys.stderr)
+            sys.exit(EXIT_INVALID_ARGS)
+        sys.exit(run_client(socket_path, argv))
 
-def _main_impl():
-    """Implementation of main CLI logic."""
-    argv = sys.argv[1:]
     segments = split_chain(argv)
 
     if not segments:
@@ -1581,18 +7244,23 @@ def _main_impl():
     if len(segments) == 1:
         # Single command (no chain) - use standard argparse flow
         parser = _create_parser()
-        args = parser.parse_args()
+        args = parser.parse_args(argv)
 
         # If no command specified, show help
         if not args.command:
             parser.print_help()
             sys.exit(EXIT_SUCCESS)
 
+        if args.explain:
+            print(format_chain_plan(plan_chain([args]), args.in_memory))
+            return
+
         # Execute the command
-        args.func(args)
+        with profiling(args), durability(getattr(args, 'durability', None)):
+            return args.func(args)
     else:
         # Multiple commands chained with '+'
-        _execute_chain(segments)
+        return _execute_chain(segments)
 
 
 if __name__ == '__main__':
@@ -184,3 +184,86 @@ def create_mpo_file(directory, filename='test.mpo',
     frame1.save(filepath, format='MPO', save_all=True, append_images=[frame2])
 
     return filepath
+
+
+def replace_icc_tags(profile, replacements):
+    """
+    Return a copy of an ICC profile with some tags' data replaced.
+
+    The new data is appended to the profile and the tag table entries are
+    pointed at it (tags may share data, as TRC tags often do).
+
+    Args:
+        profile: ICC profile bytes
+        replacements: Dict of tag signature (bytes) -> new tag data
+
+    Returns:
+        bytes: ICC profile data
+    """
+    import struct
+
+    profile = bytearray(profile)
+    count = struct.unpack_from('>I', profile, 128)[0]
+    for signature, data in replacements.items():
+        profile.extend(bytes(-len(profile) % 4))
+        offset = len(profile)
+        profile.extend(data)
+        for index in range(count):
+            entry = 132 + 12 * index
+            if profile[entry:entry + 4] == signature:
+                struct.pack_into('>II', profile, entry + 4, offset, len(data))
+    struct.pack_into('>I', profile, 0, len(profile))
+    return bytes(profile)
+
+
+def create_sampled_srgb_profile(gamma=None):
+    """
+    Create an sRGB-like ICC profile with sampled (curv) tone curves.
+
+    Stock "sRGB IEC61966-2.1" profiles store their TRCs as 1024-entry
+    tables rather than the parametric curves Pillow writes, so this
+    produces a profile that differs from Pillow's byte for byte but not in
+    effect.
+
+    Args:
+        gamma: If set, use a plain gamma curve instead (not sRGB-equivalent)
+
+    Returns:
+        bytes: ICC profile data
+    """
+    import struct
+    from PIL import ImageCms
+
+    if gamma is not None:
+        curve = b'curv' + bytes(4) + struct.pack('>IH', 1, round(gamma * 256)) + bytes(2)
+    else:
+        def srgb_to_linear(v):
+            return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+        table = [round(srgb_to_linear(i / 1023) * 65535) for i in range(1024)]
+        curve = b'curv' + bytes(4) + struct.pack(f'>I{len(table)}H', len(table), *table)
+    profile = ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+    return replace_icc_tags(profile, {b'rTRC': curve, b'gTRC': curve, b'bTRC': curve})
+
+
+def create_swapped_primaries_profile():
+    """
+    Create an RGB ICC profile that is not sRGB-equivalent.
+
+    Pillow can only build sRGB-family RGB profiles, and LittleCMS adapts
+    their white points away, so this takes the sRGB profile and swaps its
+    red and blue colorant tags: converting to sRGB then swaps the R and B
+    channels, which makes the transform easy to observe.
+
+    Returns:
+        bytes: ICC profile data
+    """
+    import struct
+    from PIL import ImageCms
+
+    profile = bytearray(ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes())
+    count = struct.unpack_from('>I', profile, 128)[0]
+    entries = {bytes(profile[132 + 12 * i:136 + 12 * i]): 132 + 12 * i for i in range(count)}
+    red, blue = entries[b'rXYZ'], entries[b'bXYZ']
+    profile[red + 4:red + 12], profile[blue + 4:blue + 12] = \
+        profile[blue + 4:blue + 12], profile[red + 4:red + 12]
+    return bytes(profile)
@@ -0,0 +1,260 @@
+"""Tests for the library API (bytes, file objects and Images in, buffers out)."""
+
+import io
+import threading
+
+import pytest
+from PIL import Image, ImageCms
+
+import ipro
+from ipro import (
+    EXIT_FILE_NOT_FOUND,
+    EXIT_INVALID_ARGS,
+    EXIT_UNSUPPORTED_FORMAT,
+    ImageNotFoundError,
+    ImageReadError,
+    ImageTooLargeError,
+    InvalidOptionsError,
+    IproError,
+    UnsupportedFormatError,
+    convert_to_buffer,
+    extract_to_buffers,
+    read_image_info,
+    resize_to_buffers,
+    strip_to_buffer,
+)
+
+
+def _jpeg_bytes(size=(400, 300), gps=True, **save_kwargs):
+    exif = Image.Exif()
+    exif[0x010F] = 'TestCam'                       # Make
+    exif[0x0132] = '2024:11:12 14:30:00'           # DateTime
+    if gps:
+        exif[0x8825] = {1: 'N', 2: (40.0, 26.0, 46.0)}
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 80, 40)).save(buffer, 'JPEG', exif=exif, **save_kwargs)
+    return buffer.getvalue()
+
+
+def _open(data):
+    return Image.open(io.BytesIO(data))
+
+
+class TestReadImageInfo:
+    """Test read_image_info() on the different source types."""
+
+    def test_bytes(self):
+        info = read_image_info(_jpeg_bytes())
+        assert (info['format'], info['width'], info['height']) == ('JPEG', 400, 300)
+        assert info['exif']['camera_make'] == 'TestCam'
+        assert info['size_kb'] == pytest.approx(len(_jpeg_bytes()) / 1024)
+        assert 'path' not in info and 'filename' not in info
+
+    def test_file_object_and_path(self, sample_png_image):
+        with open(sample_png_image, 'rb') as f:
+            from_stream = read_image_info(f)
+        from_path = read_image_info(sample_png_image)
+        assert from_path['filename'] == sample_png_image.name
+        del from_path['filename'], from_path['path']
+        assert from_stream == from_path
+
+    def test_pil_image(self):
+        info = read_image_info(Image.new('RGBA', (30, 60)))
+        assert (info['width'], info['height'], info['orientation']) == (30, 60, 'portrait')
+        assert info['size_kb'] is None
+
+    def test_falls_back_to_pillow(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (12, 8)).save(buffer, 'BMP')
+        info = read_image_info(buffer.getvalue())
+        assert (info['format'], info['width'], info['height']) == ('BMP', 12, 8)
+
+
+class TestResizeToBuffers:
+    """Test resize_to_buffers()."""
+
+    def test_widths_in_requested_order(self):
+        outputs, skipped = resize_to_buffers(_jpeg_bytes(), widths=[100, 800, 200])
+        assert [size for size, _ in skipped] == [800]
+        assert [(o['size'], o['width'], o['height']) for o in outputs] == \
+            [(100, 100, 75), (200, 200, 150)]
+        for output in outputs:
+            with _open(output['data']) as img:
+                assert img.format == 'JPEG'
+                assert img.size == (output['width'], output['height'])
+                assert not img.getexif()
+
+    def test_heights_from_image_with_threads(self):
+        source = Image.new('RGBA', (400, 300), (0, 0, 255, 128))
+        outputs, _ = resize_to_buffers(source, heights=[30, 60, 90], threads=3, cascade=True)
+        assert [o['width'] for o in outputs] == [40, 80, 120]
+        assert source.size == (400, 300) and source.mode == 'RGBA'
+
+    @pytest.mark.parametrize('kwargs', [
+        {},
+        {'widths': [100], 'heights': [100]},
+        {'widths': []},
+        {'widths': [0]},
+        {'widths': ['100']},
+        {'widths': list(range(1, 30))},
+        {'widths': [100], 'quality': 101},
+    ])
+    def test_invalid_options(self, kwargs):
+        with pytest.raises(InvalidOptionsError) as excinfo:
+            resize_to_buffers(_jpeg_bytes(), **kwargs)
+        assert excinfo.value.exit_code == EXIT_INVALID_ARGS
+        assert isinstance(excinfo.value, ValueError)
+
+
+class TestConvertToBuffer:
+    """Test convert_to_buffer()."""
+
+    def test_png_to_webp(self, sample_png_image):
+        result = convert_to_buffer(sample_png_image.read_bytes(), 'webp', quality=70)
+        assert result['format'] == 'WEBP' and not result['rewritten']
+        with _open(result['data']) as img:
+            assert img.format == 'WEBP'
+            assert img.size == (result['width'], result['height'])
+
+    def test_jpeg_rewritten_without_gps(self):
+        result = convert_to_buffer(io.BytesIO(_jpeg_bytes()), 'jpg')
+        assert result['rewritten'] and result['gps_removed']
+        with _open(result['data']) as img:
+            exif = img.getexif()
+            assert exif[0x010F] == 'TestCam'
+            assert not exif.get_ifd(0x8825)
+
+    def test_reencodes_at_new_quality(self):
+        result = convert_to_buffer(_jpeg_bytes(quality=95), 'jpeg', quality=40,
+                                   strip_exif=True)
+        assert not result['rewritten'] and not result['gps_removed']
+        with _open(result['data']) as img:
+            assert not img.getexif()
+
+    def test_image_source_left_unchanged(self):
+        profile = ImageCms.ImageCmsProfile(ImageCms.createProfile('LAB')).tobytes()
+        source = Image.new('RGB', (50, 40), (10, 200, 30))
+        source.info['icc_profile'] = profile
+        result = convert_to_buffer(source, 'png')
+        assert result['format'] == 'PNG'
+        assert source.getpixel((0, 0)) == (10, 200, 30)
+        assert source.info['icc_profile'] == profile
+
+    def test_invalid_format(self):
+        with pytest.raises(InvalidOptionsError):
+            convert_to_buffer(_jpeg_bytes(), 'gif')
+
+
+class TestStripToBuffer:
+    """Test strip_to_buffer()."""
+
+    def test_strips_exif(self):
+        data = _jpeg_bytes()
+        result = strip_to_buffer(data)
+        with _open(result['data']) as img, _open(data) as original:
+            assert not img.getexif()
+            assert img.tobytes() == original.tobytes()
+
+    def test_keep_exif(self):
+        result = strip_to_buffer(_jpeg_bytes(), keep_exif=True)
+        assert result['gps_removed']
+        with _open(result['data']) as img:
+            assert img.getexif()[0x010F] == 'TestCam'
+
+    def test_rejects_non_jpeg(self, sample_png_image):
+        with pytest.raises(UnsupportedFormatError) as excinfo:
+            strip_to_buffer(sample_png_image)
+        assert excinfo.value.exit_code == EXIT_UNSUPPORTED_FORMAT
+
+    def test_rejects_image(self):
+        with pytest.raises(InvalidOptionsError):
+            strip_to_buffer(Image.new('RGB', (4, 4)))
+
+
+class TestExtractToBuffers:
+    """Test extract_to_buffers()."""
+
+    def test_mpo_frames_copied(self, sample_mpo_image):
+        frames = extract_to_buffers(sample_mpo_image.read_bytes())
+        assert [frame['index'] for frame in frames] == [1, 2]
+        for frame in frames:
+            assert frame['format'] == 'JPEG'
+            assert frame['data'].startswith(b'\xff\xd8')
+
+    def test_image_left_on_first_frame(self):
+        frames = [Image.new('RGB', (16, 12), (i * 80, 0, 0)) for i in range(3)]
+        buffer = io.BytesIO()
+        frames[0].save(buffer, 'GIF', save_all=True, append_images=frames[1:])
+        with _open(buffer.getvalue()) as source:
+            result = extract_to_buffers(source)
+            assert source.tell() == 0
+        assert [(f['format'], f['width'], f['height']) for f in result] == [('PNG', 16, 12)] * 3
+
+
+class TestErrors:
+    """Test that failures raise typed exceptions instead of exiting."""
+
+    def test_not_an_image(self):
+        with pytest.raises(UnsupportedFormatError):
+            convert_to_buffer(b'not an image at all', 'png')
+
+    def test_truncated_image(self):
+        with pytest.raises(ImageReadError):
+            convert_to_buffer(_jpeg_bytes(gps=False)[:300], 'png')
+
+    def test_missing_path(self, temp_dir):
+        with pytest.raises(ImageNotFoundError) as excinfo:
+            read_image_info(temp_dir / 'missing.jpg')
+        assert excinfo.value.exit_code == EXIT_FILE_NOT_FOUND
+        assert isinstance(excinfo.value, FileNotFoundError)
+
+    def test_text_mode_file(self, sample_png_image):
+        with open(sample_png_image, errors='ignore') as f:
+            with pytest.raises(InvalidOptionsError):
+                read_image_info(f)
+
+    def test_unsupported_source_type(self):
+        with pytest.raises(InvalidOptionsError):
+            convert_to_buffer(12345, 'png')
+
+    def test_decompression_bomb(self, monkeypatch):
+        monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+        with pytest.raises(ImageTooLargeError):
+            resize_to_buffers(_jpeg_bytes(), widths=[10])
+
+    def test_input_size_limit(self, monkeypatch):
+        monkeypatch.setattr(ipro, 'MAX_INPUT_FILE_SIZE', 100)
+        with pytest.raises(ImageTooLargeError):
+            read_image_info(io.BytesIO(_jpeg_bytes()))
+
+    def test_all_errors_share_base(self):
+        for error in (InvalidOptionsError, UnsupportedFormatError, ImageReadError,
+                      ImageNotFoundError, ImageTooLargeError):
+            assert issubclass(error, IproError)
+
+
+class TestThreadSafety:
+    """Test concurrent calls from request-handler threads."""
+
+    def test_concurrent_calls(self):
+        sources = [_jpeg_bytes(size=(300 + 20 * i, 200)) for i in range(6)]
+        results, errors = {}, []
+
+        def work(index):
+            try:
+                outputs, _ = resize_to_buffers(sources[index], widths=[100, 50])
+                converted = convert_to_buffer(sources[index], 'webp')
+                results[index] = ([o['height'] for o in outputs], converted['width'])
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(len(sources))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not errors
+        for index in range(len(sources)):
+            width = 300 + 20 * index
+            assert results[index] == ([100 * 200 // width, 50 * 200 // width], width)
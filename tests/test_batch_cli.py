@@ -0,0 +1,115 @@
+"""CLI integration tests for batch mode (multiple files, directories, globs)."""
+import json
+import subprocess
+import sys
+import pytest
+from pathlib import Path
+from PIL import Image
+
+
+IMGPRO = str(Path(__file__).parent.parent / 'ipro.py')
+
+
+def run_ipro(*args):
+    """Run ipro.py with the given arguments and return CompletedProcess."""
+    return subprocess.run(
+        [sys.executable, IMGPRO] + list(args),
+        capture_output=True,
+        text=True,
+    )
+
+
+@pytest.fixture
+def image_dir(temp_dir):
+    """Create a directory with three JPEGs (one in a subdirectory)."""
+    photos = temp_dir / 'photos'
+    (photos / 'sub').mkdir(parents=True)
+    for name in ('a.jpg', 'b.jpg', 'sub/c.jpg'):
+        Image.new('RGB', (800, 600), (200, 100, 50)).save(photos / name, 'JPEG')
+    return photos
+
+
+class TestBatchInfo:
+    """Tests for info over several inputs."""
+
+    def test_info_directory_json_lines(self, image_dir):
+        """info on a directory prints one JSON object per file."""
+        result = run_ipro('info', str(image_dir), '--json')
+        assert result.returncode == 0
+        lines = result.stdout.strip().splitlines()
+        assert [json.loads(line)['filename'] for line in lines] == ['a.jpg', 'b.jpg']
+        assert 'Batch complete: 2 file(s), 2 succeeded, 0 failed' in result.stderr
+
+    def test_info_recursive(self, image_dir):
+        """--recursive includes files in subdirectories."""
+        result = run_ipro('info', str(image_dir), '--short', '--recursive')
+        assert result.returncode == 0
+        assert len(result.stdout.strip().splitlines()) == 3
+
+    def test_info_multiple_files_with_jobs_keeps_order(self, image_dir):
+        """Output from a process pool is printed in input order."""
+        result = run_ipro('info', str(image_dir / 'b.jpg'), str(image_dir / 'a.jpg'),
+                          '--short', '--jobs', '2')
+        assert result.returncode == 0
+        names = [line.split(',')[0] for line in result.stdout.strip().splitlines()]
+        assert names == ['b.jpg', 'a.jpg']
+
+
+class TestBatchFailures:
+    """Per-file failures are summarised instead of stopping the batch."""
+
+    def test_failure_does_not_stop_batch(self, image_dir):
+        """A corrupt file is reported while the others still succeed."""
+        (image_dir / 'broken.jpg').write_text('not an image')
+        output_dir = image_dir.parent / 'out'
+        result = run_ipro('convert', str(image_dir), '--format', 'png',
+                          '--output', str(output_dir), '--jobs', '2')
+        assert result.returncode != 0
+        assert sorted(p.name for p in output_dir.glob('*.png')) == ['a.png', 'b.png']
+        assert '1 failed' in result.stderr
+        assert 'broken.jpg' in result.stderr
+
+    def test_no_matches(self, temp_dir):
+        """A glob with no matches exits with file-not-found."""
+        result = run_ipro('info', str(temp_dir / '*.jpg'))
+        assert result.returncode == 3
+        assert 'No input files matched' in result.stderr
+
+
+class TestBatchResize:
+    """Tests for resize over a glob pattern."""
+
+    def test_resize_glob(self, image_dir):
+        """resize accepts a glob and writes one output per input."""
+        output_dir = image_dir.parent / 'web'
+        result = run_ipro('resize', str(image_dir / '*.jpg'), '--width', '300',
+                          '--output', str(output_dir))
+        assert result.returncode == 0
+        assert sorted(p.name for p in output_dir.glob('*.jpg')) == ['a.jpg', 'b.jpg']
+
+    def test_batch_then_chain(self, image_dir):
+        """Batch output feeds the next command in a chain."""
+        result = run_ipro('resize', str(image_dir), '--width', '300',
+                          '--output', str(image_dir.parent / 'web'),
+                          '+', 'convert', '--format', 'webp',
+                          '--output', str(image_dir.parent / 'webp'))
+        assert result.returncode == 0
+        assert len(list((image_dir.parent / 'webp').glob('*.webp'))) == 2
+
+
+class TestBatchMemoryBudget:
+    """Tests for --memory-budget admission control."""
+
+    def test_budget_serialises_large_images(self, image_dir):
+        """Images bigger than the budget still run, one at a time."""
+        output_dir = image_dir.parent / 'out'
+        result = run_ipro('convert', str(image_dir), '-r', '--format', 'png', '--jobs', '3',
+                          '--memory-budget', '1M', '--output', str(output_dir))
+        assert result.returncode == 0
+        assert len(list(output_dir.glob('*.png'))) == 3
+        assert result.stderr.count('more than --memory-budget') == 3
+
+    def test_invalid_budget(self, image_dir):
+        result = run_ipro('info', str(image_dir), '--memory-budget', 'lots')
+        assert result.returncode == 2
+        assert 'Invalid memory size' in result.stderr
@@ -0,0 +1,233 @@
+"""Unit tests for batch-mode helper functions."""
+import argparse
+import pytest
+from pathlib import Path
+from PIL import Image
+from ipro import (expand_inputs, _is_batch_request, resolve_jobs, parse_memory_size,
+                  estimate_job_memory, iter_admitted)
+
+
+def _make_jpeg(path, size=(400, 300)):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new('RGB', size, (10, 20, 30)).save(path, 'JPEG')
+    return path
+
+
+class TestExpandInputs:
+    """Tests for expand_inputs() file, directory, and glob expansion."""
+
+    def test_single_file_passthrough(self, temp_dir):
+        """An existing file is returned as-is."""
+        img = _make_jpeg(temp_dir / 'a.jpg')
+        assert expand_inputs([str(img)]) == [img]
+
+    def test_missing_path_passthrough(self, temp_dir):
+        """A missing non-glob path is kept so validation can report it."""
+        missing = temp_dir / 'missing.jpg'
+        assert expand_inputs([str(missing)]) == [missing]
+
+    def test_directory_lists_images_only(self, temp_dir):
+        """Directories expand to image files, skipping non-images."""
+        a = _make_jpeg(temp_dir / 'a.jpg')
+        b = _make_jpeg(temp_dir / 'b.jpg')
+        (temp_dir / 'notes.txt').write_text('not an image')
+        assert expand_inputs([str(temp_dir)]) == [a, b]
+
+    def test_directory_not_recursive_by_default(self, temp_dir):
+        """Subdirectories are ignored without recursive."""
+        a = _make_jpeg(temp_dir / 'a.jpg')
+        _make_jpeg(temp_dir / 'sub' / 'c.jpg')
+        assert expand_inputs([str(temp_dir)]) == [a]
+
+    def test_directory_recursive(self, temp_dir):
+        """recursive=True descends into subdirectories."""
+        a = _make_jpeg(temp_dir / 'a.jpg')
+        c = _make_jpeg(temp_dir / 'sub' / 'c.jpg')
+        assert expand_inputs([str(temp_dir)], recursive=True) == [a, c]
+
+    def test_recursive_skips_output_and_hidden_dirs(self, temp_dir):
+        """ipro output directories and hidden entries are not re-processed."""
+        a = _make_jpeg(temp_dir / 'a.jpg')
+        _make_jpeg(temp_dir / 'resized' / 'a.jpg')
+        _make_jpeg(temp_dir / 'converted' / 'a.jpg')
+        _make_jpeg(temp_dir / '.cache' / 'a.jpg')
+        assert expand_inputs([str(temp_dir)], recursive=True) == [a]
+
+    def test_glob_pattern(self, temp_dir):
+        """Glob patterns expand to matching files in sorted order."""
+        b = _make_jpeg(temp_dir / 'b.jpg')
+        a = _make_jpeg(temp_dir / 'a.jpg')
+        _make_jpeg(temp_dir / 'c.jpeg')
+        assert expand_inputs([str(temp_dir / '*.jpg')]) == [a, b]
+
+    def test_duplicates_removed(self, temp_dir):
+        """The same file named twice is processed once."""
+        a = _make_jpeg(temp_dir / 'a.jpg')
+        assert expand_inputs([str(a), str(temp_dir / '*.jpg')]) == [a]
+
+
+class TestIsBatchRequest:
+    """Tests for _is_batch_request() single-vs-batch detection."""
+
+    def test_plain_string_is_single(self):
+        """A str file (direct Namespace construction) is not a batch."""
+        args = argparse.Namespace(file='photo.jpg')
+        assert _is_batch_request(args) is False
+        assert args.file == 'photo.jpg'
+
+    def test_single_file_list_is_unwrapped(self, temp_dir):
+        """A one-element list naming a file is normalised to a str."""
+        img = _make_jpeg(temp_dir / 'a.jpg')
+        args = argparse.Namespace(file=[str(img)])
+        assert _is_batch_request(args) is False
+        assert args.file == str(img)
+
+    def test_single_missing_file_is_unwrapped(self, temp_dir):
+        """A missing path stays on the single-file path for its error message."""
+        args = argparse.Namespace(file=[str(temp_dir / 'missing.jpg')])
+        assert _is_batch_request(args) is False
+
+    def test_directory_is_batch(self, temp_dir):
+        """A directory argument is a batch."""
+        args = argparse.Namespace(file=[str(temp_dir)])
+        assert _is_batch_request(args) is True
+
+    def test_glob_is_batch(self, temp_dir):
+        """A glob pattern is a batch."""
+        args = argparse.Namespace(file=[str(temp_dir / '*.jpg')])
+        assert _is_batch_request(args) is True
+
+    def test_multiple_files_is_batch(self):
+        """Several file arguments are a batch."""
+        args = argparse.Namespace(file=['a.jpg', 'b.jpg'])
+        assert _is_batch_request(args) is True
+
+
+class TestResolveJobs:
+    """Tests for resolve_jobs()."""
+
+    def test_default_is_one(self):
+        assert resolve_jobs(1) == 1
+        assert resolve_jobs(None) == 1
+
+    def test_zero_means_cpu_count(self):
+        assert resolve_jobs(0) >= 1
+
+    def test_explicit_count(self):
+        assert resolve_jobs(4) == 4
+
+
+class TestParseMemorySize:
+    """Tests for parse_memory_size() --memory-budget values."""
+
+    @pytest.mark.parametrize('value, expected', [
+        ('1000', 1000), ('512M', 512 * 2**20), ('4G', 4 * 2**30),
+        ('4gb', 4 * 2**30), ('1.5GiB', 3 * 2**29),
+    ])
+    def test_valid(self, value, expected):
+        assert parse_memory_size(value) == expected
+
+    @pytest.mark.parametrize('value', ['', 'lots', '0', '-1G', '4X'])
+    def test_invalid(self, value):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_memory_size(value)
+
+
+class TestEstimateJobMemory:
+    """Tests for estimate_job_memory() header-based estimates."""
+
+    def _args(self, command, path, **kwargs):
+        return argparse.Namespace(command=command, file=str(path), **kwargs)
+
+    def test_convert_counts_two_frames(self, temp_dir):
+        path = _make_jpeg(temp_dir / 'a.jpg', (400, 300))
+        assert estimate_job_memory(self._args('convert', path)) == 400 * 300 * 4 * 2
+
+    def test_single_byte_modes(self, temp_dir):
+        path = temp_dir / 'g.png'
+        Image.new('L', (400, 300)).save(path)
+        assert estimate_job_memory(self._args('convert', path)) == 400 * 300 * 2
+
+    def test_resize_adds_outputs(self, temp_dir):
+        path = _make_jpeg(temp_dir / 'a.jpg', (400, 300))
+        args = self._args('resize', path, width='200,800', height=None, quality=90)
+        frame = 400 * 300 * 4
+        # 800 would upscale and is skipped; 200 is a quarter of the area
+        assert estimate_job_memory(args) == frame * 2 + frame // 4 * 2
+
+    def test_resize_counts_draft_scale(self, temp_dir):
+        path = _make_jpeg(temp_dir / 'a.jpg', (400, 300))
+        args = self._args('resize', path, width='50', height=None, quality=90)
+        # Drafted to 1/4 scale (100x75), which still keeps 2x over the 50px output
+        assert estimate_job_memory(args) == 100 * 75 * 4 * 2 + 50 * 37 * 4 * 2
+
+    def test_resize_draft_scale_of_odd_size(self, temp_dir):
+        path = _make_jpeg(temp_dir / 'a.jpg', (1001, 751))
+        args = self._args('resize', path, width='250', height=None, quality=90)
+        # 1/2 scale decodes to 501x376 (rounded up), not the full 1001x751
+        assert estimate_job_memory(args) == 501 * 376 * 4 * 2 + 250 * 187 * 4 * 2
+
+    def test_resize_counts_bounded_draft_scale(self, temp_dir):
+        path = _make_jpeg(temp_dir / 'a.jpg', (400, 300))
+        args = self._args('resize', path, width='150', height=None, quality=90,
+                          no_draft=True, max_memory=200 * 150 * 4)
+        # 1/2 scale is the only one that fits the ceiling and still covers 150px
+        assert estimate_job_memory(args) == 200 * 150 * 4 * 2 + 150 * 112 * 4 * 2
+
+    def test_inputs_over_pixel_limit_are_estimated(self, temp_dir, monkeypatch):
+        path = _make_jpeg(temp_dir / 'a.jpg', (400, 300))
+        monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+        assert estimate_job_memory(self._args('convert', path)) == 400 * 300 * 4 * 2
+        assert Image.MAX_IMAGE_PIXELS == 1000
+
+    def test_header_only_commands_and_unreadable_files(self, temp_dir):
+        path = _make_jpeg(temp_dir / 'a.jpg')
+        assert estimate_job_memory(self._args('info', path)) == 0
+        broken = temp_dir / 'broken.jpg'
+        broken.write_bytes(b'not an image')
+        assert estimate_job_memory(self._args('convert', broken)) == 0
+
+
+class TestIterAdmitted:
+    """Tests for iter_admitted() memory-budget scheduling."""
+
+    def _run(self, estimates, workers, budget):
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+
+        lock = threading.Lock()
+        state = {'load': 0, 'peak': 0, 'running': 0, 'max_running': 0}
+
+        def job(index):
+            with lock:
+                state['load'] += estimates[index]
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['load'])
+                state['max_running'] = max(state['max_running'], state['running'])
+            time.sleep(0.02)
+            with lock:
+                state['load'] -= estimates[index]
+                state['running'] -= 1
+            return index
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(iter_admitted(executor, job, list(range(len(estimates))),
+                                         estimates, workers, budget))
+        return results, state
+
+    def test_small_jobs_run_at_full_parallelism(self):
+        results, state = self._run([10] * 8, workers=4, budget=100)
+        assert results == list(range(8))
+        assert state['max_running'] == 4
+
+    def test_budget_limits_concurrency(self):
+        results, state = self._run([40] * 6, workers=4, budget=100)
+        assert results == list(range(6))
+        assert state['max_running'] == 2
+        assert state['peak'] <= 100
+
+    def test_oversized_job_runs_alone(self):
+        results, state = self._run([10, 10, 500, 10, 10], workers=4, budget=100)
+        assert results == list(range(5))
+        assert state['peak'] == 500  # Only the big job was running then
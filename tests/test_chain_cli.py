@@ -293,3 +293,77 @@ class TestChainOutput:
         assert 'Created' in result.stdout
         # Should see convert output
         assert 'webp' in result.stdout.lower() or 'Created' in result.stdout
+
+
+class TestChainParallelFanOut:
+    """Tests for fanning a chain segment out over --jobs workers."""
+
+    def test_parallel_fan_out_matches_sequential(self, sample_landscape_image, temp_dir):
+        """convert --jobs 3 over three resized files produces all outputs."""
+        output_resize = temp_dir / 'resized'
+        output_convert = temp_dir / 'converted'
+
+        result = run_ipro(
+            'resize', str(sample_landscape_image),
+            '--width', '200,300,400',
+            '--output', str(output_resize),
+            '+',
+            'convert', '--format', 'png', '--jobs', '3',
+            '--output', str(output_convert),
+        )
+
+        assert result.returncode == 0
+        stems = {f.stem for f in output_convert.glob('*.png')}
+        assert stems == {'landscape_200', 'landscape_300', 'landscape_400'}
+
+    def test_parallel_fan_out_output_in_input_order(self, sample_landscape_image, temp_dir):
+        """Worker output is replayed in the order the files were produced."""
+        output_resize = temp_dir / 'resized'
+        output_convert = temp_dir / 'converted'
+
+        result = run_ipro(
+            'resize', str(sample_landscape_image),
+            '--width', '200,300,400',
+            '--output', str(output_resize),
+            '+',
+            'convert', '--format', 'png', '--jobs', '3',
+            '--output', str(output_convert),
+        )
+
+        assert result.returncode == 0
+        positions = [result.stdout.index(f'landscape_{w}.png') for w in (200, 300, 400)]
+        assert positions == sorted(positions)
+
+    def test_parallel_fan_out_feeds_next_segment(self, sample_landscape_image, temp_dir):
+        """Results merged from the pool flow into the following segment."""
+        output_resize = temp_dir / 'resized'
+        output_convert = temp_dir / 'converted'
+        output_rename = temp_dir / 'renamed'
+
+        result = run_ipro(
+            'resize', str(sample_landscape_image),
+            '--width', '200,300',
+            '--output', str(output_resize),
+            '+',
+            'convert', '--format', 'png', '--jobs', '2',
+            '--output', str(output_convert),
+            '+',
+            'rename', '--ext', '--output', str(output_rename),
+        )
+
+        assert result.returncode == 0
+        assert len(list(output_rename.glob('*.png'))) == 2
+
+    def test_parallel_fan_out_failure_exit_code(self, sample_landscape_image, temp_dir):
+        """A failing worker stops the chain with that worker's exit code."""
+        output_resize = temp_dir / 'resized'
+
+        result = run_ipro(
+            'resize', str(sample_landscape_image),
+            '--width', '200,300',
+            '--output', str(output_resize),
+            '+',
+            'convert', '--format', 'jpeg', '--quality', '0', '--jobs', '2',
+        )
+
+        assert result.returncode != 0
@@ -1,6 +1,7 @@
 """Unit tests for command chaining helper functions."""
 import pytest
-from ipro import split_chain, _create_parser
+import ipro
+from ipro import split_chain, _create_parser, ChainStage, parse_sizes
 
 
 class TestSplitChain:
@@ -120,3 +121,56 @@ class TestCreateParser:
         args = parser.parse_args(['info', 'photo.jpg'])
         assert hasattr(args, 'func')
         assert callable(args.func)
+
+
+class TestChainStage:
+    """Tests for ChainStage: segments compiled once and bound per file."""
+
+    def test_resize_options_compiled(self):
+        """Resize sizes and dimension are parsed when the stage is built."""
+        stage = ChainStage.from_segment(_create_parser(), ['resize', '--width', '300,600'], 'a.jpg')
+        assert stage.command == 'resize'
+        assert stage.args.resize_options == ('width', [300, 600])
+
+    def test_bind_sets_only_file(self):
+        """bind() returns a copy with the input path replaced."""
+        stage = ChainStage.from_segment(_create_parser(), ['convert', '--format', 'webp'], 'a.jpg')
+        first = stage.bind('x.jpg')
+        second = stage.bind('y.jpg')
+        assert first.file == 'x.jpg'
+        assert second.file == 'y.jpg'
+        assert first is not second
+        assert first.format == second.format == 'webp'
+        assert stage.args.file == ['a.jpg']
+
+    def test_bind_splits_thread_budget(self):
+        """Bound resize arguments get their share of the thread budget."""
+        stage = ChainStage.from_segment(_create_parser(),
+                                        ['resize', '--width', '300', '--threads', '8'], 'a.jpg')
+        assert stage.bind('x.jpg', workers=4).threads == 2
+
+    def test_invalid_options_rejected_at_compile(self):
+        """Invalid options fail once, when the stage is compiled."""
+        with pytest.raises(SystemExit) as exc_info:
+            ChainStage.from_segment(_create_parser(), ['convert', '--format', 'bmp'], 'a.jpg')
+        assert exc_info.value.code == 2
+
+    def test_rename_requires_action_at_compile(self):
+        """rename without --ext or --prefix-exif-date fails at compile time."""
+        with pytest.raises(SystemExit) as exc_info:
+            ChainStage.from_segment(_create_parser(), ['rename'], 'a.jpg')
+        assert exc_info.value.code == 2
+
+    def test_sizes_parsed_once_per_stage(self, monkeypatch):
+        """Binding many files does not re-parse the size list."""
+        calls = []
+
+        def counting_parse_sizes(size_str):
+            calls.append(size_str)
+            return parse_sizes(size_str)
+
+        monkeypatch.setattr(ipro, 'parse_sizes', counting_parse_sizes)
+        stage = ChainStage.from_segment(_create_parser(), ['resize', '--width', '300'], 'a.jpg')
+        for i in range(50):
+            ipro._resize_options_from_args(stage.bind(f'{i}.jpg'))
+        assert calls == ['300']
@@ -0,0 +1,289 @@
+"""Tests for in-memory chain execution (--in-memory)."""
+import argparse
+import subprocess
+import sys
+import pytest
+from pathlib import Path
+from PIL import Image
+
+from ipro import ImageHandle, ImageContext, materialise_handle, MEMORY_STAGES
+
+
+IMGPRO = str(Path(__file__).parent.parent / 'ipro.py')
+
+
+def run_ipro(*args):
+    """Run ipro.py with the given arguments and return CompletedProcess."""
+    return subprocess.run(
+        [sys.executable, IMGPRO] + list(args),
+        capture_output=True,
+        text=True,
+    )
+
+
+class TestImageHandle:
+    """Tests for ImageHandle and materialise_handle()."""
+
+    def test_source_handle_is_on_disk(self, sample_square_image):
+        """A handle for an input file is not re-written."""
+        with ImageContext(sample_square_image) as ctx:
+            handle = ImageHandle.from_context(ctx)
+            assert handle.in_memory is False
+            assert handle.format == 'JPEG'
+            assert handle.size == (1000, 1000)
+
+    def test_materialise_encodes_image(self, temp_dir, capsys):
+        """An in-memory handle is encoded with its format and options."""
+        handle = ImageHandle(temp_dir / 'out' / 'a.png', image=Image.new('RGB', (10, 10)),
+                             format='PNG')
+        assert materialise_handle(handle) == str(temp_dir / 'out' / 'a.png')
+        with Image.open(temp_dir / 'out' / 'a.png') as img:
+            assert img.format == 'PNG'
+        # Once written, materialising again is a no-op
+        assert handle.in_memory is False
+
+    def test_materialise_copies_backing_file(self, sample_image_with_exif, temp_dir, capsys):
+        """A renamed-but-unchanged handle is copied byte for byte."""
+        with ImageContext(sample_image_with_exif) as ctx:
+            handle = ImageHandle.from_context(ctx).derive(temp_dir / 'renamed' / 'x.jpg')
+            materialise_handle(handle)
+        assert (temp_dir / 'renamed' / 'x.jpg').read_bytes() == sample_image_with_exif.read_bytes()
+
+    def test_materialise_refuses_symlink(self, temp_dir, capsys):
+        """Symlinked output paths are refused."""
+        target = temp_dir / 'target.png'
+        target.write_bytes(b'')
+        link = temp_dir / 'link.png'
+        link.symlink_to(target)
+        handle = ImageHandle(link, image=Image.new('RGB', (10, 10)), format='PNG')
+        assert materialise_handle(handle) is None
+        assert 'symlink' in capsys.readouterr().err
+
+
+class TestMemoryStages:
+    """Tests for individual in-memory stage functions."""
+
+    def test_resize_then_convert_stage(self, sample_landscape_image, temp_dir, capsys):
+        """resize yields JPEG handles; convert yields target-format handles."""
+        with ImageContext(sample_landscape_image) as ctx:
+            source = ImageHandle.from_context(ctx)
+            resized = MEMORY_STAGES['resize'](argparse.Namespace(
+                width='300,600', height=None, quality=90, output=str(temp_dir / 'r')), source)
+            assert [h.image.size for h in resized] == [(300, 168), (600, 337)]
+            assert all(h.format == 'JPEG' and h.in_memory for h in resized)
+
+            converted = MEMORY_STAGES['convert'](argparse.Namespace(
+                format='webp', quality=80, strip_exif=False, output=str(temp_dir / 'c')),
+                resized[0])
+            assert converted[0].format == 'WEBP'
+            assert converted[0].path == temp_dir / 'c' / 'landscape_300.webp'
+
+    def test_rename_keeps_pixels(self, sample_image_with_exif, temp_dir, capsys):
+        """rename only changes the output path."""
+        with ImageContext(sample_image_with_exif) as ctx:
+            source = ImageHandle.from_context(ctx)
+            (renamed,) = MEMORY_STAGES['rename'](argparse.Namespace(
+                ext=False, prefix_exif_date=True, output=str(temp_dir / 'n')), source)
+            assert renamed.path.name == '2024-11-12T143000_with_exif.jpg'
+            assert renamed.backing_path == sample_image_with_exif
+
+
+class TestMemoryChainCLI:
+    """CLI tests for --in-memory chains."""
+
+    def test_no_intermediate_files(self, sample_landscape_image, temp_dir):
+        """Only the final stage's outputs are written."""
+        result = run_ipro(
+            '--in-memory',
+            'resize', str(sample_landscape_image), '--width', '300,600',
+            '--output', str(temp_dir / 'resized'),
+            '+', 'convert', '--format', 'webp', '--output', str(temp_dir / 'converted'),
+        )
+        assert result.returncode == 0, result.stderr
+        assert not (temp_dir / 'resized').exists()
+        outputs = sorted(p.name for p in (temp_dir / 'converted').glob('*.webp'))
+        assert outputs == ['landscape_300.webp', 'landscape_600.webp']
+        with Image.open(temp_dir / 'converted' / 'landscape_300.webp') as img:
+            assert img.size == (300, 168)
+
+    def test_keep_intermediates(self, sample_landscape_image, temp_dir):
+        """--keep-intermediates writes every stage's outputs like the file chain."""
+        result = run_ipro(
+            '--in-memory', '--keep-intermediates',
+            'resize', str(sample_landscape_image), '--width', '300',
+            '--output', str(temp_dir / 'resized'),
+            '+', 'convert', '--format', 'png', '--output', str(temp_dir / 'converted'),
+        )
+        assert result.returncode == 0, result.stderr
+        assert (temp_dir / 'resized' / 'landscape.jpg').exists()
+        assert (temp_dir / 'converted' / 'landscape.png').exists()
+
+    def test_same_output_paths_as_file_chain(self, sample_landscape_image, temp_dir):
+        """Default output directories match the file-based chain."""
+        result = run_ipro(
+            '--in-memory',
+            'resize', str(sample_landscape_image), '--width', '300',
+            '+', 'convert', '--format', 'webp',
+            '+', 'rename', '--ext',
+        )
+        assert result.returncode == 0, result.stderr
+        assert (temp_dir / 'renamed' / 'landscape.webp').exists()
+        assert not (temp_dir / 'resized-300w').exists()
+        assert not (temp_dir / 'converted').exists()
+
+    def test_convert_png_then_resize_fails(self, sample_landscape_image, temp_dir):
+        """Stage validation matches the file chain (resize rejects PNG)."""
+        result = run_ipro(
+            '--in-memory',
+            'convert', str(sample_landscape_image), '--format', 'png',
+            '+', 'resize', '--width', '300',
+        )
+        assert result.returncode == 1
+
+    def test_missing_input(self, temp_dir):
+        """A missing first input exits with file-not-found."""
+        result = run_ipro('--in-memory', 'resize', str(temp_dir / 'nope.jpg'),
+                          '--width', '300', '+', 'convert', '--format', 'webp')
+        assert result.returncode == 3
+
+    def test_batch_inputs(self, temp_dir):
+        """Directories work as the first stage input."""
+        for name in ('a.jpg', 'b.jpg'):
+            Image.new('RGB', (800, 600)).save(temp_dir / name)
+        result = run_ipro('--in-memory', 'resize', str(temp_dir), '--width', '200',
+                          '+', 'convert', '--format', 'webp',
+                          '--output', str(temp_dir / 'web'))
+        assert result.returncode == 0, result.stderr
+        assert sorted(p.name for p in (temp_dir / 'web').glob('*.webp')) == ['a.webp', 'b.webp']
+
+
+class TestChainPlanner:
+    """Tests for plan_chain() fusion and --explain."""
+
+    def _stages(self, *segments):
+        from ipro import _create_parser
+        parser = _create_parser()
+        return [parser.parse_args([seg[0], 'photo.jpg'] + seg[1:]) for seg in segments]
+
+    def test_resize_convert_fused(self):
+        from ipro import plan_chain
+        stages = self._stages(['resize', '--width', '300'], ['convert', '--format', 'webp'])
+        plan = plan_chain(stages)
+        assert [[s.command for s in op] for op in plan] == [['resize', 'convert']]
+
+    def test_rename_convert_fused(self):
+        from ipro import plan_chain
+        stages = self._stages(['rename', '--ext'], ['convert', '--format', 'png'])
+        assert len(plan_chain(stages)) == 1
+
+    def test_info_fuses_with_anything(self):
+        from ipro import plan_chain
+        stages = self._stages(['info'], ['extract'])
+        assert [[s.command for s in op] for op in plan_chain(stages)] == [['info', 'extract']]
+
+    def test_convert_resize_not_fused(self):
+        from ipro import plan_chain
+        stages = self._stages(['convert', '--format', 'jpeg'], ['resize', '--width', '300'])
+        assert len(plan_chain(stages)) == 2
+
+    def test_fuse_disabled(self):
+        from ipro import plan_chain
+        stages = self._stages(['resize', '--width', '300'], ['convert', '--format', 'webp'])
+        assert len(plan_chain(stages, fuse=False)) == 2
+
+    def test_explain_prints_plan_without_running(self, sample_landscape_image, temp_dir):
+        result = run_ipro(
+            '--in-memory', '--explain',
+            'resize', str(sample_landscape_image), '--width', '300',
+            '+', 'convert', '--format', 'webp',
+        )
+        assert result.returncode == 0
+        assert 'resize width=300 + convert' in result.stdout
+        assert 'fused' in result.stdout
+        assert not (temp_dir / 'converted').exists()
+        assert not (temp_dir / 'resized-300w').exists()
+
+    def test_explain_file_based(self, sample_landscape_image):
+        result = run_ipro(
+            '--explain',
+            'resize', str(sample_landscape_image), '--width', '300',
+            '+', 'convert', '--format', 'webp',
+        )
+        assert result.returncode == 0
+        assert 'file-based' in result.stdout
+        assert '2 operation(s)' in result.stdout
+
+    def test_explain_reports_parse_errors_first(self, sample_landscape_image):
+        """Segments are parsed before anything runs."""
+        result = run_ipro(
+            '--in-memory',
+            'resize', str(sample_landscape_image), '--width', '300',
+            '+', 'convert', '--bogus',
+        )
+        assert result.returncode == 2
+        assert 'Processing' not in result.stdout
+
+
+class TestFusedResizeConvert:
+    """Tests for the fused resize → convert operation."""
+
+    @pytest.fixture
+    def wide_gamut_jpeg(self, temp_dir):
+        """An 800x600 JPEG with a non-sRGB profile, so convert has to transform it."""
+        from .fixtures import create_swapped_primaries_profile
+        path = temp_dir / 'photo.jpg'
+        Image.linear_gradient('L').resize((800, 600)).convert('RGB').save(
+            path, 'JPEG', quality=90, icc_profile=create_swapped_primaries_profile())
+        return path
+
+    def _run(self, *argv):
+        from ipro import _execute_chain, split_chain
+        return _execute_chain(split_chain(list(argv)))
+
+    def _chain(self, source, out_dir, widths, *options):
+        return self._run(*options, 'resize', str(source), '--width', widths,
+                         '--output', str(out_dir / 'resized'),
+                         '+', 'convert', '--format', 'webp', '--output', str(out_dir / 'web'))
+
+    def test_one_encode_per_output(self, wide_gamut_jpeg, temp_dir, monkeypatch, capsys):
+        """Each size is encoded once, straight to the final format."""
+        import ipro
+        saves = []
+        original_save = Image.Image.save
+        monkeypatch.setattr(Image.Image, 'save', lambda self, fp, format=None, **kwargs:
+                            saves.append(format) or original_save(self, fp, format, **kwargs))
+        monkeypatch.setitem(ipro.MEMORY_STAGES, 'convert', None)
+
+        outputs = self._chain(wide_gamut_jpeg, temp_dir, '200,400', '--in-memory')
+        assert [Path(p).name for p in outputs] == ['photo_200.webp', 'photo_400.webp']
+        assert saves == ['WEBP', 'WEBP']
+        assert not (temp_dir / 'resized').exists()
+
+    def test_matches_unfused_chain(self, wide_gamut_jpeg, temp_dir, capsys):
+        """Fusion changes how the chain runs, not what it writes."""
+        fused = self._chain(wide_gamut_jpeg, temp_dir / 'fused', '200,400', '--in-memory')
+        unfused = self._chain(wide_gamut_jpeg, temp_dir / 'unfused', '200,400',
+                              '--in-memory', '--keep-intermediates')
+        assert len(fused) == 2
+        for a, b in zip(fused, unfused):
+            assert Path(a).name == Path(b).name
+            assert Path(a).read_bytes() == Path(b).read_bytes()
+
+    @pytest.mark.parametrize('widths, first_size', [
+        ('200,400', (200, 150)),            # Sizes smaller in total: convert each
+        ('790,780,770', (800, 600)),        # Sizes larger in total: convert the source once
+    ])
+    def test_srgb_conversion_order(self, widths, first_size, wide_gamut_jpeg, temp_dir,
+                                   monkeypatch, capsys):
+        """The sRGB conversion runs where it touches the fewest pixels."""
+        import ipro
+        sizes = []
+        original = ipro.convert_to_srgb
+        monkeypatch.setattr(ipro, 'convert_to_srgb', lambda img, **kwargs:
+                            sizes.append(img.size) or original(img, **kwargs))
+
+        self._chain(wide_gamut_jpeg, temp_dir, widths, '--in-memory')
+        assert sizes[0] == first_size
+        with Image.open(temp_dir / 'web' / f"photo_{widths.split(',')[0]}.webp") as img:
+            # Either way the output was converted and carries the sRGB profile
+            assert img.info.get('icc_profile') == ipro.srgb_profile_bytes()
@@ -249,3 +249,125 @@ class TestConvertImageColorModes:
 
         assert result is True
         assert output_path.exists()
+
+
+class TestSrgbTransformCache:
+    """Test the cached ICC -> sRGB transforms used by convert_to_srgb."""
+
+    @pytest.fixture
+    def other_profile(self):
+        from .fixtures import create_swapped_primaries_profile
+        return create_swapped_primaries_profile()
+
+    @pytest.fixture(autouse=True)
+    def empty_cache(self):
+        import ipro
+        ipro._srgb_transforms.clear()
+        yield
+        ipro._srgb_transforms.clear()
+
+    def _image(self, profile):
+        img = Image.new('RGB', (32, 32))
+        for x in range(32):
+            img.putpixel((x, x), (x * 8, 255 - x * 8, 128))
+        img.info['icc_profile'] = profile
+        return img
+
+    def test_transform_is_reused(self, other_profile):
+        from ipro import srgb_transform
+        first = srgb_transform(other_profile, 'RGB')
+        assert srgb_transform(bytes(other_profile), 'RGB') is first
+        assert srgb_transform(other_profile, 'RGBA') is not first
+
+    def test_least_recently_used_is_evicted(self, other_profile, monkeypatch):
+        import ipro
+        from PIL import ImageCms
+        monkeypatch.setattr(ipro, 'ICC_TRANSFORM_CACHE_SIZE', 2)
+        second = ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB', 9000)).tobytes()
+
+        first = ipro.srgb_transform(other_profile, 'RGB')
+        ipro.srgb_transform(second, 'RGB')
+        assert ipro.srgb_transform(other_profile, 'RGB') is first  # Now most recent
+        ipro.srgb_transform(other_profile, 'RGBA')                 # Evicts second
+        assert len(ipro._srgb_transforms) == 2
+        assert ipro.srgb_transform(other_profile, 'RGB') is first
+
+    def test_matches_profile_to_profile(self, other_profile):
+        import io
+        from PIL import ImageCms
+        from ipro import convert_to_srgb
+        img = self._image(other_profile)
+        expected = ImageCms.profileToProfile(
+            img, ImageCms.ImageCmsProfile(io.BytesIO(other_profile)),
+            ImageCms.createProfile('sRGB'))
+
+        result = convert_to_srgb(img)
+        assert result is not img
+        assert result.tobytes() == expected.tobytes()
+        assert result.getpixel((1, 1)) == img.getpixel((1, 1))[2::-1]
+        assert img.tobytes() != expected.tobytes()  # Source untouched
+
+    def test_in_place(self, other_profile):
+        from ipro import convert_to_srgb, srgb_profile_bytes
+        img = self._image(other_profile)
+        expected = convert_to_srgb(img).tobytes()
+
+        assert convert_to_srgb(img, in_place=True) is img
+        assert img.tobytes() == expected
+        assert img.info['icc_profile'] == srgb_profile_bytes()
+
+    def test_unusable_profile_returns_original(self):
+        from ipro import convert_to_srgb
+        img = self._image(b'not an icc profile')
+        assert convert_to_srgb(img, in_place=True) is img
+
+
+class TestSrgbEquivalentProfiles:
+    """Test that sRGB-equivalent embedded profiles skip the colour transform."""
+
+    @pytest.fixture(autouse=True)
+    def empty_cache(self):
+        import ipro
+        ipro._srgb_transforms.clear()
+        yield
+        ipro._srgb_transforms.clear()
+
+    def test_recognises_srgb_variants(self):
+        from ipro import is_srgb_profile, srgb_profile_bytes
+        from .fixtures import create_sampled_srgb_profile
+        sampled = create_sampled_srgb_profile()
+        assert sampled != srgb_profile_bytes()
+        assert is_srgb_profile(srgb_profile_bytes())
+        assert is_srgb_profile(sampled)
+
+    def test_rejects_other_profiles(self):
+        from PIL import ImageCms
+        from ipro import is_srgb_profile
+        from .fixtures import create_sampled_srgb_profile, create_swapped_primaries_profile
+        assert not is_srgb_profile(create_sampled_srgb_profile(gamma=2.2))
+        assert not is_srgb_profile(create_swapped_primaries_profile())
+        assert not is_srgb_profile(ImageCms.ImageCmsProfile(ImageCms.createProfile('LAB')).tobytes())
+        assert not is_srgb_profile(b'not an icc profile')
+
+    def test_no_transform_or_copy(self):
+        from unittest import mock
+        from PIL import ImageCms
+        import ipro
+        from .fixtures import create_sampled_srgb_profile
+        img = Image.new('RGB', (16, 16), (200, 40, 90))
+        img.info['icc_profile'] = create_sampled_srgb_profile()
+
+        with mock.patch.object(ImageCms, 'ImageCmsTransform') as build:
+            assert ipro.convert_to_srgb(img) is img
+            assert ipro.convert_to_srgb(img, in_place=True) is img
+        build.assert_not_called()
+        assert ipro.srgb_transform(img.info['icc_profile'], 'RGB') is None
+        assert img.getpixel((0, 0)) == (200, 40, 90)
+
+    def test_non_srgb_still_converted(self):
+        import ipro
+        from .fixtures import create_sampled_srgb_profile
+        img = Image.new('RGB', (16, 16), (200, 40, 90))
+        img.info['icc_profile'] = create_sampled_srgb_profile(gamma=1.8)
+        assert ipro.srgb_transform(img.info['icc_profile'], 'RGB') is not None
+        assert ipro.convert_to_srgb(img).getpixel((0, 0)) != (200, 40, 90)
@@ -0,0 +1,147 @@
+"""Tests for atomic output writes and --durability."""
+
+import os
+import stat
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+import ipro
+from ipro import SyncGroup, atomic_output, convert_image, durability, resize_image
+
+
+IMGPRO = str(Path(__file__).parent.parent / 'ipro.py')
+
+
+def run_ipro(*args, cwd=None):
+    """Run ipro as a subprocess and return (exit_code, stdout, stderr)."""
+    cmd = [sys.executable, IMGPRO] + list(args)
+    result = subprocess.run(cmd, capture_output=True, text=True, cwd=cwd)
+    return result.returncode, result.stdout, result.stderr
+
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    """Record the paths passed to _fsync_path instead of syncing them."""
+    calls = []
+    monkeypatch.setattr(ipro, '_fsync_path', lambda path: calls.append(Path(path)))
+    return calls
+
+
+class TestAtomicOutput:
+    """Test writing through a renamed temporary file."""
+
+    def test_replaces_on_success(self, temp_dir):
+        target = temp_dir / 'out.jpg'
+        target.write_bytes(b'old')
+        with atomic_output(target) as temp_path:
+            assert temp_path.parent == temp_dir
+            assert temp_path.name.startswith('.') and temp_path.suffix == '.jpg'
+            temp_path.write_bytes(b'new')
+            assert target.read_bytes() == b'old'
+        assert target.read_bytes() == b'new'
+        assert [p.name for p in temp_dir.iterdir()] == ['out.jpg']
+
+    def test_failure_leaves_target_untouched(self, temp_dir):
+        target = temp_dir / 'out.jpg'
+        target.write_bytes(b'old')
+        with pytest.raises(RuntimeError):
+            with atomic_output(target) as temp_path:
+                temp_path.write_bytes(b'trunc')
+                raise RuntimeError('killed mid-write')
+        assert target.read_bytes() == b'old'
+        assert [p.name for p in temp_dir.iterdir()] == ['out.jpg']
+
+    def test_permissions_follow_umask(self, temp_dir):
+        previous = os.umask(0o022)
+        try:
+            with atomic_output(temp_dir / 'out.png') as temp_path:
+                temp_path.write_bytes(b'data')
+        finally:
+            os.umask(previous)
+        assert stat.S_IMODE(os.stat(temp_dir / 'out.png').st_mode) == 0o644
+
+    def test_file_durability_syncs_file_and_directory(self, temp_dir, fsyncs):
+        with durability('file'):
+            with atomic_output(temp_dir / 'out.png') as temp_path:
+                temp_path.write_bytes(b'data')
+        assert fsyncs == [temp_path, temp_dir]
+
+    def test_batch_durability_defers_directory_sync(self, temp_dir, fsyncs):
+        temp_paths = []
+        with durability('batch'):
+            for name in ('a.png', 'b.png'):
+                with atomic_output(temp_dir / name) as temp_path:
+                    temp_path.write_bytes(b'data')
+                    temp_paths.append(temp_path)
+            # File data is synced before each rename; only the directory waits
+            assert fsyncs == temp_paths
+        assert fsyncs == temp_paths + [temp_dir]
+
+    def test_replacing_keeps_mode(self, temp_dir):
+        target = temp_dir / 'out.jpg'
+        target.write_bytes(b'old')
+        os.chmod(target, 0o640)
+        with atomic_output(target) as temp_path:
+            temp_path.write_bytes(b'new')
+        assert stat.S_IMODE(os.stat(target).st_mode) == 0o640
+
+
+class TestSyncGroup:
+    """Test grouped fsyncs."""
+
+    def test_one_sync_per_directory(self, temp_dir, fsyncs):
+        group = SyncGroup()
+        group.add([temp_dir / 'a' / '1.jpg', temp_dir / 'a' / '2.jpg'])
+        group.add([temp_dir / 'b' / '1.jpg', temp_dir / 'a' / '1.jpg'])
+        assert len(group) == 4
+        group.flush()
+        assert fsyncs == [temp_dir / 'a', temp_dir / 'b']
+        assert len(group) == 0
+
+
+class TestWriters:
+    """Test that a failed encode never leaves a partial output."""
+
+    def test_resize_keeps_previous_output(self, sample_landscape_image, temp_dir, monkeypatch):
+        out_dir = temp_dir / 'out'
+        out_dir.mkdir()
+        output = out_dir / f'{sample_landscape_image.stem}_100.jpg'
+        output.write_bytes(b'previous good output')
+
+        def failing_save(self, fp, *args, **kwargs):
+            Path(fp).write_bytes(b'\xff\xd8 partial')
+            raise OSError('disk full')
+
+        monkeypatch.setattr(Image.Image, 'save', failing_save)
+        with pytest.raises(OSError):
+            resize_image(sample_landscape_image, out_dir, [100])
+        assert output.read_bytes() == b'previous good output'
+        assert [p.name for p in out_dir.iterdir()] == [output.name]
+
+    def test_convert_failure_leaves_no_file(self, sample_png_image, temp_dir, monkeypatch):
+        monkeypatch.setattr(Image.Image, 'save',
+                            lambda self, fp, *a, **k: Path(fp).write_bytes(b'x') and 1 / 0)
+        assert not convert_image(sample_png_image, temp_dir / 'out' / 'a.webp', 'webp')
+        assert list((temp_dir / 'out').iterdir()) == []
+
+
+class TestDurabilityCLI:
+    """Test --durability on real commands."""
+
+    @pytest.mark.parametrize('mode', ['none', 'file', 'batch'])
+    def test_batch_modes(self, mode, sample_landscape_image, sample_png_image, temp_dir):
+        code, _, stderr = run_ipro('convert', str(sample_landscape_image), str(sample_png_image),
+                                   '-f', 'webp', '-o', str(temp_dir / 'out'), '-j', '2',
+                                   '--durability', mode, '--journal', str(temp_dir / 'j.jsonl'))
+        assert code == 0, stderr
+        assert sorted(p.name for p in (temp_dir / 'out').iterdir()) == \
+            sorted(f'{p.stem}.webp' for p in (sample_landscape_image, sample_png_image))
+
+    def test_invalid_mode(self, sample_landscape_image):
+        code, _, stderr = run_ipro('strip', str(sample_landscape_image), '--durability', 'disk')
+        assert code == 2
+        assert 'invalid choice' in stderr
@@ -0,0 +1,143 @@
+"""Tests for the header-only metadata probe used by the info command."""
+import argparse
+import struct
+import zlib
+import pytest
+from PIL import Image
+import ipro
+from ipro import probe_image_header, _exif_to_dict
+
+
+def _pillow_view(path):
+    """What Pillow reports for a file: the probe must agree exactly."""
+    with Image.open(path) as img:
+        return {
+            'format': img.format,
+            'width': img.size[0],
+            'height': img.size[1],
+            'n_frames': getattr(img, 'n_frames', 1),
+            'exif': _exif_to_dict(img.getexif()),
+        }
+
+
+def _exif_bytes():
+    exif = Image.Exif()
+    exif[0x010F] = 'TestCam'
+    exif[0x0112] = 6
+    exif[0x0132] = '2024:01:02 03:04:05'
+    return exif.tobytes()
+
+
+def _frame(color, size=(320, 240), mode='RGB'):
+    return Image.new(mode, size, color)
+
+
+SAMPLES = {
+    'plain.jpg': lambda p: _frame('red').save(p),
+    'exif.jpg': lambda p: _frame('red').save(p, exif=_exif_bytes()),
+    'progressive.jpg': lambda p: _frame('red').save(p, progressive=True, exif=_exif_bytes()),
+    'xmp.jpg': lambda p: _frame('red').save(p, xmp=b'<tiff:Orientation>3</tiff:Orientation>'),
+    'stereo.mpo': lambda p: _frame('red').save(p, format='MPO', save_all=True,
+                                               append_images=[_frame('blue')]),
+    'rgb.png': lambda p: _frame('green').save(p),
+    'rgba.png': lambda p: _frame((1, 2, 3, 4), mode='RGBA').save(p),
+    'exif.png': lambda p: _frame('green').save(p, exif=_exif_bytes()),
+    'anim.png': lambda p: _frame('green').save(p, save_all=True,
+                                               append_images=[_frame('red'), _frame('blue')]),
+    'still.gif': lambda p: _frame('red').save(p),
+    'anim.gif': lambda p: _frame('red').save(p, save_all=True,
+                                             append_images=[_frame('blue'), _frame('green')]),
+    'lossy.webp': lambda p: _frame('red').save(p),
+    'lossless.webp': lambda p: _frame('red').save(p, lossless=True),
+    'alpha.webp': lambda p: _frame((1, 2, 3, 4), mode='RGBA').save(p),
+    'exif.webp': lambda p: _frame('red').save(p, exif=_exif_bytes()),
+    'anim.webp': lambda p: _frame('red').save(p, save_all=True, append_images=[_frame('blue')]),
+    'still.tif': lambda p: _frame('red').save(p),
+    'pages.tif': lambda p: _frame('red').save(p, save_all=True,
+                                              append_images=[_frame('blue'), _frame('green')]),
+}
+
+
+class TestProbeMatchesPillow:
+    """The probe reports exactly what Pillow would, without Pillow plugins."""
+
+    @pytest.mark.parametrize('name', sorted(SAMPLES))
+    def test_format(self, name, temp_dir):
+        path = temp_dir / name
+        SAMPLES[name](path)
+        assert probe_image_header(path) == _pillow_view(path)
+
+    @pytest.mark.parametrize('name', ['still.heic', 'exif.heic', 'multi.heic'])
+    def test_heif(self, name, temp_dir):
+        pillow_heif = pytest.importorskip('pillow_heif')
+        if not pillow_heif.libheif_info().get('HEIF'):
+            pytest.skip('No HEIF encoder available')
+        path = temp_dir / name
+        if name == 'exif.heic':
+            _frame('red').save(path, exif=_exif_bytes())
+        elif name == 'multi.heic':
+            _frame('red').save(path, save_all=True, append_images=[_frame('blue')])
+        else:
+            _frame('red').save(path)
+        assert probe_image_header(path) == _pillow_view(path)
+
+    def test_mpo_fixture(self, sample_mpo_image):
+        assert probe_image_header(sample_mpo_image) == _pillow_view(sample_mpo_image)
+
+    def test_exif_fixture(self, sample_image_with_exif):
+        assert probe_image_header(sample_image_with_exif) == _pillow_view(sample_image_with_exif)
+
+
+class TestProbeFallback:
+    """Anything the probe does not model returns None (Pillow is used instead)."""
+
+    def test_not_an_image(self, temp_dir):
+        path = temp_dir / 'notes.txt'
+        path.write_text('hello')
+        assert probe_image_header(path) is None
+
+    def test_missing_file(self, temp_dir):
+        assert probe_image_header(temp_dir / 'missing.jpg') is None
+
+    def test_truncated_jpeg(self, temp_dir):
+        path = temp_dir / 'cut.jpg'
+        _frame('red').save(path, exif=_exif_bytes())
+        path.write_bytes(path.read_bytes()[:40])
+        assert probe_image_header(path) is None
+
+    def test_oversized_dimensions(self, temp_dir):
+        """Images past the pixel limit are left to Pillow's bomb check."""
+        ihdr = struct.pack('>IIBBBBB', 50000, 50000, 8, 2, 0, 0, 0)
+        chunk = struct.pack('>I', len(ihdr)) + b'IHDR' + ihdr + struct.pack(
+            '>I', zlib.crc32(b'IHDR' + ihdr))
+        path = temp_dir / 'huge.png'
+        path.write_bytes(b'\x89PNG\r\n\x1a\n' + chunk + b'\x00\x00\x00\x00IEND\xaeB`\x82')
+        assert probe_image_header(path) is None
+
+    def test_tiff_transposing_orientation(self, temp_dir):
+        path = temp_dir / 'rotated.tif'
+        _frame('red').save(path, exif=_exif_bytes())
+        assert probe_image_header(path) is None
+
+
+class TestInfoUsesProbe:
+    """info takes its metadata from the probe when one is available."""
+
+    def test_info_png_without_pillow(self, temp_dir, monkeypatch, capsys):
+        path = temp_dir / 'exif.png'
+        SAMPLES['exif.png'](path)
+
+        def fail_open(*args, **kwargs):
+            raise AssertionError('Pillow should not be used')
+
+        monkeypatch.setattr(ipro.Image, 'open', fail_open)
+        ipro.cmd_info(argparse.Namespace(file=str(path), json=False, short=True,
+                                         exif=False, exif_all=False))
+        assert capsys.readouterr().out.startswith('exif.png,PNG,1,320,240,')
+
+    def test_info_falls_back_to_pillow(self, temp_dir, capsys):
+        path = temp_dir / 'rotated.tif'
+        _frame('red').save(path, exif=_exif_bytes())
+        ipro.cmd_info(argparse.Namespace(file=str(path), json=False, short=True,
+                                         exif=False, exif_all=False))
+        assert capsys.readouterr().out.startswith('rotated.tif,TIFF,1,')
@@ -0,0 +1,248 @@
+"""Tests for the http command (variant rendering, cache, single-flight, ETags)."""
+
+import http.client
+import io
+import os
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+import ipro
+from ipro import (
+    SingleFlight,
+    VariantCache,
+    VariantService,
+    create_http_server,
+    render_variant,
+)
+
+
+@pytest.fixture
+def root(temp_dir):
+    """An image root with a JPEG and a PNG."""
+    root = temp_dir / 'root'
+    (root / 'photos').mkdir(parents=True)
+    Image.new('RGB', (1200, 800), (20, 120, 220)).save(root / 'photos' / 'a.jpg', quality=90)
+    Image.new('RGBA', (400, 400), (0, 0, 0, 0)).save(root / 'logo.png')
+    return root
+
+
+@pytest.fixture
+def service(root, temp_dir):
+    return VariantService(root, VariantCache(temp_dir / 'cache'))
+
+
+def _image(data):
+    return Image.open(io.BytesIO(data))
+
+
+class TestRenderVariant:
+    """Test render_variant()."""
+
+    def test_resize_and_convert(self, root):
+        result = render_variant(root / 'photos' / 'a.jpg', width=300, format='webp', quality=70)
+        assert (result['format'], result['width'], result['height']) == ('WEBP', 300, 200)
+        with _image(result['data']) as img:
+            assert (img.format, img.size) == ('WEBP', (300, 200))
+
+    def test_keeps_source_format_and_never_upscales(self, root):
+        result = render_variant(root / 'logo.png', height=1000)
+        assert (result['format'], result['width'], result['height']) == ('PNG', 400, 400)
+
+    def test_width_and_height_exclusive(self, root):
+        with pytest.raises(ipro.InvalidOptionsError):
+            render_variant(root / 'logo.png', width=10, height=10)
+
+
+class TestSingleFlight:
+    """Test collapsing of concurrent calls."""
+
+    def test_concurrent_callers_share_one_call(self):
+        flights = SingleFlight()
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def work():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'result'
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flights.do('k', work)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flights.do('k', work)))
+                     for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+
+        assert len(calls) == 1
+        assert sorted(results) == [('result', False)] * 3 + [('result', True)]
+
+    def test_errors_are_shared_and_not_cached(self):
+        flights = SingleFlight()
+        with pytest.raises(ValueError):
+            flights.do('k', lambda: (_ for _ in ()).throw(ValueError('boom')))
+        assert flights.do('k', lambda: 42) == (42, True)
+
+
+class TestVariantCache:
+    """Test the on-disk LRU cache."""
+
+    def test_evicts_least_recently_used(self, temp_dir):
+        cache = VariantCache(temp_dir / 'cache', max_bytes=250)
+        cache.put('aa' * 32, b'a' * 100, '.jpg')
+        cache.put('bb' * 32, b'b' * 100, '.jpg')
+        assert cache.get('aa' * 32) == b'a' * 100   # 'bb' is now least recently used
+        cache.put('cc' * 32, b'c' * 100, '.jpg')
+
+        assert cache.get('bb' * 32) is None
+        assert cache.get('aa' * 32) is not None and cache.get('cc' * 32) is not None
+        assert cache.total_bytes == 200
+        assert not list((temp_dir / 'cache').glob('bb/*'))
+
+    def test_index_survives_restart(self, temp_dir):
+        cache = VariantCache(temp_dir / 'cache')
+        cache.put('ab' * 32, b'data', '.png')
+        (temp_dir / 'cache' / 'ab' / '.tmp-partial').write_bytes(b'x')
+
+        reopened = VariantCache(temp_dir / 'cache')
+        assert reopened.get('ab' * 32) == b'data'
+        assert len(reopened) == 1 and reopened.total_bytes == 4
+        assert not (temp_dir / 'cache' / 'ab' / '.tmp-partial').exists()
+
+    def test_missing_file_is_a_miss(self, temp_dir):
+        cache = VariantCache(temp_dir / 'cache')
+        cache.put('cd' * 32, b'data', '.jpg')
+        next((temp_dir / 'cache' / 'cd').iterdir()).unlink()
+        assert cache.get('cd' * 32) is None
+        assert len(cache) == 0
+
+
+class TestVariantService:
+    """Test request handling in-process."""
+
+    def test_miss_then_hit(self, service):
+        status, headers, body = service.handle('GET', '/w/300/q/80/f/webp/photos/a.jpg')
+        assert status == 200
+        assert headers['X-Ipro-Cache'] == 'miss'
+        assert headers['Content-Type'] == 'image/webp'
+        assert headers['Content-Length'] == str(len(body))
+        with _image(body) as img:
+            assert img.size == (300, 200)
+
+        status, again, cached = service.handle('GET', '/f/webp/q/80/w/300/photos/a.jpg')
+        assert (status, again['X-Ipro-Cache'], again['ETag']) == (200, 'hit', headers['ETag'])
+        assert cached == body
+
+    def test_conditional_get(self, service):
+        _, headers, _ = service.handle('GET', '/h/100/photos/a.jpg')
+        etag = headers['ETag']
+        for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            status, response, body = service.handle('GET', '/h/100/photos/a.jpg',
+                                                    {'If-None-Match': header})
+            assert (status, body, response['ETag']) == (304, b'', etag)
+        status, _, _ = service.handle('GET', '/h/100/photos/a.jpg', {'If-None-Match': '"x"'})
+        assert status == 200
+
+    def test_changed_source_gets_new_etag(self, service, root):
+        _, before, _ = service.handle('GET', '/w/100/photos/a.jpg')
+        source = root / 'photos' / 'a.jpg'
+        Image.new('RGB', (1200, 800), (200, 0, 0)).save(source)
+        os.utime(source, ns=(0, 10**9))
+        _, after, _ = service.handle('GET', '/w/100/photos/a.jpg')
+        assert after['ETag'] != before['ETag']
+        assert after['X-Ipro-Cache'] == 'miss'
+
+    def test_head(self, service):
+        status, headers, body = service.handle('HEAD', '/photos/a.jpg')
+        assert status == 200 and body == b''
+        assert int(headers['Content-Length']) > 0
+
+    @pytest.mark.parametrize('method,path,expected', [
+        ('GET', '/w/abc/photos/a.jpg', 400),
+        ('GET', '/w/0/photos/a.jpg', 400),
+        ('GET', '/w/100/h/100/photos/a.jpg', 400),
+        ('GET', '/f/gif/photos/a.jpg', 400),
+        ('GET', '/photos/../photos/a.jpg', 400),
+        ('GET', '/photos/missing.jpg', 404),
+        ('GET', '/photos', 404),
+        ('GET', '/notes.txt', 415),
+        ('POST', '/photos/a.jpg', 405),
+    ])
+    def test_errors(self, service, root, method, path, expected):
+        (root / 'notes.txt').write_text('not an image')
+        status, headers, _ = service.handle(method, path)
+        assert status == expected
+        assert 'ETag' not in headers
+
+    def test_symlink_out_of_root(self, service, root, temp_dir, sample_square_image):
+        (root / 'escape.jpg').symlink_to(sample_square_image)
+        status, _, _ = service.handle('GET', '/escape.jpg')
+        assert status == 404
+
+    def test_concurrent_requests_render_once(self, service, monkeypatch):
+        calls = []
+        original = ipro.render_variant
+
+        def slow_render(*args, **kwargs):
+            calls.append(1)
+            time.sleep(0.2)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(ipro, 'render_variant', slow_render)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            service.handle('GET', '/w/200/f/png/photos/a.jpg'))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert {status for status, _, _ in results} == {200}
+        assert sorted(h['X-Ipro-Cache'] for _, h, _ in results) == ['miss'] + ['shared'] * 3
+        assert len({body for _, _, body in results}) == 1
+
+
+class TestHttpServer:
+    """Test the service over a real socket."""
+
+    def test_get_and_revalidate(self, service):
+        server = create_http_server(service, port=0, quiet=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            connection = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+            connection.request('GET', '/w/120/f/jpeg/photos/a.jpg')
+            response = connection.getresponse()
+            body = response.read()
+            assert response.status == 200
+            assert response.getheader('Content-Type') == 'image/jpeg'
+            with _image(body) as img:
+                assert img.size == (120, 80)
+
+            connection.request('GET', '/w/120/f/jpeg/photos/a.jpg',
+                               headers={'If-None-Match': response.getheader('ETag')})
+            revalidated = connection.getresponse()
+            assert revalidated.status == 304
+            assert revalidated.read() == b''
+
+            # Weak validators (as caches send them) match too
+            connection.request('GET', '/w/120/f/jpeg/photos/a.jpg',
+                               headers={'If-None-Match': 'W/' + response.getheader('ETag')})
+            weak = connection.getresponse()
+            assert weak.status == 304
+            assert weak.read() == b''
+            connection.close()
+        finally:
+            server.shutdown()
+            server.server_close()
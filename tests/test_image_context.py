@@ -0,0 +1,105 @@
+"""Unit tests for ImageContext and single-open command handling."""
+import argparse
+import pytest
+from PIL import Image
+
+import ipro
+from ipro import ImageContext, get_image_info, get_image_format, extract_exif_data
+
+
+@pytest.fixture
+def count_opens(monkeypatch):
+    """Count calls to Image.open made through ipro."""
+    calls = []
+    original_open = Image.open
+
+    def counting_open(*args, **kwargs):
+        calls.append(args[0] if args else None)
+        return original_open(*args, **kwargs)
+
+    monkeypatch.setattr(ipro.Image, 'open', counting_open)
+    return calls
+
+
+class TestImageContext:
+    """Tests for the ImageContext probe cache."""
+
+    def test_probes_image(self, sample_image_with_exif):
+        """Format, size, frames and EXIF are exposed from one handle."""
+        with ImageContext(sample_image_with_exif) as ctx:
+            assert ctx.format == 'JPEG'
+            assert ctx.size == (1200, 900)
+            assert ctx.n_frames == 1
+            assert ctx.exif_dict['Make'] == 'Canon'
+            assert ctx.icc_profile is None
+
+    def test_opens_once(self, sample_image_with_exif, count_opens):
+        """Repeated probes reuse the same open image."""
+        with ImageContext(sample_image_with_exif) as ctx:
+            ctx.format, ctx.size, ctx.n_frames, ctx.exif_dict
+            ctx.format, ctx.size
+        assert len(count_opens) == 1
+
+    def test_size_recorded_before_draft(self, temp_dir):
+        """size reports the original dimensions even after draft decoding."""
+        path = temp_dir / 'big.jpg'
+        Image.new('RGB', (4000, 3000)).save(path, 'JPEG')
+        with ImageContext(path) as ctx:
+            assert ctx.size == (4000, 3000)
+            ipro.apply_jpeg_draft(ctx.image, (300, 225))
+            assert ctx.size == (4000, 3000)
+
+    def test_unreadable_file(self, sample_non_image_file):
+        """format is None for unreadable files; image re-raises the error."""
+        with ImageContext(sample_non_image_file) as ctx:
+            assert ctx.format is None
+            assert ctx.exif_dict is None
+            with pytest.raises(Exception):
+                ctx.image
+
+    def test_close(self, sample_square_image):
+        """close() releases the image and is safe to call twice."""
+        ctx = ImageContext(sample_square_image)
+        img = ctx.image
+        ctx.close()
+        ctx.close()
+        assert img.fp is None
+
+    def test_helpers_accept_context(self, sample_image_with_exif):
+        """Path helpers reuse a supplied context."""
+        with ImageContext(sample_image_with_exif) as ctx:
+            assert get_image_format(sample_image_with_exif, context=ctx) == 'JPEG'
+            assert extract_exif_data(sample_image_with_exif, context=ctx)['Make'] == 'Canon'
+            assert get_image_info(sample_image_with_exif, context=ctx)['width'] == 1200
+
+
+class TestCommandsOpenOnce:
+    """Each command opens its input exactly once."""
+
+    def test_info(self, sample_image_with_exif, count_opens, capsys):
+        """info reads a JPEG's headers directly and never opens it with Pillow."""
+        ipro.cmd_info(argparse.Namespace(file=str(sample_image_with_exif), json=True,
+                                         short=False, exif=False, exif_all=False))
+        assert len(count_opens) == 0
+
+    def test_resize(self, sample_landscape_image, temp_dir, count_opens, capsys):
+        ipro.cmd_resize(argparse.Namespace(file=str(sample_landscape_image), width='300,600',
+                                           height=None, output=str(temp_dir / 'out'),
+                                           quality=90))
+        assert len(count_opens) == 1
+
+    def test_convert(self, sample_image_with_exif, temp_dir, count_opens, capsys):
+        ipro.cmd_convert(argparse.Namespace(file=str(sample_image_with_exif), format='webp',
+                                            output=str(temp_dir / 'out'), quality=80,
+                                            strip_exif=False))
+        assert len(count_opens) == 1
+
+    def test_rename(self, sample_image_with_exif, temp_dir, count_opens, capsys):
+        ipro.cmd_rename(argparse.Namespace(file=str(sample_image_with_exif), ext=True,
+                                           prefix_exif_date=True, output=str(temp_dir / 'out')))
+        assert len(count_opens) == 1
+
+    def test_extract(self, sample_mpo_image, temp_dir, count_opens, capsys):
+        ipro.cmd_extract(argparse.Namespace(file=str(sample_mpo_image),
+                                            output=str(temp_dir / 'out')))
+        assert len(count_opens) == 1
@@ -0,0 +1,224 @@
+"""Tests for incremental builds (--incremental, --content-hash, --prune)."""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+import ipro
+from ipro import Manifest, MANIFEST_NAME
+
+
+IMGPRO = str(Path(__file__).parent.parent / 'ipro.py')
+
+
+def run_ipro(*args, cwd=None):
+    """Run ipro as a subprocess and return (exit_code, stdout, stderr)."""
+    cmd = [sys.executable, IMGPRO] + list(args)
+    result = subprocess.run(cmd, capture_output=True, text=True, cwd=cwd)
+    return result.returncode, result.stdout, result.stderr
+
+
+@pytest.fixture
+def photo_dir(temp_dir):
+    """A directory with three 800x600 JPEGs."""
+    source = temp_dir / 'photos'
+    source.mkdir()
+    for index in range(3):
+        Image.new('RGB', (800, 600), (index * 60, 90, 30)).save(source / f'p{index}.jpg')
+    return source
+
+
+def _bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+
+
+class TestManifest:
+    """Test the manifest record and lookup logic."""
+
+    OPTIONS = {'format': 'png', 'quality': None, 'strip_exif': False}
+
+    def _record(self, manifest, source, output_dir, names=('out.png',)):
+        outputs = [output_dir / name for name in names]
+        for path in outputs:
+            path.write_bytes(b'x')
+        return manifest.record(source, 'convert', self.OPTIONS, outputs)
+
+    def test_lookup_without_manifest_creates_nothing(self, sample_square_image, temp_dir):
+        output_dir = temp_dir / 'out'
+        with Manifest(output_dir) as manifest:
+            assert manifest.current_outputs(sample_square_image, 'convert', self.OPTIONS) is None
+        assert not output_dir.exists()
+
+    def test_recorded_run_is_current(self, sample_square_image, temp_dir):
+        with Manifest(temp_dir) as manifest:
+            self._record(manifest, sample_square_image, temp_dir)
+            assert manifest.current_outputs(sample_square_image, 'convert', self.OPTIONS) == \
+                [str(temp_dir / 'out.png')]
+        assert (temp_dir / MANIFEST_NAME).exists()
+
+    def test_changes_invalidate(self, sample_square_image, temp_dir, monkeypatch):
+        with Manifest(temp_dir) as manifest:
+            self._record(manifest, sample_square_image, temp_dir)
+            assert manifest.current_outputs(sample_square_image, 'convert',
+                                            dict(self.OPTIONS, quality=50)) is None
+            assert manifest.current_outputs(sample_square_image, 'resize', self.OPTIONS) is None
+
+            monkeypatch.setattr(ipro, '__version__', '99.0.0')
+            assert manifest.current_outputs(sample_square_image, 'convert', self.OPTIONS) is None
+            monkeypatch.undo()
+
+            (temp_dir / 'out.png').unlink()
+            assert manifest.current_outputs(sample_square_image, 'convert', self.OPTIONS) is None
+
+    def test_touched_input_needs_content_hash(self, sample_square_image, temp_dir):
+        with Manifest(temp_dir) as manifest:
+            outputs = [temp_dir / 'out.png']
+            outputs[0].write_bytes(b'x')
+            manifest.record(sample_square_image, 'convert', self.OPTIONS, outputs,
+                            content_hash=True)
+            _bump_mtime(sample_square_image)
+            assert manifest.current_outputs(sample_square_image, 'convert', self.OPTIONS) is None
+            assert manifest.current_outputs(sample_square_image, 'convert', self.OPTIONS,
+                                            content_hash=True) is not None
+            # The new mtime was recorded, so a plain check passes again
+            assert manifest.current_outputs(sample_square_image, 'convert', self.OPTIONS) is not None
+
+    def test_record_returns_outputs_no_longer_produced(self, sample_square_image, temp_dir):
+        with Manifest(temp_dir) as manifest:
+            self._record(manifest, sample_square_image, temp_dir, ('a.png', 'b.png'))
+            stale = self._record(manifest, sample_square_image, temp_dir, ('a.png',))
+        assert stale == [temp_dir / 'b.png']
+
+    def test_orphans(self, temp_dir):
+        source = temp_dir / 'gone.jpg'
+        Image.new('RGB', (10, 10)).save(source)
+        with Manifest(temp_dir / 'out') as manifest:
+            (temp_dir / 'out').mkdir()
+            self._record(manifest, source, temp_dir / 'out')
+            assert manifest.orphans() == []
+            source.unlink()
+            [(input_name, command, outputs)] = manifest.orphans()
+            assert input_name == str(source.resolve())
+            assert outputs == [temp_dir / 'out' / 'out.png']
+            manifest.forget(input_name, command)
+            assert manifest.orphans() == []
+
+    def test_claimed_outputs(self, temp_dir):
+        first, second = temp_dir / 'a.jpg', temp_dir / 'a.png'
+        Image.new('RGB', (10, 10)).save(first)
+        Image.new('RGB', (10, 10)).save(second)
+        with Manifest(temp_dir / 'out') as manifest:
+            assert manifest.claimed_outputs(second, 'convert', ['out.png']) == []
+            (temp_dir / 'out').mkdir()
+            self._record(manifest, first, temp_dir / 'out')
+            assert manifest.claimed_outputs(first, 'convert', ['out.png']) == []
+            assert manifest.claimed_outputs(second, 'convert', ['out.png']) == \
+                [('out.png', str(first.resolve()))]
+            assert manifest.claimed_outputs(second, 'convert', ['other.png']) == []
+            first.unlink()
+            assert manifest.claimed_outputs(second, 'convert', ['out.png']) == []
+
+
+class TestIncrementalCLI:
+    """Test --incremental, --content-hash and --prune on the command line."""
+
+    def test_second_run_skips_everything(self, photo_dir):
+        code, stdout, _ = run_ipro('resize', str(photo_dir), '--width', '300,500', '--incremental')
+        assert code == 0
+        assert stdout.count('✓ Created') == 6
+
+        code, stdout, _ = run_ipro('resize', str(photo_dir), '--width', '300,500', '--incremental')
+        assert code == 0
+        assert stdout.count('Up to date:') == 3
+        assert 'Created' not in stdout
+
+    def test_changed_input_is_redone(self, photo_dir):
+        run_ipro('convert', str(photo_dir), '--format', 'png', '--incremental')
+        Image.new('RGB', (800, 600), (255, 255, 255)).save(photo_dir / 'p1.jpg')
+        _bump_mtime(photo_dir / 'p1.jpg')
+
+        code, stdout, _ = run_ipro('convert', str(photo_dir), '--format', 'png', '--incremental')
+        assert code == 0
+        assert stdout.count('Up to date:') == 2
+        assert 'converted/p1.png' in stdout
+
+    def test_content_hash_skips_touched_files(self, photo_dir):
+        run_ipro('convert', str(photo_dir), '--format', 'png', '--content-hash')
+        _bump_mtime(photo_dir / 'p0.jpg')
+
+        code, stdout, _ = run_ipro('convert', str(photo_dir), '--format', 'png', '--content-hash')
+        assert code == 0
+        assert stdout.count('Up to date:') == 3
+
+    def test_changed_options_report_and_prune(self, photo_dir):
+        out_dir = photo_dir.parent / 'out'
+        run_ipro('resize', str(photo_dir / 'p0.jpg'), '--width', '300,500',
+                 '--output', str(out_dir), '--incremental')
+
+        code, _, stderr = run_ipro('resize', str(photo_dir / 'p0.jpg'), '--width', '300',
+                                   '--output', str(out_dir), '--incremental')
+        assert code == 0
+        assert f"Stale: {out_dir / 'p0_500.jpg'}" in stderr
+        assert (out_dir / 'p0_500.jpg').exists()
+
+        code, _, stderr = run_ipro('resize', str(photo_dir / 'p0.jpg'), '--width', '300,400',
+                                   '--output', str(out_dir), '--prune')
+        assert code == 0
+        assert not (out_dir / 'p0_500.jpg').exists()
+        assert (out_dir / 'p0_300.jpg').exists()
+
+    def test_removed_inputs_reported_once_and_pruned(self, photo_dir):
+        run_ipro('convert', str(photo_dir), '--format', 'png', '--incremental', '--jobs', '2')
+        (photo_dir / 'p2.jpg').unlink()
+
+        code, _, stderr = run_ipro('convert', str(photo_dir), '--format', 'png',
+                                   '--incremental', '--jobs', '2')
+        assert code == 0
+        assert stderr.count('Stale:') == 1
+        assert (photo_dir / 'converted' / 'p2.png').exists()
+
+        code, _, stderr = run_ipro('convert', str(photo_dir), '--format', 'png', '--prune')
+        assert code == 0
+        assert 'Pruned:' in stderr
+        assert not (photo_dir / 'converted' / 'p2.png').exists()
+
+        code, _, stderr = run_ipro('convert', str(photo_dir), '--format', 'png', '--prune')
+        assert 'Pruned:' not in stderr
+
+    def test_max_memory_change_is_redone(self, photo_dir):
+        source = photo_dir / 'p0.jpg'
+        run_ipro('resize', str(source), '--width', '300', '--incremental')
+
+        code, stdout, _ = run_ipro('resize', str(source), '--width', '300', '--incremental',
+                                   '--max-memory', '100M')
+        assert code == 0
+        assert 'Up to date:' not in stdout
+        assert 'Created' in stdout
+
+    def test_shared_output_name_refused(self, photo_dir):
+        Image.new('RGB', (80, 60)).save(photo_dir / 'p0.png')
+
+        code, stdout, stderr = run_ipro('convert', str(photo_dir), '--format', 'webp',
+                                        '--incremental')
+        assert code == ipro.EXIT_INVALID_ARGS
+        assert 'p0.jpg and' in stderr and 'p0.png would both write' in stderr
+        assert 'Created' not in stdout
+        assert not (photo_dir / 'converted').exists()
+
+    def test_output_of_another_input_refused(self, photo_dir):
+        run_ipro('convert', str(photo_dir / 'p0.jpg'), '--format', 'webp', '--incremental')
+        Image.new('RGB', (80, 60)).save(photo_dir / 'p0.png')
+
+        code, _, stderr = run_ipro('convert', str(photo_dir / 'p0.png'), '--format', 'webp',
+                                   '--incremental')
+        assert code == ipro.EXIT_INVALID_ARGS
+        assert f"is already the output of {(photo_dir / 'p0.jpg').resolve()}" in stderr
+
+    def test_without_flag_no_manifest(self, photo_dir):
+        run_ipro('convert', str(photo_dir), '--format', 'png')
+        assert not (photo_dir / 'converted' / MANIFEST_NAME).exists()
@@ -0,0 +1,149 @@
+"""Tests for resumable batches (--journal, --resume)."""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from ipro import BatchJournal, journal_options
+
+
+IMGPRO = str(Path(__file__).parent.parent / 'ipro.py')
+
+
+def run_ipro(*args, cwd=None):
+    """Run ipro as a subprocess and return (exit_code, stdout, stderr)."""
+    cmd = [sys.executable, IMGPRO] + list(args)
+    result = subprocess.run(cmd, capture_output=True, text=True, cwd=cwd)
+    return result.returncode, result.stdout, result.stderr
+
+
+@pytest.fixture
+def photo_dir(temp_dir):
+    """A directory with four 800x600 JPEGs."""
+    source = temp_dir / 'photos'
+    source.mkdir()
+    for index in range(4):
+        Image.new('RGB', (800, 600), (index * 60, 90, 30)).save(source / f'p{index}.jpg')
+    return source
+
+
+def _args(**options):
+    values = {'command': 'convert', 'file': 'x.jpg', 'jobs': 4, 'format': 'png',
+              'quality': None, 'strip_exif': False, 'output': None}
+    values.update(options)
+    return argparse.Namespace(**values)
+
+
+def _records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+class TestBatchJournal:
+    """Test recording and looking up finished inputs."""
+
+    def test_record_and_complete(self, temp_dir, sample_landscape_image):
+        output = temp_dir / 'out.png'
+        output.write_bytes(b'png data')
+        with BatchJournal(temp_dir / 'j.jsonl', _args()) as journal:
+            journal.record(sample_landscape_image, [output])
+
+        record, = _records(temp_dir / 'j.jsonl')
+        assert record['input'] == str(sample_landscape_image.resolve())
+        assert record['outputs'][0]['size'] == 8
+        assert len(record['outputs'][0]['sha256']) == 64
+
+        reopened = BatchJournal(temp_dir / 'j.jsonl', _args(jobs=1))
+        assert reopened.completed(sample_landscape_image) == [str(output.resolve())]
+        assert BatchJournal(temp_dir / 'j.jsonl', _args(quality=50)).completed(
+            sample_landscape_image) is None
+
+    def test_changed_input_or_output_is_redone(self, temp_dir, sample_landscape_image):
+        output = temp_dir / 'out.png'
+        output.write_bytes(b'png data')
+        with BatchJournal(temp_dir / 'j.jsonl', _args()) as journal:
+            journal.record(sample_landscape_image, [output])
+
+        output.write_bytes(b'torn')
+        assert BatchJournal(temp_dir / 'j.jsonl', _args()).completed(
+            sample_landscape_image) is None
+        output.write_bytes(b'png data')
+        stat = os.stat(sample_landscape_image)
+        os.utime(sample_landscape_image, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert BatchJournal(temp_dir / 'j.jsonl', _args()).completed(
+            sample_landscape_image) is None
+
+    def test_torn_last_line(self, temp_dir, sample_landscape_image, sample_png_image):
+        with BatchJournal(temp_dir / 'j.jsonl', _args()) as journal:
+            journal.record(sample_landscape_image, [])
+        with open(temp_dir / 'j.jsonl', 'a') as f:
+            f.write('{"journal": 1, "comm')
+
+        with BatchJournal(temp_dir / 'j.jsonl', _args()) as journal:
+            assert journal.completed(sample_landscape_image) == []
+            journal.record(sample_png_image, [])
+        lines = (temp_dir / 'j.jsonl').read_text().splitlines()
+        assert len(lines) == 3
+        assert json.loads(lines[2])['input'] == str(sample_png_image.resolve())
+
+    def test_renamed_output_counts_as_done(self, temp_dir):
+        renamed = temp_dir / 'renamed.jpg'
+        renamed.write_bytes(b'jpeg')
+        args = argparse.Namespace(command='rename', file='x', ext=True, prefix_exif_date=False)
+        with BatchJournal(temp_dir / 'j.jsonl', args) as journal:
+            journal.record(temp_dir / 'gone.jpeg', [renamed])
+        assert BatchJournal(temp_dir / 'j.jsonl', args).completed(renamed) == \
+            [str(renamed.resolve())]
+
+    def test_options_ignore_run_settings(self):
+        options = journal_options(_args(recursive=True, memory_budget=1 << 30, threads=4))
+        assert options == {'format': 'png', 'output': None, 'quality': None,
+                           'strip_exif': False}
+
+
+class TestResumeCLI:
+    """Test --journal and --resume on real batches."""
+
+    def test_resume_redoes_only_unfinished(self, photo_dir, temp_dir):
+        journal = temp_dir / 'batch.jsonl'
+        code, _, stderr = run_ipro('convert', str(photo_dir), '-f', 'png', '-o',
+                                   str(temp_dir / 'out'), '--journal', str(journal))
+        assert code == 0, stderr
+        assert len(_records(journal)) == 4
+
+        # Simulate a batch that died after two items: drop the last records
+        lines = journal.read_text().splitlines(keepends=True)
+        journal.write_text(''.join(lines[:2]) + lines[2][:40])
+        (temp_dir / 'out' / 'p1.png').unlink()
+
+        code, stdout, stderr = run_ipro('convert', str(photo_dir), '-f', 'png', '-o',
+                                        str(temp_dir / 'out'), '--journal', str(journal),
+                                        '--resume', '-j', '2')
+        assert code == 0, stderr
+        assert 'Resuming: 1 of 4 file(s) already done' in stderr
+        assert 'p0' not in stdout
+        assert sorted(p.name for p in (temp_dir / 'out').iterdir()) == \
+            ['p0.png', 'p1.png', 'p2.png', 'p3.png']
+
+    def test_single_file_is_journaled(self, sample_landscape_image, temp_dir):
+        journal = temp_dir / 'one.jsonl'
+        code, _, _ = run_ipro('resize', str(sample_landscape_image), '--width', '100',
+                              '-o', str(temp_dir / 'out'), '--journal', str(journal))
+        assert code == 0
+        assert len(_records(journal)) == 1
+
+    @pytest.mark.parametrize('args', [
+        ['resize', 'x.jpg', '--width', '100', '--resume'],
+        ['resize', 'x.jpg', '--width', '100', '--journal', 'j.jsonl', '+', 'convert', '-f',
+         'png'],
+    ])
+    def test_invalid(self, args, temp_dir):
+        Image.new('RGB', (200, 100)).save(temp_dir / 'x.jpg')
+        code, _, stderr = run_ipro(*args, cwd=temp_dir)
+        assert code == 2
+        assert '--resume' in stderr or '--journal' in stderr
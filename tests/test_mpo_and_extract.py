@@ -240,3 +240,81 @@ class TestExtractEdgeCases:
         )
         assert exit_code == 0
         assert out_dir.exists()
+
+
+class TestExtractLosslessMPO:
+    """MPO frames are copied out byte for byte instead of re-encoded."""
+
+    @pytest.fixture
+    def mpo_with_exif(self, temp_dir):
+        """A 2-frame MPO whose first frame carries EXIF with GPS."""
+        exif = Image.Exif()
+        exif[0x010F] = 'StereoCam'
+        exif[0x8825] = {1: 'N', 2: (51.0, 30.0, 0.0)}
+        path = temp_dir / 'camera.mpo'
+        Image.new('RGB', (320, 240), (200, 40, 40)).save(
+            path, format='MPO', save_all=True, exif=exif.tobytes(),
+            append_images=[Image.new('RGB', (320, 240), (40, 40, 200))])
+        return path
+
+    def test_frames_are_pixel_identical(self, sample_mpo_image, temp_dir):
+        """Each extracted frame decodes to exactly the source frame."""
+        from ipro import extract_frames
+        created = extract_frames(sample_mpo_image, temp_dir / 'frames')
+        with Image.open(sample_mpo_image) as source:
+            for index, info in enumerate(created):
+                source.seek(index)
+                with Image.open(info['path']) as frame:
+                    assert frame.tobytes() == source.convert('RGB').tobytes()
+
+    def test_compressed_data_is_copied(self, sample_mpo_image, temp_dir):
+        """The entropy-coded data of each frame appears verbatim in the source."""
+        from ipro import extract_frames, _jpeg_header_segments
+        source = sample_mpo_image.read_bytes()
+        for info in extract_frames(sample_mpo_image, temp_dir / 'frames'):
+            data = info['path'].read_bytes()
+            _, scan_start = _jpeg_header_segments(data)
+            assert data[scan_start:] in source
+
+    def test_frames_are_plain_jpegs(self, sample_mpo_image, temp_dir):
+        """Extracted frames no longer carry the MP index of the container."""
+        from ipro import extract_frames
+        for info in extract_frames(sample_mpo_image, temp_dir / 'frames'):
+            with Image.open(info['path']) as frame:
+                assert frame.format == 'JPEG'
+                assert getattr(frame, 'n_frames', 1) == 1
+
+    def test_metadata_removed(self, mpo_with_exif, temp_dir):
+        """EXIF (including GPS) is dropped, as with decoded frames."""
+        from ipro import extract_frames
+        created = extract_frames(mpo_with_exif, temp_dir / 'frames')
+        assert len(created) == 2
+        with Image.open(created[0]['path']) as frame:
+            assert not frame.getexif()
+        assert created[0]['width'] == 320
+        assert created[0]['height'] == 240
+
+    def test_corrupt_index_falls_back_to_decoding(self, sample_mpo_image, temp_dir, monkeypatch):
+        """If the MP index can't be used, frames are decoded as before."""
+        import ipro
+
+        def broken_index(data):
+            raise ValueError("corrupt")
+
+        monkeypatch.setattr(ipro, 'split_mpo_frames', broken_index)
+        created = ipro.extract_frames(sample_mpo_image, temp_dir / 'frames')
+        assert [info['filename'] for info in created] == ['stereo_001.jpg', 'stereo_002.jpg']
+
+    def test_split_rejects_plain_jpeg(self, sample_square_image):
+        """A JPEG without an MP index is not split."""
+        from ipro import split_mpo_frames
+        with pytest.raises(ValueError):
+            split_mpo_frames(sample_square_image.read_bytes())
+
+    def test_split_rejects_out_of_range_offset(self, sample_mpo_image):
+        """An index pointing past the end of the file is corrupt."""
+        from ipro import split_mpo_frames
+        data = sample_mpo_image.read_bytes()
+        cut = len(data) - 100
+        with pytest.raises(ValueError):
+            split_mpo_frames(data[:cut])
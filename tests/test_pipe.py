@@ -0,0 +1,153 @@
+"""Tests for pipe mode (stdin input and stdout output with '-')."""
+
+import io
+import json
+import subprocess
+import sys
+import tarfile
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from ipro import stdin_source, write_pipe_outputs
+
+
+IMGPRO = str(Path(__file__).parent.parent / 'ipro.py')
+
+
+def run_ipro(*args, stdin=b'', cwd=None):
+    """Run ipro as a subprocess with bytes on stdin; return (exit_code, stdout bytes, stderr)."""
+    cmd = [sys.executable, IMGPRO] + list(args)
+    result = subprocess.run(cmd, input=stdin, capture_output=True, cwd=cwd)
+    return result.returncode, result.stdout, result.stderr.decode()
+
+
+def _jpeg(size=(1200, 800)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (20, 120, 220)).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def _tar_members(data):
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        return {member.name: tar.extractfile(member).read() for member in tar}
+
+
+class TestStdinSource:
+    """Test reading and spooling stdin."""
+
+    def test_small_input_stays_in_memory(self):
+        with stdin_source(io.BytesIO(b'abc'), threshold=10) as source:
+            assert source == b'abc'
+
+    def test_large_input_is_spooled_and_removed(self):
+        data = b'x' * 100
+        with stdin_source(io.BytesIO(data), threshold=10) as source:
+            assert isinstance(source, Path)
+            assert source.read_bytes() == data
+        assert not source.exists()
+
+    def test_empty_input(self):
+        with pytest.raises(SystemExit) as excinfo:
+            with stdin_source(io.BytesIO(b'')):
+                pass
+        assert excinfo.value.code == 2
+
+
+class TestWritePipeOutputs:
+    """Test raw and tar output."""
+
+    def test_raw(self):
+        stream = io.BytesIO()
+        write_pipe_outputs([('a.jpg', b'data')], as_tar=False, stream=stream)
+        assert stream.getvalue() == b'data'
+
+    def test_tar(self):
+        stream = io.BytesIO()
+        write_pipe_outputs([('a_1.jpg', b'one'), ('a_2.jpg', b'two')], as_tar=True,
+                           stream=stream)
+        assert _tar_members(stream.getvalue()) == {'a_1.jpg': b'one', 'a_2.jpg': b'two'}
+
+
+class TestPipeCLI:
+    """Test '-' on the command line."""
+
+    def test_resize_stdin_to_stdout(self, temp_dir):
+        code, stdout, stderr = run_ipro('resize', '-', '--width', '800', stdin=_jpeg(),
+                                        cwd=temp_dir)
+        assert code == 0, stderr
+        with Image.open(io.BytesIO(stdout)) as img:
+            assert (img.format, img.size) == ('JPEG', (800, 533))
+        assert list(temp_dir.iterdir()) == []
+
+    def test_convert_to_stdout(self):
+        code, stdout, _ = run_ipro('convert', '-', '-f', 'webp', '-o', '-', stdin=_jpeg())
+        assert code == 0
+        with Image.open(io.BytesIO(stdout)) as img:
+            assert img.format == 'WEBP'
+
+    def test_file_input_to_stdout_tar(self, sample_landscape_image):
+        code, stdout, stderr = run_ipro('resize', str(sample_landscape_image),
+                                        '--width', '100,200,99999', '-o', '-')
+        assert code == 0
+        assert 'Skipped 99999px' in stderr
+        stem = sample_landscape_image.stem
+        assert sorted(_tar_members(stdout)) == [f'{stem}_100.jpg', f'{stem}_200.jpg']
+        assert not (sample_landscape_image.parent / 'resized').exists()
+
+    def test_extract_tar(self):
+        frames = [Image.new('RGB', (32, 24), (i * 60, 0, 0)) for i in range(3)]
+        buffer = io.BytesIO()
+        frames[0].save(buffer, 'GIF', save_all=True, append_images=frames[1:])
+        code, stdout, _ = run_ipro('extract', '-', stdin=buffer.getvalue())
+        assert code == 0
+        assert sorted(_tar_members(stdout)) == ['stdin_001.png', 'stdin_002.png',
+                                                'stdin_003.png']
+
+    def test_info_stdin(self):
+        code, stdout, _ = run_ipro('info', '-', '--json', stdin=_jpeg((60, 40)))
+        assert code == 0
+        info = json.loads(stdout)
+        assert (info['filename'], info['width'], info['height']) == ('-', 60, 40)
+
+    def test_strip_stdin(self):
+        code, stdout, _ = run_ipro('strip', '-', stdin=_jpeg((60, 40)))
+        assert code == 0
+        assert stdout.startswith(b'\xff\xd8')
+
+    @pytest.mark.parametrize('args,stdin,expected_code,message', [
+        (['resize', '-', '--width', '100'], b'not an image', 1, 'Cannot identify'),
+        (['strip', '-'], None, 1, 'only rewrites JPEG'),
+        (['rename', '-', '--ext'], b'', 2, "can't read stdin"),
+        (['convert', '-', '-f', 'png'], b'', 2, 'No input on stdin'),
+        (['convert', '-', '-f', 'gif'], None, 2, 'Unsupported output format'),
+        (['resize', '-', '--width', '100', '+', 'convert', '-f', 'png'], None, 2, 'chain'),
+    ])
+    def test_errors(self, args, stdin, expected_code, message):
+        if stdin is None:
+            buffer = io.BytesIO()
+            Image.new('RGB', (8, 8)).save(buffer, 'PNG')
+            stdin = buffer.getvalue()
+        code, stdout, stderr = run_ipro(*args, stdin=stdin)
+        assert code == expected_code
+        assert message in stderr
+        assert stdout == b''
+
+    def test_resize_stdin_max_pixels(self, monkeypatch, capsysbinary):
+        """--max-pixels admits large stdin inputs, as it does for files."""
+        import ipro
+        monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+        parser = ipro._create_parser()
+        monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.BytesIO(_jpeg((60, 60)))))
+        args = parser.parse_args(['resize', '-', '--width', '30'])
+        with pytest.raises(SystemExit) as exc_info:
+            ipro.run_pipe(args)
+        assert exc_info.value.code == ipro.EXIT_READ_ERROR
+        assert b'pixel limit' in capsysbinary.readouterr().err
+
+        monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.BytesIO(_jpeg((60, 60)))))
+        args = parser.parse_args(['resize', '-', '--width', '30', '--max-pixels', '10000'])
+        ipro.run_pipe(args)
+        with Image.open(io.BytesIO(capsysbinary.readouterr().out)) as img:
+            assert img.size == (30, 30)
@@ -0,0 +1,163 @@
+"""Tests for stage profiling (--profile, --profile-jsonl, IPRO_PROFILE)."""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from ipro import (
+    ImageContext,
+    collect_profile,
+    convert_image,
+    format_profile,
+    profile_active,
+    profile_settings,
+    profile_stage,
+)
+
+
+IMGPRO = str(Path(__file__).parent.parent / 'ipro.py')
+
+
+def run_ipro(*args, env=None):
+    """Run ipro as a subprocess and return (exit_code, stdout, stderr)."""
+    cmd = [sys.executable, IMGPRO] + list(args)
+    result = subprocess.run(cmd, capture_output=True, text=True,
+                            env=dict(os.environ, **(env or {})))
+    return result.returncode, result.stdout, result.stderr
+
+
+@pytest.fixture
+def photo_dir(temp_dir):
+    """A directory with two 800x600 JPEGs."""
+    source = temp_dir / 'photos'
+    source.mkdir()
+    for index in range(2):
+        Image.new('RGB', (800, 600), (index * 90, 60, 30)).save(source / f'p{index}.jpg')
+    return source
+
+
+class TestProfileStage:
+    """Test recording of individual stages."""
+
+    def test_inactive_records_nothing(self, temp_dir):
+        assert not profile_active()
+        with profile_stage('encode', output_path=temp_dir / 'x') as counts:
+            pass
+        assert counts == {}
+
+    def test_records_times_and_bytes(self, sample_square_image, temp_dir):
+        output = temp_dir / 'out.bin'
+        with collect_profile([]) as records:
+            assert profile_active()
+            with profile_stage('copy', 'in.jpg', output, read_path=sample_square_image):
+                output.write_bytes(b'x' * 100)
+            with profile_stage('probe', 'in.jpg') as counts:
+                counts['bytes_read'] = 7
+        assert not profile_active()
+
+        copy, probe = records
+        assert copy['stage'] == 'copy'
+        assert copy['input'] == 'in.jpg'
+        assert copy['output'] == str(output)
+        assert copy['bytes_read'] == sample_square_image.stat().st_size
+        assert copy['bytes_written'] == 100
+        assert copy['wall_s'] >= 0 and copy['cpu_s'] >= 0
+        assert probe['bytes_read'] == 7
+        assert probe['bytes_written'] == 0
+
+    def test_image_context_attributes_stages(self, sample_square_image, temp_dir):
+        output = temp_dir / 'out.png'
+        with collect_profile([]) as records:
+            with ImageContext(sample_square_image) as context:
+                assert convert_image(sample_square_image, output, 'png', context=context)
+            with profile_stage('copy'):
+                pass
+
+        stages = [record['stage'] for record in records]
+        assert stages[:2] == ['open', 'decode']
+        assert 'encode' in stages
+        assert all(record['input'] == str(sample_square_image) for record in records[:-1])
+        assert records[-1]['input'] is None
+        encode = next(record for record in records if record['stage'] == 'encode')
+        assert encode['output'] == str(output)
+        assert encode['bytes_written'] == output.stat().st_size
+
+
+class TestFormatProfile:
+    """Test the summary table."""
+
+    def test_rows_follow_pipeline_order(self):
+        records = [
+            {'stage': 'encode', 'input': 'a', 'output': 'a1', 'wall_s': 0.5, 'cpu_s': 0.4,
+             'bytes_read': 0, 'bytes_written': 2**20},
+            {'stage': 'decode', 'input': 'a', 'output': None, 'wall_s': 0.25, 'cpu_s': 0.2,
+             'bytes_read': 3 * 2**20, 'bytes_written': 0},
+            {'stage': 'encode', 'input': 'b', 'output': 'b1', 'wall_s': 0.25, 'cpu_s': 0.2,
+             'bytes_read': 0, 'bytes_written': 2**20},
+        ]
+        lines = format_profile(records, 2.0).splitlines()
+        assert lines[0] == 'Profile: 2 input(s), 2 output(s), 2.000 s wall'
+        assert lines[2].split() == ['decode', '1', '0.250', '0.200', '3.00', '0.00', '12.5%']
+        assert lines[3].split() == ['encode', '2', '0.750', '0.600', '0.00', '2.00', '37.5%']
+
+
+class TestProfileSettings:
+    """Test --profile, --profile-jsonl and IPRO_PROFILE resolution."""
+
+    @pytest.mark.parametrize('flags,env,expected', [
+        ({}, '', (False, None)),
+        ({'profile': True}, '', (True, None)),
+        ({'profile_jsonl': 'p.jsonl'}, '', (True, 'p.jsonl')),
+        ({}, '1', (True, None)),
+        ({}, '0', (False, None)),
+        ({}, 'env.jsonl', (True, 'env.jsonl')),
+        ({'profile_jsonl': 'p.jsonl'}, 'env.jsonl', (True, 'p.jsonl')),
+    ])
+    def test_settings(self, monkeypatch, flags, env, expected):
+        monkeypatch.setenv('IPRO_PROFILE', env)
+        assert profile_settings(argparse.Namespace(**flags)) == expected
+
+
+class TestProfileCLI:
+    """Test profiling from the command line."""
+
+    def test_profile_prints_summary(self, sample_square_image):
+        code, stdout, stderr = run_ipro('--profile', 'resize', str(sample_square_image),
+                                        '--width', '50,80')
+        assert code == 0
+        assert 'Profile: 1 input(s), 2 output(s)' in stderr
+        for stage in ('open', 'decode', 'resample', 'encode'):
+            assert f"\n  {stage} " in stderr
+        assert 'Profile:' not in stdout
+
+    def test_jsonl_merges_worker_records(self, photo_dir, temp_dir):
+        jsonl = temp_dir / 'profile.jsonl'
+        code, _, stderr = run_ipro('--profile-jsonl', str(jsonl), 'convert', str(photo_dir),
+                                   '--format', 'png', '--jobs', '2')
+        assert code == 0
+        assert 'Profile: 2 input(s), 2 output(s)' in stderr
+
+        records = [json.loads(line) for line in jsonl.read_text().splitlines()]
+        encodes = [record for record in records if record['stage'] == 'encode']
+        assert sorted(Path(record['input']).name for record in encodes) == ['p0.jpg', 'p1.jpg']
+        assert all(record['bytes_written'] > 0 for record in encodes)
+        assert all(record['pid'] != os.getpid() for record in records)
+
+    def test_env_var_profiles_chain(self, sample_square_image):
+        code, _, stderr = run_ipro('--in-memory', 'resize', str(sample_square_image),
+                                   '--width', '50', '+', 'convert', '--format', 'webp',
+                                   env={'IPRO_PROFILE': '1'})
+        assert code == 0
+        assert stderr.count('Profile:') == 1
+        assert '\n  icc ' in stderr
+
+    def test_profile_off_by_default(self, sample_square_image):
+        code, _, stderr = run_ipro('info', str(sample_square_image), env={'IPRO_PROFILE': ''})
+        assert code == 0
+        assert 'Profile:' not in stderr
@@ -476,3 +476,59 @@ class TestResizeOutputFormat:
         assert exit_code != 0
         assert len(stderr) > 0
         assert len(stdout) == 0 or stdout.strip() == ''
+
+
+class TestResizeLargeInputs:
+    """Test --max-pixels and --max-memory."""
+
+    def test_max_pixels_rejects_larger_input(self, temp_dir):
+        """Inputs above --max-pixels are refused as possible bombs."""
+        from .fixtures import create_test_image_file
+
+        img_path = create_test_image_file(1200, 800, directory=temp_dir, filename='test.jpg')
+
+        exit_code, _, stderr = run_ipro_resize(img_path, '--width', '300', '--max-pixels', '500K')
+        assert exit_code == 4
+        assert 'exceeds pixel limit (500,000 pixels)' in stderr
+        assert '--max-pixels' in stderr
+
+        exit_code, _, _ = run_ipro_resize(img_path, '--width', '300', '--max-pixels', '1M')
+        assert exit_code == 0
+
+    def test_max_memory_too_low_fails(self, temp_dir):
+        """A ceiling no DCT scale can meet is reported instead of exceeded."""
+        from .fixtures import create_test_image_file
+
+        img_path = create_test_image_file(1200, 800, directory=temp_dir, filename='test.jpg')
+
+        exit_code, _, stderr = run_ipro_resize(img_path, '--width', '1000', '--max-memory', '1M')
+        assert exit_code != 0
+        assert 'memory ceiling' in stderr
+
+        exit_code, stdout, _ = run_ipro_resize(img_path, '--width', '300', '--max-memory', '1M')
+        assert exit_code == 0
+        assert '(300x200' in stdout
+
+    def test_over_pixel_limit_without_flags(self, temp_dir):
+        """Inputs between the pixel limit and Pillow's hard limit resize as before (no ceiling)."""
+        # 101 MP progressive JPEG: decoding it at full scale needs more than
+        # the 381 MB default ceiling, which must only apply with --max-pixels
+        img_path = temp_dir / 'huge.jpg'
+        Image.new('L', (10100, 10000), 128).save(img_path, progressive=True)
+
+        exit_code, stdout, stderr = run_ipro_resize(img_path, '--width', '6000')
+        assert exit_code == 0, stderr
+        assert '(6000x5940' in stdout
+
+        exit_code, _, stderr = run_ipro_resize(img_path, '--width', '6000',
+                                               '--max-pixels', '200M')
+        assert exit_code != 0
+        assert 'memory ceiling' in stderr
+
+    def test_invalid_max_pixels(self, temp_dir):
+        """Malformed pixel counts are argument errors."""
+        from .fixtures import create_test_image_file
+
+        img_path = create_test_image_file(1200, 800, directory=temp_dir, filename='test.jpg')
+        exit_code, _, _ = run_ipro_resize(img_path, '--width', '300', '--max-pixels', 'lots')
+        assert exit_code == 2
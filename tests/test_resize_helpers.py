@@ -505,3 +505,308 @@ class TestExtractExifExceptionHandling:
         # Should return None, not raise an exception
         result = extract_exif_data(missing_file)
         assert result is None
+
+
+class TestJpegDraftDecoding:
+    """Test reduced-scale JPEG decoding in resize_image."""
+
+    def _make_jpeg(self, path, size):
+        from PIL import Image
+        Image.new('RGB', size, (30, 120, 210)).save(path, 'JPEG')
+        return path
+
+    def test_apply_jpeg_draft_reduces_scale(self, temp_dir):
+        """A small target lets libjpeg decode at 1/4 scale."""
+        from PIL import Image
+        from ipro import apply_jpeg_draft
+
+        path = self._make_jpeg(temp_dir / "big.jpg", (4000, 3000))
+        with Image.open(path) as img:
+            scale = apply_jpeg_draft(img, (300, 225))
+            assert scale == 4
+            assert img.size == (1000, 750)
+
+    def test_apply_jpeg_draft_odd_size(self, temp_dir):
+        """Odd sizes round up when scaled; the scale reported is the one applied."""
+        from PIL import Image
+        from ipro import apply_jpeg_draft
+
+        path = self._make_jpeg(temp_dir / "odd.jpg", (1001, 751))
+        with Image.open(path) as img:
+            assert apply_jpeg_draft(img, (250, 187)) == 2
+            assert img.size == (501, 376)
+
+    def test_apply_jpeg_draft_keeps_headroom(self, temp_dir):
+        """The decoded size never drops below headroom x target."""
+        from PIL import Image
+        from ipro import apply_jpeg_draft, DRAFT_HEADROOM
+
+        path = self._make_jpeg(temp_dir / "big.jpg", (4000, 3000))
+        with Image.open(path) as img:
+            apply_jpeg_draft(img, (900, 675))
+            assert img.size[0] >= 900 * DRAFT_HEADROOM
+
+    def test_apply_jpeg_draft_large_target_is_noop(self, temp_dir):
+        """Targets close to the original size decode at full resolution."""
+        from PIL import Image
+        from ipro import apply_jpeg_draft
+
+        path = self._make_jpeg(temp_dir / "big.jpg", (4000, 3000))
+        with Image.open(path) as img:
+            assert apply_jpeg_draft(img, (3000, 2250)) == 1
+            assert img.size == (4000, 3000)
+
+    def test_apply_jpeg_draft_ignores_png(self, temp_dir):
+        """Non-JPEG images are left untouched."""
+        from PIL import Image
+        from ipro import apply_jpeg_draft
+
+        path = temp_dir / "big.png"
+        Image.new('RGB', (4000, 3000)).save(path, 'PNG')
+        with Image.open(path) as img:
+            assert apply_jpeg_draft(img, (300, 225)) == 1
+            assert img.size == (4000, 3000)
+
+    def test_resize_draft_output_dimensions_match_exact(self, temp_dir):
+        """Draft and full decodes produce identical output dimensions."""
+        path = self._make_jpeg(temp_dir / "big.jpg", (4000, 3000))
+
+        drafted, _ = resize_image(path, temp_dir / "draft", [300, 1000],
+                                  dimension='width', quality=90, draft=True)
+        exact, _ = resize_image(path, temp_dir / "exact", [300, 1000],
+                                dimension='width', quality=90, draft=False)
+
+        assert [(f['width'], f['height']) for f in drafted] == \
+               [(f['width'], f['height']) for f in exact]
+        assert [(f['width'], f['height']) for f in drafted] == [(300, 225), (1000, 750)]
+
+    def test_resize_draft_skip_uses_original_size(self, temp_dir):
+        """Upscaling checks still compare against the full-resolution size."""
+        path = self._make_jpeg(temp_dir / "big.jpg", (4000, 3000))
+
+        created, skipped = resize_image(path, temp_dir / "out", [300, 5000],
+                                        dimension='width', quality=90)
+        assert len(created) == 1
+        assert skipped == [(5000, "original is only 4000px wide")]
+
+
+class TestCascadeResize:
+    """Test cascaded multi-size resizing."""
+
+    def _make_textured_jpeg(self, path, size=(2400, 1600)):
+        from PIL import Image
+        gradient = Image.linear_gradient('L').resize(size)
+        noise = Image.effect_noise(size, 64)
+        radial = Image.radial_gradient('L').resize(size)
+        Image.merge('RGB', (gradient, noise, radial)).save(path, 'JPEG', quality=95)
+        return path
+
+    def test_plan_cascade_largest_first(self):
+        """Sizes are processed in descending order."""
+        from ipro import plan_cascade
+
+        plan = plan_cascade([(400, 300), (1600, 1200), (800, 600)])
+        assert [index for index, _ in plan] == [1, 2, 0]
+
+    def test_plan_cascade_reuses_safe_intermediates(self):
+        """Each size reuses the smallest earlier output that is 2x larger."""
+        from ipro import plan_cascade
+
+        plan = plan_cascade([(2400, 1600), (1600, 1067), (1200, 800), (800, 533), (400, 267)])
+        assert plan == [(0, None), (1, None), (2, 0), (3, 1), (4, 2)]
+
+    def test_plan_cascade_single_size(self):
+        """A single size always comes from the original."""
+        from ipro import plan_cascade
+
+        assert plan_cascade([(300, 200)]) == [(0, None)]
+
+    def test_cascade_preserves_requested_order(self, temp_dir):
+        """created_files follows the requested size order, not processing order."""
+        path = self._make_textured_jpeg(temp_dir / "photo.jpg")
+
+        created, _ = resize_image(path, temp_dir / "out", [400, 1600, 800],
+                                  dimension='width', quality=90, cascade=True)
+        assert [f['width'] for f in created] == [400, 1600, 800]
+
+    def test_cascade_releases_used_intermediates(self):
+        """Each intermediate is dropped once the last size derived from it is done."""
+        import weakref
+        from PIL import Image
+        from ipro import _render_sizes, plan_cascade
+
+        img = Image.new('RGB', (1600, 1200), (90, 120, 30))
+        # Plan: 800 from the original, 350 and 300 from 800, 100 from 300
+        targets = [(w, w, w * 3 // 4) for w in (800, 350, 300, 100)]
+        refs = {}
+        alive_at_emit = {}
+
+        def emit(index, resized_img):
+            alive_at_emit[index] = sorted(i for i, ref in refs.items() if ref() is not None)
+            refs[index] = weakref.ref(resized_img)
+
+        _render_sizes(img, targets, emit, draft=False, cascade=True)
+        assert plan_cascade([(w, h) for _, w, h in targets]) == \
+            [(0, None), (1, 0), (2, 0), (3, 2)]
+        # 800 is held only while 300 still needs it; 300 goes once 100 is made
+        assert alive_at_emit == {0: [], 1: [0], 2: [], 3: []}
+
+    def test_cascade_close_to_direct(self, temp_dir):
+        """Cascaded outputs differ only marginally from direct resampling."""
+        from PIL import Image, ImageChops, ImageStat
+
+        path = self._make_textured_jpeg(temp_dir / "photo.jpg")
+        sizes = [1600, 1200, 800, 400]
+
+        direct, _ = resize_image(path, temp_dir / "direct", sizes,
+                                 dimension='width', quality=95, draft=False)
+        cascaded, _ = resize_image(path, temp_dir / "cascade", sizes,
+                                   dimension='width', quality=95, draft=False, cascade=True)
+
+        for d, c in zip(direct, cascaded):
+            assert (d['width'], d['height']) == (c['width'], c['height'])
+            with Image.open(d['path']) as a, Image.open(c['path']) as b:
+                diff = ImageStat.Stat(ImageChops.difference(a, b)).mean
+                assert max(diff) < 4.0
+
+
+class TestThreadedResize:
+    """Test parallel resampling/encoding of sizes within one resize."""
+
+    def _make_jpeg(self, path, size=(2000, 1500)):
+        from PIL import Image
+        Image.merge('RGB', [Image.effect_noise(size, 40)] * 3).save(path, 'JPEG')
+        return path
+
+    def test_threaded_matches_sequential(self, temp_dir):
+        """Threaded output is byte-identical and in requested order."""
+        path = self._make_jpeg(temp_dir / "photo.jpg")
+        sizes = [300, 1200, 600, 900]
+
+        sequential, _ = resize_image(path, temp_dir / "seq", sizes, quality=85, threads=1)
+        threaded, _ = resize_image(path, temp_dir / "thr", sizes, quality=85, threads=4)
+
+        assert [f['width'] for f in threaded] == sizes
+        for a, b in zip(sequential, threaded):
+            assert a['path'].read_bytes() == b['path'].read_bytes()
+
+    def test_threaded_cascade(self, temp_dir):
+        """Cascade mode also works with a thread pool."""
+        path = self._make_jpeg(temp_dir / "photo.jpg")
+
+        created, _ = resize_image(path, temp_dir / "out", [400, 1600, 800],
+                                  quality=85, cascade=True, threads=3)
+        assert [f['width'] for f in created] == [400, 1600, 800]
+        assert all(f['path'].exists() for f in created)
+
+    def test_resolve_threads_shares_budget(self):
+        """The thread budget is divided between batch workers."""
+        from ipro import resolve_threads
+
+        assert resolve_threads(8) == 8
+        assert resolve_threads(8, workers=4) == 2
+        assert resolve_threads(2, workers=4) == 1
+        assert resolve_threads(0) >= 1
+
+    def test_threads_default_serial(self):
+        """Parallel sizes are opt-in: --threads defaults to 1."""
+        from ipro import _create_parser
+
+        args = _create_parser().parse_args(['resize', 'x.jpg', '--width', '300'])
+        assert args.threads == 1
+
+
+class TestBoundedDecoding:
+    """Test decoding oversized inputs within a memory ceiling."""
+
+    def _make_jpeg(self, path, size=(4000, 3000), progressive=False):
+        from PIL import Image
+        Image.new('RGB', size, (30, 120, 210)).save(path, 'JPEG', progressive=progressive)
+        return path
+
+    def test_parse_pixel_count(self):
+        """Pixel counts take decimal K/M/G suffixes."""
+        from ipro import parse_pixel_count
+
+        assert parse_pixel_count('600M') == 600_000_000
+        assert parse_pixel_count('1.5g') == 1_500_000_000
+        assert parse_pixel_count('250000') == 250_000
+        assert parse_pixel_count('40MP') == 40_000_000
+        for bad in ('', 'lots', '-5M', '0'):
+            with pytest.raises(argparse.ArgumentTypeError):
+                parse_pixel_count(bad)
+
+    def test_decode_memory_counts_progressive_coefficients(self, temp_dir):
+        """Progressive JPEGs keep a full-size coefficient buffer at any scale."""
+        from PIL import Image
+        from ipro import decode_memory
+
+        baseline = self._make_jpeg(temp_dir / "base.jpg")
+        progressive = self._make_jpeg(temp_dir / "prog.jpg", progressive=True)
+        with Image.open(baseline) as img:
+            assert decode_memory(img) == 4000 * 3000 * 4
+            assert decode_memory(img, 4) == 1000 * 750 * 4
+        with Image.open(progressive) as img:
+            assert decode_memory(img, 4) == 1000 * 750 * 4 + 4000 * 3000 * 3
+
+    def test_ceiling_picks_smallest_fitting_reduction(self, temp_dir):
+        """The least reduction that fits the ceiling is used."""
+        from PIL import Image
+        from ipro import apply_bounded_draft
+
+        path = self._make_jpeg(temp_dir / "big.jpg")
+        with Image.open(path) as img:
+            assert apply_bounded_draft(img, (1800, 1350), 16 * 2**20, draft=False) == 2
+            assert img.size == (2000, 1500)
+        with Image.open(path) as img:
+            assert apply_bounded_draft(img, (300, 225), 64 * 2**20, draft=False) == 1
+        with Image.open(path) as img:
+            assert apply_bounded_draft(img, (300, 225), 64 * 2**20) == 4
+
+    def test_ceiling_too_low_raises(self, temp_dir):
+        """No reduction below the target size is taken to meet the ceiling."""
+        from PIL import Image
+        from ipro import apply_bounded_draft
+
+        path = self._make_jpeg(temp_dir / "big.jpg")
+        with Image.open(path) as img:
+            with pytest.raises(OSError, match='memory ceiling'):
+                apply_bounded_draft(img, (3000, 2250), 16 * 2**20)
+
+    def test_resize_with_ceiling_matches_dimensions(self, temp_dir):
+        """Outputs keep their exact size when decoded at a reduced scale."""
+        path = self._make_jpeg(temp_dir / "big.jpg")
+
+        created, _ = resize_image(path, temp_dir / "out", [1800, 600],
+                                  quality=90, draft=False, max_memory=16 * 2**20)
+        assert [(f['width'], f['height']) for f in created] == [(1800, 1350), (600, 450)]
+
+    def test_default_ceiling_needs_max_pixels(self, monkeypatch):
+        """Only inputs admitted by an explicit --max-pixels get the default ceiling."""
+        import argparse
+        import ipro
+        from ipro import resize_memory_ceiling
+
+        monkeypatch.setattr(ipro, 'MAX_IMAGE_PIXELS', 1_000_000)
+        monkeypatch.setattr(ipro, 'DEFAULT_DECODE_MEMORY', 8 * 2**20)
+
+        def args(**options):
+            return argparse.Namespace(**{'max_pixels': None, 'max_memory': None, **options})
+
+        assert resize_memory_ceiling(args(), 2000, 1500) is None
+        assert resize_memory_ceiling(args(max_pixels=10**7), 2000, 1500) == 8 * 2**20
+        assert resize_memory_ceiling(args(max_pixels=10**7), 800, 600) is None
+        assert resize_memory_ceiling(args(max_memory=2**20), 800, 600) == 2**20
+
+    def test_no_ceiling_without_max_memory(self, temp_dir, monkeypatch):
+        """Without a ceiling, large inputs are only drafted to the target size."""
+        import ipro
+
+        path = self._make_jpeg(temp_dir / "big.jpg")
+        monkeypatch.setattr(ipro, 'MAX_IMAGE_PIXELS', 1_000_000)
+        calls = []
+        monkeypatch.setattr(ipro, 'apply_bounded_draft', lambda *a, **kw: calls.append(a))
+
+        created, _ = resize_image(path, temp_dir / "out", [1000], quality=90)
+        assert calls == []
+        assert created[0]['width'] == 1000
@@ -0,0 +1,226 @@
+"""Tests for the persistent server (ipro serve) and its client (--connect)."""
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import pytest
+from pathlib import Path
+from PIL import Image
+from ipro import create_server, close_server, run_client, main
+
+
+IMGPRO = str(Path(__file__).parent.parent / 'ipro.py')
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'),
+                                reason='Unix domain sockets not available')
+
+
+@pytest.fixture
+def socket_path():
+    """A short socket path (AF_UNIX paths are limited to ~100 bytes)."""
+    tmp = tempfile.mkdtemp(prefix='ipro', dir='/tmp')
+    yield Path(tmp) / 's.sock'
+    for entry in Path(tmp).iterdir():
+        entry.unlink()
+    os.rmdir(tmp)
+
+
+@pytest.fixture
+def server(socket_path):
+    """Run a one-worker server in a background thread."""
+    srv = create_server(socket_path, workers=1)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    close_server(srv)
+    thread.join(timeout=5)
+
+
+def _request(path, message):
+    """Send one raw protocol message and return the decoded reply lines."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(str(path))
+        client.sendall(message)
+        client.shutdown(socket.SHUT_WR)
+        data = b''
+        while chunk := client.recv(65536):
+            data += chunk
+    return [json.loads(line) for line in data.decode('utf-8').splitlines()]
+
+
+class TestServeProtocol:
+    """Tests for the JSON-lines protocol spoken by the server."""
+
+    def test_info_request(self, server, socket_path, sample_landscape_image):
+        """A request returns captured stdout and an exit message."""
+        request = {'argv': ['info', str(sample_landscape_image), '--short'], 'cwd': '/'}
+        replies = _request(socket_path, (json.dumps(request) + '\n').encode())
+        assert replies[-1] == {'exit': 0, 'outputs': [str(sample_landscape_image)]}
+        assert 'landscape.jpg,JPEG' in replies[0]['stdout']
+
+    def test_relative_paths_use_client_cwd(self, server, socket_path, sample_landscape_image):
+        """Relative paths are resolved against the client's working directory."""
+        request = {'argv': ['convert', 'landscape.jpg', '--format', 'png'],
+                   'cwd': str(sample_landscape_image.parent)}
+        replies = _request(socket_path, (json.dumps(request) + '\n').encode())
+        assert replies[-1]['exit'] == 0
+        assert (sample_landscape_image.parent / 'converted' / 'landscape.png').exists()
+
+    def test_error_exit_code(self, server, socket_path, temp_dir):
+        """Command failures report the CLI's exit code."""
+        request = {'argv': ['info', str(temp_dir / 'missing.jpg')], 'cwd': '/'}
+        replies = _request(socket_path, (json.dumps(request) + '\n').encode())
+        assert replies[-1]['exit'] == 3
+        assert 'File not found' in replies[0]['stderr']
+
+    def test_output_streamed_in_order(self, server, socket_path, sample_landscape_image,
+                                      temp_dir):
+        """stdout and stderr arrive line by line, interleaved as they were written."""
+        out_dir = temp_dir / 'out'
+        out_dir.mkdir()
+        (out_dir / 'landscape.png').write_bytes(b'old')
+        request = {'argv': ['convert', str(sample_landscape_image), '--format', 'png',
+                            '--output', str(out_dir)], 'cwd': '/'}
+        replies = _request(socket_path, (json.dumps(request) + '\n').encode())
+        assert 'Overwriting' in replies[0]['stderr']
+        assert 'Created' in replies[1]['stdout']
+        assert replies[-1] == {'exit': 0, 'outputs': [str(out_dir / 'landscape.png')]}
+
+    def test_output_sent_while_running(self, sample_landscape_image, monkeypatch):
+        """Each line reaches the client as soon as it is written."""
+        import ipro
+        client, worker = socket.socketpair()
+        received = []
+
+        def fake_main(argv):
+            print('first')
+            client.settimeout(5)
+            received.append(client.recv(65536))
+            print('second', file=sys.stderr)
+            return []
+
+        monkeypatch.setattr(ipro, 'main', fake_main)
+        with client:
+            assert ipro._serve_request(['info', 'x.jpg'], '/', worker) == (0, [], '', '')
+            received.append(client.recv(65536))
+        assert [json.loads(line) for line in received] == [{'stdout': 'first\n'},
+                                                          {'stderr': 'second\n'}]
+
+    def test_malformed_request(self, server, socket_path):
+        """A request that is not valid JSON is rejected with exit code 2."""
+        replies = _request(socket_path, b'not json\n')
+        assert replies[-1]['exit'] == 2
+
+    def test_nested_serve_rejected(self, server, socket_path):
+        """serve cannot be started through a server."""
+        request = {'argv': ['serve', '--socket', '/tmp/other.sock'], 'cwd': '/'}
+        replies = _request(socket_path, (json.dumps(request) + '\n').encode())
+        assert replies[-1]['exit'] == 2
+
+    @pytest.mark.parametrize('argv', [
+        ['--profile', 'http', '--root', '/'],
+        ['--in-memory', 'serve', '--socket', '/tmp/other.sock'],
+        ['--profile-jsonl', '/tmp/p.jsonl', 'http'],
+        ['info', 'x.jpg', '+', 'http'],
+        ['info', 'x.jpg', '--connect=/tmp/other.sock'],
+    ])
+    def test_server_commands_rejected_after_options(self, argv):
+        """Server commands are found wherever they appear on the command line."""
+        from ipro import _serve_request
+        code, _, _, err = _serve_request(argv, '/')
+        assert code == 2
+        assert 'cannot be used through a server' in err
+
+    def test_file_named_like_command_allowed(self, temp_dir):
+        """A file called 'http' is not mistaken for the subcommand."""
+        from ipro import _serve_request
+        code, _, _, err = _serve_request(['info', 'http'], str(temp_dir))
+        assert code == 3
+        assert 'through a server' not in err
+
+    def test_socket_created_private(self, socket_path, monkeypatch):
+        """The socket is bound under a restrictive umask, not only chmod-ed afterwards."""
+        import socketserver
+        modes = []
+        original = socketserver.UnixStreamServer.server_bind
+
+        def bind(self):
+            original(self)
+            modes.append(os.stat(self.server_address).st_mode & 0o777)
+
+        monkeypatch.setattr(socketserver.UnixStreamServer, 'server_bind', bind)
+        previous = os.umask(0o022)
+        try:
+            srv = create_server(socket_path, workers=1)
+        finally:
+            os.umask(previous)
+        close_server(srv)
+        assert modes == [0o600]
+
+    def test_refuses_live_socket(self, server, socket_path):
+        """A second server cannot take over a socket that is in use."""
+        with pytest.raises(OSError):
+            create_server(socket_path, workers=1)
+
+
+class TestConnectClient:
+    """Tests for run_client() and the --connect flag."""
+
+    def test_run_client_chain(self, server, socket_path, sample_landscape_image, temp_dir, capsys):
+        """A chain runs on the server with output replayed locally."""
+        code = run_client(socket_path, [
+            'resize', str(sample_landscape_image), '--width', '300',
+            '--output', str(temp_dir / 'resized'),
+            '+', 'convert', '--format', 'webp', '--output', str(temp_dir / 'converted'),
+        ])
+        assert code == 0
+        assert 'Created' in capsys.readouterr().out
+        assert (temp_dir / 'converted' / 'landscape.webp').exists()
+
+    def test_run_client_no_server(self, socket_path, capsys):
+        """Connecting to a missing server is a read error."""
+        assert run_client(socket_path, ['info', 'x.jpg']) == 4
+        assert 'Cannot connect' in capsys.readouterr().err
+
+    def test_connect_flag(self, server, socket_path, sample_landscape_image):
+        """ipro --connect SOCKET ... exits with the server's exit code."""
+        result = subprocess.run(
+            [sys.executable, IMGPRO, '--connect', str(socket_path),
+             'info', str(sample_landscape_image), '--short'],
+            capture_output=True, text=True,
+        )
+        assert result.returncode == 0
+        assert 'landscape.jpg,JPEG' in result.stdout
+
+    def test_connect_requires_path(self):
+        """--connect without a socket path is an argument error."""
+        with pytest.raises(SystemExit) as exc_info:
+            main(['--connect'])
+        assert exc_info.value.code == 2
+
+
+class TestServeCli:
+    """Tests for starting and stopping ipro serve."""
+
+    def test_serve_removes_socket_on_sigterm(self, socket_path, sample_landscape_image):
+        """serve listens on the socket and cleans it up on SIGTERM."""
+        proc = subprocess.Popen(
+            [sys.executable, IMGPRO, 'serve', '--socket', str(socket_path), '--workers', '1'],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+        try:
+            for _ in range(100):
+                if socket_path.exists():
+                    break
+                time.sleep(0.05)
+            assert socket_path.exists()
+            assert oct(socket_path.stat().st_mode & 0o777) == oct(0o600)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+        assert not socket_path.exists()
@@ -0,0 +1,314 @@
+"""Tests for JPEG metadata rewriting without re-encoding (strip command, convert fast path)."""
+
+import subprocess
+import sys
+from pathlib import Path
+from unittest import mock
+
+import pytest
+from PIL import Image, ImageCms
+
+import ipro
+from ipro import (
+    blank_gps_ifd,
+    convert_image,
+    srgb_profile_bytes,
+    strip_jpeg_metadata,
+    _jpeg_header_segments,
+)
+
+
+IMGPRO = str(Path(__file__).parent.parent / 'ipro.py')
+
+
+def run_ipro(*args):
+    """Run ipro as a subprocess and return (exit_code, stdout, stderr)."""
+    cmd = [sys.executable, IMGPRO] + list(args)
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    return result.returncode, result.stdout, result.stderr
+
+
+XMP_PACKET = (b'<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF>'
+              b'<rdf:Description exif:GPSLatitude="40,26.767N"/></rdf:RDF></x:xmpmeta>')
+
+
+def _make_exif(gps=True):
+    exif = Image.Exif()
+    exif[0x010F] = 'TestCam'          # Make
+    exif[0x0112] = 1                  # Orientation
+    exif[0x0132] = '2024:11:12 14:30:00'
+    if gps:
+        exif[0x8825] = {1: 'N', 2: (40.0, 26.0, 46.0), 3: 'W', 4: (79.0, 58.0, 56.0)}
+    return exif
+
+
+@pytest.fixture
+def jpeg_with_metadata(temp_dir):
+    """A JPEG carrying EXIF (with GPS), XMP, a comment and an ICC profile."""
+    path = temp_dir / 'meta.jpg'
+    img = Image.new('RGB', (64, 48))
+    for x in range(64):
+        for y in range(48):
+            img.putpixel((x, y), (x * 4, y * 5, (x + y) * 2))
+    img.save(path, 'JPEG', quality=90, exif=_make_exif(), xmp=XMP_PACKET,
+             comment=b'hello', icc_profile=srgb_profile_bytes())
+    return path
+
+
+def _scan_data(path):
+    data = Path(path).read_bytes()
+    return data[_jpeg_header_segments(data)[1]:]
+
+
+def _pixels(path):
+    with Image.open(path) as img:
+        return img.convert('RGB').tobytes()
+
+
+class TestBlankGpsIfd:
+    """Test in-place blanking of the EXIF GPS directory."""
+
+    def test_blanks_gps_and_keeps_other_tags(self):
+        payload = _make_exif().tobytes()
+        blanked, removed = blank_gps_ifd(payload)
+        assert removed is True
+        assert len(blanked) == len(payload)
+
+        exif = Image.Exif()
+        exif.load(blanked)
+        assert exif[0x010F] == 'TestCam'
+        assert exif[0x0132] == '2024:11:12 14:30:00'
+        assert not exif.get_ifd(0x8825)
+        assert b'N\x00' not in blanked[blanked.index(b'TestCam'):]
+
+    def test_big_endian(self):
+        exif = _make_exif()
+        exif.endian = '>'
+        blanked, removed = blank_gps_ifd(exif.tobytes())
+        assert removed is True
+        reloaded = Image.Exif()
+        reloaded.load(blanked)
+        assert not reloaded.get_ifd(0x8825)
+
+    def test_no_gps_is_unchanged(self):
+        payload = _make_exif(gps=False).tobytes()
+        assert blank_gps_ifd(payload) == (payload, False)
+
+    def test_malformed_raises(self):
+        with pytest.raises(ValueError):
+            blank_gps_ifd(b'Exif\x00\x00II*\x00\xff\xff\xff\x00')
+        with pytest.raises(ValueError):
+            blank_gps_ifd(b'not exif')
+
+
+class TestStripJpegMetadata:
+    """Test the segment-level JPEG rewriter."""
+
+    def test_default_removes_metadata_keeps_icc(self, jpeg_with_metadata, temp_dir):
+        output = temp_dir / 'out.jpg'
+        strip_jpeg_metadata(jpeg_with_metadata, output)
+
+        with Image.open(output) as img:
+            assert not img.getexif()
+            assert 'xmp' not in img.info
+            assert 'comment' not in img.info
+            assert img.info['icc_profile'] == srgb_profile_bytes()
+        assert _scan_data(output) == _scan_data(jpeg_with_metadata)
+        assert _pixels(output) == _pixels(jpeg_with_metadata)
+
+    def test_no_gps_keeps_exif(self, jpeg_with_metadata, temp_dir):
+        output = temp_dir / 'out.jpg'
+        assert strip_jpeg_metadata(jpeg_with_metadata, output, exif='no-gps') is True
+
+        with Image.open(output) as img:
+            exif = img.getexif()
+            assert exif[0x010F] == 'TestCam'
+            assert not exif.get_ifd(0x8825)
+
+    def test_keep_other_drops_gps_xmp_only(self, jpeg_with_metadata, temp_dir):
+        output = temp_dir / 'out.jpg'
+        strip_jpeg_metadata(jpeg_with_metadata, output, exif='no-gps', keep_other=True)
+
+        with Image.open(output) as img:
+            assert img.info.get('comment') == b'hello'
+            assert 'xmp' not in img.info  # The XMP packet carries GPS
+
+    def test_replace_and_remove_icc(self, jpeg_with_metadata, temp_dir):
+        profile = ImageCms.ImageCmsProfile(ImageCms.createProfile('LAB')).tobytes()
+        replaced = temp_dir / 'replaced.jpg'
+        strip_jpeg_metadata(jpeg_with_metadata, replaced, icc_profile=profile)
+        with Image.open(replaced) as img:
+            assert img.info['icc_profile'] == profile
+
+        removed = temp_dir / 'removed.jpg'
+        strip_jpeg_metadata(jpeg_with_metadata, removed, icc_profile=None)
+        with Image.open(removed) as img:
+            assert 'icc_profile' not in img.info
+
+    def test_adds_icc_to_jpeg_without_one(self, sample_square_image, temp_dir):
+        output = temp_dir / 'out.jpg'
+        strip_jpeg_metadata(sample_square_image, output, icc_profile=srgb_profile_bytes())
+        with Image.open(output) as img:
+            assert img.info['icc_profile'] == srgb_profile_bytes()
+        assert _pixels(output) == _pixels(sample_square_image)
+
+    def test_large_icc_profile_is_chunked(self, sample_square_image, temp_dir):
+        profile = srgb_profile_bytes() + bytes(150000)
+        output = temp_dir / 'out.jpg'
+        strip_jpeg_metadata(sample_square_image, output, icc_profile=profile)
+        with Image.open(output) as img:
+            assert img.info['icc_profile'] == profile
+
+    def test_not_jpeg_raises(self, sample_png_image, temp_dir):
+        with pytest.raises(ValueError):
+            strip_jpeg_metadata(sample_png_image, temp_dir / 'out.jpg')
+
+
+class TestGpsNote:
+    """Test the note printed when convert drops GPS data."""
+
+    def test_names_existing_option(self, jpeg_with_metadata, temp_dir, capsys):
+        assert convert_image(jpeg_with_metadata, temp_dir / 'out.png', 'png') is True
+        err = capsys.readouterr().err
+        assert err.count(ipro.GPS_STRIPPED_NOTE) == 1
+        assert '--strip-exif' in err
+        option_strings = {option for action in ipro._create_parser()._subparsers._group_actions[0]
+                          .choices['convert']._actions for option in action.option_strings}
+        assert '--strip-exif' in option_strings
+
+
+class TestConvertFastPath:
+    """Test that JPEG-to-JPEG convert rewrites metadata instead of re-encoding."""
+
+    def test_unspecified_quality_skips_decode(self, jpeg_with_metadata, temp_dir, capsys):
+        output = temp_dir / 'out.jpg'
+        with mock.patch.object(ipro, 'prepare_for_format') as prepare:
+            assert convert_image(jpeg_with_metadata, output, 'jpeg') is True
+        prepare.assert_not_called()
+        assert 'GPS metadata stripped' in capsys.readouterr().err
+
+        assert _scan_data(output) == _scan_data(jpeg_with_metadata)
+        with Image.open(output) as img:
+            exif = img.getexif()
+            assert exif[0x010F] == 'TestCam'
+            assert not exif.get_ifd(0x8825)
+            assert img.info['icc_profile'] == srgb_profile_bytes()
+
+    def test_matching_quality_skips_decode(self, jpeg_with_metadata, temp_dir):
+        output = temp_dir / 'out.jpg'
+        with mock.patch.object(ipro, 'prepare_for_format') as prepare:
+            assert convert_image(jpeg_with_metadata, output, 'jpeg', quality=90,
+                                 strip_exif=True) is True
+        prepare.assert_not_called()
+        with Image.open(output) as img:
+            assert not img.getexif()
+
+    def test_equivalent_srgb_profile_skips_decode(self, temp_dir):
+        from .fixtures import create_sampled_srgb_profile
+        source = temp_dir / 'stock.jpg'
+        Image.new('RGB', (16, 16), (200, 40, 40)).save(
+            source, 'JPEG', icc_profile=create_sampled_srgb_profile())
+        output = temp_dir / 'out.jpg'
+        with mock.patch.object(ipro, 'prepare_for_format') as prepare:
+            assert convert_image(source, output, 'jpeg') is True
+        prepare.assert_not_called()
+        with Image.open(output) as img:
+            assert img.info['icc_profile'] == srgb_profile_bytes()
+
+    def test_different_quality_reencodes(self, jpeg_with_metadata, temp_dir):
+        output = temp_dir / 'out.jpg'
+        assert convert_image(jpeg_with_metadata, output, 'jpeg', quality=50) is True
+        assert _scan_data(output) != _scan_data(jpeg_with_metadata)
+        with Image.open(output) as img, Image.open(jpeg_with_metadata) as source:
+            assert img.quantization != source.quantization
+
+    def test_foreign_icc_profile_reencodes(self, temp_dir):
+        from .fixtures import create_swapped_primaries_profile
+        source = temp_dir / 'foreign.jpg'
+        profile = create_swapped_primaries_profile()
+        Image.new('RGB', (16, 16), (200, 40, 40)).save(source, 'JPEG', icc_profile=profile)
+        output = temp_dir / 'out.jpg'
+        with mock.patch.object(ipro, 'prepare_for_format',
+                               wraps=ipro.prepare_for_format) as prepare:
+            assert convert_image(source, output, 'jpeg') is True
+        prepare.assert_called_once()
+
+    def test_png_target_reencodes(self, jpeg_with_metadata, temp_dir):
+        output = temp_dir / 'out.png'
+        assert convert_image(jpeg_with_metadata, output, 'png') is True
+        with Image.open(output) as img:
+            assert img.format == 'PNG'
+
+
+class TestStripCLI:
+    """Test the strip subcommand."""
+
+    def test_strip_default(self, jpeg_with_metadata, temp_dir):
+        exit_code, stdout, _ = run_ipro('strip', str(jpeg_with_metadata))
+        assert exit_code == 0
+        output = temp_dir / 'stripped' / 'meta.jpg'
+        assert f"Created: {output}" in stdout
+        with Image.open(output) as img:
+            assert not img.getexif()
+            assert 'xmp' not in img.info
+        assert _pixels(output) == _pixels(jpeg_with_metadata)
+
+    def test_strip_gps_only(self, jpeg_with_metadata, temp_dir):
+        out_dir = temp_dir / 'clean'
+        exit_code, stdout, _ = run_ipro('strip', str(jpeg_with_metadata), '--gps-only',
+                                        '--output', str(out_dir))
+        assert exit_code == 0
+        assert 'GPS removed' in stdout
+        with Image.open(out_dir / 'meta.jpg') as img:
+            assert img.getexif()[0x010F] == 'TestCam'
+            assert img.info.get('comment') == b'hello'
+            assert not img.getexif().get_ifd(0x8825)
+
+    def test_strip_icc(self, jpeg_with_metadata, temp_dir):
+        exit_code, _, _ = run_ipro('strip', str(jpeg_with_metadata), '--keep-exif', '--strip-icc')
+        assert exit_code == 0
+        with Image.open(temp_dir / 'stripped' / 'meta.jpg') as img:
+            assert 'icc_profile' not in img.info
+            assert img.getexif()[0x010F] == 'TestCam'
+
+    def test_strip_rejects_non_jpeg(self, sample_png_image):
+        exit_code, _, stderr = run_ipro('strip', str(sample_png_image))
+        assert exit_code == 1
+        assert 'only rewrites JPEG' in stderr
+
+    def test_strip_refuses_to_overwrite_input(self, jpeg_with_metadata, temp_dir):
+        exit_code, _, stderr = run_ipro('strip', str(jpeg_with_metadata), '--output', str(temp_dir))
+        assert exit_code == 2
+        assert 'overwrite the input' in stderr
+
+    def test_strip_in_memory_chain_falls_back_to_files(self, jpeg_with_metadata, temp_dir):
+        exit_code, stdout, stderr = run_ipro('--in-memory', 'resize', str(jpeg_with_metadata),
+                                             '--width', '32', '+', 'strip')
+        assert exit_code == 0, stderr
+        assert 'cannot run in memory' in stderr
+        assert 'Created:' in stdout
+
+    def test_strip_opens_input_once(self, jpeg_with_metadata, temp_dir, monkeypatch):
+        opens = []
+        original_open = Image.open
+        monkeypatch.setattr(Image, 'open',
+                            lambda fp, *a, **k: opens.append(fp) or original_open(fp, *a, **k))
+        args = ipro._create_parser().parse_args(['strip', str(jpeg_with_metadata),
+                                                 '--output', str(temp_dir / 'out')])
+        assert args.func(args) == [str(temp_dir / 'out' / 'meta.jpg')]
+        assert opens == [jpeg_with_metadata]
+
+    def test_strip_max_pixels(self, jpeg_with_metadata, temp_dir, monkeypatch, capsys):
+        monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+        parser = ipro._create_parser()
+        args = parser.parse_args(['strip', str(jpeg_with_metadata),
+                                  '--output', str(temp_dir / 'out')])
+        with pytest.raises(SystemExit) as exc_info:
+            args.func(args)
+        assert exc_info.value.code == ipro.EXIT_READ_ERROR
+        assert 'use --max-pixels' in capsys.readouterr().err
+
+        args = parser.parse_args(['strip', str(jpeg_with_metadata), '--max-pixels', '5000',
+                                  '--output', str(temp_dir / 'out')])
+        assert args.func(args) == [str(temp_dir / 'out' / 'meta.jpg')]
+        assert Image.MAX_IMAGE_PIXELS == 1000